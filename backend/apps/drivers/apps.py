@@ -5,3 +5,6 @@ class DriversConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.drivers'
     verbose_name = '驱动管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
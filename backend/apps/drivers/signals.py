@@ -0,0 +1,7 @@
+"""
+驱动列表缓存失效
+"""
+from services.query_cache import invalidate_on_change
+from .models import Driver
+
+invalidate_on_change(Driver, 'drivers')
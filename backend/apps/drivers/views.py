@@ -5,6 +5,8 @@ from rest_framework.permissions import AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Driver
 from .serializers import DriverSerializer
+from services.query_cache import cached_view
+import shutil
 import subprocess
 import sys
 
@@ -17,7 +19,16 @@ class DriverViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['framework', 'browser', 'is_recommended']
     search_fields = ['description']
 
+    @cached_view('drivers', per_user=False)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_view('drivers', per_user=False)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
+    @cached_view('drivers', per_user=False)
     def recommended(self, request):
         """获取推荐的驱动"""
         drivers = self.queryset.filter(is_recommended=True)
@@ -45,17 +56,12 @@ class DriverViewSet(viewsets.ReadOnlyModelViewSet):
                 result['version'] = selenium.__version__
                 result['message'] = 'Selenium已安装'
 
-                # 检查ChromeDriver
-                try:
-                    from selenium import webdriver
-                    from selenium.webdriver.chrome.service import Service
-                    from webdriver_manager.chrome import ChromeDriverManager
-                    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()))
-                    driver.quit()
-                    result['chrome_driver'] = True
-                except Exception as e:
-                    result['chrome_driver'] = False
-                    result['message'] += f'\nChromeDriver检查失败: {str(e)}'
+                # 检查ChromeDriver（只查找驱动文件，不启动浏览器，也不触发驱动下载）
+                chrome_driver_path = shutil.which('chromedriver')
+                result['chrome_driver'] = bool(chrome_driver_path)
+                result['chrome_driver_path'] = chrome_driver_path
+                if not chrome_driver_path:
+                    result['message'] += '\n未在PATH中找到ChromeDriver，执行机会在首次执行时自动解析并缓存驱动'
 
             elif framework == 'playwright':
                 import playwright
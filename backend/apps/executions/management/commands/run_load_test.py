@@ -0,0 +1,73 @@
+"""
+API 脚本压测管理命令
+
+使用多个虚拟用户重复执行 httprunner 脚本，结果写入执行记录并生成报告:
+    python manage.py run_load_test 12 --users 50 --duration 120 --spawn-rate 10
+    python manage.py run_load_test 12 --users 20 --arrival-rate 100 --duration 60
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.executions.models import Execution
+from apps.scripts.models import Script
+from engine.executor import TestExecutor
+
+
+class Command(BaseCommand):
+    help = '以压测模式执行 API 脚本，统计延迟分位数、吞吐量和错误率'
+
+    def add_arguments(self, parser):
+        parser.add_argument('script_id', type=int, help='API 脚本ID')
+        parser.add_argument('--users', type=int, default=10, help='虚拟用户数（默认10，每个虚拟用户一个线程，上限 500）')
+        parser.add_argument('--duration', type=float, default=0, help='压测时长（秒）')
+        parser.add_argument('--iterations', type=int, default=0, help='场景总执行次数')
+        parser.add_argument(
+            '--arrival-rate',
+            type=float,
+            default=0,
+            help='每秒发起的场景数，设置后为开环模式，虚拟用户全部繁忙时丢弃',
+        )
+        parser.add_argument('--spawn-rate', type=float, default=0, help='每秒启动的虚拟用户数（默认同时启动）')
+        parser.add_argument('--think-time', type=float, default=0, help='闭环模式下两次场景之间的等待时间（秒）')
+
+    def handle(self, *args, **options):
+        try:
+            script = Script.objects.get(id=options['script_id'])
+        except Script.DoesNotExist:
+            raise CommandError(f"脚本 ID {options['script_id']} 不存在")
+
+        if script.framework != 'httprunner':
+            raise CommandError(f'压测模式仅支持 API 脚本，当前框架: {script.framework}')
+
+        load_test = {
+            'users': options['users'],
+            'duration': options['duration'],
+            'iterations': options['iterations'],
+            'arrival_rate': options['arrival_rate'],
+            'spawn_rate': options['spawn_rate'],
+            'think_time': options['think_time'],
+        }
+
+        execution = Execution.objects.create(
+            execution_type='script',
+            script=script,
+            status='pending',
+            created_by=script.created_by
+        )
+        self.stdout.write(f'开始压测: 脚本={script.name}, 执行ID={execution.id}, 参数={load_test}')
+
+        TestExecutor(execution, load_test=load_test).run()
+
+        execution.refresh_from_db()
+        stats = (execution.result or {}).get('load_test')
+        if not stats:
+            raise CommandError(f"压测失败: {(execution.result or {}).get('error', '未知错误')}")
+
+        latency = stats['latency']
+        self.stdout.write(
+            f"场景: {stats['iterations']} 次 (失败 {stats['failed_iterations']}, 丢弃 {stats['dropped_iterations']}), "
+            f"请求: {stats['requests']}, 吞吐量: {stats['throughput']}/s, 错误率: {stats['error_rate']}%"
+        )
+        self.stdout.write(
+            f"响应时间(ms): 平均 {latency['mean']}, p50 {latency['p50']}, "
+            f"p90 {latency['p90']}, p99 {latency['p99']}, 最大 {latency['max']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'[SUCCESS] 压测完成，执行ID={execution.id}'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executions', '0006_execution_display_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='execution',
+            index=models.Index(fields=['parent', 'status'], name='execution_parent_status_idx'),
+        ),
+    ]
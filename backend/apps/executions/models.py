@@ -97,6 +97,10 @@ class Execution(models.Model):
         verbose_name = '执行记录'
         verbose_name_plural = '执行记录'
         ordering = ['-created_at']
+        indexes = [
+            # 计划执行按父执行统计子执行状态
+            models.Index(fields=['parent', 'status'], name='execution_parent_status_idx'),
+        ]
 
     def __str__(self):
         if self.execution_type == 'plan':
@@ -157,9 +161,10 @@ class Execution(models.Model):
                     date_prefix = now.strftime('%Y%m%d')  # 8位
 
                     # 使用 select_for_update 锁定查询，防止并发冲突
+                    # display_id 全局唯一，序号不按执行类型区分，否则计划和脚本执行会取到相同的序号
                     max_display_id = Execution.objects.filter(
                         display_id__startswith=date_prefix,
-                        execution_type=self.execution_type
+                        display_id__regex=r'^\d{11}$'
                     ).select_for_update().order_by('-display_id').values_list('display_id', flat=True).first()
 
                     if max_display_id:
@@ -40,6 +40,12 @@ class ExecutionCreateSerializer(serializers.Serializer):
         default='parallel',
         required=False
     )
+    # 数据驱动脚本按数据行分片到多台执行机并行执行
+    shard_data = serializers.BooleanField(default=False, required=False)
+    # 计划执行：上次失败和最近失败率高的脚本优先调度
+    prioritize_failures = serializers.BooleanField(default=False, required=False)
+    # 计划执行：失败的脚本数达到该值时取消其余子任务
+    fail_fast = serializers.IntegerField(min_value=1, required=False, allow_null=True)
 
     def validate(self, attrs):
         if not attrs.get('plan_id') and not attrs.get('script_id'):
@@ -0,0 +1,166 @@
+"""
+执行模块单元测试
+"""
+import os
+
+from django.test import TestCase
+from apps.users.models import User
+
+
+class ArtifactRetentionTest(TestCase):
+    """执行产物保留与清理测试"""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from apps.projects.models import Project
+        from apps.scripts.models import Script
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.screenshots_root = os.path.join(self.tmpdir, 'screenshots')
+        os.makedirs(self.screenshots_root)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir,
+            SCREENSHOTS_ROOT=self.screenshots_root,
+            REPORTS_ROOT=os.path.join(self.tmpdir, 'reports'),
+            EXECUTION_LOGS_ROOT=os.path.join(self.tmpdir, 'execution_logs'),
+        )
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='retention', email='retention@example.com',
+                                             password='testpass123')
+        self.project = Project.objects.create(name='清理项目', creator=self.user)
+        self.script = Script.objects.create(project=self.project, name='清理脚本', type='api',
+                                            framework='httprunner', created_by=self.user)
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _file(self, name, age_days=10):
+        """在截图目录创建文件，返回 /media/ URL"""
+        import time
+        path = os.path.join(self.screenshots_root, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return f'/media/screenshots/{name}'
+
+    def _run(self, status='completed', age_days=10, image=None, result=None):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.executions.models import Execution
+        from apps.reports.models import Screenshot
+
+        execution = Execution.objects.create(execution_type='script', script=self.script, status=status,
+                                             result=result or {}, created_by=self.user)
+        Execution.objects.filter(id=execution.id).update(created_at=timezone.now() - timedelta(days=age_days))
+        if image:
+            Screenshot.objects.create(execution=execution, step_index=0, image_path=image, file_size=100)
+        return execution
+
+    def _path(self, url):
+        return os.path.join(self.tmpdir, *url[len('/media/'):].split('/'))
+
+    def _log_file(self, name, age_days=10):
+        """在执行日志目录创建日志文件，返回文件路径"""
+        import time
+        logs_root = os.path.join(self.tmpdir, 'execution_logs')
+        os.makedirs(logs_root, exist_ok=True)
+        path = os.path.join(logs_root, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 50)
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_select_runs_to_evict(self):
+        """测试保留最近执行，失败执行保留更久，没有产物的执行不淘汰"""
+        from apps.reports.models import RetentionPolicy
+        from services.artifact_retention import ArtifactRetention
+
+        policy = RetentionPolicy(keep_last_runs=1, keep_days=7, keep_failed_days=30)
+        old_ok = self._run(image=self._file('ok.png'))
+        self._run(status='failed', image=self._file('failed.png'))
+        self._run()
+        self._run(age_days=0, image=self._file('latest.png'))
+
+        self.assertEqual(ArtifactRetention().select_runs_to_evict(self.project, policy), [old_ok.id])
+
+    def test_dry_run_counts_shared_files_once(self):
+        """测试 dry_run 不删除文件和记录，多次执行共享的截图只统计一次"""
+        from apps.reports.models import RetentionPolicy, Screenshot
+        from services.artifact_retention import ArtifactRetention
+
+        RetentionPolicy.objects.create(keep_last_runs=0, keep_days=7, keep_failed_days=7)
+        shared = self._file('shared.png')
+        for _ in range(3):
+            self._run(image=shared)
+
+        stats = ArtifactRetention(dry_run=True, batch_size=1).run()
+        self.assertEqual((stats['runs_evicted'], stats['files_deleted'], stats['bytes_freed']), (3, 1, 100))
+        self.assertTrue(os.path.exists(self._path(shared)))
+        self.assertEqual(Screenshot.objects.count(), 3)
+
+        stats = ArtifactRetention(batch_size=1).run()
+        self.assertEqual((stats['runs_evicted'], stats['files_deleted'], stats['bytes_freed']), (3, 1, 100))
+        self.assertFalse(os.path.exists(self._path(shared)))
+        self.assertEqual(Screenshot.objects.count(), 0)
+
+    def test_sweep_orphan_files_keeps_referenced(self):
+        """测试孤儿文件清理保留被截图记录和旧版本执行结果引用的文件以及新文件"""
+        from services.artifact_retention import ArtifactRetention
+
+        orphan = self._file('orphan.png')
+        recent = self._file('recent.png', age_days=0)
+        referenced = self._file('referenced.png')
+        legacy_list = self._file('legacy_list.png')
+        legacy_failure = self._file('legacy_failure.png')
+        self._run(age_days=0, image=referenced, result={
+            'screenshots': [{'step': 1, 'path': legacy_list}],
+            'failure_screenshot': legacy_failure,
+        })
+
+        ArtifactRetention().sweep_orphan_files(grace_days=1)
+
+        self.assertFalse(os.path.exists(self._path(orphan)))
+        for url in (recent, referenced, legacy_list, legacy_failure):
+            self.assertTrue(os.path.exists(self._path(url)), url)
+
+    def test_evict_deletes_execution_log_file(self):
+        """测试淘汰执行时删除完整日志文件并移除结果中的 log_file，只有日志文件的执行也会淘汰"""
+        from apps.executions.models import Execution
+        from apps.reports.models import RetentionPolicy
+        from services.artifact_retention import ArtifactRetention
+
+        RetentionPolicy.objects.create(keep_last_runs=0, keep_days=7, keep_failed_days=7)
+        log_file = self._log_file('execution_1.log.gz')
+        outside = os.path.join(self.tmpdir, 'outside.log.gz')
+        with open(outside, 'wb') as f:
+            f.write(b'x')
+        logged = self._run(result={'logs': [], 'log_file': log_file})
+        escaped = self._run(result={'log_file': outside})
+
+        stats = ArtifactRetention().run()
+
+        self.assertEqual((stats['runs_evicted'], stats['files_deleted'], stats['bytes_freed']), (1, 1, 50))
+        self.assertFalse(os.path.exists(log_file))
+        self.assertEqual(Execution.objects.get(id=logged.id).result, {'logs': []})
+        # 执行日志目录以外的路径不处理
+        self.assertTrue(os.path.exists(outside))
+        self.assertEqual(Execution.objects.get(id=escaped.id).result, {'log_file': outside})
+
+    def test_sweep_orphan_execution_logs(self):
+        """测试孤儿文件清理包含执行日志目录，保留被执行结果引用的日志文件"""
+        from services.artifact_retention import ArtifactRetention
+
+        orphan = self._log_file('execution_2.log.gz')
+        referenced = self._log_file('execution_3.log.gz')
+        self._run(age_days=0, result={'log_file': referenced})
+
+        ArtifactRetention().sweep_orphan_files(grace_days=1)
+
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(referenced))
@@ -3,11 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.http import FileResponse
 from django.utils import timezone
 from datetime import datetime
 from .models import Execution
 from .serializers import ExecutionSerializer, ExecutionCreateSerializer
+from apps.scripts.modules import ModuleReferenceError, get_module_resolver
 from apps.users.permissions import IsExecutionOwnerOrAdmin
+import os
 import time
 import logging
 
@@ -78,6 +82,9 @@ class ExecutionViewSet(viewsets.ModelViewSet):
         script_id = serializer.validated_data.get('script_id')
         executor_id = serializer.validated_data.get('executor_id')
         execution_mode = serializer.validated_data.get('execution_mode', 'parallel')
+        shard_data = serializer.validated_data.get('shard_data', False)
+        prioritize_failures = serializer.validated_data.get('prioritize_failures', False)
+        fail_fast = serializer.validated_data.get('fail_fast')
 
         # 如果是计划执行，创建父子执行记录结构
         if plan_id and not script_id:
@@ -100,12 +107,31 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # 创建父执行记录（计划执行）
+            # 创建执行记录前检查模块引用，展开结果会被缓存，下发任务时直接复用
+            scripts_list = list(scripts)  # 转换为列表以支持多次迭代
+            error_response = self._check_modules(scripts_list)
+            if error_response:
+                return error_response
+
+            # 按历史耗时预估调度顺序：并行执行时预估耗时最长的脚本先创建任务、先分发
+            # 失败优先时上次失败和最近失败率高的脚本最先调度（需在创建本次父执行记录前计算）
+            from services.data_sharding import count_available_slots
+            from services.duration_estimator import plan_schedule
+            scheduled_scripts, schedule = plan_schedule(
+                scripts_list, execution_mode, count_available_slots(plan.project_id),
+                plan_id=plan.id, prioritize_failures=prioritize_failures
+            )
+
+            # 创建父执行记录（计划执行），调度信息（含预计总耗时）和快速失败阈值保存在结果中
+            parent_result = {'schedule': schedule}
+            if fail_fast:
+                parent_result['fail_fast'] = {'threshold': fail_fast, 'triggered': False}
             parent_execution = Execution.objects.create(
                 execution_type='plan',
                 execution_mode=execution_mode,
                 plan_id=plan_id,
                 status='pending',
+                result=parent_result,
                 created_by=request.user
             )
 
@@ -113,9 +139,11 @@ class ExecutionViewSet(viewsets.ModelViewSet):
             child_executions = []
 
             # 准备计划中所有脚本的信息（用于执行机显示）
+            # 顺序执行按调度顺序执行，脚本列表和 script_index 都使用调度顺序；并行执行使用计划顺序
+            sequential = execution_mode != 'parallel'
+            ordered_scripts = scheduled_scripts if sequential else scripts_list
             plan_scripts_info = []
-            scripts_list = list(scripts)  # 转换为列表以支持多次迭代
-            for script in scripts_list:
+            for script in ordered_scripts:
                 plan_scripts_info.append({
                     'id': script.id,
                     'name': script.name,
@@ -140,10 +168,11 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                 child_execution.save()
                 child_executions.append(child_execution)
 
-            # 第二阶段：为每个子执行创建任务
-            from apps.executors.models import TaskQueue
+            # 第二阶段：按调度顺序为每个子执行创建任务，分发服务按创建顺序分配
+            script_indexes = {script.id: index for index, script in enumerate(scripts_list)}
 
-            for index, script in enumerate(scripts_list):
+            for position, script in enumerate(scheduled_scripts):
+                index = script_indexes[script.id]
                 child_execution = child_executions[index]
 
                 # 创建任务数据
@@ -155,31 +184,17 @@ class ExecutionViewSet(viewsets.ModelViewSet):
                 task_data['execution_mode'] = execution_mode
                 # 添加完整的计划脚本信息
                 task_data['plan_scripts'] = plan_scripts_info
-                task_data['script_index'] = index  # 脚本在计划中的顺序
+                # 脚本在 plan_scripts 中的顺序，顺序执行时分发服务按该顺序等待前一个脚本完成
+                task_data['script_index'] = position if sequential else index
                 task_data['total_scripts'] = len(scripts_list)  # 总脚本数
+                task_data['expected_duration'] = schedule['expected_durations'][str(script.id)]
 
                 # 根据执行模式设置优先级
-                # 顺序执行：后面的任务优先级较低，确保按顺序执行
+                # 顺序执行：按调度顺序，后面的任务优先级较低，确保按顺序执行
                 # 并行执行：所有任务优先级相同
-                priority = 'normal' if execution_mode == 'parallel' else 'low' if index > 0 else 'normal'
-
-                # 如果指定了执行机，直接分配
-                if executor_id:
-                    TaskQueue.objects.create(
-                        execution=child_execution,
-                        executor_id=executor_id,
-                        status='pending',
-                        script_data=task_data,
-                        priority=priority
-                    )
-                else:
-                    # 否则让系统自动分配
-                    TaskQueue.objects.create(
-                        execution=child_execution,
-                        status='pending',
-                        script_data=task_data,
-                        priority=priority
-                    )
+                priority = 'low' if sequential and position > 0 else 'normal'
+
+                self._create_tasks(child_execution, task_data, priority, executor_id, shard_data)
 
             # 触发任务分发
             from services.task_distributor import TaskDistributor
@@ -191,6 +206,12 @@ class ExecutionViewSet(viewsets.ModelViewSet):
             )
 
         # 单个脚本执行
+        if script_id:
+            from apps.scripts.models import Script
+            error_response = self._check_modules(Script.objects.filter(id=script_id))
+            if error_response:
+                return error_response
+
         execution = Execution.objects.create(
             execution_type='script',
             plan_id=plan_id,
@@ -201,34 +222,78 @@ class ExecutionViewSet(viewsets.ModelViewSet):
 
         # 创建任务队列记录
         task_data = self._prepare_task_data(execution)
+        self._create_tasks(execution, task_data, 'normal', executor_id, shard_data)
+
+        # 触发任务分发
+        from services.task_distributor import TaskDistributor
+        TaskDistributor().distribute_tasks()
+
+        return Response(
+            ExecutionSerializer(execution).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @staticmethod
+    def _check_modules(scripts):
+        """展开脚本引用的模块，存在循环引用或引用了不存在的模块时返回错误响应"""
+        resolver = get_module_resolver()
+        for script in scripts:
+            try:
+                resolver.expand_script(script, strict=True)
+            except ModuleReferenceError as e:
+                return Response(
+                    {'error': f'脚本 {script.name} 的{e}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        return None
+
+    def _create_tasks(self, execution, task_data, priority, executor_id=None, shard_data=False):
+        """
+        为执行记录创建任务
+
+        开启分片且脚本为数据驱动时，按数据行区间拆分为多个任务，分发到不同执行机并行执行；
+        指定了执行机时不分片
+        """
         from apps.executors.models import TaskQueue
 
-        # 如果指定了执行机，直接分配
-        if executor_id:
+        data_source = task_data.get('data_source') or {}
+        shards = []
+        if shard_data and not executor_id and task_data.get('data_driven'):
+            from services.data_sharding import plan_shards, count_available_executors
+            shards = plan_shards(
+                data_source.get('row_count', 0),
+                count_available_executors(task_data.get('project_id'))
+            )
+
+        if len(shards) <= 1:
+            # 如果指定了执行机，直接分配；否则让系统自动分配
             TaskQueue.objects.create(
                 execution=execution,
-                executor_id=executor_id,
+                executor_id=executor_id or None,
                 status='pending',
                 script_data=task_data,
-                priority='normal'
+                priority=priority
             )
-        else:
-            # 否则让系统自动分配
-            TaskQueue.objects.create(
+            return
+
+        TaskQueue.objects.bulk_create([
+            TaskQueue(
                 execution=execution,
                 status='pending',
-                script_data=task_data,
-                priority='normal'
+                script_data={
+                    **task_data,
+                    'shard': {
+                        'index': index,
+                        'count': len(shards),
+                        'row_start': row_start,
+                        'row_end': row_end,
+                    }
+                },
+                priority=priority
             )
-
-        # 触发任务分发
-        from services.task_distributor import TaskDistributor
-        TaskDistributor().distribute_tasks()
-
-        return Response(
-            ExecutionSerializer(execution).data,
-            status=status.HTTP_201_CREATED
-        )
+            for index, (row_start, row_end) in enumerate(shards)
+        ])
+        logger.info(f"执行 {execution.id} 的数据驱动脚本已拆分为 {len(shards)} 个分片任务")
 
     def _prepare_task_data(self, execution):
         """准备任务数据（兼容旧代码）"""
@@ -247,18 +312,32 @@ class ExecutionViewSet(viewsets.ModelViewSet):
             except Script.DoesNotExist:
                 return {}
 
-        return {
+        script_data = {
             'script_id': script.id,
+            # 脚本版本，模块已在平台展开，执行机收到的是展开后的步骤
+            'script_version': script.updated_at.isoformat() if script.updated_at else None,
             'name': script.name,  # 执行机期望 'name' 字段
             'description': script.description,
             'type': script.type,
             'framework': script.framework,
-            'steps': script.steps,
+            'steps': get_module_resolver().expand_script(script),
             'variables': script.variables or {},
             'timeout': script.timeout or 30000,
             'project_id': script.project_id,
         }
 
+        # 数据驱动脚本只下发数据源元信息，数据行由执行机通过 /api/tasks/{id}/data-rows/ 分页拉取
+        if script.data_driven and script.data_source:
+            script_data['data_driven'] = True
+            script_data['data_source'] = {
+                'id': script.data_source_id,
+                'columns': script.data_source.columns,
+                'row_count': script.data_source.get_row_count(),
+                'page_size': 100,
+            }
+
+        return script_data
+
     def update(self, request, *args, **kwargs):
         """更新执行记录 - 权限检查"""
         execution = self.get_object()
@@ -596,11 +675,45 @@ class ExecutionViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def logs(self, request, pk=None):
-        """获取执行日志"""
+        """
+        获取执行日志
+
+        结果中只保存最近的日志；日志超过内存上限时完整日志写入了 gzip 文件，
+        ?download=true 下载完整日志文件
+        """
         execution = self.get_object()
+        result = execution.result or {}
         # 从result中提取日志
-        logs = execution.result.get('logs', []) if execution.result else []
-        return Response({'logs': logs})
+        logs = result.get('logs', [])
+        log_file = result.get('log_file')
+
+        if request.query_params.get('download') in ('true', '1'):
+            path = self._execution_log_path(log_file)
+            if not path:
+                return Response({'error': '没有完整日志文件'}, status=status.HTTP_404_NOT_FOUND)
+            return FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=f'execution_{execution.id}.log.gz',
+                content_type='application/gzip'
+            )
+
+        return Response({
+            'logs': logs,
+            'total': result.get('log_total', len(logs)),
+            'has_full_log': bool(self._execution_log_path(log_file)),
+        })
+
+    @staticmethod
+    def _execution_log_path(log_file):
+        """只允许访问执行日志目录下存在的文件"""
+        if not log_file:
+            return None
+        root = os.path.realpath(str(settings.EXECUTION_LOGS_ROOT))
+        path = os.path.realpath(str(log_file))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ExecutorsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.executors'
+    verbose_name = '执行机管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
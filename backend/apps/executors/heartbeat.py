@@ -6,6 +6,7 @@
 
 import logging
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
@@ -35,7 +36,9 @@ def heartbeat_report(request):
         "cpu_usage": 0.0,
         "memory_usage": 0.0,
         "disk_usage": 0.0,
-        "message": ""
+        "effective_capacity": 3,
+        "message": "",
+        "metrics": {"browser_pool": {...}}
     }
     """
     try:
@@ -47,6 +50,10 @@ def heartbeat_report(request):
         memory_usage = data.get('memory_usage')
         disk_usage = data.get('disk_usage')
         message = data.get('message', '')
+        metrics = data.get('metrics')
+        if not isinstance(metrics, dict):
+            metrics = {}
+        effective_capacity = data.get('effective_capacity')
 
         if not executor_uuid:
             return Response(
@@ -66,6 +73,11 @@ def heartbeat_report(request):
         # 更新执行机状态
         executor.status = exec_status
         executor.current_tasks = current_tasks
+        if effective_capacity is not None:
+            try:
+                executor.effective_capacity = max(int(effective_capacity), 0)
+            except (TypeError, ValueError):
+                pass
         executor.last_heartbeat = timezone.now()
         executor.save()
 
@@ -77,7 +89,8 @@ def heartbeat_report(request):
             memory_usage=memory_usage,
             disk_usage=disk_usage,
             current_tasks=current_tasks,
-            message=message
+            message=message,
+            metrics=metrics
         )
 
         logger.debug(
@@ -88,7 +101,9 @@ def heartbeat_report(request):
         return Response({
             'success': True,
             'server_time': timezone.now().isoformat(),
-            'pending_tasks': _get_pending_tasks_count(executor)
+            'pending_tasks': _get_pending_tasks_count(executor),
+            # 管理员配置的并发上限，执行机据此限制动态并发数
+            'max_concurrent': executor.max_concurrent
         })
 
     except Exception as e:
@@ -123,6 +138,10 @@ def executor_register(request):
         platform = data.get('platform', 'Unknown')
         browser_types = data.get('browser_types', ['chrome'])
         owner_username = data.get('owner_username', '')
+        try:
+            requested_concurrent = int(data.get('max_concurrent') or 3)
+        except (TypeError, ValueError):
+            requested_concurrent = 3
 
         if not executor_uuid:
             return Response(
@@ -146,7 +165,8 @@ def executor_register(request):
             'platform': platform,
             'browser_types': browser_types,
             'status': 'online',
-            'max_concurrent': 3,
+            # 新执行机使用客户端配置的并发数，之后以管理员在平台上的配置为准
+            'max_concurrent': min(max(requested_concurrent, 1), settings.EXECUTOR_MAX_CONCURRENT_LIMIT),
             'scope': 'global',
         }
         if owner:
@@ -171,6 +191,7 @@ def executor_register(request):
         return Response({
             'success': True,
             'executor_id': executor.id,
+            'max_concurrent': executor.max_concurrent,
             'message': '注册成功'
         })
 
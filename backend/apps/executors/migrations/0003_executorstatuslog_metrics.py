@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executors', '0002_alter_executor_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executorstatuslog',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict, verbose_name='运行指标'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executors', '0003_executorstatuslog_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executor',
+            name='effective_capacity',
+            field=models.IntegerField(blank=True, null=True, verbose_name='有效并发数'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('executors', '0004_executor_effective_capacity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='executor',
+            index=models.Index(fields=['last_heartbeat'], name='executor_heartbeat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskqueue',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='taskqueue_dispatch_idx'),
+        ),
+    ]
@@ -35,6 +35,8 @@ class Executor(models.Model):
 
     # 配置信息
     max_concurrent = models.IntegerField(default=3, verbose_name='最大并发数')
+    # 执行机根据 CPU、内存和浏览器占用动态计算并随心跳上报的并发数，不超过 max_concurrent
+    effective_capacity = models.IntegerField(null=True, blank=True, verbose_name='有效并发数')
     current_tasks = models.IntegerField(default=0, verbose_name='当前任务数')
     browser_types = models.JSONField(default=list, verbose_name='支持的浏览器')  # ['chrome', 'firefox', 'edge']
     platform = models.CharField(max_length=50, verbose_name='操作系统')  # 'Windows', 'Mac', 'Linux'
@@ -86,6 +88,10 @@ class Executor(models.Model):
                 violation_error_message='同一用户下不能存在同名执行机'
             )
         ]
+        indexes = [
+            # 在线判断和离线检测按心跳时间过滤
+            models.Index(fields=['last_heartbeat'], name='executor_heartbeat_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.get_status_display()})'
@@ -98,10 +104,17 @@ class Executor(models.Model):
             return False
         return (timezone.now() - self.last_heartbeat).total_seconds() < 120
 
+    @property
+    def capacity(self):
+        """当前可用的并发数：执行机上报的有效并发数，未上报时为 max_concurrent"""
+        if self.effective_capacity is None:
+            return self.max_concurrent
+        return min(self.effective_capacity, self.max_concurrent)
+
     @property
     def is_available(self):
         """判断是否可用（在线 + 启用 + 未达并发上限）"""
-        return self.is_online and self.is_enabled and self.current_tasks < self.max_concurrent
+        return self.is_online and self.is_enabled and self.current_tasks < self.capacity
 
 
 class ExecutorGroup(models.Model):
@@ -161,6 +174,7 @@ class ExecutorStatusLog(models.Model):
     disk_usage = models.FloatField(null=True, blank=True, verbose_name='磁盘使用率')
     current_tasks = models.IntegerField(default=0, verbose_name='当前任务数')
     message = models.TextField(blank=True, verbose_name='消息')
+    metrics = models.JSONField(default=dict, blank=True, verbose_name='运行指标')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
     class Meta:
@@ -298,6 +312,10 @@ class TaskQueue(models.Model):
         verbose_name = '任务队列'
         verbose_name_plural = '任务队列'
         ordering = ['-priority', '-created_at']
+        indexes = [
+            # 分发时按状态过滤、按优先级和创建时间排序
+            models.Index(fields=['status', 'priority', 'created_at'], name='taskqueue_dispatch_idx'),
+        ]
 
     def __str__(self):
         return f'Task {self.id} - {self.get_status_display()}'
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Executor, ExecutorGroup, ExecutorTag, ExecutorStatusLog, Variable, TaskQueue
 from apps.projects.models import Project
@@ -24,7 +25,7 @@ class ExecutorStatusLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExecutorStatusLog
         fields = ['id', 'status', 'cpu_usage', 'memory_usage', 'disk_usage',
-                  'current_tasks', 'message', 'created_at']
+                  'current_tasks', 'message', 'metrics', 'created_at']
 
 class ExecutorSerializer(serializers.ModelSerializer):
     """执行机序列化器"""
@@ -58,13 +59,13 @@ class ExecutorSerializer(serializers.ModelSerializer):
         model = Executor
         fields = [
             'id', 'uuid', 'name', 'owner', 'owner_name', 'status', 'status_display',
-            'scope', 'scope_display', 'max_concurrent', 'current_tasks',
+            'scope', 'scope_display', 'max_concurrent', 'effective_capacity', 'current_tasks',
             'browser_types', 'platform', 'groups', 'group_ids', 'tags', 'tag_ids',
             'bound_projects', 'bound_project_ids', 'last_heartbeat', 'version',
             'is_enabled', 'description', 'is_online', 'is_available',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['uuid', 'owner', 'last_heartbeat', 'created_at', 'updated_at']
+        read_only_fields = ['uuid', 'owner', 'effective_capacity', 'last_heartbeat', 'created_at', 'updated_at']
 
     def validate(self, attrs):
         # 验证执行机名称在同一用户下的唯一性
@@ -115,8 +116,9 @@ class ExecutorSerializer(serializers.ModelSerializer):
         """验证并发数上限"""
         if value < 1:
             raise serializers.ValidationError("并发数必须大于0")
-        if value > 3:
-            raise serializers.ValidationError("并发数上限为3")
+        limit = settings.EXECUTOR_MAX_CONCURRENT_LIMIT
+        if value > limit:
+            raise serializers.ValidationError(f"并发数上限为{limit}")
         return value
 
     def __init__(self, *args, **kwargs):
@@ -210,6 +212,8 @@ class ExecutorHeartbeatSerializer(serializers.Serializer):
     memory_usage = serializers.FloatField(required=False, allow_null=True)
     disk_usage = serializers.FloatField(required=False, allow_null=True)
     message = serializers.CharField(required=False, allow_blank=True)
+    effective_capacity = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    metrics = serializers.JSONField(required=False)
 
 
 class ExecutorRegisterSerializer(serializers.Serializer):
@@ -0,0 +1,42 @@
+"""
+- 变量修改后更新变量快照缓存的版本号
+- 执行机列表缓存失效
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.projects.models import Project
+from services.query_cache import invalidate, invalidate_on_change
+from services.variable_cache import bump_version
+from .models import Executor, ExecutorGroup, ExecutorTag, Variable
+
+
+@receiver(post_save, sender=Variable)
+@receiver(post_delete, sender=Variable)
+def bump_variable_snapshot_version(sender, instance, **kwargs):
+    bump_version('project', instance.project_id)
+    bump_version('script', instance.script_id)
+
+
+# 执行机列表：心跳也会保存执行机，列表中包含心跳时间和状态，因此任何保存都失效
+invalidate_on_change(Executor, 'executors')
+invalidate_on_change(ExecutorGroup, 'executors')
+invalidate_on_change(ExecutorTag, 'executors')
+invalidate_on_change(Project, 'executors', fields=['name', 'creator'])
+
+# 用户可见的执行机：只在所有者、作用域、项目创建者变化时失效，不受心跳影响
+invalidate_on_change(Executor, 'executor_visibility', fields=['owner', 'scope'])
+invalidate_on_change(Project, 'executor_visibility', fields=['creator'])
+
+
+@receiver(m2m_changed, sender=Executor.groups.through)
+@receiver(m2m_changed, sender=Executor.tags.through)
+def invalidate_executor_list(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate('executors')
+
+
+@receiver(m2m_changed, sender=Executor.bound_projects.through)
+def invalidate_executor_visibility(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate('executors', 'executor_visibility')
@@ -1,7 +1,10 @@
 """
 执行器模块单元测试
 """
-from django.test import TestCase
+import os
+import uuid
+
+from django.test import TestCase, TransactionTestCase
 from apps.executors.models import Executor, TaskQueue
 from apps.users.models import User
 
@@ -86,3 +89,547 @@ class TaskQueueModelTest(TestCase):
             status='pending'
         )
         self.assertIn('Task', str(task))
+
+
+class ScreenshotStorageTest(TestCase):
+    """截图内容寻址存储测试"""
+
+    def setUp(self):
+        import io
+        import tempfile
+        from PIL import Image
+
+        self.tmpdir = tempfile.mkdtemp()
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), color=(200, 30, 30)).save(buffer, format='PNG')
+        self.png_bytes = buffer.getvalue()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_save_deduplicates_and_generates_thumbnail(self):
+        """测试相同内容只存一份且后台生成缩略图"""
+        import os
+        import threading
+        from services.screenshot_storage import ScreenshotStorage
+
+        storage = ScreenshotStorage(root=self.tmpdir, url_prefix='/media/screenshots')
+        done = threading.Event()
+        first = storage.save(self.png_bytes, on_thumbnail=lambda url: done.set())
+        second = storage.save(self.png_bytes)
+
+        self.assertEqual(first['sha256'], second['sha256'])
+        self.assertEqual(first['url'], second['url'])
+        self.assertTrue(first['url'].startswith('/media/screenshots/'))
+        self.assertTrue(done.wait(timeout=10))
+        thumb_path = os.path.join(self.tmpdir, *first['thumbnail_url'][len('/media/screenshots/'):].split('/'))
+        self.assertTrue(os.path.exists(thumb_path))
+
+    def test_save_rejects_invalid_image(self):
+        """测试非图片数据被拒绝"""
+        from services.screenshot_storage import ScreenshotStorage, ScreenshotStorageError
+
+        storage = ScreenshotStorage(root=self.tmpdir, url_prefix='/media/screenshots')
+        with self.assertRaises(ScreenshotStorageError):
+            storage.save(b'not an image')
+
+
+class DataShardingTest(TestCase):
+    """数据驱动分片测试"""
+
+    def test_plan_shards_covers_all_rows(self):
+        """测试分片区间连续且覆盖所有行"""
+        from django.test import override_settings
+        from services.data_sharding import plan_shards
+
+        with override_settings(DATA_SHARD_MIN_ROWS=100, DATA_SHARD_MAX_SHARDS=16):
+            self.assertEqual(plan_shards(1050, 4), [(0, 263), (263, 526), (526, 788), (788, 1050)])
+            # 行数不足时不分片
+            self.assertEqual(plan_shards(150, 4), [(0, 150)])
+            self.assertEqual(plan_shards(0, 4), [])
+
+    def test_merge_shard_results(self):
+        """测试分片结果按顺序合并"""
+        from services.data_sharding import merge_shard_results
+
+        merged = merge_shard_results({
+            '1': {'status': 'failed', 'total': 2, 'passed': 1, 'failed': 1,
+                  'steps': [{'name': 'c'}, {'name': 'd'}], 'duration': 5, 'message': '断言失败'},
+            '0': {'status': 'completed', 'total': 2, 'passed': 2, 'failed': 0,
+                  'steps': [{'name': 'a'}, {'name': 'b'}], 'duration': 8},
+        })
+        self.assertEqual([step['name'] for step in merged['steps']], ['a', 'b', 'c', 'd'])
+        self.assertEqual((merged['total'], merged['passed'], merged['failed']), (4, 3, 1))
+        self.assertEqual(merged['duration'], 8)
+        self.assertIn('分片 2', merged['message'])
+
+    def _shard_tasks(self, count):
+        from apps.executions.models import Execution
+
+        user = User.objects.create_user(username='sharding', email='sharding@example.com', password='testpass123')
+        execution = Execution.objects.create(execution_type='script', status='running', created_by=user)
+        tasks = [
+            TaskQueue.objects.create(
+                execution=execution, status='running',
+                script_data={'shard': {'index': index, 'count': count, 'row_start': index * 10,
+                                       'row_end': index * 10 + 10}}
+            )
+            for index in range(count)
+        ]
+        return execution, tasks
+
+    def test_duplicate_report_after_merge_ignored(self):
+        """测试合并后结果中只保留分片汇总，重复上报的分片结果不再改变执行记录"""
+        from services.data_sharding import record_shard_result
+
+        execution, tasks = self._shard_tasks(2)
+        for index, task in enumerate(tasks):
+            task.status = 'completed'
+            task.save()
+            record_shard_result(task, {'total': 1, 'passed': 1, 'failed': 0,
+                                       'steps': [{'name': str(index)}], 'duration': 1})
+
+        execution.refresh_from_db()
+        merged = execution.result
+        self.assertNotIn('shard_results', merged)
+        self.assertEqual(sorted(merged['shards']), ['0', '1'])
+
+        self.assertIsNone(record_shard_result(tasks[0], {'total': 1, 'passed': 0, 'failed': 1,
+                                                         'steps': [], 'duration': 1}))
+        execution.refresh_from_db()
+        self.assertEqual(execution.result, merged)
+
+    def test_cancelled_last_shard_merges(self):
+        """测试最后一个未结束的分片被取消后合并结果，执行记录不再停留在执行中"""
+        from services.data_sharding import finish_cancelled_shards, record_shard_result
+
+        execution, tasks = self._shard_tasks(2)
+        tasks[0].status = 'failed'
+        tasks[0].save()
+        self.assertIsNone(record_shard_result(tasks[0], {'total': 1, 'passed': 0, 'failed': 1,
+                                                         'steps': [], 'duration': 1, 'message': '断言失败'}))
+
+        tasks[1].status = 'cancelled'
+        tasks[1].save()
+        self.assertEqual(finish_cancelled_shards([execution.id]), 1)
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'failed')
+        self.assertIsNotNone(execution.completed_at)
+        self.assertEqual(execution.result['shards']['1']['status'], 'cancelled')
+
+
+class ShardResultConcurrencyTest(TransactionTestCase):
+    """分片结果并发上报测试（真实事务，多线程）"""
+
+    def test_concurrent_last_shards_both_merged(self):
+        """测试最后两个分片同时上报结果时合并结果包含两个分片"""
+        import threading
+        from django.db import connection
+        from apps.executions.models import Execution
+        from services.data_sharding import record_shard_result
+
+        user = User.objects.create_user(username='sharding', email='sharding@example.com', password='testpass123')
+        execution = Execution.objects.create(execution_type='script', status='running', created_by=user)
+        tasks = [
+            TaskQueue.objects.create(
+                execution=execution, status='completed',
+                script_data={'shard': {'index': index, 'count': 2, 'row_start': index * 10,
+                                       'row_end': index * 10 + 10}}
+            )
+            for index in range(2)
+        ]
+
+        barrier = threading.Barrier(2)
+        merged, errors = [], []
+
+        def report(task, name):
+            try:
+                barrier.wait()
+                result = record_shard_result(task, {'total': 1, 'passed': 1, 'failed': 0,
+                                                    'steps': [{'name': name}], 'duration': 1})
+                if result is not None:
+                    merged.append(result.id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=report, args=(task, name)) for task, name in zip(tasks, 'ab')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(merged, [execution.id])
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'completed')
+        self.assertEqual([step['name'] for step in execution.result['steps']], ['a', 'b'])
+        self.assertEqual(sorted(execution.result['shards']), ['0', '1'])
+
+
+class ExecutorCapacityTest(TestCase):
+    """执行机动态并发测试"""
+
+    def setUp(self):
+        import uuid
+        from django.utils import timezone
+
+        self.user = User.objects.create_user(username='capacity', password='testpass123')
+        self.limited = Executor.objects.create(
+            uuid=uuid.uuid4(), name='limited', owner=self.user, platform='Linux', status='online',
+            max_concurrent=16, effective_capacity=2, last_heartbeat=timezone.now()
+        )
+        self.static = Executor.objects.create(
+            uuid=uuid.uuid4(), name='static', owner=self.user, platform='Linux', status='online',
+            max_concurrent=4, last_heartbeat=timezone.now()
+        )
+
+    def test_capacity_is_bounded_by_max_concurrent(self):
+        """测试有效并发数不超过 max_concurrent，未上报时使用 max_concurrent"""
+        self.assertEqual(self.limited.capacity, 2)
+        self.assertEqual(self.static.capacity, 4)
+        self.limited.effective_capacity = 32
+        self.assertEqual(self.limited.capacity, 16)
+
+    def test_distributor_prefers_free_slots(self):
+        """测试分发时优先选择剩余并发多的执行机"""
+        from types import SimpleNamespace
+        from services.task_distributor import TaskDistributor
+
+        task = SimpleNamespace(script_data={}, execution_id=None)
+        ordered = TaskDistributor()._order_by_load(Executor.objects.all(), task)
+        self.assertEqual([executor.name for executor in ordered], ['static', 'limited'])
+
+    def test_distributor_skips_executors_without_free_slots(self):
+        """测试已分配和运行中的任务占满有效并发数的执行机不再分配任务"""
+        from types import SimpleNamespace
+        from services.task_distributor import TaskDistributor
+
+        from apps.executions.models import Execution
+
+        execution = Execution.objects.create(execution_type='script', created_by=self.user)
+        for executor, status in [(self.limited, 'running'), (self.limited, 'assigned'), (self.static, 'running')]:
+            TaskQueue.objects.create(execution=execution, executor=executor, status=status, script_data={})
+
+        task = SimpleNamespace(script_data={}, execution_id=None)
+        ordered = TaskDistributor()._order_by_load(Executor.objects.all(), task)
+        self.assertEqual([(executor.name, executor.free_slots) for executor in ordered], [('static', 3)])
+
+        self.static.effective_capacity = 1
+        self.static.save()
+        self.assertFalse(TaskDistributor()._order_by_load(Executor.objects.all(), task).exists())
+
+    def test_heartbeat_updates_effective_capacity(self):
+        """测试心跳上报有效并发数并返回并发上限"""
+        response = self.client.post('/api/executor/heartbeat/', {
+            'executor_uuid': str(self.static.uuid),
+            'status': 'idle',
+            'effective_capacity': 3,
+            'metrics': {'admission': {'limited_by': 'memory'}},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['max_concurrent'], 4)
+        self.static.refresh_from_db()
+        self.assertEqual(self.static.effective_capacity, 3)
+        self.assertEqual(self.static.status_logs.first().metrics, {'admission': {'limited_by': 'memory'}})
+
+
+class VariableSnapshotTest(TestCase):
+    """任务变量快照缓存测试"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from apps.projects.models import Project
+        from apps.scripts.models import Script
+
+        # 测试之间数据库回滚不会触发信号，清空缓存避免复用的ID命中上一个测试的快照
+        cache.clear()
+        self.user = User.objects.create_user(username='variables', password='testpass123')
+        self.project = Project.objects.create(name='变量项目', creator=self.user)
+        self.scripts = [
+            Script.objects.create(project=self.project, name=f'脚本{i}', type='api',
+                                  framework='httprunner', created_by=self.user)
+            for i in range(3)
+        ]
+
+    def test_script_variables_override_project_variables(self):
+        """测试脚本级变量覆盖项目级变量，整批任务只查询一次数据库"""
+        from apps.executors.models import Variable
+        from services.variable_cache import VariableSnapshots
+
+        Variable.objects.create(name='host', value='a', scope='project', project=self.project, created_by=self.user)
+        Variable.objects.create(name='host', value='b', scope='script', script=self.scripts[0], created_by=self.user)
+
+        snapshots = VariableSnapshots()
+        with self.assertNumQueries(2):
+            snapshots.prefetch((self.project.id, script.id) for script in self.scripts)
+            results = [snapshots.get(self.project.id, script.id) for script in self.scripts]
+        self.assertEqual(results[0][0], {'host': 'b'})
+        self.assertEqual(results[1][0], {'host': 'a'})
+        self.assertEqual(results[1][1], results[2][1])
+
+        # 再次分发时命中缓存
+        with self.assertNumQueries(0):
+            VariableSnapshots().get(self.project.id, self.scripts[1].id)
+
+    def test_variable_change_invalidates_snapshot(self):
+        """测试变量修改或删除后快照失效"""
+        from apps.executors.models import Variable
+        from services.variable_cache import VariableSnapshots
+
+        variable = Variable.objects.create(
+            name='host', value='a', scope='project', project=self.project, created_by=self.user
+        )
+        before = VariableSnapshots().get(self.project.id, self.scripts[0].id)
+
+        variable.value = 'c'
+        variable.save()
+        after = VariableSnapshots().get(self.project.id, self.scripts[0].id)
+        self.assertEqual(after[0], {'host': 'c'})
+        self.assertNotEqual(after[1], before[1])
+
+        variable.delete()
+        self.assertEqual(VariableSnapshots().get(self.project.id, self.scripts[0].id)[0], {})
+
+
+class QueryCacheTest(TestCase):
+    """查询缓存测试"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='testpass123')
+
+    def test_visible_executors_invalidated_on_scope_change(self):
+        """测试执行机作用域变化后可见执行机缓存失效，心跳保存不失效"""
+        from django.utils import timezone
+        from apps.executors.views import ExecutorViewSet
+        from apps.projects.models import Project
+        from services.query_cache import cached_value
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        executor = Executor.objects.create(name='共享执行机', owner=other, scope='project', uuid=uuid.uuid4())
+
+        def visible():
+            return cached_value(f'executors:visible:{self.user.pk}', ['executor_visibility'],
+                                lambda: ExecutorViewSet._visible_executor_ids(self.user))
+
+        Project.objects.create(name='缓存项目', creator=self.user)
+        self.assertEqual(visible(), [])
+
+        executor.last_heartbeat = timezone.now()
+        executor.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(visible(), [])
+
+        executor.scope = 'global'
+        executor.save()
+        self.assertEqual(visible(), [executor.id])
+
+    def test_role_counts_invalidated_on_role_change(self):
+        """测试用户角色变化后角色统计缓存失效"""
+        from rest_framework.test import APIClient
+
+        self.user.role = 'admin'
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def counts():
+            response = client.get('/api/users/roles/')
+            return {role['value']: role['user_count'] for role in response.data['results']}
+
+        self.assertEqual(counts()['admin'], 1)
+        User.objects.create_user(username='tester1', email='tester1@example.com', password='testpass123', role='tester')
+        self.assertEqual(counts()['tester'], 1)
+
+
+class DurationEstimatorTest(TestCase):
+    """脚本耗时预估和计划调度测试"""
+
+    def setUp(self):
+        from apps.projects.models import Project
+        from apps.scripts.models import Script
+
+        self.user = User.objects.create_user(username='estimator', email='estimator@example.com',
+                                             password='testpass123')
+        project = Project.objects.create(name='调度项目', creator=self.user)
+        self.project = project
+        self.scripts = [
+            Script.objects.create(project=project, name=f'脚本{i}', type='api',
+                                  framework='httprunner', created_by=self.user)
+            for i in range(4)
+        ]
+
+    def _history(self, script, *durations):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.executions.models import Execution
+
+        start = timezone.now() - timedelta(days=1)
+        for offset, duration in enumerate(durations):
+            started_at = start + timedelta(hours=offset)
+            Execution.objects.create(
+                execution_type='script', script=script, status='completed', created_by=self.user,
+                started_at=started_at, completed_at=started_at + timedelta(seconds=duration)
+            )
+
+    def test_estimate_uses_ewma_and_framework_fallback(self):
+        """测试按 EWMA 预估，没有历史的脚本使用同框架的预估"""
+        from services.duration_estimator import estimate_durations
+
+        self._history(self.scripts[0], 100, 200)
+        estimates = estimate_durations(self.scripts[:2])
+        self.assertAlmostEqual(estimates[self.scripts[0].id], 130.0)
+        self.assertAlmostEqual(estimates[self.scripts[1].id], 130.0)
+
+    def test_longest_expected_first_shortens_makespan(self):
+        """测试并行计划按预估耗时从长到短调度，预计总耗时不超过计划顺序"""
+        from services.duration_estimator import plan_schedule
+
+        for script, duration in zip(self.scripts, (10, 10, 10, 30)):
+            self._history(script, duration)
+        ordered, schedule = plan_schedule(self.scripts, 'parallel', slots=2)
+        self.assertEqual(ordered[0].id, self.scripts[3].id)
+        self.assertEqual(schedule['predicted_makespan'], 30.0)
+        self.assertEqual(schedule['plan_order_makespan'], 40.0)
+
+        ordered, schedule = plan_schedule(self.scripts, 'sequential', slots=2)
+        self.assertEqual([script.id for script in ordered], [script.id for script in self.scripts])
+        self.assertEqual(schedule['predicted_makespan'], 60.0)
+
+    def test_failures_first(self):
+        """测试失败优先：上次计划执行失败的脚本最先调度，其余按最近失败率排序"""
+        from apps.executions.models import Execution
+        from apps.plans.models import Plan
+        from services.duration_estimator import plan_schedule
+
+        plan = Plan.objects.create(project=self.project, name='失败优先计划', created_by=self.user)
+
+        previous = Execution.objects.create(execution_type='plan', plan_id=plan.id, status='failed',
+                                            created_by=self.user)
+        Execution.objects.create(execution_type='script', parent=previous, plan_id=plan.id,
+                                 script=self.scripts[2], status='failed', created_by=self.user)
+        for status in ('failed', 'completed'):
+            Execution.objects.create(execution_type='script', script=self.scripts[1], status=status,
+                                     created_by=self.user)
+
+        for mode in ('parallel', 'sequential'):
+            ordered, schedule = plan_schedule(self.scripts, mode, slots=2, plan_id=plan.id, prioritize_failures=True)
+            self.assertEqual([script.id for script in ordered[:2]], [self.scripts[2].id, self.scripts[1].id])
+            self.assertEqual(schedule['strategy'], 'failures_first')
+            self.assertEqual(schedule['failed_last_run'], [self.scripts[2].id])
+            self.assertEqual(schedule['failure_rates'][str(self.scripts[1].id)], 0.5)
+
+    def test_failures_first_sequential_dispatch_order(self):
+        """测试顺序执行的失败优先计划按调度顺序分发：上次失败的脚本先执行，完成后再分发下一个"""
+        import uuid
+        from unittest import mock
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from apps.executions.models import Execution
+        from apps.plans.models import Plan
+        from services.task_distributor import TaskDistributor
+
+        plan = Plan.objects.create(project=self.project, name='顺序失败优先计划', created_by=self.user,
+                                   script_ids=[script.id for script in self.scripts])
+        previous = Execution.objects.create(execution_type='plan', plan_id=plan.id, status='failed',
+                                            created_by=self.user)
+        Execution.objects.create(execution_type='script', parent=previous, plan_id=plan.id,
+                                 script=self.scripts[2], status='failed', created_by=self.user)
+        Executor.objects.create(uuid=uuid.uuid4(), name='顺序执行机', owner=self.user, platform='Linux',
+                                status='online', max_concurrent=8, last_heartbeat=timezone.now())
+        self.user.role = 'tester'
+        self.user.save()
+
+        def dispatched():
+            tasks = TaskQueue.objects.filter(status='assigned', script_data__parent_execution_id=parent_id)
+            return [task.script_data['script_id'] for task in tasks.order_by('assigned_at', 'id')]
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('services.message_queue.get_message_queue_publisher') as publisher:
+            publisher.return_value.publish_task.return_value = True
+            response = client.post('/api/executions/', {
+                'plan_id': plan.id, 'execution_mode': 'sequential', 'prioritize_failures': True
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            parent_id = response.data['id']
+            self.assertEqual(dispatched(), [self.scripts[2].id])
+
+            first = TaskQueue.objects.get(status='assigned', script_data__parent_execution_id=parent_id)
+            self.assertEqual(first.script_data['script_index'], 0)
+            self.assertEqual(first.script_data['plan_scripts'][0]['id'], self.scripts[2].id)
+
+            # 前一个脚本完成前，其余脚本（包括计划中的第一个脚本）都不分发
+            TaskDistributor().distribute_tasks()
+            self.assertEqual(dispatched(), [self.scripts[2].id])
+
+            Execution.objects.filter(id=first.execution_id).update(status='completed')
+            TaskDistributor().distribute_tasks()
+
+        # 下一个分发的是调度顺序中的第二个脚本
+        self.assertEqual(dispatched(), [self.scripts[2].id, first.script_data['plan_scripts'][1]['id']])
+        self.assertEqual(Execution.objects.get(id=parent_id).result['schedule']['strategy'], 'failures_first')
+
+    def test_fail_fast_cancels_remaining(self):
+        """测试失败数达到快速失败阈值后取消其余子任务"""
+        from apps.executions.models import Execution
+        from apps.plans.models import Plan
+        from apps.executors.views import TaskQueueViewSet
+
+        plan = Plan.objects.create(project=self.project, name='失败优先计划', created_by=self.user)
+
+        parent = Execution.objects.create(
+            execution_type='plan', plan_id=plan.id, status='running', created_by=self.user,
+            result={'fail_fast': {'threshold': 1, 'triggered': False}}
+        )
+        children = [
+            Execution.objects.create(execution_type='script', parent=parent, plan_id=plan.id, script=script,
+                                     status='pending', created_by=self.user)
+            for script in self.scripts
+        ]
+        tasks = [TaskQueue.objects.create(execution=child, script_data={}, status='pending') for child in children]
+
+        children[0].status = 'failed'
+        children[0].save()
+        TaskQueueViewSet()._update_parent_execution_status(parent)
+
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, 'failed')
+        self.assertTrue(parent.result['fail_fast']['triggered'])
+        self.assertEqual(Execution.objects.filter(parent=parent, status='stopped').count(), 3)
+        self.assertFalse(TaskQueue.objects.filter(id__in=[task.id for task in tasks], status='pending').exists())
+
+    def test_fail_fast_triggered_once_with_stale_parent(self):
+        """测试并发上报时使用过期的父执行副本不会重复触发快速失败，也不会覆盖触发记录"""
+        from unittest import mock
+        from apps.executions.models import Execution
+        from apps.executors.views import TaskQueueViewSet
+
+        parent = Execution.objects.create(
+            execution_type='plan', status='running', created_by=self.user,
+            result={'fail_fast': {'threshold': 1, 'triggered': False}}
+        )
+        children = [
+            Execution.objects.create(execution_type='script', parent=parent, script=script,
+                                     status='pending', created_by=self.user)
+            for script in self.scripts[:3]
+        ]
+        stale = Execution.objects.get(id=parent.id)
+
+        children[0].status = 'failed'
+        children[0].save()
+        TaskQueueViewSet()._update_parent_execution_status(parent)
+        triggered = Execution.objects.get(id=parent.id).result['fail_fast']
+
+        with mock.patch('services.task_distributor.TaskDistributor.cancel_all_child_tasks') as cancel:
+            self.assertFalse(TaskQueueViewSet()._apply_fail_fast(stale, 1))
+            TaskQueueViewSet()._update_parent_execution_status(stale)
+        cancel.assert_not_called()
+        self.assertEqual(Execution.objects.get(id=parent.id).result['fail_fast'], triggered)
+        self.assertTrue(triggered['triggered'])
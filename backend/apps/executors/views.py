@@ -5,9 +5,11 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 import logging
 
+from services.query_cache import cached_value, cached_view
 from .models import Executor, ExecutorGroup, ExecutorTag, ExecutorStatusLog, Variable, TaskQueue
 from .serializers import (
     ExecutorSerializer, ExecutorGroupSerializer, ExecutorTagSerializer,
@@ -77,17 +79,28 @@ class ExecutorViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """获取查询集 - 只返回当前用户的执行机"""
-        queryset = Executor.objects.filter(owner=self.request.user)
+        user = self.request.user
+        executor_ids = cached_value(
+            f'executors:visible:{user.pk}', ['executor_visibility'],
+            lambda: self._visible_executor_ids(user)
+        )
+        return Executor.objects.filter(id__in=executor_ids).select_related('owner').prefetch_related(
+            'groups', 'tags', 'bound_projects'
+        )
 
+    @staticmethod
+    def _visible_executor_ids(user):
+        """用户可见的执行机ID：自己的执行机，以及创建了项目时项目绑定的执行机和全局执行机"""
+        condition = Q(owner=user)
         # 项目创建者可以看到项目内的全局执行机
-        user_created_projects = self.request.user.created_projects.all()
-        for project in user_created_projects:
-            project_executors = Executor.objects.filter(
-                Q(bound_projects=project) | Q(scope='global')
-            )
-            queryset = queryset | project_executors
+        if user.created_projects.exists():
+            condition |= Q(bound_projects__creator=user) | Q(scope='global')
+        return list(Executor.objects.filter(condition).values_list('id', flat=True).distinct())
 
-        return queryset.distinct()
+    @cached_view('executors', 'executor_visibility', timeout=15)
+    def list(self, request, *args, **kwargs):
+        """执行机列表 - 按用户缓存，执行机保存（包括心跳）时失效；在线状态随时间变化，只缓存很短时间"""
+        return super().list(request, *args, **kwargs)
 
     @action(detail=False, methods=['get'])
     def online(self, request):
@@ -155,6 +168,8 @@ class ExecutorViewSet(viewsets.ModelViewSet):
         # 仅当报告数大于后端记录数时更新（防止任务完成后未及时减少）
         if reported_tasks > executor.current_tasks:
             executor.current_tasks = reported_tasks
+        if 'effective_capacity' in data:
+            executor.effective_capacity = data['effective_capacity']
         executor.last_heartbeat = timezone.now()
         executor.save()
 
@@ -166,7 +181,8 @@ class ExecutorViewSet(viewsets.ModelViewSet):
             memory_usage=data.get('memory_usage'),
             disk_usage=data.get('disk_usage'),
             current_tasks=executor.current_tasks,
-            message=data.get('message', '')
+            message=data.get('message', ''),
+            metrics=data.get('metrics') or {}
         )
 
         return Response({'message': '心跳更新成功', 'server_time': timezone.now()})
@@ -399,6 +415,9 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
                 if task.executor:
                     task.executor.current_tasks = max(0, task.executor.current_tasks - 1)
                     task.executor.save()
+                if (task.script_data or {}).get('shard'):
+                    from services.data_sharding import finish_cancelled_shards
+                    finish_cancelled_shards([task.execution_id])
                 return Response(
                     {'error': '任务已被停止，无法开始执行'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -470,6 +489,10 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
         failed = children.filter(status='failed').count()
         running = children.filter(status__in=['pending', 'running']).count()
 
+        # 快速失败：失败数达到阈值时取消其余子任务
+        if running and self._apply_fail_fast(parent_execution, failed):
+            running = children.filter(status__in=['pending', 'running']).count()
+
         # 更新父任务状态
         if running == 0:
             # 所有子任务都已完成/失败
@@ -495,7 +518,56 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
             if not parent_execution.started_at:
                 parent_execution.started_at = timezone.now()
 
-        parent_execution.save()
+        # 不写入 result，避免覆盖其他请求（快速失败）同时更新的结果
+        parent_execution.save(update_fields=['status', 'started_at', 'completed_at'])
+
+    def _apply_fail_fast(self, parent_execution, failed):
+        """
+        失败的子执行数达到父执行设置的快速失败阈值时，取消其余子任务并停止未完成的子执行
+
+        多个子任务同时上报结果时锁定父执行记录，只有一次上报触发快速失败
+
+        Returns:
+            是否触发了快速失败
+        """
+        fail_fast = (parent_execution.result or {}).get('fail_fast')
+        if not fail_fast or fail_fast.get('triggered') or failed < fail_fast['threshold']:
+            return False
+
+        from apps.executions.models import Execution
+        from services.task_distributor import TaskDistributor
+
+        with transaction.atomic():
+            locked = Execution.objects.select_for_update().get(id=parent_execution.id)
+            result = locked.result or {}
+            fail_fast = result.get('fail_fast')
+            if not fail_fast or fail_fast.get('triggered'):
+                parent_execution.result = result
+                return False
+
+            cancelled = TaskDistributor().cancel_all_child_tasks(parent_execution.id)
+
+            # 执行机通过 status_check 检测到子执行已停止后中止正在执行的脚本
+            now = timezone.now()
+            message = f'失败的脚本数达到 {fail_fast["threshold"]}，已快速失败停止执行'
+            for child in locked.children.select_for_update().filter(status__in=['pending', 'running', 'paused']):
+                child.status = 'stopped'
+                child.completed_at = now
+                child.result = {
+                    **(child.result or {}),
+                    'success': False,
+                    'message': message,
+                    'error': message,
+                    'stopped_at': now.isoformat(),
+                }
+                child.save(update_fields=['status', 'completed_at', 'result'])
+
+            fail_fast.update(triggered=True, triggered_at=now.isoformat(), cancelled_tasks=cancelled)
+            locked.save(update_fields=['result'])
+            parent_execution.result = result
+
+        logger.info(f"计划执行快速失败: execution_id={parent_execution.id}, failed={failed}, cancelled={cancelled}")
+        return True
 
     @action(detail=True, methods=['post'], permission_classes=[])
     def result(self, request, pk=None):
@@ -560,23 +632,30 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
                 'logs': result_logs  # 保存日志数据
             }
 
-            task.execution.result = execution_result
-            task.execution.status = task.status
-            task.execution.completed_at = timezone.now()
-            task.execution.save()
-
-            # 如果有父任务（计划执行），更新父任务状态
-            if task.execution.parent:
-                self._update_parent_execution_status(task.execution.parent)
-
-            # 自动生成报告
-            try:
-                from apps.reports.generators import ReportGenerator
-                generator = ReportGenerator(task.execution)
-                generator.generate()  # 自动生成报告
-                logger.info(f"报告已自动生成: execution_id={task.execution.id}")
-            except Exception as e:
-                logger.warning(f"自动生成报告失败: {e}")
+            if (task.script_data or {}).get('shard'):
+                # 分片任务：所有分片完成后才合并结果并结束执行记录
+                from services.data_sharding import record_shard_result
+                execution = record_shard_result(task, execution_result)
+            else:
+                execution = task.execution
+                execution.result = execution_result
+                execution.status = task.status
+                execution.completed_at = timezone.now()
+                execution.save()
+
+            if execution:
+                # 如果有父任务（计划执行），更新父任务状态
+                if execution.parent:
+                    self._update_parent_execution_status(execution.parent)
+
+                # 自动生成报告
+                try:
+                    from apps.reports.generators import ReportGenerator
+                    generator = ReportGenerator(execution)
+                    generator.generate()  # 自动生成报告
+                    logger.info(f"报告已自动生成: execution_id={execution.id}")
+                except Exception as e:
+                    logger.warning(f"自动生成报告失败: {e}")
 
         # 任务完成后，自动触发任务分发（处理等待中的任务）
         try:
@@ -599,14 +678,39 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
             'status': task.status
         })
 
+    @action(detail=True, methods=['get'], permission_classes=[], url_path='data-rows')
+    def data_rows(self, request, pk=None):
+        """执行机分页拉取数据驱动脚本的数据行（?offset=0&limit=100）"""
+        task = get_object_or_404(TaskQueue, pk=pk)
+        script = task.execution.script if task.execution else None
+
+        if not script or not script.data_driven or not script.data_source:
+            return Response(
+                {'error': '该任务的脚本未配置数据源'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+        except (TypeError, ValueError):
+            return Response({'error': 'offset/limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data_source = script.data_source
+        return Response({
+            'columns': data_source.columns,
+            'total': data_source.get_row_count(),
+            'offset': offset,
+            'rows': data_source.get_rows_page(offset, limit)
+        })
+
     @action(detail=True, methods=['post'], permission_classes=[])
     def screenshot(self, request, pk=None):
-        """接收执行器上报的截图"""
+        """接收执行器上报的截图（base64 JSON，兼容旧版执行机）"""
         # 不使用 get_queryset()，直接通过 task ID 获取
         task = get_object_or_404(TaskQueue, pk=pk)
 
         image_data = request.data.get('image_data')
-        is_failure = request.data.get('is_failure', True)
 
         if not image_data:
             return Response(
@@ -616,9 +720,6 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
 
         try:
             import base64
-            from django.core.files.base import ContentFile
-            import os
-            from django.conf import settings
 
             # 解码 base64 图片数据
             if image_data.startswith('data:image'):
@@ -626,34 +727,94 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
                 image_data = image_data.split(',', 1)[1]
 
             image_bytes = base64.b64decode(image_data)
+        except Exception as e:
+            return Response(
+                {'error': f'image_data 不是合法的 base64 数据: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return self._store_screenshot(task, image_bytes, request.data)
+
+    @action(detail=True, methods=['post'], permission_classes=[], url_path='screenshot/upload')
+    def upload_screenshot(self, request, pk=None):
+        """
+        接收执行器上传的二进制截图（multipart/form-data）
+
+        表单字段：
+        - file: 图片文件（必填）
+        - is_failure: 是否失败截图，默认 true
+        - step_index / step_name / error_message: 截图对应的步骤信息
+        """
+        task = get_object_or_404(TaskQueue, pk=pk)
 
-            # 保存截图文件
-            filename = f"task_{task.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.png"
-            screenshots_dir = os.path.join(settings.MEDIA_ROOT, 'screenshots')
-            os.makedirs(screenshots_dir, exist_ok=True)
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': '缺少 file 参数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            file_path = os.path.join(screenshots_dir, filename)
-            with open(file_path, 'wb') as f:
-                f.write(image_bytes)
+        return self._store_screenshot(task, upload, request.data)
+
+    def _store_screenshot(self, task, fileobj, data):
+        """按内容哈希保存截图，记录 Screenshot 并更新执行结果"""
+        from services.screenshot_storage import get_screenshot_storage, ScreenshotStorageError
+        from apps.reports.models import Screenshot
+
+        is_failure = str(data.get('is_failure', True)).lower() not in ('false', '0', '')
+        try:
+            step_index = int(data.get('step_index', 0) or 0)
+        except (TypeError, ValueError):
+            step_index = 0
 
-            # 可以将截图路径保存到任务的 result 中
+        try:
+            screenshot = None
             if task.execution:
-                if not task.execution.result:
-                    task.execution.result = {}
-                task.execution.result['screenshot'] = f"/media/screenshots/{filename}"
+                screenshot = Screenshot.objects.create(
+                    execution=task.execution,
+                    step_index=step_index,
+                    step_name=str(data.get('step_name', '') or '')[:200],
+                    image_path='',
+                    is_error=is_failure,
+                    error_message=str(data.get('error_message', '') or '')
+                )
+
+            def on_thumbnail(thumbnail_url, screenshot_id=screenshot.id if screenshot else None):
+                if screenshot_id:
+                    Screenshot.objects.filter(id=screenshot_id).update(thumbnail_path=thumbnail_url)
+
+            stored = get_screenshot_storage().save(fileobj, on_thumbnail=on_thumbnail)
+
+            if screenshot:
+                screenshot.image_path = stored['url']
+                screenshot.file_size = stored['size']
+                screenshot.save(update_fields=['image_path', 'file_size'])
+
+                execution = task.execution
+                if not execution.result:
+                    execution.result = {}
+                execution.result['screenshot'] = stored['url']
                 if is_failure:
-                    task.execution.result['failure_screenshot'] = f"/media/screenshots/{filename}"
-                task.execution.save()
+                    execution.result['failure_screenshot'] = stored['url']
+                execution.save(update_fields=['result'])
 
-            logger.info(f"任务 {task.id} 截图已保存: {filename}")
+            logger.info(f"任务 {task.id} 截图已保存: {stored['url']}")
 
             return Response({
                 'message': '截图已保存',
-                'path': f"/media/screenshots/{filename}"
+                'path': stored['url'],
+                'thumbnail': stored['thumbnail_url'],
+                'sha256': stored['sha256']
             })
 
+        except ScreenshotStorageError as e:
+            if screenshot and not screenshot.image_path:
+                screenshot.delete()
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"保存截图失败: {e}")
+            if screenshot and not screenshot.image_path:
+                screenshot.delete()
             return Response(
                 {'error': f'保存截图失败: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -685,6 +846,11 @@ class TaskQueueViewSet(viewsets.ModelViewSet):
             task.execution.completed_at = timezone.now()
             task.execution.save()
 
+            # 分片任务：记录已取消的分片，其他分片都已结束时合并结果
+            if (task.script_data or {}).get('shard'):
+                from services.data_sharding import finish_cancelled_shards
+                finish_cancelled_shards([task.execution_id])
+
         return Response({'message': '任务已取消'})
 
     @action(detail=False, methods=['post'], permission_classes=[])
@@ -6,6 +6,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 from .models import Plan
 from .serializers import PlanSerializer
+from apps.projects.access import accessible_project_ids, is_project_admin
 from apps.users.permissions import IsPlanOwnerOrAdmin
 
 
@@ -23,21 +24,13 @@ class PlanViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # 管理员和超级管理员可以看到所有计划
-        if user.role in ['admin', 'super_admin']:
+        if is_project_admin(user):
             return Plan.objects.select_related('project', 'created_by').all()
 
-        # 其他用户只能看到自己创建的项目的计划 + 自己创建的计划
-        from apps.projects.models import ProjectMember
-        user_created_projects = user.created_projects.all()
-        member_project_ids = ProjectMember.objects.filter(
-            user=user
-        ).values_list('project_id', flat=True)
-
+        # 其他用户只能看到自己创建或加入的项目的计划 + 自己创建的计划
         return Plan.objects.select_related('project', 'created_by').filter(
-            Q(project__in=user_created_projects) |
-            Q(project__in=member_project_ids) |
-            Q(created_by=user)
-        ).distinct()
+            Q(project_id__in=accessible_project_ids(user)) | Q(created_by=user)
+        )
 
     def perform_create(self, serializer):
         """创建计划时自动设置创建者"""
@@ -0,0 +1,47 @@
+"""
+用户可访问的项目
+- 自己创建的项目 + 作为成员加入的项目，按用户缓存为项目ID集合
+- 项目或成员变化时只使相关用户的缓存失效
+- 查询集用 project_id__in 过滤，对象权限检查是集合成员判断，不再查询数据库
+"""
+from typing import FrozenSet, Optional
+
+from services.query_cache import cached_value, invalidate
+
+ADMIN_ROLES = ('admin', 'super_admin')
+
+
+def _namespace(user_id: int) -> str:
+    return f'project_access:{user_id}'
+
+
+def _load(user_id: int) -> FrozenSet[int]:
+    from .models import Project, ProjectMember
+
+    # 一次 UNION 查询；模型默认排序不能用在 UNION 的子查询中
+    created = Project.objects.filter(creator_id=user_id).order_by().values_list('id', flat=True)
+    joined = ProjectMember.objects.filter(user_id=user_id).order_by().values_list('project_id', flat=True)
+    return frozenset(created.union(joined))
+
+
+def accessible_project_ids(user) -> FrozenSet[int]:
+    """用户创建或加入的项目ID（不区分管理员，管理员的全部权限由调用方判断）"""
+    return cached_value(f'project_access:{user.pk}', [_namespace(user.pk)], lambda: _load(user.pk))
+
+
+def is_project_admin(user) -> bool:
+    return getattr(user, 'role', None) in ADMIN_ROLES
+
+
+def has_project_access(user, project_id: Optional[int]) -> bool:
+    """用户是否可以访问项目，管理员可以访问所有项目"""
+    if is_project_admin(user):
+        return True
+    return project_id is not None and project_id in accessible_project_ids(user)
+
+
+def invalidate_project_access(*user_ids: Optional[int]):
+    """使用户的可访问项目缓存失效"""
+    namespaces = {_namespace(user_id) for user_id in user_ids if user_id}
+    if namespaces:
+        invalidate(*namespaces)
@@ -0,0 +1,43 @@
+"""
+- 项目列表缓存失效
+- 项目或成员变化时使相关用户的可访问项目缓存失效
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.plans.models import Plan
+from apps.scripts.models import Script
+from services.query_cache import invalidate_on_change
+from .access import invalidate_project_access
+from .models import Project, ProjectMember
+
+invalidate_on_change(Project, 'projects')
+# 成员变化影响用户可见的项目
+invalidate_on_change(ProjectMember, 'projects')
+# 项目列表中的脚本数、计划数
+invalidate_on_change(Script, 'projects', fields=['project'])
+invalidate_on_change(Plan, 'projects', fields=['project'])
+
+
+@receiver(post_init, sender=Project)
+def remember_project_creator(sender, instance, **kwargs):
+    instance._access_creator_id = instance.__dict__.get('creator_id')
+
+
+@receiver(post_save, sender=Project)
+def invalidate_creator_access(sender, instance, created, **kwargs):
+    if created or instance.creator_id != instance._access_creator_id:
+        invalidate_project_access(instance.creator_id, instance._access_creator_id)
+    instance._access_creator_id = instance.creator_id
+
+
+@receiver(post_delete, sender=Project)
+def invalidate_deleted_project_access(sender, instance, **kwargs):
+    # 成员记录级联删除时各自触发 post_delete
+    invalidate_project_access(instance.creator_id)
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def invalidate_member_access(sender, instance, **kwargs):
+    invalidate_project_access(instance.user_id)
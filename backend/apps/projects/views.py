@@ -3,9 +3,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from .access import accessible_project_ids, is_project_admin
 from .models import Project, ProjectMember
 from .serializers import ProjectSerializer, ProjectMemberSerializer, ProjectMemberCreateSerializer
 from apps.users.permissions import IsProjectOwnerOrAdmin, IsAdmin
+from services.query_cache import cached_view
 
 
 class ProjectMemberViewSet(viewsets.ModelViewSet):
@@ -62,7 +64,7 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
             return Response({'error': '项目不存在'}, status=status.HTTP_404_NOT_FOUND)
 
         # 检查权限：项目创建者、管理员、超级管理员可以添加成员
-        is_creator = project.creator == request.user
+        is_creator = project.creator_id == request.user.id
         is_admin = request.user.role in ['admin', 'super_admin']
 
         if not (is_creator or is_admin):
@@ -94,7 +96,7 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
             return Response({'error': '项目不存在'}, status=status.HTTP_404_NOT_FOUND)
 
         # 检查权限：项目创建者、管理员、超级管理员可以移除成员
-        is_creator = project.creator == request.user
+        is_creator = project.creator_id == request.user.id
         is_admin = request.user.role in ['admin', 'super_admin']
 
         if not (is_creator or is_admin):
@@ -113,7 +115,7 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
             return Response({'error': '项目不存在'}, status=status.HTTP_404_NOT_FOUND)
 
         # 检查权限：项目创建者、管理员、超级管理员可以变更成员角色
-        is_creator = project.creator == request.user
+        is_creator = project.creator_id == request.user.id
         is_admin = request.user.role in ['admin', 'super_admin']
 
         if not (is_creator or is_admin):
@@ -145,23 +147,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # 管理员和超级管理员可以看到所有项目
-        if user.role in ['admin', 'super_admin']:
+        if is_project_admin(user):
             return queryset
 
         # 其他用户可以看到：自己创建的项目 + 作为成员加入的项目
-        from django.db.models import Q
+        return queryset.filter(id__in=accessible_project_ids(user))
 
-        # 获取用户作为成员加入的项目ID列表
-        member_project_ids = ProjectMember.objects.filter(
-            user=user
-        ).values_list('project_id', flat=True)
-
-        # 筛选：创建者是用户 OR 用户是项目成员
-        queryset = queryset.filter(
-            Q(creator=user) | Q(id__in=member_project_ids)
-        ).distinct()
-
-        return queryset
+    @cached_view('projects')
+    def list(self, request, *args, **kwargs):
+        """项目列表 - 按用户缓存，项目、成员、脚本、计划变化时失效"""
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """创建项目时自动设置创建者"""
@@ -186,7 +181,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         user = request.user
 
         # 检查权限：项目创建者、管理员、超级管理员可以更新项目
-        is_creator = project.creator == user
+        is_creator = project.creator_id == user.id
         is_admin = user.role in ['admin', 'super_admin']
 
         if not (is_creator or is_admin):
@@ -203,7 +198,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         user = request.user
 
         # 检查权限：项目创建者、管理员、超级管理员可以删除项目
-        is_creator = project.creator == user
+        is_creator = project.creator_id == user.id
         is_admin = user.role in ['admin', 'super_admin']
 
         if not (is_creator or is_admin):
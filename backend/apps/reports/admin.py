@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Report
+from .models import Report, RetentionPolicy
 
 
 @admin.register(Report)
@@ -8,3 +8,10 @@ class ReportAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     readonly_fields = ['created_at']
     search_fields = ['execution__plan__name', 'execution__script__name']
+
+
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ['project', 'keep_last_runs', 'keep_days', 'keep_failed_days', 'max_total_bytes', 'is_enabled']
+    list_filter = ['is_enabled']
+    list_editable = ['is_enabled']
@@ -83,6 +83,39 @@ class ReportGenerator:
         self.report_dir = settings.REPORTS_ROOT
         self.screenshot_dir = settings.SCREENSHOTS_ROOT
 
+    def _collect_screenshots(self) -> list:
+        """
+        收集执行的截图信息
+
+        优先使用 Screenshot 记录（含缩略图），兼容旧版写入 result 的截图列表
+
+        Returns:
+            截图列表，每项包含 url、thumbnail、step_index、step_name、is_error
+        """
+        screenshots = [
+            {
+                'url': shot.image_path,
+                'thumbnail': shot.thumbnail_path or shot.image_path,
+                'step_index': shot.step_index,
+                'step_name': shot.step_name,
+                'is_error': shot.is_error,
+            }
+            for shot in self.execution.screenshots.exclude(image_path='')
+        ]
+        if screenshots:
+            return screenshots
+
+        legacy = (self.execution.result or {}).get('screenshots', [])
+        failure_screenshot = (self.execution.result or {}).get('failure_screenshot')
+        if not legacy and failure_screenshot:
+            legacy = [failure_screenshot]
+        return [
+            item if isinstance(item, dict) else {
+                'url': item, 'thumbnail': item, 'step_index': None, 'step_name': '', 'is_error': True
+            }
+            for item in legacy
+        ]
+
     def _get_suggestion_for_error(self, error_message: str) -> str:
         """
         根据错误消息获取修复建议
@@ -163,7 +196,7 @@ class ReportGenerator:
             else:
                 step_types[step_type]['failed'] += 1
 
-        return {
+        summary = {
             'total': total,
             'passed': passed,
             'failed': failed,
@@ -178,6 +211,20 @@ class ReportGenerator:
             'execution_type': 'script'
         }
 
+        # 压测执行：总耗时取压测时长，并汇总吞吐量、错误率和延迟分位数
+        load_test = result.get('load_test')
+        if load_test:
+            summary['total_duration'] = load_test.get('elapsed', 0)
+            summary['load_test'] = {
+                'users': load_test.get('config', {}).get('users', 0),
+                'iterations': load_test.get('iterations', 0),
+                'requests': load_test.get('requests', 0),
+                'throughput': load_test.get('throughput', 0),
+                'error_rate': load_test.get('error_rate', 0),
+                'latency': load_test.get('latency', {}),
+            }
+        return summary
+
     def _generate_plan_summary(self) -> dict:
         """生成计划执行的汇总数据"""
         # 获取所有子脚本执行记录
@@ -404,8 +451,9 @@ class ReportGenerator:
                 'summary': self._generate_summary(),
                 'steps': (self.execution.result or {}).get('steps', []),
                 'logs': (self.execution.result or {}).get('logs', []),
-                'screenshots': (self.execution.result or {}).get('screenshots', []),
+                'screenshots': self._collect_screenshots(),
                 'charts_data': self._generate_charts_data(),
+                'load_test': (self.execution.result or {}).get('load_test'),
                 'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             html_content = self._render_template(template_data)
@@ -427,8 +475,9 @@ class ReportGenerator:
                 'summary': self._generate_summary(),
                 'steps': (self.execution.result or {}).get('steps', []),
                 'logs': (self.execution.result or {}).get('logs', []),
-                'screenshots': (self.execution.result or {}).get('screenshots', []),
+                'screenshots': self._collect_screenshots(),
                 'charts_data': self._generate_charts_data(),
+                'load_test': (self.execution.result or {}).get('load_test'),
                 'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
@@ -538,6 +587,8 @@ class ReportGenerator:
             border-radius: 4px;
             cursor: pointer;
         }
+        .screenshot-list { display: flex; flex-wrap: wrap; gap: 12px; }
+        .screenshot-item { text-decoration: none; color: #666; font-size: 12px; text-align: center; }
         .log-entry {
             padding: 8px;
             border-left: 3px solid #ddd;
@@ -589,6 +640,65 @@ class ReportGenerator:
             </div>
         </div>
 
+        {% if load_test %}
+        <div class="section">
+            <h2>压测结果</h2>
+            <div class="summary" style="padding: 0 0 20px 0;">
+                <div class="card">
+                    <div class="label">虚拟用户 / 场景次数</div>
+                    <div class="value">{{ load_test.config.users }} / {{ load_test.iterations }}</div>
+                </div>
+                <div class="card rate">
+                    <div class="label">吞吐量</div>
+                    <div class="value">{{ load_test.throughput }}/s</div>
+                </div>
+                <div class="card failed">
+                    <div class="label">错误率</div>
+                    <div class="value">{{ load_test.error_rate }}%</div>
+                </div>
+                <div class="card">
+                    <div class="label">p50 / p90 / p99 (ms)</div>
+                    <div class="value" style="font-size: 20px;">
+                        {{ load_test.latency.p50 }} / {{ load_test.latency.p90 }} / {{ load_test.latency.p99 }}
+                    </div>
+                </div>
+            </div>
+            <div id="loadChart" class="chart-container"></div>
+            <table class="steps-table">
+                <thead>
+                    <tr>
+                        <th width="60">序号</th>
+                        <th>步骤名称</th>
+                        <th width="80">次数</th>
+                        <th width="100">吞吐量</th>
+                        <th width="80">错误率</th>
+                        <th width="80">平均</th>
+                        <th width="80">p50</th>
+                        <th width="80">p90</th>
+                        <th width="80">p99</th>
+                        <th width="80">最大</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for step in load_test.steps %}
+                    <tr>
+                        <td>{{ step.index + 1 }}</td>
+                        <td>{{ step.name }} <span style="color: #999;">({{ step.type }})</span></td>
+                        <td>{{ step.count }}</td>
+                        <td>{{ step.throughput }}/s</td>
+                        <td{% if step.errors %} class="error-msg"{% endif %}>{{ step.error_rate }}%</td>
+                        <td>{{ step.latency.mean }}ms</td>
+                        <td>{{ step.latency.p50 }}ms</td>
+                        <td>{{ step.latency.p90 }}ms</td>
+                        <td>{{ step.latency.p99 }}ms</td>
+                        <td>{{ step.latency.max }}ms</td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+        {% endif %}
+
         <div class="section">
             <h2>测试趋势</h2>
             <div id="trendChart" class="chart-container"></div>
@@ -658,6 +768,21 @@ class ReportGenerator:
             </table>
         </div>
 
+        {% if screenshots %}
+        <div class="section">
+            <h2>截图</h2>
+            <div class="screenshot-list">
+                {% for shot in screenshots %}
+                <a href="{{ shot.url }}" target="_blank" class="screenshot-item">
+                    <img class="screenshot" src="{{ shot.thumbnail }}" loading="lazy" alt="{{ shot.step_name }}"
+                         onerror="this.onerror=null; this.src='{{ shot.url }}';" />
+                    <div class="{{ 'error-msg' if shot.is_error else '' }}">{{ shot.step_name or ('步骤 ' ~ shot.step_index if shot.step_index is not none else '') }}</div>
+                </a>
+                {% endfor %}
+            </div>
+        </div>
+        {% endif %}
+
         {% if logs %}
         <div class="section">
             <h2>执行日志</h2>
@@ -710,6 +835,28 @@ class ReportGenerator:
             }]
         });
 
+        {% if load_test %}
+        // 压测时间序列（每秒请求数、错误数和延迟）
+        const loadChart = echarts.init(document.getElementById('loadChart'));
+        loadChart.setOption({
+            title: { text: '每秒请求数与响应时间' },
+            tooltip: { trigger: 'axis' },
+            legend: { data: ['请求数', '错误数', '平均响应时间', 'p90 响应时间'], top: 30 },
+            grid: { top: 70 },
+            xAxis: { type: 'category', name: '秒', data: {{ load_test.timeseries.t | tojson }} },
+            yAxis: [
+                { type: 'value', name: '次数' },
+                { type: 'value', name: '响应时间 (ms)' }
+            ],
+            series: [
+                { name: '请求数', type: 'bar', data: {{ load_test.timeseries.requests | tojson }}, itemStyle: { color: '#1890ff' } },
+                { name: '错误数', type: 'bar', data: {{ load_test.timeseries.errors | tojson }}, itemStyle: { color: '#f5222d' } },
+                { name: '平均响应时间', type: 'line', yAxisIndex: 1, data: {{ load_test.timeseries.avg_ms | tojson }} },
+                { name: 'p90 响应时间', type: 'line', yAxisIndex: 1, data: {{ load_test.timeseries.p90_ms | tojson }} }
+            ]
+        });
+        {% endif %}
+
         {% if charts_data.failure_analysis %}
         // 失败原因图
         const failureChart = echarts.init(document.getElementById('failureChart'));
@@ -0,0 +1,66 @@
+"""
+清理执行产物管理命令
+
+按项目保留策略（RetentionPolicy）删除过期的报告和截图，建议通过定时任务每天执行一次：
+    python manage.py cleanup_artifacts --orphans
+"""
+from django.core.management.base import BaseCommand
+from services.artifact_retention import ArtifactRetention
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '按保留策略清理报告和截图等执行产物'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计将被清理的内容，不实际删除',
+        )
+        parser.add_argument(
+            '--project-id',
+            type=int,
+            help='只清理指定项目的产物',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批处理的执行数量（默认200）',
+        )
+        parser.add_argument(
+            '--orphans',
+            action='store_true',
+            help='同时清理未被任何记录引用的孤儿文件',
+        )
+        parser.add_argument(
+            '--orphan-grace-days',
+            type=int,
+            default=1,
+            help='孤儿文件的最短保留天数（默认1天）',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        retention = ArtifactRetention(dry_run=dry_run, batch_size=options['batch_size'])
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('[DRY RUN] 仅统计，不会删除任何文件或记录'))
+
+        stats = retention.run(
+            project_id=options.get('project_id'),
+            sweep_orphans=options.get('orphans', False),
+            orphan_grace_days=options['orphan_grace_days'],
+        )
+
+        freed_mb = stats['bytes_freed'] / 1024 / 1024
+        self.stdout.write(
+            f"检查项目: {stats['projects']}, 淘汰执行: {stats['runs_evicted']}, "
+            f"截图记录: {stats['screenshots_deleted']}, 报告记录: {stats['reports_deleted']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"[SUCCESS] {'可' if dry_run else '已'}释放 {stats['files_deleted']} 个文件, {freed_mb:.2f} MB"
+        ))
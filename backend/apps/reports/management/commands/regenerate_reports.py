@@ -6,6 +6,7 @@ from apps.executions.models import Execution
 from apps.reports.models import Report
 from apps.reports.generators import ReportGenerator
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +40,10 @@ class Command(BaseCommand):
         else:
             # 重新生成所有报告
             if force:
-                # 删除所有现有报告
+                # 删除所有现有报告（同时删除报告文件，避免磁盘上残留旧文件）
                 report_count = Report.objects.count()
+                for report in Report.objects.only('html_report', 'pdf_report').iterator():
+                    self._remove_report_files(report)
                 Report.objects.all().delete()
                 self.stdout.write(self.style.WARNING(f'已删除 {report_count} 个旧报告'))
 
@@ -63,6 +66,8 @@ class Command(BaseCommand):
         """重新生成单个报告"""
         try:
             # 删除旧报告
+            for report in Report.objects.filter(execution=execution):
+                self._remove_report_files(report)
             Report.objects.filter(execution=execution).delete()
 
             # 生成新报告
@@ -85,3 +90,12 @@ class Command(BaseCommand):
         except Exception as e:
             logger.error(f"生成报告失败 - execution_id={execution.id}: {e}", exc_info=True)
             self.stdout.write(self.style.ERROR(f'[FAIL] 生成报告失败: 执行ID={execution.id}, 错误={str(e)}'))
+
+    def _remove_report_files(self, report):
+        """删除报告对应的HTML/PDF文件"""
+        for path in (report.html_report, report.pdf_report):
+            if path and os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除报告文件失败: {path}, {e}")
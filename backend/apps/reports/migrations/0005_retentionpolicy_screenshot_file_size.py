@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_projectmember'),
+        ('reports', '0004_alter_report_html_report_alter_report_pdf_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screenshot',
+            name='file_size',
+            field=models.BigIntegerField(default=0, verbose_name='文件大小(字节)'),
+        ),
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keep_last_runs', models.IntegerField(default=50, verbose_name='保留最近执行数')),
+                ('keep_days', models.IntegerField(default=14, verbose_name='成功执行保留天数')),
+                ('keep_failed_days', models.IntegerField(default=60, verbose_name='失败执行保留天数')),
+                ('max_total_bytes', models.BigIntegerField(default=0, verbose_name='产物总大小上限(字节)')),
+                ('is_enabled', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('project', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policy', to='projects.project', verbose_name='所属项目')),
+            ],
+            options={
+                'verbose_name': '产物保留策略',
+                'verbose_name_plural': '产物保留策略',
+                'db_table': 'reports_retention_policy',
+            },
+        ),
+    ]
@@ -127,6 +127,7 @@ class Screenshot(models.Model):
     thumbnail_path = models.CharField(max_length=500, blank=True, verbose_name='缩略图路径')
     is_error = models.BooleanField(default=False, verbose_name='是否错误截图')
     error_message = models.TextField(blank=True, verbose_name='错误消息')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小(字节)')
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
     class Meta:
@@ -137,3 +138,34 @@ class Screenshot(models.Model):
 
     def __str__(self):
         return f'{self.execution_id} - Step {self.step_index}'
+
+
+class RetentionPolicy(models.Model):
+    """
+    产物保留策略
+    控制报告、截图等执行产物的清理规则，project 为空时为全局默认策略
+    """
+    project = models.OneToOneField(
+        'projects.Project',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='retention_policy',
+        verbose_name='所属项目'
+    )
+    keep_last_runs = models.IntegerField(default=50, verbose_name='保留最近执行数')
+    keep_days = models.IntegerField(default=14, verbose_name='成功执行保留天数')
+    keep_failed_days = models.IntegerField(default=60, verbose_name='失败执行保留天数')
+    max_total_bytes = models.BigIntegerField(default=0, verbose_name='产物总大小上限(字节)')
+    # max_total_bytes 为 0 表示不限制
+    is_enabled = models.BooleanField(default=True, verbose_name='是否启用')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'reports_retention_policy'
+        verbose_name = '产物保留策略'
+        verbose_name_plural = '产物保留策略'
+
+    def __str__(self):
+        return f'{self.project.name if self.project else "全局默认"} - 保留最近 {self.keep_last_runs} 次'
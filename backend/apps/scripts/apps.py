@@ -5,3 +5,6 @@ class ScriptsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.scripts'
     verbose_name = '脚本管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0006_script_unique_script_name_per_project'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSourceRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_index', models.IntegerField(verbose_name='行号')),
+                ('data', models.JSONField(default=dict, verbose_name='行数据')),
+                ('data_source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='row_set', to='scripts.datasource', verbose_name='数据源')),
+            ],
+            options={
+                'verbose_name': '数据源行',
+                'verbose_name_plural': '数据源行',
+                'db_table': 'scripts_datasource_row',
+                'ordering': ['row_index'],
+                'unique_together': {('data_source', 'row_index')},
+            },
+        ),
+    ]
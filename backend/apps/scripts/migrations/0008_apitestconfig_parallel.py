@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scripts', '0007_datasourcerow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apitestconfig',
+            name='max_parallel_requests',
+            field=models.IntegerField(default=8, verbose_name='最大并行请求数'),
+        ),
+        migrations.AddField(
+            model_name='apitestconfig',
+            name='parallel_enabled',
+            field=models.BooleanField(default=False, verbose_name='并行执行请求'),
+        ),
+    ]
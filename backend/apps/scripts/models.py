@@ -1,6 +1,54 @@
-from django.db import models
+import re
+from typing import Optional
+
+from django.db import models, transaction
 from django.conf import settings
 
+_CSV_INT = re.compile(r'[+-]?\d+')
+_CSV_FLOAT = re.compile(r'[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?')
+_CSV_BOOL = {'true': True, 'false': False}
+# 列类型从窄到宽，列中出现更宽的值时整列按更宽的类型处理
+_CSV_TYPE_ORDER = ('int', 'float', 'str')
+
+
+def csv_value_type(value: str) -> Optional[str]:
+    """CSV 单元格的类型：int/float/bool/str，空单元格返回 None"""
+    text = value.strip()
+    if not text:
+        return None
+    if text.lower() in _CSV_BOOL:
+        return 'bool'
+    if _CSV_INT.fullmatch(text):
+        return 'int'
+    if _CSV_FLOAT.fullmatch(text):
+        return 'float'
+    return 'str'
+
+
+def merge_csv_type(current: Optional[str], value_type: Optional[str]) -> Optional[str]:
+    """合并列中已有值的类型和新值的类型"""
+    if value_type is None or current == value_type:
+        return current
+    if current is None:
+        return value_type
+    if 'bool' in (current, value_type) or 'str' in (current, value_type):
+        return 'str'
+    return max(current, value_type, key=_CSV_TYPE_ORDER.index)
+
+
+def coerce_csv_value(value: str, column_type: Optional[str]):
+    """按列类型转换单元格，与原来 pandas 按列推断类型的结果一致；空单元格为空字符串"""
+    text = value.strip()
+    if not text:
+        return ''
+    if column_type == 'int':
+        return int(text)
+    if column_type == 'float':
+        return float(text)
+    if column_type == 'bool':
+        return _CSV_BOOL[text.lower()]
+    return value
+
 
 class DataSource(models.Model):
     """
@@ -30,36 +78,192 @@ class DataSource(models.Model):
     def __str__(self):
         return self.name
 
+    # 文件解析时每批写入的行数
+    INGEST_CHUNK_SIZE = 1000
+    # data 中保留的预览行数
+    PREVIEW_ROWS = 20
+
     def parse_file(self):
-        """解析上传的文件"""
+        """
+        解析上传的文件
+
+        按批流式读取 CSV/Excel，逐批写入 DataSourceRow，data 中只保留列名和少量预览行，
+        避免大文件一次性加载到内存或写入单个 JSON 字段
+        """
         if not self.file:
             return
 
         try:
-            import pandas as pd
-
             file_path = self.file.path
 
             if self.type == 'csv':
-                df = pd.read_csv(file_path)
+                columns, rows = self._iter_csv(file_path)
             elif self.type == 'excel':
-                df = pd.read_excel(file_path)
+                columns, rows = self._iter_excel(file_path)
             else:
                 return
 
-            # 转换为数据格式
-            data = {
-                'columns': df.columns.tolist(),
-                'rows': df.to_dict('records')
-            }
+            preview = []
+            row_count = 0
+            with transaction.atomic():
+                self.row_set.all().delete()
+                batch = []
+                for row in rows:
+                    if len(preview) < self.PREVIEW_ROWS:
+                        preview.append(row)
+                    batch.append(DataSourceRow(data_source=self, row_index=row_count, data=row))
+                    row_count += 1
+                    if len(batch) >= self.INGEST_CHUNK_SIZE:
+                        DataSourceRow.objects.bulk_create(batch)
+                        batch = []
+                if batch:
+                    DataSourceRow.objects.bulk_create(batch)
 
-            self.data = data
-            self.row_count = len(df)
-            self.save()
+                self.data = {
+                    'columns': columns,
+                    'preview': preview,
+                    'storage': 'rows',
+                }
+                self.row_count = row_count
+                self.save()
 
         except Exception as e:
             raise ValueError(f'文件解析失败: {str(e)}')
 
+    @staticmethod
+    def _iter_csv(file_path):
+        """
+        流式读取 CSV，返回 (列名, 行生成器)
+
+        先完整读一遍推断每列的类型（只保存每列的类型），再读第二遍按列类型转换单元格
+        """
+        import csv
+
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            columns = next(reader, [])
+            column_types = [None] * len(columns)
+            for values in reader:
+                for i, value in enumerate(values[:len(columns)]):
+                    column_types[i] = merge_csv_type(column_types[i], csv_value_type(value))
+
+        def rows():
+            with open(file_path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for values in reader:
+                    if not any(values):
+                        continue
+                    yield {
+                        column: coerce_csv_value(value, column_type)
+                        for column, column_type, value in zip(columns, column_types, values)
+                    }
+
+        return columns, rows()
+
+    @staticmethod
+    def _iter_excel(file_path):
+        """以只读模式流式读取 Excel 第一个工作表，返回 (列名, 行生成器)"""
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        sheet_rows = workbook.active.iter_rows(values_only=True)
+        header = next(sheet_rows, None) or ()
+        columns = [str(c) if c is not None else f'column_{i + 1}' for i, c in enumerate(header)]
+
+        def rows():
+            try:
+                for values in sheet_rows:
+                    if values is None or all(v is None for v in values):
+                        continue
+                    row = {}
+                    for column, value in zip(columns, values):
+                        if value is None:
+                            value = ''
+                        elif not isinstance(value, (int, float, str, bool)):
+                            # 日期等类型转换为字符串，保证可以写入 JSON
+                            value = str(value)
+                        row[column] = value
+                    yield row
+            finally:
+                workbook.close()
+
+        return columns, rows()
+
+    @property
+    def columns(self) -> list:
+        return (self.data or {}).get('columns', []) if isinstance(self.data, dict) else []
+
+    def iter_rows(self, start: int = 0, chunk_size: int = 500):
+        """
+        惰性迭代数据行
+
+        文件数据源从 DataSourceRow 按 row_index 分块读取，手动录入/旧数据从 data['rows'] 读取
+
+        Args:
+            start: 起始行号
+            chunk_size: 每次查询的行数
+
+        Yields:
+            (row_index, row_data)
+        """
+        data = self.data if isinstance(self.data, dict) else {}
+        if data.get('storage') != 'rows':
+            for row_index, row in enumerate(data.get('rows', [])[start:], start):
+                yield row_index, row
+            return
+
+        next_index = start
+        while True:
+            chunk = list(
+                self.row_set.filter(row_index__gte=next_index)
+                .order_by('row_index')
+                .values_list('row_index', 'data')[:chunk_size]
+            )
+            if not chunk:
+                return
+            yield from chunk
+            next_index = chunk[-1][0] + 1
+
+    def get_rows_page(self, offset: int = 0, limit: int = 100) -> list:
+        """获取一页数据行，返回 [{'row_index': i, 'data': {...}}]"""
+        rows = []
+        for row_index, row in self.iter_rows(start=offset, chunk_size=limit):
+            if len(rows) >= limit:
+                break
+            rows.append({'row_index': row_index, 'data': row})
+        return rows
+
+    def get_row_count(self) -> int:
+        data = self.data if isinstance(self.data, dict) else {}
+        if data.get('storage') == 'rows':
+            return self.row_count
+        return len(data.get('rows', []))
+
+
+class DataSourceRow(models.Model):
+    """
+    数据源行 - 文件数据源按行存储，支持分页读取
+    """
+    data_source = models.ForeignKey(
+        DataSource,
+        on_delete=models.CASCADE,
+        related_name='row_set',
+        verbose_name='数据源'
+    )
+    row_index = models.IntegerField(verbose_name='行号')
+    data = models.JSONField(default=dict, verbose_name='行数据')
+
+    class Meta:
+        db_table = 'scripts_datasource_row'
+        verbose_name = '数据源行'
+        verbose_name_plural = '数据源行'
+        ordering = ['row_index']
+        unique_together = ['data_source', 'row_index']
+
+    def __str__(self):
+        return f'{self.data_source_id} - {self.row_index}'
+
 
 class Script(models.Model):
     """
@@ -184,6 +388,10 @@ class ApiTestConfig(models.Model):
     mock_enabled = models.BooleanField(default=False, verbose_name='启用Mock')
     mock_response = models.JSONField(default=dict, verbose_name='Mock响应')
 
+    # 并行请求配置
+    parallel_enabled = models.BooleanField(default=False, verbose_name='并行执行请求')
+    max_parallel_requests = models.IntegerField(default=8, verbose_name='最大并行请求数')
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -0,0 +1,227 @@
+"""
+模块步骤展开
+- 按层批量加载脚本引用的所有模块（包括模块引用的模块），每层一到两次查询
+- 模块内容和展开结果按 (脚本ID, updated_at) 缓存，模块或其依赖修改后自动失效
+- 模块之间循环引用时抛出 ModuleCycleError；严格模式下引用不存在的模块时抛出 MissingModuleError
+"""
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .models import Script
+
+logger = logging.getLogger(__name__)
+
+
+class ModuleReferenceError(ValueError):
+    """模块引用错误"""
+
+
+class ModuleCycleError(ModuleReferenceError):
+    """模块循环引用"""
+
+    def __init__(self, path: List[int]):
+        self.path = path
+        super().__init__(f"模块循环引用: {' -> '.join(str(script_id) for script_id in path)}")
+
+
+class MissingModuleError(ModuleReferenceError):
+    """引用的模块不存在"""
+
+    def __init__(self, module_ids: List[int]):
+        self.module_ids = module_ids
+        super().__init__(f"模块不存在: {', '.join(str(module_id) for module_id in module_ids)}")
+
+
+def _module_refs(steps: list) -> List[int]:
+    """步骤列表中直接引用的模块ID（按出现顺序去重）"""
+    refs = []
+    for step in steps or []:
+        if isinstance(step, dict) and step.get('type') == 'module':
+            module_id = _module_id(step)
+            if module_id is not None and module_id not in refs:
+                refs.append(module_id)
+    return refs
+
+
+def _module_id(step: dict) -> Optional[int]:
+    try:
+        return int(step.get('module_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+class ModuleResolver:
+    """
+    模块解析器
+
+    进程内共享，线程安全；缓存条目以 updated_at 作为版本，无需手动失效
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (模块ID, updated_at) -> (原始步骤, 直接引用的模块ID)
+        self._modules: 'OrderedDict[Tuple[int, object], Tuple[list, List[int]]]' = OrderedDict()
+        # (模块ID, updated_at) -> (依赖模块的版本, 展开后的步骤)
+        self._expanded: 'OrderedDict[Tuple[int, object], Tuple[Dict[int, object], list]]' = OrderedDict()
+
+    def expand(self, steps: list, root_id: Optional[int] = None, strict: bool = False) -> list:
+        """
+        展开步骤中的模块步骤
+
+        参数:
+            steps: 步骤列表
+            root_id: 步骤所属脚本的ID，用于检测模块引用回自身
+            strict: 为 True 时引用（包括间接引用）不存在的模块抛出 MissingModuleError
+
+        返回:
+            展开后的步骤列表（深拷贝，调用方可以修改）；非严格模式下不存在的模块记录警告后跳过
+        """
+        refs = _module_refs(steps)
+        if not refs:
+            return copy.deepcopy(list(steps or []))
+
+        versions, modules = self._load_closure(refs)
+        if strict:
+            missing = [
+                module_id
+                for module_refs in [refs] + [entry[1] for entry in modules.values()]
+                for module_id in module_refs
+                if module_id not in modules
+            ]
+            if missing:
+                raise MissingModuleError(sorted(set(missing)))
+        memo: Dict[int, list] = {}
+        stack = [root_id] if root_id is not None else []
+        expanded = self._expand_steps(steps, versions, modules, memo, stack)
+        return copy.deepcopy(expanded)
+
+    def expand_script(self, script: Script, strict: bool = False) -> list:
+        """展开脚本的步骤"""
+        return self.expand(script.steps, root_id=script.id, strict=strict)
+
+    def clear(self):
+        with self._lock:
+            self._modules.clear()
+            self._expanded.clear()
+
+    def _load_closure(self, refs: List[int]) -> Tuple[Dict[int, object], Dict[int, Tuple[list, List[int]]]]:
+        """
+        批量加载引用的模块及其传递依赖
+
+        返回:
+            (模块ID -> updated_at, 模块ID -> (原始步骤, 直接引用的模块ID))
+        """
+        versions: Dict[int, object] = {}
+        modules: Dict[int, Tuple[list, List[int]]] = {}
+        # 已查询过的ID，查询不到的模块不再重复查询
+        seen = set()
+        frontier = set(refs)
+
+        while frontier:
+            seen |= frontier
+            rows = Script.objects.filter(id__in=frontier, is_module=True).values_list('id', 'updated_at')
+            uncached = []
+            for script_id, updated_at in rows:
+                versions[script_id] = updated_at
+                with self._lock:
+                    entry = self._modules.get((script_id, updated_at))
+                    if entry is not None:
+                        self._modules.move_to_end((script_id, updated_at))
+                if entry is None:
+                    uncached.append(script_id)
+                else:
+                    modules[script_id] = entry
+
+            if uncached:
+                # 只有未缓存或已修改的模块才读取步骤
+                for script_id, updated_at, steps in Script.objects.filter(id__in=uncached).values_list(
+                        'id', 'updated_at', 'steps'):
+                    entry = (steps or [], _module_refs(steps))
+                    versions[script_id] = updated_at
+                    modules[script_id] = entry
+                    self._store(self._modules, (script_id, updated_at), entry)
+
+            frontier = {
+                module_id
+                for script_id in frontier if script_id in modules
+                for module_id in modules[script_id][1]
+                if module_id not in seen
+            }
+
+        return versions, modules
+
+    def _expand_steps(self, steps, versions, modules, memo, stack) -> list:
+        expanded = []
+        for step in steps or []:
+            if isinstance(step, dict) and step.get('type') == 'module':
+                module_id = _module_id(step)
+                if module_id is None or module_id not in modules:
+                    logger.warning(f"模块脚本 {step.get('module_id')} 不存在")
+                    continue
+                expanded.extend(self._expand_module(module_id, versions, modules, memo, stack))
+            else:
+                expanded.append(step)
+        return expanded
+
+    def _expand_module(self, module_id, versions, modules, memo, stack) -> list:
+        if module_id in stack:
+            raise ModuleCycleError(stack[stack.index(module_id):] + [module_id])
+        if module_id in memo:
+            return memo[module_id]
+
+        key = (module_id, versions[module_id])
+        with self._lock:
+            cached = self._expanded.get(key)
+            if cached is not None:
+                self._expanded.move_to_end(key)
+        if cached is not None:
+            dependencies, steps = cached
+            if all(versions.get(dep_id) == version for dep_id, version in dependencies.items()):
+                memo[module_id] = steps
+                return steps
+
+        stack.append(module_id)
+        try:
+            steps = self._expand_steps(modules[module_id][0], versions, modules, memo, stack)
+        finally:
+            stack.pop()
+
+        # 记录展开结果依赖的所有模块版本，任一依赖修改后缓存失效
+        dependencies = {}
+        pending = list(modules[module_id][1])
+        while pending:
+            dep_id = pending.pop()
+            if dep_id in dependencies:
+                continue
+            # 不存在的模块记为 None，之后创建了该模块时缓存同样失效
+            dependencies[dep_id] = versions.get(dep_id)
+            if dep_id in modules:
+                pending.extend(modules[dep_id][1])
+        self._store(self._expanded, key, (dependencies, steps))
+        memo[module_id] = steps
+        return steps
+
+    def _store(self, cache: OrderedDict, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+
+# 单例
+_module_resolver: Optional[ModuleResolver] = None
+_module_resolver_lock = threading.Lock()
+
+
+def get_module_resolver() -> ModuleResolver:
+    """获取模块解析器单例"""
+    global _module_resolver
+    with _module_resolver_lock:
+        if _module_resolver is None:
+            _module_resolver = ModuleResolver()
+        return _module_resolver
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Script, DataSource, ApiTestConfig
+from .modules import ModuleReferenceError, get_module_resolver
 
 
 class DataSourceSerializer(serializers.ModelSerializer):
@@ -61,6 +62,15 @@ class ScriptSerializer(serializers.ModelSerializer):
                     'name': '同一项目下已存在同名脚本'
                 })
 
+        # 检查模块循环引用和不存在的模块
+        if 'steps' in attrs:
+            try:
+                get_module_resolver().expand(
+                    attrs['steps'], root_id=self.instance.id if self.instance else None, strict=True
+                )
+            except ModuleReferenceError as e:
+                raise serializers.ValidationError({'steps': str(e)})
+
         return attrs
 
     def create(self, validated_data):
@@ -80,5 +90,6 @@ class ApiTestConfigSerializer(serializers.ModelSerializer):
         model = ApiTestConfig
         fields = ['id', 'script', 'base_url', 'default_headers', 'auth_type', 'auth_config',
                   'sign_enabled', 'sign_algorithm', 'sign_key', 'sign_position', 'sign_field',
-                  'mock_enabled', 'mock_response', 'created_at', 'updated_at']
+                  'mock_enabled', 'mock_response', 'parallel_enabled', 'max_parallel_requests',
+                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,13 @@
+"""
+脚本列表缓存失效
+"""
+from apps.projects.models import Project, ProjectMember
+from services.query_cache import invalidate_on_change
+from .models import DataSource, Script
+
+invalidate_on_change(Script, 'scripts')
+# 成员变化影响用户可见的脚本
+invalidate_on_change(ProjectMember, 'scripts')
+# 脚本列表中的项目名、数据源名
+invalidate_on_change(Project, 'scripts', fields=['name'])
+invalidate_on_change(DataSource, 'scripts', fields=['name'])
@@ -0,0 +1,263 @@
+"""
+脚本模块单元测试
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.projects.models import Project
+from apps.scripts.models import Script
+from apps.scripts.modules import MissingModuleError, ModuleCycleError, ModuleResolver
+from apps.users.models import User
+
+
+def _module_step(module_id):
+    return {'type': 'module', 'module_id': module_id}
+
+
+class ModuleResolverTest(TestCase):
+    """模块展开测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='modules', password='testpass123', role='tester')
+        self.project = Project.objects.create(name='模块项目', creator=self.user)
+        self.resolver = ModuleResolver()
+
+    def _module(self, name, steps):
+        return Script.objects.create(project=self.project, name=name, type='api', framework='httprunner',
+                                     steps=steps, is_module=True, module_name=name, created_by=self.user)
+
+    def test_batch_loading_query_count(self):
+        """测试按层批量加载模块，查询次数与模块数量无关，缓存命中后只查询版本"""
+        leaf = self._module('leaf', [{'name': 'leaf'}])
+        modules = [self._module(f'module{i}', [{'name': f'step{i}'}, _module_step(leaf.id)]) for i in range(5)]
+        steps = [_module_step(module.id) for module in modules]
+
+        # 两层模块：每层查询版本和步骤各一次
+        with self.assertNumQueries(4):
+            expanded = self.resolver.expand(steps)
+        self.assertEqual(len(expanded), 10)
+        self.assertEqual(expanded[:2], [{'name': 'step0'}, {'name': 'leaf'}])
+
+        # 缓存命中：每层只查询版本
+        with self.assertNumQueries(2):
+            self.assertEqual(self.resolver.expand(steps), expanded)
+
+    def test_expanded_steps_are_copies(self):
+        """测试展开结果是深拷贝，修改后不影响缓存"""
+        module = self._module('module', [{'name': 'step'}])
+
+        expanded = self.resolver.expand([_module_step(module.id)])
+        expanded[0]['name'] = 'changed'
+
+        self.assertEqual(self.resolver.expand([_module_step(module.id)]), [{'name': 'step'}])
+
+    def test_nested_module_edit_invalidates_cache(self):
+        """测试修改被间接引用的模块后 updated_at 变化，展开结果重新计算"""
+        inner = self._module('inner', [{'name': 'old'}])
+        outer = self._module('outer', [_module_step(inner.id)])
+        steps = [_module_step(outer.id)]
+        self.assertEqual(self.resolver.expand(steps), [{'name': 'old'}])
+
+        inner.steps = [{'name': 'new'}]
+        inner.save()
+
+        # outer 命中缓存，只重新读取 inner 的步骤
+        with self.assertNumQueries(3):
+            self.assertEqual(self.resolver.expand(steps), [{'name': 'new'}])
+
+    def test_cycle_detected(self):
+        """测试模块之间循环引用"""
+        first = self._module('first', [])
+        second = self._module('second', [_module_step(first.id)])
+        first.steps = [_module_step(second.id)]
+        first.save()
+
+        with self.assertRaises(ModuleCycleError) as context:
+            self.resolver.expand([_module_step(first.id)])
+        self.assertEqual(context.exception.path, [first.id, second.id, first.id])
+
+    def test_cycle_back_to_root_detected(self):
+        """测试模块引用回正在展开的脚本自身"""
+        root = self._module('root', [])
+        module = self._module('module', [_module_step(root.id)])
+
+        with self.assertRaises(ModuleCycleError):
+            self.resolver.expand([_module_step(module.id)], root_id=root.id)
+
+    def test_missing_module(self):
+        """测试不存在的模块默认跳过，严格模式下报错（包括间接引用）"""
+        module = self._module('module', [{'name': 'step'}, _module_step(999999)])
+        steps = [_module_step(module.id)]
+
+        self.assertEqual(self.resolver.expand(steps), [{'name': 'step'}])
+        with self.assertRaises(MissingModuleError) as context:
+            self.resolver.expand(steps, strict=True)
+        self.assertEqual(context.exception.module_ids, [999999])
+
+
+class ModuleReferenceApiTest(TestCase):
+    """脚本保存和执行时的模块引用检查测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='module-api', password='testpass123', role='tester')
+        self.project = Project.objects.create(name='模块接口项目', creator=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _script(self, name, steps, is_module=False):
+        return Script.objects.create(project=self.project, name=name, type='api', framework='httprunner',
+                                     steps=steps, is_module=is_module, created_by=self.user)
+
+    def _create_script(self, steps):
+        return self.client.post('/api/scripts/', {
+            'project': self.project.id, 'name': '新脚本', 'type': 'api', 'framework': 'httprunner',
+            'steps': steps,
+        }, format='json')
+
+    def test_create_script_with_missing_module(self):
+        """测试保存引用不存在模块的脚本返回400"""
+        response = self._create_script([_module_step(999999)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('steps', response.data)
+
+    def test_update_module_into_cycle(self):
+        """测试修改模块形成循环引用返回400"""
+        first = self._script('first', [], is_module=True)
+        second = self._script('second', [_module_step(first.id)], is_module=True)
+
+        response = self.client.patch(f'/api/scripts/{first.id}/', {'steps': [_module_step(second.id)]},
+                                     format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('steps', response.data)
+        first.refresh_from_db()
+        self.assertEqual(first.steps, [])
+
+    def test_create_script_with_valid_module(self):
+        """测试引用存在的模块正常保存"""
+        module = self._script('module', [{'name': 'step'}], is_module=True)
+
+        response = self._create_script([_module_step(module.id)])
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_execute_script_with_cycle(self):
+        """测试执行存在循环引用的脚本返回400，不创建执行记录"""
+        from apps.executions.models import Execution
+
+        first = self._script('first', [], is_module=True)
+        second = self._script('second', [_module_step(first.id)], is_module=True)
+        Script.objects.filter(id=first.id).update(steps=[_module_step(second.id)])
+        script = self._script('script', [_module_step(first.id)])
+
+        response = self.client.post('/api/executions/', {'script_id': script.id}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('循环引用', response.data['error'])
+        self.assertFalse(Execution.objects.exists())
+
+    def test_execute_script_with_missing_module(self):
+        """测试执行引用了已删除模块的脚本返回400"""
+        from apps.executions.models import Execution
+
+        module = self._script('module', [{'name': 'step'}], is_module=True)
+        script = self._script('script', [_module_step(module.id)])
+        module.delete()
+
+        response = self.client.post('/api/executions/', {'script_id': script.id}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('模块不存在', response.data['error'])
+        self.assertFalse(Execution.objects.exists())
+
+
+class DataSourceRowsTest(TestCase):
+    """数据源文件解析和数据行分页测试"""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmpdir)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='datasource', email='datasource@example.com',
+                                             password='testpass123')
+
+    def tearDown(self):
+        import shutil
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _csv_source(self, content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from apps.scripts.models import DataSource
+
+        data_source = DataSource.objects.create(
+            name='CSV数据源', type='csv', file=SimpleUploadedFile('data.csv', content.encode('utf-8'))
+        )
+        data_source.parse_file()
+        return data_source
+
+    def test_parse_csv_in_chunks_with_column_types(self):
+        """测试 CSV 分批写入数据行，按列推断数字和布尔类型，混合列保持字符串"""
+        from unittest import mock
+        from apps.scripts.models import DataSource
+
+        content = 'id,price,enabled,code\n1,9.5,true,007\n2,10,False,A1\n\n3,,TRUE,042\n'
+        with mock.patch.object(DataSource, 'INGEST_CHUNK_SIZE', 2), \
+                mock.patch.object(DataSource, 'PREVIEW_ROWS', 2):
+            data_source = self._csv_source(content)
+
+        self.assertEqual(data_source.row_count, 3)
+        self.assertEqual(data_source.data['columns'], ['id', 'price', 'enabled', 'code'])
+        self.assertEqual(len(data_source.data['preview']), 2)
+        self.assertEqual(
+            [row for _, row in data_source.iter_rows()],
+            [
+                {'id': 1, 'price': 9.5, 'enabled': True, 'code': '007'},
+                {'id': 2, 'price': 10.0, 'enabled': False, 'code': 'A1'},
+                {'id': 3, 'price': '', 'enabled': True, 'code': '042'},
+            ]
+        )
+
+    def test_iter_rows_keyset_pagination(self):
+        """测试按 row_index 分块读取，行号不连续时也不遗漏和重复"""
+        from apps.scripts.models import DataSource, DataSourceRow
+
+        data_source = DataSource.objects.create(name='行数据源', type='csv', data={'storage': 'rows'}, row_count=4)
+        for row_index in (0, 1, 5, 9):
+            DataSourceRow.objects.create(data_source=data_source, row_index=row_index, data={'n': row_index})
+
+        self.assertEqual([index for index, _ in data_source.iter_rows(chunk_size=2)], [0, 1, 5, 9])
+        self.assertEqual([index for index, _ in data_source.iter_rows(start=2, chunk_size=1)], [5, 9])
+        self.assertEqual(data_source.get_rows_page(1, 2), [
+            {'row_index': 1, 'data': {'n': 1}}, {'row_index': 5, 'data': {'n': 5}}
+        ])
+
+        # 手动录入的数据源从 data['rows'] 读取
+        manual = DataSource.objects.create(name='手动数据源', data={'rows': [{'a': 1}, {'a': 2}]})
+        self.assertEqual(list(manual.iter_rows(start=1)), [(1, {'a': 2})])
+        self.assertEqual(manual.get_row_count(), 2)
+
+    def test_task_data_rows_endpoint(self):
+        """测试执行机按任务分页拉取数据行"""
+        from rest_framework.test import APIClient
+        from apps.executions.models import Execution
+        from apps.executors.models import TaskQueue
+
+        data_source = self._csv_source('name\n' + ''.join(f'user{i}\n' for i in range(5)))
+        project = Project.objects.create(name='数据驱动项目', creator=self.user)
+        script = Script.objects.create(project=project, name='数据驱动脚本', type='api', framework='httprunner',
+                                       created_by=self.user, data_driven=True, data_source=data_source)
+        execution = Execution.objects.create(execution_type='script', script=script, created_by=self.user)
+        task = TaskQueue.objects.create(execution=execution, script_data={})
+
+        response = APIClient().get(f'/api/tasks/{task.id}/data-rows/', {'offset': 3, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual([row['data']['name'] for row in response.data['rows']], ['user3', 'user4'])
+
+        response = APIClient().get(f'/api/tasks/{task.id}/data-rows/', {'offset': 'x'})
+        self.assertEqual(response.status_code, 400)
@@ -8,8 +8,9 @@ from django_filters.rest_framework import DjangoFilterBackend, FilterSet
 from django_filters import CharFilter, BooleanFilter
 from .models import Script, DataSource
 from .serializers import ScriptSerializer, ScriptDetailSerializer, DataSourceSerializer
-from apps.projects.models import ProjectMember, Project
+from apps.projects.access import accessible_project_ids, is_project_admin
 from apps.users.permissions import IsScriptOwnerOrAdmin
+from services.query_cache import cached_view
 import json
 import yaml
 
@@ -44,6 +45,23 @@ class DataSourceViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
+    @action(detail=True, methods=['get'])
+    def rows(self, request, pk=None):
+        """分页获取数据源的数据行（?offset=0&limit=100）"""
+        data_source = self.get_object()
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+        except (TypeError, ValueError):
+            return Response({'error': 'offset/limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'columns': data_source.columns,
+            'total': data_source.get_row_count(),
+            'offset': offset,
+            'rows': data_source.get_rows_page(offset, limit)
+        })
+
 
 class ScriptViewSet(viewsets.ModelViewSet):
     serializer_class = ScriptSerializer
@@ -60,35 +78,31 @@ class ScriptViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # 管理员和超级管理员可以看到所有脚本
-        if user.role in ['admin', 'super_admin']:
+        if is_project_admin(user):
             # 处理project参数，只过滤指定project=0时不过滤
             project_param = self.request.query_params.get('project')
             if project_param is not None and str(project_param) != '0':
                 queryset = queryset.filter(project=project_param)
             return queryset
 
-        # 获取用户有权限访问的项目：自己创建的 + 作为成员加入的
-        user_created_projects = user.created_projects.all()
-        member_project_ids = ProjectMember.objects.filter(
-            user=user
-        ).values_list('project_id', flat=True)
-
-        # 合并有权限的项目
-        accessible_projects = user_created_projects | Project.objects.filter(
-            id__in=member_project_ids
-        )
+        # 用户有权限访问的项目：自己创建的 + 作为成员加入的
+        project_ids = accessible_project_ids(user)
 
         # 处理project参数
         project_param = self.request.query_params.get('project')
         if project_param is not None and str(project_param) != '0':
             # 检查用户是否有权限访问该项目
-            if not accessible_projects.filter(id=project_param).exists():
+            try:
+                project_id = int(project_param)
+            except (TypeError, ValueError):
+                return Script.objects.none()
+            if project_id not in project_ids:
                 # 用户没有权限访问该项目，返回空查询集
                 return Script.objects.none()
-            queryset = queryset.filter(project=project_param)
+            queryset = queryset.filter(project_id=project_id)
         else:
             # 没有指定项目，返回用户有权限访问的所有项目的脚本
-            queryset = queryset.filter(project__in=accessible_projects)
+            queryset = queryset.filter(project_id__in=project_ids)
 
         return queryset
 
@@ -97,6 +111,11 @@ class ScriptViewSet(viewsets.ModelViewSet):
             return ScriptDetailSerializer
         return ScriptSerializer
 
+    @cached_view('scripts')
+    def list(self, request, *args, **kwargs):
+        """脚本列表 - 按用户缓存，脚本、项目成员变化时失效"""
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """创建脚本时自动设置创建者"""
         serializer.save(created_by=self.request.user)
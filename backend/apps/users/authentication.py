@@ -0,0 +1,161 @@
+"""
+带缓存的 Token 认证
+- Token -> 用户按 TTL 缓存，认证时不再查询 authtoken_token 和 users 表
+- 缓存中只保存认证和权限判断需要的字段（不含密码哈希），访问其他字段时才按主键读取用户
+- 用户保存（修改角色、密码、禁用等）、删除以及登出时清除该用户 Token 的缓存
+- 每个 Token 的最近访问时间和请求数先在进程内累计，间隔一段时间才写入缓存一次
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+_USER_KEY = 'auth:token:{key}'
+_LAST_SEEN_KEY = 'auth:last_seen:{user_id}'
+_REQUESTS_KEY = 'auth:requests:{user_id}'
+
+# 缓存的用户字段，权限判断只使用这些字段时不查询数据库
+CACHED_USER_FIELDS = ('id', 'username', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+class TokenActivity:
+    """
+    Token 访问统计
+
+    每次认证只更新进程内计数；距上次写入超过 interval 秒时把最近访问时间和
+    累计的请求数写入共享缓存，多个工作进程的请求数会累加
+    """
+
+    def __init__(self, interval: int = 60):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # user_id -> [未写入的请求数, 上次写入的单调时钟时间]
+        self._pending: Dict[int, List[float]] = {}
+
+    def record(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is None:
+                entry = self._pending[user_id] = [0, now - self.interval]
+            entry[0] += 1
+            if now - entry[1] < self.interval:
+                return
+            count = int(entry[0])
+            entry[0] = 0
+            entry[1] = now
+        self._flush(user_id, count)
+
+    def _flush(self, user_id: int, count: int):
+        cache.set(_LAST_SEEN_KEY.format(user_id=user_id), time.time(), None)
+        requests_key = _REQUESTS_KEY.format(user_id=user_id)
+        if not cache.add(requests_key, count, None):
+            try:
+                cache.incr(requests_key, count)
+            except ValueError:
+                # 两次调用之间键被清除
+                cache.set(requests_key, count, None)
+
+    @staticmethod
+    def get_stats(user_ids: Iterable[int]) -> Dict[int, Dict[str, Optional[float]]]:
+        """
+        用户最近的 Token 访问统计
+
+        返回:
+            {user_id: {'last_seen': 时间戳或 None, 'requests': 请求数}}，最近访问时间最多滞后 interval 秒
+        """
+        user_ids = list(user_ids)
+        keys = {}
+        for user_id in user_ids:
+            keys[_LAST_SEEN_KEY.format(user_id=user_id)] = (user_id, 'last_seen')
+            keys[_REQUESTS_KEY.format(user_id=user_id)] = (user_id, 'requests')
+        found = cache.get_many(list(keys))
+        stats = {user_id: {'last_seen': None, 'requests': 0} for user_id in user_ids}
+        for key, value in found.items():
+            user_id, field = keys[key]
+            stats[user_id][field] = value
+        return stats
+
+
+token_activity = TokenActivity(interval=settings.AUTH_TOKEN_ACTIVITY_INTERVAL)
+
+
+class CachedUser(SimpleLazyObject):
+    """
+    认证缓存中的用户
+
+    CACHED_USER_FIELDS 中的字段以及 pk、is_authenticated 直接从缓存返回；
+    访问其他属性、比较或作为查询参数时按主键读取完整的用户（只读取一次）
+    """
+
+    def __init__(self, fields: Dict):
+        self.__dict__['_fields'] = fields
+        super().__init__(lambda: get_user_model().objects.get(pk=fields['id']))
+
+    def __getattr__(self, name):
+        if self._wrapped is empty:
+            fields = self.__dict__['_fields']
+            if name in fields:
+                return fields[name]
+            if name == 'pk':
+                return fields['id']
+            if name == 'is_authenticated':
+                return True
+            if name == 'is_anonymous':
+                return False
+        return super().__getattr__(name)
+
+    def __bool__(self):
+        return True
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    带缓存的 TokenAuthentication
+
+    缓存未命中时与 TokenAuthentication 相同，查询 Token 和用户后写入缓存；
+    失效由 apps.users.signals 中的信号和 logout 视图负责
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _USER_KEY.format(key=key)
+        fields = cache.get(cache_key)
+        if isinstance(fields, dict):
+            user = CachedUser(fields)
+        else:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            fields = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+            cache.set(cache_key, fields, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        if not fields['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token_activity.record(fields['id'])
+        # 与 TokenAuthentication 一致，request.auth 为 Token 对象（未查询数据库）
+        return user, self.get_model()(key=key, user_id=fields['id'])
+
+
+def invalidate_token(key: Optional[str]):
+    """清除 Token 的认证缓存"""
+    if key:
+        cache.delete(_USER_KEY.format(key=key))
+
+
+def invalidate_user_tokens(user_id: int):
+    """清除用户所有 Token 的认证缓存"""
+    from rest_framework.authtoken.models import Token
+
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([_USER_KEY.format(key=key) for key in keys])
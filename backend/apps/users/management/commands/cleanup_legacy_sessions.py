@@ -0,0 +1,60 @@
+"""
+清理旧版本文件会话
+
+旧版本使用文件存储会话（每个会话一个文件，从不清理），会话改为存储在缓存中后，
+这些文件已不再使用，部署新版本后执行一次即可：
+python manage.py cleanup_legacy_sessions
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = '删除旧版本文件会话遗留的会话文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='会话文件目录（默认 LEGACY_SESSION_FILE_PATH）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计将被删除的文件，不实际删除',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options.get('path') or settings.LEGACY_SESSION_FILE_PATH)
+        if not path.is_dir():
+            self.stdout.write('没有需要清理的会话文件')
+            return
+
+        # 文件会话的文件名为 Cookie 名 + 会话键
+        prefix = settings.SESSION_COOKIE_NAME
+        deleted = 0
+        freed = 0
+        for file in path.iterdir():
+            if not file.is_file() or not file.name.startswith(prefix):
+                continue
+            freed += file.stat().st_size
+            if not options['dry_run']:
+                file.unlink(missing_ok=True)
+            deleted += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] 将删除 {deleted} 个会话文件，释放 {freed / 1024:.1f} KB'
+            ))
+            return
+
+        if not any(path.iterdir()):
+            try:
+                path.rmdir()
+            except OSError:
+                # 目录可能是挂载点（如旧版本的会话卷），无法删除时保留空目录
+                pass
+        self.stdout.write(self.style.SUCCESS(
+            f'已删除 {deleted} 个会话文件，释放 {freed / 1024:.1f} KB'
+        ))
@@ -0,0 +1,154 @@
+"""
+把 SQLite 数据库中的数据迁移到当前配置的数据库（如 PostgreSQL）
+
+使用方法：
+1. 配置 DB_ENGINE 等环境变量指向新数据库，执行 python manage.py migrate 创建表结构
+2. python manage.py migrate_sqlite_data --source /app/db/db.sqlite3
+
+按外键依赖顺序逐表分批复制（保留主键），复制完成后重置自增序列；
+目标库中 migrate 生成的数据（content types、权限等）会先被清空，再以源库为准写入
+"""
+import copy
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+SOURCE_ALIAS = 'sqlite_source'
+
+
+def _copy_models():
+    """需要复制的模型（包括多对多中间表），按外键依赖排序，被引用的表在前"""
+    models = [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+    dependencies = OrderedDict()
+    for model in models:
+        dependencies[model] = {
+            field.related_model._meta.concrete_model
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not None
+            and field.related_model._meta.concrete_model is not model
+        }
+
+    ordered = []
+    pending = list(dependencies)
+    while pending:
+        ready = [model for model in pending if not (dependencies[model] & set(pending))]
+        if not ready:
+            # 存在循环外键时按原顺序处理，依赖数据库的延迟约束检查
+            ready = pending[:1]
+        for model in ready:
+            ordered.append(model)
+            pending.remove(model)
+    return ordered
+
+
+@contextmanager
+def _keep_timestamps(model):
+    """复制时保留原有的 auto_now / auto_now_add 时间"""
+    changed = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            changed.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = '把 SQLite 数据库中的数据迁移到当前配置的数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default='/app/db/db.sqlite3',
+            help='源 SQLite 数据库文件（默认 /app/db/db.sqlite3）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批复制的行数（默认1000）',
+        )
+        parser.add_argument(
+            '--noinput',
+            action='store_false',
+            dest='interactive',
+            help='不提示确认，直接清空目标库并复制',
+        )
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.exists():
+            raise CommandError(f'源数据库不存在: {source}')
+
+        target = connections[DEFAULT_DB_ALIAS]
+        if target.vendor == 'sqlite' and Path(str(target.settings_dict['NAME'])).resolve() == source.resolve():
+            raise CommandError('目标数据库与源数据库相同，请先通过 DB_ENGINE 等环境变量配置新的数据库')
+
+        self._add_source(source)
+        source_tables = set(connections[SOURCE_ALIAS].introspection.table_names())
+        models = [
+            model for model in _copy_models()
+            if model._meta.db_table in source_tables and router.allow_migrate_model(DEFAULT_DB_ALIAS, model)
+        ]
+
+        if options['interactive']:
+            answer = input(
+                f'将清空 {target.vendor} 数据库 {target.settings_dict["NAME"]} 中的 {len(models)} 张表，'
+                f'并从 {source} 复制数据。输入 yes 继续: '
+            )
+            if answer != 'yes':
+                self.stdout.write('已取消')
+                return
+
+        batch_size = max(options['batch_size'], 1)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            for model in reversed(models):
+                model._base_manager.using(DEFAULT_DB_ALIAS).all()._raw_delete(DEFAULT_DB_ALIAS)
+            for model in models:
+                copied = self._copy_model(model, batch_size)
+                self.stdout.write(f'{model._meta.label}: {copied} 行')
+
+        # 保留主键写入后，序列仍从 1 开始，需要重置到当前最大值
+        sequence_sql = target.ops.sequence_reset_sql(no_style(), models)
+        if sequence_sql:
+            with target.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+        connections[SOURCE_ALIAS].close()
+        self.stdout.write(self.style.SUCCESS(f'迁移完成，共 {len(models)} 张表'))
+
+    def _add_source(self, source: Path):
+        """注册源 SQLite 数据库连接"""
+        databases = {
+            DEFAULT_DB_ALIAS: copy.deepcopy(connections.settings[DEFAULT_DB_ALIAS]),
+            SOURCE_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(source)},
+        }
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings(databases)[SOURCE_ALIAS]
+
+    def _copy_model(self, model, batch_size: int) -> int:
+        """按主键分批复制一张表"""
+        queryset = model._base_manager.using(SOURCE_ALIAS).order_by('pk')
+        copied = 0
+        last_pk = None
+        with _keep_timestamps(model):
+            while True:
+                batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                batch = list(batch_queryset[:batch_size])
+                if not batch:
+                    break
+                model._base_manager.using(DEFAULT_DB_ALIAS).bulk_create(batch, batch_size=batch_size)
+                copied += len(batch)
+                last_pk = batch[-1].pk
+        return copied
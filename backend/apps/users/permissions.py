@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from apps.projects.access import has_project_access
+
 
 class RolePermission(permissions.BasePermission):
     """
@@ -99,13 +101,13 @@ class IsProjectOwnerOrAdmin(permissions.BasePermission):
         if user.role in ['admin', 'super_admin']:
             return True
 
-        # 安全操作（GET, HEAD, OPTIONS）允许所有有权限的用户
+        # 安全操作（GET, HEAD, OPTIONS）允许项目创建者和成员
         if request.method in permissions.SAFE_METHODS:
-            return True
+            return has_project_access(user, obj.id)
 
         # 写操作：只有项目创建者可以操作
-        if hasattr(obj, 'creator'):
-            return obj.creator == user
+        if hasattr(obj, 'creator_id'):
+            return obj.creator_id == user.id
 
         return False
 
@@ -139,14 +141,14 @@ class IsScriptOwnerOrAdmin(permissions.BasePermission):
         if user.role in ['admin', 'super_admin']:
             return True
 
-        # 安全操作允许所有有权限的用户
+        # 安全操作允许所属项目的创建者和成员
         if request.method in permissions.SAFE_METHODS:
-            return True
+            return has_project_access(user, getattr(obj, 'project_id', None))
 
         # tester 只能操作自己创建的脚本
         if user.role == 'tester':
-            if hasattr(obj, 'created_by'):
-                return obj.created_by == user
+            if hasattr(obj, 'created_by_id'):
+                return obj.created_by_id == user.id
 
         return False
 
@@ -180,14 +182,15 @@ class IsPlanOwnerOrAdmin(permissions.BasePermission):
         if user.role in ['admin', 'super_admin']:
             return True
 
-        # 安全操作允许所有有权限的用户
+        # 安全操作允许所属项目的创建者和成员，以及计划的创建者
         if request.method in permissions.SAFE_METHODS:
-            return True
+            return (getattr(obj, 'created_by_id', None) == user.id
+                    or has_project_access(user, getattr(obj, 'project_id', None)))
 
         # tester 只能操作自己创建的计划
         if user.role == 'tester':
-            if hasattr(obj, 'created_by'):
-                return obj.created_by == user
+            if hasattr(obj, 'created_by_id'):
+                return obj.created_by_id == user.id
 
         return False
 
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from datetime import datetime, timezone
+from .authentication import TokenActivity
 
 User = get_user_model()
 
@@ -8,15 +10,34 @@ User = get_user_model()
 class UserSerializer(serializers.ModelSerializer):
     """用户序列化器 - 带角色显示名称"""
     role_display = serializers.CharField(source='get_role_display', read_only=True)
+    last_seen = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'role', 'role_display', 'is_active', 'rabbitmq_enabled', 'created_at', 'updated_at']
+        fields = ['id', 'username', 'email', 'role', 'role_display', 'is_active', 'rabbitmq_enabled',
+                  'last_seen', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'role_display']
         extra_kwargs = {
             'rabbitmq_enabled': {'required': False}
         }
 
+    @staticmethod
+    def activity_context(users) -> dict:
+        """一次批量读取多个用户的最近访问时间，作为 context 传入，避免序列化列表时逐个读取缓存"""
+        stats = TokenActivity.get_stats(user.pk for user in users)
+        return {'last_seen': {user_id: item['last_seen'] for user_id, item in stats.items()}}
+
+    def get_last_seen(self, obj):
+        """最近一次 Token 访问时间（最多滞后 AUTH_TOKEN_ACTIVITY_INTERVAL 秒），只读缓存"""
+        last_seen = self.context.get('last_seen')
+        if last_seen is not None and obj.pk in last_seen:
+            timestamp = last_seen[obj.pk]
+        else:
+            timestamp = TokenActivity.get_stats([obj.pk])[obj.pk]['last_seen']
+        if timestamp is None:
+            return None
+        return serializers.DateTimeField().to_representation(datetime.fromtimestamp(timestamp, tz=timezone.utc))
+
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
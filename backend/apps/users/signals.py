@@ -0,0 +1,26 @@
+"""
+- 角色统计缓存失效
+- 用户修改角色、密码或被禁用、删除后清除其 Token 的认证缓存
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from services.query_cache import invalidate_on_change
+from .authentication import invalidate_token, invalidate_user_tokens
+from .models import User
+
+# 登录时更新 last_login 等保存不影响角色统计
+invalidate_on_change(User, 'roles', fields=['role'])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_token_cache(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
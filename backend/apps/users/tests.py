@@ -131,3 +131,162 @@ class UserRoleTest(TestCase):
         self.assertIn(self.tester.role, roles)
         self.assertIn(self.admin.role, roles)
         self.assertIn(self.super_admin.role, roles)
+
+
+class ProjectAccessTest(TestCase):
+    """可访问项目缓存测试"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pass123')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='pass123')
+
+    def test_membership_changes_invalidate_access(self):
+        """测试加入、移出项目后可访问项目立即更新，缓存命中时不查询数据库"""
+        from apps.projects.access import accessible_project_ids, has_project_access
+        from apps.projects.models import Project, ProjectMember
+
+        project = Project.objects.create(name='访问项目', creator=self.owner)
+        self.assertEqual(accessible_project_ids(self.owner), {project.id})
+        self.assertFalse(has_project_access(self.member, project.id))
+
+        membership = ProjectMember.objects.create(project=project, user=self.member)
+        self.assertTrue(has_project_access(self.member, project.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(has_project_access(self.member, project.id))
+
+        membership.delete()
+        self.assertFalse(has_project_access(self.member, project.id))
+
+    def test_project_delete_invalidates_access(self):
+        """测试删除项目后创建者和成员的缓存失效"""
+        from apps.projects.access import accessible_project_ids
+        from apps.projects.models import Project, ProjectMember
+
+        project = Project.objects.create(name='删除项目', creator=self.owner)
+        ProjectMember.objects.create(project=project, user=self.member)
+        self.assertEqual(accessible_project_ids(self.member), {project.id})
+
+        project.delete()
+        self.assertEqual(accessible_project_ids(self.owner), set())
+        self.assertEqual(accessible_project_ids(self.member), set())
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Token 认证缓存测试"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.authtoken.models import Token
+        from rest_framework.test import APIRequestFactory
+
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='token', email='token@example.com',
+                                             password='pass123', role='tester')
+        self.token = Token.objects.create(user=self.user)
+
+    def _authenticate(self):
+        from apps.users.authentication import CachedTokenAuthentication
+
+        request = self.factory.get('/api/users/me/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_cached_lookup_skips_database(self):
+        """测试缓存命中后认证和权限判断不查询数据库"""
+        self._authenticate()
+        with self.assertNumQueries(0):
+            user, token = self._authenticate()
+            self.assertTrue(user and user.is_authenticated)
+            self.assertEqual((user.pk, user.id, user.role), (self.user.pk, self.user.pk, 'tester'))
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cache_excludes_password(self):
+        """测试缓存中只保存认证需要的字段，其他字段按需读取用户"""
+        from django.core.cache import cache
+
+        self._authenticate()
+        cached = cache.get(f'auth:token:{self.token.key}')
+        self.assertIsInstance(cached, dict)
+        self.assertNotIn('password', cached)
+
+        user, _ = self._authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'token@example.com')
+            self.assertTrue(user.check_password('pass123'))
+        self.assertEqual(user, self.user)
+
+    def test_legacy_cached_user_ignored(self):
+        """测试升级前缓存的 User 对象不再使用，重新查询后写入字段"""
+        from django.core.cache import cache
+
+        cache.set(f'auth:token:{self.token.key}', self.user)
+        user, _ = self._authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIsInstance(cache.get(f'auth:token:{self.token.key}'), dict)
+
+    def test_role_change_invalidates_cache(self):
+        """测试修改角色、禁用用户后缓存失效"""
+        from rest_framework.exceptions import AuthenticationFailed
+
+        self._authenticate()
+        self.user.role = 'admin'
+        self.user.save()
+        self.assertEqual(self._authenticate()[0].role, 'admin')
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_user_list_reads_last_seen_once(self):
+        """测试用户列表一次批量读取所有用户的最近访问时间"""
+        from unittest import mock
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from apps.users.authentication import TokenActivity
+
+        users = [
+            User.objects.create_user(username=f'seen{i}', email=f'seen{i}@example.com', password='pass123')
+            for i in range(3)
+        ]
+        TokenActivity(interval=0).record(users[0].pk)
+        self.user.role = 'admin'
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            response = client.get('/api/users/')
+        self.assertEqual(get_many.call_count, 1)
+        last_seen = {item['username']: item['last_seen'] for item in response.data['results']}
+        self.assertIsNotNone(last_seen['seen0'])
+        self.assertIsNone(last_seen['seen1'])
+
+
+class CleanupLegacySessionsTest(TestCase):
+    """旧版本会话文件清理测试"""
+
+    def test_sessions_deleted_and_mount_point_kept(self):
+        """测试删除会话文件，目录无法删除（挂载点）时不报错"""
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from unittest import mock
+        from django.conf import settings
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory)
+            (path / f'{settings.SESSION_COOKIE_NAME}abc').write_text('session')
+            (path / 'other.txt').write_text('keep')
+
+            call_command('cleanup_legacy_sessions', path=directory, stdout=StringIO())
+            self.assertEqual([file.name for file in path.iterdir()], ['other.txt'])
+
+            (path / 'other.txt').unlink()
+            with mock.patch.object(Path, 'rmdir', side_effect=OSError('Device or resource busy')):
+                call_command('cleanup_legacy_sessions', path=directory, stdout=StringIO())
+            self.assertTrue(path.is_dir())
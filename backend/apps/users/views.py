@@ -136,6 +136,17 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserUpdateSerializer
         return UserSerializer
 
+    def list(self, request, *args, **kwargs):
+        """用户列表 - 本页用户的最近访问时间一次批量读取"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        users = page if page is not None else list(queryset)
+        context = {**self.get_serializer_context(), **UserSerializer.activity_context(users)}
+        serializer = self.get_serializer(users, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         """创建用户时，如果启用了 RabbitMQ，同步创建 RabbitMQ 用户"""
         user = serializer.save()
@@ -184,6 +195,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def logout(self, request):
+        from .authentication import invalidate_token
+
+        # Token 仍然有效（执行机共用），只清除认证缓存，下次请求重新读取用户状态
+        invalidate_token(getattr(request.auth, 'key', None))
         logout(request)
         return Response({'message': '登出成功'}, status=status.HTTP_200_OK)
 
@@ -705,13 +720,19 @@ def role_list(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
+    from django.db.models import Count
+    from services.query_cache import cached_value
     from .permissions import RolePermission
     from .models import User
 
+    # 各角色的用户数量，一次分组查询，用户角色变化时缓存失效
+    counts = cached_value('users:role_counts', ['roles'], lambda: dict(
+        User.objects.values_list('role').annotate(count=Count('id')).order_by()
+    ))
+
     roles = []
     for role_value, role_label in User.ROLE_CHOICES:
-        # 统计每个角色的用户数量
-        count = User.objects.filter(role=role_value).count()
+        count = counts.get(role_value, 0)
         roles.append({
             'value': role_value,
             'label': role_label,
@@ -741,8 +762,8 @@ def role_detail(request, role):
     if request.method == 'GET':
         # 获取角色详情
         role_label = dict(User.ROLE_CHOICES).get(role, role)
-        users = User.objects.filter(role=role)
-        user_data = UserSerializer(users, many=True).data
+        users = list(User.objects.filter(role=role))
+        user_data = UserSerializer(users, many=True, context=UserSerializer.activity_context(users)).data
 
         return Response({
             'value': role,
@@ -750,7 +771,7 @@ def role_detail(request, role):
             'level': RolePermission.ROLE_LEVELS.get(role, 0),
             'permissions': RolePermission.ROLE_PERMISSIONS.get(role, []),
             'users': user_data,
-            'user_count': users.count()
+            'user_count': len(users)
         })
 
     elif request.method == 'PUT':
@@ -796,12 +817,12 @@ def role_users(request, role):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    users = User.objects.filter(role=role)
-    serializer = UserSerializer(users, many=True)
+    users = list(User.objects.filter(role=role))
+    serializer = UserSerializer(users, many=True, context=UserSerializer.activity_context(users))
 
     return Response({
         'role': role,
         'role_label': dict(User.ROLE_CHOICES).get(role, role),
         'users': serializer.data,
-        'count': users.count()
+        'count': len(users)
     })
@@ -0,0 +1,5 @@
+"""
+性能基准测试脚本（不参与单元测试），在 backend 目录下以模块方式运行:
+    python -m benchmarks.templates
+    python -m benchmarks.json_path
+"""
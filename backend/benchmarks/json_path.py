@@ -0,0 +1,141 @@
+"""
+JSONPath 断言性能基准测试
+
+对比旧的断言实现（每次断言重新解析响应、每次拆分路径字符串）与编译路径的耗时，
+默认使用约 5MB 的响应和 200 个断言:
+    python -m benchmarks.json_path
+    python -m benchmarks.json_path --size-mb 5 --assertions 200 --rounds 3
+"""
+import argparse
+import json
+import random
+import time
+
+from engine.extractors import compile_json_path
+
+
+def build_document(size_mb: float) -> dict:
+    items = []
+    size = 0
+    i = 0
+    while size < size_mb * 1024 * 1024:
+        item = {
+            'id': i,
+            'name': f'商品-{i}',
+            'price': round((i * 37) % 1000 / 10, 1),
+            'status': 'active' if i % 3 else 'inactive',
+            'tags': [f'tag{i % 7}', f'tag{i % 11}'],
+            'detail': {'sku': f'SKU{i:08d}', 'stock': i % 50, 'description': '描述文本' * 8},
+        }
+        size += len(json.dumps(item, ensure_ascii=False).encode('utf-8'))
+        items.append(item)
+        i += 1
+    return {'code': 0, 'message': 'ok', 'data': {'total': len(items), 'items': items}}
+
+
+def build_paths(item_count: int, count: int, seed: int = 1) -> list:
+    """生成旧实现也支持的确定路径"""
+    rng = random.Random(seed)
+    templates = [
+        'data.items[{i}].id',
+        'data.items[{i}].name',
+        'data.items[{i}].price',
+        'data.items[{i}].detail.sku',
+        'data.items[{i}].detail.stock',
+        'data.items[{i}].tags[1]',
+        'data.total',
+        'code',
+    ]
+    return [rng.choice(templates).format(i=rng.randrange(item_count)) for _ in range(count)]
+
+
+def build_query_paths(count: int) -> list:
+    """通配符和过滤表达式（旧实现不支持）"""
+    templates = [
+        'data.items[*].id',
+        'data.items[?(@.price > 90)].id',
+        "data.items[?(@.status == 'inactive' && @.detail.stock < 5)].detail.sku",
+        'data.items[0:100].price',
+        '$..sku',
+    ]
+    return [templates[i % len(templates)] for i in range(count)]
+
+
+def legacy_get_json_value(data, path):
+    """旧版 ApiEngine._get_json_value"""
+    keys = path.split('.')
+    current = data
+
+    for key in keys:
+        if '[' in key:
+            name, index = key.split('[')
+            if name:
+                current = current.get(name)
+            index = int(index.rstrip(']'))
+            if isinstance(current, list):
+                current = current[index]
+        else:
+            if isinstance(current, dict):
+                current = current.get(key)
+            else:
+                return None
+
+    return current
+
+
+def timed(func, rounds: int):
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONPath 断言性能基准测试')
+    parser.add_argument('--size-mb', type=float, default=5)
+    parser.add_argument('--assertions', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    document = build_document(args.size_mb)
+    text = json.dumps(document, ensure_ascii=False)
+    item_count = document['data']['total']
+    paths = build_paths(item_count, args.assertions)
+    query_count = args.assertions // 4
+    mixed_paths = paths[:args.assertions - query_count] + build_query_paths(query_count)
+
+    print(f'响应大小: {len(text.encode("utf-8")) / 1024 / 1024:.2f}MB, 元素数: {item_count}, 断言数: {args.assertions}')
+
+    # 旧实现每个断言都调用 response.json() 重新解析整个响应，耗时较长，只执行一轮
+    reparse_time, expected = timed(
+        lambda: [legacy_get_json_value(json.loads(text), path) for path in paths], 1
+    )
+
+    parse_time, parsed = timed(lambda: json.loads(text), args.rounds)
+    compile_json_path.cache_clear()
+    cold_time, _ = timed(lambda: [compile_json_path(path) for path in paths], 1)
+
+    cases = [
+        ('旧路径拆分 (JSON 只解析一次)', lambda: [legacy_get_json_value(parsed, path) for path in paths]),
+        ('编译路径 (缓存命中)', lambda: [compile_json_path(path).get(parsed) for path in paths]),
+    ]
+
+    print(f'{"实现":<40}{"耗时(ms)":>12}')
+    print(f'{"旧实现 - 每次断言解析 JSON (1 轮)":<40}{reparse_time * 1000:>12.1f}')
+    for name, func in cases:
+        elapsed, result = timed(func, args.rounds)
+        status = '' if result == expected else '  [结果不一致]'
+        print(f'{name:<40}{elapsed * 1000:>12.1f}{status}')
+
+    mixed_time, _ = timed(lambda: [compile_json_path(path).get(parsed) for path in mixed_paths], args.rounds)
+    print(f'{f"编译路径 - 含 {query_count} 个通配符/过滤":<40}{mixed_time * 1000:>12.1f}')
+    print(f'{"解析 JSON (一次, 懒解析后所有断言共用)":<40}{parse_time * 1000:>12.1f}')
+    print(f'{"编译路径 - 首次编译":<40}{cold_time * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+变量替换性能基准测试
+
+对比旧的三种变量替换实现与编译模板的耗时（默认 10000 个步骤 x 100 个变量）:
+    python -m benchmarks.templates
+    python -m benchmarks.templates --steps 10000 --variables 100 --rounds 3
+"""
+import argparse
+import json
+import re
+import time
+
+from engine.template import compile_template, render_template
+
+
+def build_steps(step_count: int, variable_count: int) -> list:
+    steps = []
+    for i in range(step_count):
+        steps.append({
+            'name': f'步骤 {i} - ${{v{i % variable_count}}}',
+            'type': 'input',
+            'description': '不含变量的描述文本，用于模拟真实步骤中的静态内容',
+            'params': {
+                'locator': f'#field_${{v{(i * 7) % variable_count}}}',
+                'value': f'${{v{(i * 13) % variable_count}}}',
+                'timeout': 10,
+                'options': {
+                    'clear': True,
+                    'wait': 'visible',
+                    'extra': [1, 2, f'prefix-${{v{(i * 3) % variable_count}}}-suffix'],
+                },
+            },
+        })
+    return steps
+
+
+def legacy_regex_walk(value, variables):
+    """旧版 TestEngine.resolve_variables"""
+    if isinstance(value, str):
+        def replace_var(match):
+            var_value = variables.get(match.group(1), '')
+            return str(var_value) if var_value is not None else match.group(0)
+        return re.sub(r'\$\{([^}]+)\}', replace_var, value)
+    elif isinstance(value, dict):
+        return {k: legacy_regex_walk(v, variables) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [legacy_regex_walk(item, variables) for item in value]
+    return value
+
+
+def legacy_str_replace(value, variables):
+    """旧版执行机 StepExecutor._replace_variables"""
+    if isinstance(value, str):
+        for var_name, var_value in variables.items():
+            value = value.replace(f"${{{var_name}}}", str(var_value))
+        return value
+    elif isinstance(value, dict):
+        return {k: legacy_str_replace(v, variables) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [legacy_str_replace(v, variables) for v in value]
+    return value
+
+
+def legacy_json_round_trip(steps, variables):
+    """旧版 TestExecutor._replace_variables"""
+    steps_json = json.dumps(steps)
+    for key, value in variables.items():
+        steps_json = steps_json.replace(f'${{{key}}}', str(value))
+    return json.loads(steps_json)
+
+
+def timed(func, rounds: int):
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='变量替换性能基准测试')
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--variables', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    steps = build_steps(args.steps, args.variables)
+    variables = {f'v{i}': f'value_{i}' for i in range(args.variables)}
+
+    template = compile_template(steps)
+    compile_time, _ = timed(lambda: compile_template(steps), args.rounds)
+
+    cases = [
+        ('regex 逐步骤遍历 (旧 TestEngine)', lambda: [legacy_regex_walk(step, variables) for step in steps]),
+        ('str.replace 循环 (旧执行机)', lambda: [legacy_str_replace(step, variables) for step in steps]),
+        ('JSON 序列化往返 (旧 TestExecutor)', lambda: legacy_json_round_trip(steps, variables)),
+        ('编译模板 - 仅渲染', lambda: template.render(variables)),
+        ('编译模板 - 编译+渲染', lambda: compile_template(steps).render(variables)),
+        ('编译模板 - 复制容器渲染', lambda: compile_template(steps, copy_containers=True).render(variables)),
+        ('一次性渲染 (新 TestEngine)', lambda: [render_template(step, variables, missing='') for step in steps]),
+    ]
+
+    print(f'步骤数: {args.steps}, 变量数: {args.variables}, 取 {args.rounds} 轮最优')
+    print(f'{"实现":<36}{"耗时(ms)":>12}')
+    expected = None
+    for name, func in cases:
+        elapsed, result = timed(func, args.rounds)
+        if expected is None:
+            expected = result
+        status = '' if result == expected else '  [结果不一致]'
+        print(f'{name:<36}{elapsed * 1000:>12.1f}{status}')
+    print(f'{"编译模板 - 仅编译":<36}{compile_time * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,14 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
 class DisableCSRFMiddleware:
     """
     CSRF保护中间件 - 仅豁免特定API端点
@@ -36,3 +47,90 @@ class DisableCSRFMiddleware:
         if auth_header.startswith('Token '):
             return True
         return False
+
+
+class SessionRefreshMiddleware:
+    """
+    会话滑动过期中间件
+
+    替代 SESSION_SAVE_EVERY_REQUEST：只有本次请求使用了会话、且剩余有效期少于
+    SESSION_REFRESH_THRESHOLD 时才标记为已修改，由 SessionMiddleware 保存并续期 Cookie；
+    只用 Token 认证、未读取会话的请求不会产生任何会话读写
+    """
+
+    # 会话中记录最近一次保存时间的键
+    REFRESHED_AT_KEY = '_refreshed_at'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return response
+
+        now = int(time.time())
+        if session.modified:
+            # 本次请求本来就会保存，顺便记录保存时间
+            session[self.REFRESHED_AT_KEY] = now
+            return response
+
+        expires_at = session.get(self.REFRESHED_AT_KEY, 0) + session.get_expiry_age()
+        if expires_at - now <= settings.SESSION_REFRESH_THRESHOLD:
+            session[self.REFRESHED_AT_KEY] = now
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    请求查询预算中间件
+
+    统计每个请求执行的 SQL 数量和总耗时，超过 QUERY_BUDGET_MAX_QUERIES 或
+    QUERY_BUDGET_MAX_MS 时记录警告日志，并附上重复次数最多的 SQL，便于定位 N+1 查询；
+    两个预算都为 0 时不做统计
+    """
+
+    # 日志中列出的重复 SQL 条数和每条 SQL 的最大长度
+    TOP_STATEMENTS = 3
+    STATEMENT_LIMIT = 300
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        max_queries = getattr(settings, 'QUERY_BUDGET_MAX_QUERIES', 0)
+        max_ms = getattr(settings, 'QUERY_BUDGET_MAX_MS', 0)
+        if not max_queries and not max_ms:
+            return self.get_response(request)
+
+        statements = Counter()
+        elapsed = [0.0]
+
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed[0] += time.perf_counter() - start
+                statements[sql] += 1
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            response = self.get_response(request)
+
+        query_count = sum(statements.values())
+        query_ms = elapsed[0] * 1000
+        if (max_queries and query_count > max_queries) or (max_ms and query_ms > max_ms):
+            repeated = '; '.join(
+                f'{count}x {sql[:self.STATEMENT_LIMIT]}'
+                for sql, count in statements.most_common(self.TOP_STATEMENTS)
+            )
+            logger.warning(
+                f'请求超出查询预算: {request.method} {request.path} '
+                f'queries={query_count} time={query_ms:.1f}ms '
+                f'(budget: {max_queries} queries, {max_ms}ms) top: {repeated}'
+            )
+        return response
@@ -62,7 +62,9 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'core.middleware.DisableCSRFMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -91,12 +93,61 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': Path('/app/db/db.sqlite3'),  # 使用持久化卷目录
+# 数据库配置 - DB_ENGINE 可选 sqlite3（默认）/postgresql/mysql
+# Django 4.2 没有内置连接池：CONN_MAX_AGE 让每个工作线程复用持久连接，
+# 连接数较多时在数据库前部署 PgBouncer（事务模式需设置 DB_DISABLE_SERVER_SIDE_CURSORS=true）
+DATABASE_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'auto_test_platform'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False').lower() == 'true',
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
     }
-}
+elif DATABASE_ENGINE == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('DB_NAME', 'auto_test_platform'),
+            'USER': os.getenv('DB_USER', 'root'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '3306'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path(os.getenv('SQLITE_PATH', '/app/db/db.sqlite3')),  # 使用持久化卷目录
+            'OPTIONS': {
+                # 等待写锁的时间（秒），避免并发写入时直接报 database is locked
+                'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+            },
+        }
+    }
+
+# 单个请求的查询预算，超出时由 QueryBudgetMiddleware 记录警告日志（0 表示不限制）
+QUERY_BUDGET_MAX_QUERIES = int(os.getenv('QUERY_BUDGET_MAX_QUERIES', 50))
+QUERY_BUDGET_MAX_MS = int(os.getenv('QUERY_BUDGET_MAX_MS', 500))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -125,13 +176,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
+# Token 认证缓存的过期时间（秒），用户保存、删除和登出时立即失效
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+# Token 最近访问时间写入缓存的最小间隔（秒）
+AUTH_TOKEN_ACTIVITY_INTERVAL = int(os.getenv('AUTH_TOKEN_ACTIVITY_INTERVAL', 60))
+
 # CORS settings - 支持从环境变量读取
 CORS_ALLOWED_ORIGINS_ENV = os.getenv('CORS_ALLOWED_ORIGINS', '')
 CORS_ALLOWED_ORIGINS = [
@@ -158,6 +214,18 @@ AUTH_USER_MODEL = 'users.User'
 # Report settings
 REPORTS_ROOT = BASE_DIR / 'reports'
 SCREENSHOTS_ROOT = MEDIA_ROOT / 'screenshots'
+# 超过内存上限的执行日志写入该目录（gzip 压缩）
+EXECUTION_LOGS_ROOT = MEDIA_ROOT / 'execution_logs'
+
+# 数据驱动分片执行：每个分片的最少行数、最多分片数
+DATA_SHARD_MIN_ROWS = int(os.getenv('DATA_SHARD_MIN_ROWS', 200))
+DATA_SHARD_MAX_SHARDS = int(os.getenv('DATA_SHARD_MAX_SHARDS', 16))
+
+# 执行机最大并发数允许配置的上限，执行机实际并发由客户端按资源动态决定，不超过该执行机的 max_concurrent
+EXECUTOR_MAX_CONCURRENT_LIMIT = int(os.getenv('EXECUTOR_MAX_CONCURRENT_LIMIT', 64))
+
+# 没有执行历史的脚本的预估耗时（秒），用于计划调度和预计总耗时
+EXPECTED_DURATION_DEFAULT = int(os.getenv('EXPECTED_DURATION_DEFAULT', 60))
 
 # Create directories if they don't exist
 os.makedirs(REPORTS_ROOT, exist_ok=True)
@@ -196,11 +264,46 @@ if not RABBITMQ_ENCRYPTION_KEY:
             "生成密钥命令: python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
         )
 
-# Session settings - 使用文件存储以避免容器重启导致session丢失
-SESSION_ENGINE = 'django.contrib.sessions.backends.file'
-SESSION_FILE_PATH = BASE_DIR / 'sessions'
-os.makedirs(SESSION_FILE_PATH, exist_ok=True)
+# Cache settings - 设置了 REDIS_HOST 时使用 Redis，所有 ASGI 工作进程共享缓存；
+# 否则使用进程内缓存（仅适用于开发环境和测试）
+def _redis_url(env_name, db_env_name, default_db):
+    if os.getenv(env_name):
+        return os.getenv(env_name)
+    if os.getenv('REDIS_HOST'):
+        return f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', 6379)}/{os.getenv(db_env_name, default_db)}"
+    return ''
+
+
+CACHE_REDIS_URL = _redis_url('CACHE_REDIS_URL', 'CACHE_REDIS_DB', 2)
+SESSION_REDIS_URL = _redis_url('SESSION_REDIS_URL', 'SESSION_REDIS_DB', 1)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'atp',
+        'TIMEOUT': 300,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # 会话单独使用一个缓存，清空查询缓存不会使用户退出登录
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSION_REDIS_URL,
+        'KEY_PREFIX': 'session',
+    } if SESSION_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+# Session settings - 会话存储在缓存中，请求时不再读写磁盘
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 86400  # 24小时
-SESSION_SAVE_EVERY_REQUEST = True  # 每次请求都保存session
+# 滑动过期：剩余有效期少于该值（秒）时由 SessionRefreshMiddleware 续期，不再每次请求都保存session
+SESSION_REFRESH_THRESHOLD = int(os.getenv('SESSION_REFRESH_THRESHOLD', 6 * 3600))
+# 旧版本文件会话的目录，由 cleanup_legacy_sessions 命令清理
+LEGACY_SESSION_FILE_PATH = BASE_DIR / 'sessions'
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_HTTPONLY = True
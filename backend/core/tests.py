@@ -1,8 +1,13 @@
 """
 中间件单元测试
 """
-from django.test import TestCase, RequestFactory
-from core.middleware import DisableCSRFMiddleware
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from core.middleware import DisableCSRFMiddleware, QueryBudgetMiddleware, SessionRefreshMiddleware
 
 
 class DisableCSRFMiddlewareTest(TestCase):
@@ -58,3 +63,79 @@ class DisableCSRFMiddlewareTest(TestCase):
                 getattr(request, '_dont_enforce_csrf_checks', False),
                 f'路径 {path} 不应该被豁免'
             )
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    """查询预算中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _view(self, query_count):
+        def view(request):
+            for _ in range(query_count):
+                get_user_model().objects.filter(username='budget').exists()
+            return HttpResponse('ok')
+        return view
+
+    @override_settings(QUERY_BUDGET_MAX_QUERIES=3, QUERY_BUDGET_MAX_MS=0)
+    def test_logs_request_over_budget(self):
+        """测试超出查询数预算时记录重复的 SQL"""
+        middleware = QueryBudgetMiddleware(self._view(5))
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            response = middleware(self.factory.get('/api/scripts/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries=5', logs.output[0])
+        self.assertIn('5x SELECT', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_MAX_QUERIES=3, QUERY_BUDGET_MAX_MS=0)
+    def test_request_within_budget(self):
+        """测试未超出预算时不记录日志"""
+        middleware = QueryBudgetMiddleware(self._view(2))
+        with self.assertNoLogs('core.middleware', level='WARNING'):
+            middleware(self.factory.get('/api/scripts/'))
+
+
+class SessionRefreshMiddlewareTest(TestCase):
+    """会话滑动过期中间件测试"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        session = SessionStore()
+        session['user'] = 'tester'
+        session.create()
+        self.session_key = session.session_key
+
+    def _request(self, refreshed_at=None, read=True):
+        if refreshed_at is not None:
+            session = SessionStore(self.session_key)
+            session[SessionRefreshMiddleware.REFRESHED_AT_KEY] = refreshed_at
+            session.save()
+        request = self.factory.get('/api/scripts/')
+        request.session = SessionStore(self.session_key)
+
+        def view(request):
+            if read:
+                request.session.get('user')
+            return HttpResponse('ok')
+        SessionRefreshMiddleware(view)(request)
+        return request
+
+    @override_settings(SESSION_COOKIE_AGE=3600, SESSION_REFRESH_THRESHOLD=600)
+    def test_fresh_session_not_saved(self):
+        """测试剩余有效期充足时不保存会话"""
+        request = self._request(refreshed_at=int(time.time()))
+        self.assertFalse(request.session.modified)
+
+    @override_settings(SESSION_COOKIE_AGE=3600, SESSION_REFRESH_THRESHOLD=600)
+    def test_session_near_expiry_refreshed(self):
+        """测试临近过期时续期"""
+        request = self._request(refreshed_at=int(time.time()) - 3300)
+        self.assertTrue(request.session.modified)
+
+    @override_settings(SESSION_COOKIE_AGE=3600, SESSION_REFRESH_THRESHOLD=600)
+    def test_unused_session_untouched(self):
+        """测试未读取会话的请求不会续期"""
+        request = self._request(refreshed_at=int(time.time()) - 3300, read=False)
+        self.assertFalse(request.session.accessed)
+        self.assertFalse(request.session.modified)
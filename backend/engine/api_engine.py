@@ -1,31 +1,99 @@
 """
 API测试引擎实现
 """
+import heapq
+import re
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, List
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from django.conf import settings
 
 from .base import TestEngine
+from .extractors import compile_json_path, compile_regex
+from .request_graph import RequestGroup, build_request_groups
+from .response_body import CapturedResponse, ResponseBody
 
 
 class ApiEngine(TestEngine):
     """
     API测试引擎
     支持RESTful API测试
+
+    配置 parallel=True 时，相互之间没有变量依赖的请求组在线程池中并发执行，
+    步骤结果和日志仍按原步骤顺序汇总
+
+    响应体流式读取，步骤结果中只保存不超过 response_capture_bytes 的响应体，
+    更大的响应体只保存预览、大小和 SHA-256
     """
 
+    # 响应体默认限制（字节）
+    RESPONSE_CAPTURE_BYTES = 8 * 1024
+    RESPONSE_MEMORY_BYTES = 1024 * 1024
+    RESPONSE_MAX_BYTES = 100 * 1024 * 1024
+    # 步骤结果中单个响应头的最大长度
+    HEADER_VALUE_LIMIT = 1024
+
     def __init__(self, config: Dict[str, Any] = None):
+        # 并行执行时每个线程有各自的结果缓冲、当前步骤和最近响应
+        self._local = threading.local()
         super().__init__(config)
         self.timeout = self.config.get('timeout', 30)
         self.base_url = self.config.get('base_url', '')
         self.headers = self.config.get('headers', {})
         self.auth = self.config.get('auth', {})
+        # 步骤结果中保存的响应体大小、内存中保留的响应体大小、读取的响应体上限（0 表示不限制）
+        self.response_capture_bytes = self.config.get('response_capture_bytes', self.RESPONSE_CAPTURE_BYTES)
+        self.response_memory_bytes = self.config.get('response_memory_bytes', self.RESPONSE_MEMORY_BYTES)
+        self.response_max_bytes = self.config.get('response_max_bytes', self.RESPONSE_MAX_BYTES)
+        self.parallel = bool(self.config.get('parallel', False))
+        self.max_parallel_requests = max(int(self.config.get('max_parallel_requests', 8)), 1)
+        self._parallel_active = False
         self.session = requests.Session()
+        if self.parallel:
+            # 每个主机的连接池不小于并发数，避免并发请求时连接被丢弃重建
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(self.max_parallel_requests, 10))
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
         self.cookies = {}
 
+    @property
+    def results(self) -> Dict[str, Any]:
+        buffer = getattr(self._local, 'results', None)
+        return self._results if buffer is None else buffer
+
+    @results.setter
+    def results(self, value: Dict[str, Any]):
+        self._results = value
+
+    @property
+    def current_step_index(self) -> int:
+        return getattr(self._local, 'step_index', self._current_step_index)
+
+    @current_step_index.setter
+    def current_step_index(self, value: int):
+        if getattr(self._local, 'results', None) is None:
+            self._current_step_index = value
+        else:
+            self._local.step_index = value
+
+    @property
+    def last_response(self) -> requests.Response:
+        # 未发送过请求时抛出 AttributeError，hasattr(self, 'last_response') 为 False
+        return self._local.response
+
+    @last_response.setter
+    def last_response(self, value: requests.Response):
+        # 被替换的响应不再使用，关闭其响应体释放临时文件
+        previous = getattr(self._local, 'response', None)
+        if previous is not None and previous is not value:
+            previous.close()
+        self._local.response = value
+
     def setup(self) -> bool:
         """初始化API测试环境"""
         try:
@@ -86,8 +154,119 @@ class ApiEngine(TestEngine):
                 'duration': round((time.time() - start_time) * 1000, 2)
             }
 
+    def execute_steps(self, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        执行多个步骤
+
+        并行模式下按请求组的变量依赖并发执行；失败即停止（continue_on_failure=False）时
+        无法保证不越过失败步骤，仍按顺序执行
+        """
+        if (
+            not self.parallel
+            or self._parallel_active
+            or not self.config.get('continue_on_failure', True)
+        ):
+            return super().execute_steps(steps)
+
+        groups = build_request_groups(steps)
+        if sum(1 for group in groups if not group.serial) < 2:
+            return super().execute_steps(steps)
+
+        self._parallel_active = True
+        try:
+            self._execute_groups(steps, groups)
+        finally:
+            self._parallel_active = False
+        return self.results
+
+    def _execute_groups(self, steps: List[Dict[str, Any]], groups: List[RequestGroup]):
+        """按依赖关系调度请求组，完成的组按原顺序合并到结果中"""
+        start_time = time.time()
+        self.results['total'] = len(steps)
+
+        pending = {group.position: len(group.depends_on) for group in groups}
+        dependents: Dict[int, List[int]] = {group.position: [] for group in groups}
+        for group in groups:
+            for position in group.depends_on:
+                dependents[position].append(group.position)
+
+        ready = [position for position, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        buffers: Dict[int, tuple] = {}
+        merged = 0
+        running = {}
+        completed = 0
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_parallel_requests,
+            thread_name_prefix='ApiEngineRequest'
+        ) as pool:
+            while completed < len(groups):
+                finished = []
+                while ready:
+                    group = groups[heapq.heappop(ready)]
+                    if group.serial:
+                        # 串行组就绪时前面的组都已完成，先合并结果再在当前线程执行
+                        merged = self._merge_buffers(groups, buffers, merged)
+                        for index, step in group.steps:
+                            self._run_indexed_step(index, step)
+                        merged += 1
+                        finished.append(group.position)
+                    else:
+                        running[pool.submit(self._run_group, group)] = group
+
+                if not finished:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        group = running.pop(future)
+                        buffers[group.position] = future.result()
+                        finished.append(group.position)
+
+                for position in finished:
+                    completed += 1
+                    for dependent in dependents[position]:
+                        pending[dependent] -= 1
+                        if pending[dependent] == 0:
+                            heapq.heappush(ready, dependent)
+
+        self._merge_buffers(groups, buffers, merged)
+        self.add_log(
+            f"并行执行完成: {len(groups)} 个请求组"
+            f"（{sum(1 for group in groups if group.serial)} 个串行），"
+            f"最大并发 {self.max_parallel_requests}，耗时 {time.time() - start_time:.2f}秒"
+        )
+
+    def _run_group(self, group: RequestGroup) -> tuple:
+        """在工作线程中执行请求组，返回 (结果缓冲, 最近响应)"""
+        self._local.__dict__.clear()
+        self._local.results = {'passed': 0, 'failed': 0, 'steps': [], 'logs': [], 'screenshots': []}
+        try:
+            for index, step in group.steps:
+                self._run_indexed_step(index, step)
+            return self._local.results, getattr(self._local, 'response', None)
+        finally:
+            self._local.__dict__.clear()
+
+    def _merge_buffers(self, groups: List[RequestGroup], buffers: Dict[int, tuple], merged: int) -> int:
+        """按组顺序合并已完成的结果缓冲，遇到未完成的组时停止，返回下一个待合并的位置"""
+        while merged < len(groups) and merged in buffers:
+            buffer, response = buffers.pop(merged)
+            for key in ('passed', 'failed'):
+                self.results[key] += buffer[key]
+            for key in ('steps', 'logs', 'screenshots'):
+                self.results[key].extend(buffer[key])
+            if response is not None:
+                # 后续串行步骤的断言和提取使用按顺序最近一个请求的响应
+                self.last_response = response
+            merged += 1
+        return merged
+
     def teardown(self) -> None:
         """清理资源"""
+        response = getattr(self._local, 'response', None)
+        if response is not None:
+            response.close()
+            del self._local.response
         try:
             self.session.close()
             self.add_log("Session已关闭")
@@ -150,8 +329,15 @@ class ApiEngine(TestEngine):
             else:
                 request_params['data'] = body
 
-        # 发送请求
-        response = self.session.request(method, url, **request_params)
+        # 发送请求，响应体流式读取
+        raw_response = self.session.request(method, url, stream=True, **request_params)
+        body = ResponseBody.read(
+            raw_response,
+            memory_bytes=self.response_memory_bytes,
+            max_bytes=params.get('max_response_bytes', self.response_max_bytes),
+            preview_bytes=self.response_capture_bytes
+        )
+        response = CapturedResponse(raw_response, body)
 
         # 保存响应供后续使用
         self.last_response = response
@@ -161,20 +347,15 @@ class ApiEngine(TestEngine):
             'success': response.status_code < 400,
             'status_code': response.status_code,
             'response_time': response.elapsed.total_seconds() * 1000,
-            'response_headers': dict(response.headers),
+            'response_headers': self._capture_headers(response.headers),
+            'response_size': body.size,
             'request': {
                 'method': method,
                 'url': url,
                 'headers': request_headers
             }
         }
-
-        # 尝试解析响应体
-        try:
-            response_body = response.json()
-            result['response_body'] = response_body
-        except:
-            result['response_body'] = response.text
+        result.update(self._capture_body(response))
 
         # 判断请求是否成功（基于状态码）
         expected_status = params.get('expected_status', 200)
@@ -197,6 +378,39 @@ class ApiEngine(TestEngine):
 
         return result
 
+    def _capture_headers(self, headers) -> Dict[str, str]:
+        """保存到步骤结果的响应头，过长的值截断"""
+        limit = self.HEADER_VALUE_LIMIT
+        return {
+            name: value if len(value) <= limit else value[:limit] + '...'
+            for name, value in headers.items()
+        }
+
+    def _capture_body(self, response: CapturedResponse) -> Dict[str, Any]:
+        """
+        保存到步骤结果的响应体
+
+        不超过 response_capture_bytes 的响应体完整保存（JSON 解析后保存），
+        更大的或被截断的响应体只保存文本预览和 SHA-256
+        """
+        body = response.body
+        if body.size <= self.response_capture_bytes and not body.truncated:
+            try:
+                return {'response_body': response.json()}
+            except ValueError:
+                return {'response_body': response.text}
+
+        return {
+            'response_body': response.preview_text,
+            'response_preview': True,
+            'response_sha256': body.sha256,
+            'response_truncated': body.truncated,
+        }
+
+    def _response_json_value(self, response: CapturedResponse, json_path: str) -> Any:
+        """按 JSONPath 从响应中取值，大响应体增量解析"""
+        return response.json_value(json_path, self._get_json_value)
+
     def _assert(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """断言响应"""
         assert_type = params.get('assert_type', 'status_code')
@@ -235,8 +449,7 @@ class ApiEngine(TestEngine):
             elif assert_type == 'body':
                 json_path = params.get('json_path')
                 try:
-                    response_body = response.json()
-                    actual = self._get_json_value(response_body, json_path)
+                    actual = self._response_json_value(response, json_path)
                     success = str(actual) == str(expected)
                     return {
                         'success': success,
@@ -269,10 +482,8 @@ class ApiEngine(TestEngine):
 
             elif assert_type == 'regex':
                 pattern = params.get('pattern', expected)
-                import re
                 try:
-                    compiled_pattern = re.compile(pattern)
-                    success = compiled_pattern.search(response.text) is not None
+                    success = compile_regex(pattern).search(response.text) is not None
                     return {
                         'success': success,
                         'message': f'正则匹配断言: pattern="{pattern}", 结果={success}',
@@ -285,8 +496,7 @@ class ApiEngine(TestEngine):
                 json_path = params.get('json_path')
                 operator = params.get('operator', '==')
                 try:
-                    response_body = response.json()
-                    actual = self._get_json_value(response_body, json_path)
+                    actual = self._response_json_value(response, json_path)
 
                     actual_num = float(str(actual).strip())
                     expected_num = float(str(expected).strip())
@@ -357,8 +567,7 @@ class ApiEngine(TestEngine):
         try:
             if extract_type == 'json_path':
                 json_path = params.get('json_path')
-                response_body = self.last_response.json()
-                value = self._get_json_value(response_body, json_path)
+                value = self._response_json_value(self.last_response, json_path)
 
             elif extract_type == 'header':
                 header_name = params.get('header_name')
@@ -366,10 +575,7 @@ class ApiEngine(TestEngine):
 
             elif extract_type == 'regex':
                 pattern = params.get('pattern')
-                import re
-                match = re.search(pattern, self.last_response.text)
-                if match:
-                    value = match.group(1) if match.lastindex else match.group(0)
+                value = compile_regex(pattern).extract(self.last_response.text)
 
             elif extract_type == 'cookie':
                 cookie_name = params.get('cookie_name')
@@ -422,26 +628,12 @@ class ApiEngine(TestEngine):
         return self.resolve_variables(data)
 
     def _get_json_value(self, data: Any, path: str) -> Any:
-        """通过JSONPath获取值"""
-        keys = path.split('.')
-        current = data
-
-        for key in keys:
-            # 处理数组索引 [0]
-            if '[' in key:
-                name, index = key.split('[')
-                if name:
-                    current = current.get(name)
-                index = int(index.rstrip(']'))
-                if isinstance(current, list):
-                    current = current[index]
-            else:
-                if isinstance(current, dict):
-                    current = current.get(key)
-                else:
-                    return None
+        """
+        通过JSONPath获取值
 
-        return current
+        路径编译后缓存；确定路径返回单个值（不存在时为 None），含通配符或过滤的路径返回匹配值列表
+        """
+        return compile_json_path(path).get(data)
 
     def _execute_script(self, script: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
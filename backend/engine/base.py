@@ -1,9 +1,14 @@
 """
 测试引擎基类
 """
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
-import re
+
+from .conditions import ConditionError, compile_condition
+from .extractors import compile_regex
+from .log_buffer import LogBuffer, level_value
+from .template import render_template
 
 
 class TestEngine(ABC):
@@ -12,15 +17,25 @@ class TestEngine(ABC):
     所有测试引擎必须实现此接口
     """
 
+    # set_variable 日志中变量值的最大长度
+    LOG_VALUE_LIMIT = 200
+
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
         self.driver = None
+        # 低于 log_level 的日志不记录；超过 log_capacity 条后写入日志文件，内存中只保留最近的日志
+        self.log_level = level_value(self.config.get('log_level', 'info'))
+        self.log_buffer = LogBuffer(
+            capacity=self.config.get('log_capacity', 1000),
+            log_dir=self.config.get('log_dir'),
+            name=self.config.get('log_name'),
+        )
         self.results = {
             'total': 0,
             'passed': 0,
             'failed': 0,
             'steps': [],
-            'logs': [],
+            'logs': self.log_buffer,
             'screenshots': []
         }
         self.current_step_index = 0
@@ -72,13 +87,23 @@ class TestEngine(ABC):
         pass
 
     def add_log(self, message: str, level: str = 'info'):
-        """添加日志"""
-        self.results['logs'].append({
-            'step': self.current_step_index,
-            'message': message,
-            'level': level,
-            'timestamp': self._get_timestamp()
-        })
+        """添加日志，时间戳在导出时才格式化"""
+        if level_value(level) < self.log_level:
+            return
+        self.results['logs'].append((time.monotonic(), self.current_step_index, level, message))
+
+    def log_enabled(self, level: str) -> bool:
+        """该级别的日志是否会被记录，用于跳过构造开销较大的日志消息"""
+        return level_value(level) >= self.log_level
+
+    def export_logs(self) -> Dict[str, Any]:
+        """
+        导出日志到执行结果
+
+        返回:
+            logs: 最近的日志；log_total: 日志总数；log_file: 日志超过内存上限时完整日志文件的路径
+        """
+        return self.log_buffer.export()
 
     def add_screenshot(self, path: str):
         """添加截图"""
@@ -87,11 +112,6 @@ class TestEngine(ABC):
             'path': path
         })
 
-    def _get_timestamp(self) -> str:
-        """获取当前时间戳"""
-        from datetime import datetime
-        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
     def _find_element(self, locator: Dict[str, str]):
         """
         查找元素（子类可实现自己的定位逻辑）
@@ -112,7 +132,11 @@ class TestEngine(ABC):
             value: 变量值
         """
         self.variables[name] = value
-        self.add_log(f"设置变量: {name} = {value}")
+        if self.log_enabled('debug'):
+            text = str(value)
+            if len(text) > self.LOG_VALUE_LIMIT:
+                text = f'{text[:self.LOG_VALUE_LIMIT]}...（共 {len(text)} 个字符）'
+            self.add_log(f"设置变量: {name} = {text}", 'debug')
 
     def get_variable(self, name: str, default: Any = None) -> Any:
         """
@@ -137,22 +161,8 @@ class TestEngine(ABC):
         返回:
             解析后的值
         """
-        if isinstance(value, str):
-            # 使用正则表达式查找所有 ${变量名} 格式的变量
-            pattern = r'\$\{([^}]+)\}'
-
-            def replace_var(match):
-                var_name = match.group(1)
-                var_value = self.get_variable(var_name, '')
-                return str(var_value) if var_value is not None else match.group(0)
-
-            return re.sub(pattern, replace_var, value)
-        elif isinstance(value, dict):
-            return {k: self.resolve_variables(v) for k, v in value.items()}
-        elif isinstance(value, list):
-            return [self.resolve_variables(item) for item in value]
-        else:
-            return value
+        # 未定义的变量替换为空字符串，值为 None 的变量保留原占位符
+        return render_template(value, self.variables, missing='')
 
     def extract_from_text(self, text: str, pattern: str, pattern_type: str = 'regex') -> Any:
         """
@@ -168,7 +178,7 @@ class TestEngine(ABC):
         """
         try:
             if pattern_type == 'regex':
-                match = re.search(pattern, text)
+                match = compile_regex(pattern).search(text)
                 if match:
                     # 如果有捕获组，返回第一个捕获组，否则返回整个匹配
                     return match.group(1) if match.groups() else match.group(0)
@@ -190,6 +200,9 @@ class TestEngine(ABC):
         - 字符串比较: ${status} == 'success'
         - 布尔运算: ${flag} == true
         - 逻辑运算: and, or, not
+        - 成员判断: ${code} in [200, 201]
+
+        只允许比较和布尔运算，不使用 eval
 
         参数:
             condition: 条件表达式字符串
@@ -198,25 +211,9 @@ class TestEngine(ABC):
             bool: 条件是否为真
         """
         try:
-            # 解析变量
-            resolved_condition = self.resolve_variables(condition)
-
-            # 处理布尔值
-            resolved_condition = resolved_condition.replace(' true', ' True').replace(' false', ' False')
-
-            # 处理字符串引号
-            resolved_condition = resolved_condition.replace("'true'", "True").replace("'false'", "False")
-
-            # 安全评估（仅允许有限的操作）
-            allowed_names = {"True": True, "False": False, "None": None}
-            allowed_names.update(self.variables)
-
-            # 使用eval进行评估，限制可用名称
-            result = eval(resolved_condition, {"__builtins__": {}}, allowed_names)
-
-            return bool(result)
-
-        except Exception as e:
+            # 条件按表达式编译缓存，循环中反复求值同一条件时不再重复解析
+            return compile_condition(str(condition)).evaluate(self.variables)
+        except ConditionError as e:
             self.add_log(f"条件评估失败: {str(e)}", 'error')
             return False
 
@@ -331,7 +328,7 @@ class TestEngine(ABC):
             # 固定次数循环
             count = params.get('count', 1)
             for i in range(count):
-                self.add_log(f"循环第 {i + 1}/{count} 次")
+                self.add_log(f"循环第 {i + 1}/{count} 次", 'debug')
                 self.set_variable('__loop_index__', i)
                 self.set_variable('__loop_count__', count)
 
@@ -359,7 +356,7 @@ class TestEngine(ABC):
                 return {'success': False, 'error': '数据必须是数组类型'}
 
             for i, item in enumerate(data):
-                self.add_log(f"遍历数据第 {i + 1}/{len(data)} 项")
+                self.add_log(f"遍历数据第 {i + 1}/{len(data)} 项", 'debug')
                 self.set_variable('__loop_item__', item)
                 self.set_variable('__loop_index__', i)
 
@@ -437,75 +434,85 @@ class TestEngine(ABC):
         self.results['total'] = len(steps)
 
         for index, step in enumerate(steps):
-            self.current_step_index = index
+            result = self._run_indexed_step(index, step)
 
-            # 解析步骤中的变量
-            resolved_step = self.resolve_variables(step)
+            # 如果步骤失败且不继续执行，则中断
+            if not result.get('success') and not self.config.get('continue_on_failure', True):
+                self.add_log("步骤失败，停止执行", 'error')
+                break
 
-            self.add_log(f"开始执行步骤 {index + 1}: {resolved_step.get('name', 'Unnamed')}")
+        return self.results
 
-            try:
-                # 检查是否是流程控制步骤
-                step_type = resolved_step.get('type')
-                if step_type in ['if', 'loop', 'retry', 'skip']:
-                    result = self.execute_control_step(resolved_step)
-                else:
-                    result = self.execute_step(resolved_step)
-
-                step_result = {
-                    'index': index,
-                    'name': step.get('name', 'Unnamed'),
-                    'type': step.get('type', 'unknown'),
-                    'success': result.get('success', False),
-                    'message': result.get('message', ''),
-                    'duration': result.get('duration', 0)
-                }
+    def _run_indexed_step(self, index: int, step: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行第 index 个步骤，并将步骤结果、日志和计数写入 self.results
 
-                # 处理流程控制步骤的特殊结果
-                if step_type in ['if', 'loop', 'retry']:
-                    # 流程控制步骤可能有嵌套的结果
-                    if 'total_iterations' in result:
-                        step_result['iterations'] = result['total_iterations']
-                        step_result['passed_iterations'] = result.get('passed_iterations', 0)
-                        step_result['failed_iterations'] = result.get('failed_iterations', 0)
-                    if 'attempts' in result:
-                        step_result['attempts'] = result['attempts']
-                    if result.get('skipped'):
-                        step_result['skipped'] = True
-
-                if result.get('error'):
-                    step_result['error'] = result['error']
-                    self.results['failed'] += 1
-                    self.add_log(f"步骤失败: {result['error']}", 'error')
-                else:
-                    self.results['passed'] += 1
-                    self.add_log(f"步骤成功: {result.get('message', '')}")
+        返回:
+            Dict: 步骤执行结果
+        """
+        self.current_step_index = index
 
-                if result.get('screenshot'):
-                    self.add_screenshot(result['screenshot'])
+        # 解析步骤中的变量
+        resolved_step = self.resolve_variables(step)
 
-                self.results['steps'].append(step_result)
+        self.add_log(f"开始执行步骤 {index + 1}: {resolved_step.get('name', 'Unnamed')}")
 
-                # 如果步骤失败且不继续执行，则中断
-                if not result.get('success') and not self.config.get('continue_on_failure', True):
-                    self.add_log("步骤失败，停止执行", 'error')
-                    break
+        try:
+            # 检查是否是流程控制步骤
+            step_type = resolved_step.get('type')
+            if step_type in ['if', 'loop', 'retry', 'skip']:
+                result = self.execute_control_step(resolved_step)
+            else:
+                result = self.execute_step(resolved_step)
+
+            step_result = {
+                'index': index,
+                'name': step.get('name', 'Unnamed'),
+                'type': step.get('type', 'unknown'),
+                'success': result.get('success', False),
+                'message': result.get('message', ''),
+                'duration': result.get('duration', 0)
+            }
 
-            except Exception as e:
+            # 处理流程控制步骤的特殊结果
+            if step_type in ['if', 'loop', 'retry']:
+                # 流程控制步骤可能有嵌套的结果
+                if 'total_iterations' in result:
+                    step_result['iterations'] = result['total_iterations']
+                    step_result['passed_iterations'] = result.get('passed_iterations', 0)
+                    step_result['failed_iterations'] = result.get('failed_iterations', 0)
+                if 'attempts' in result:
+                    step_result['attempts'] = result['attempts']
+                if result.get('skipped'):
+                    step_result['skipped'] = True
+
+            if result.get('error'):
+                step_result['error'] = result['error']
                 self.results['failed'] += 1
-                error_msg = f"步骤执行异常: {str(e)}"
-                self.add_log(error_msg, 'error')
-                self.results['steps'].append({
-                    'index': index,
-                    'name': step.get('name', 'Unnamed'),
-                    'type': step.get('type', 'unknown'),
-                    'success': False,
-                    'error': error_msg
-                })
-                if not self.config.get('continue_on_failure', True):
-                    break
+                self.add_log(f"步骤失败: {result['error']}", 'error')
+            else:
+                self.results['passed'] += 1
+                self.add_log(f"步骤成功: {result.get('message', '')}")
 
-        return self.results
+            if result.get('screenshot'):
+                self.add_screenshot(result['screenshot'])
+
+            self.results['steps'].append(step_result)
+
+            return result
+
+        except Exception as e:
+            self.results['failed'] += 1
+            error_msg = f"步骤执行异常: {str(e)}"
+            self.add_log(error_msg, 'error')
+            self.results['steps'].append({
+                'index': index,
+                'name': step.get('name', 'Unnamed'),
+                'type': step.get('type', 'unknown'),
+                'success': False,
+                'error': error_msg
+            })
+            return {'success': False, 'error': error_msg}
 
     def _execute_upload(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -0,0 +1,241 @@
+"""
+流程控制条件表达式编译
+条件只解析一次并按表达式缓存，求值时不使用 eval，只允许比较和布尔运算
+
+支持:
+- 变量比较: ${var1} == ${var2}、count >= 3（直接使用变量名）
+- 数值比较: ${count} > 5
+- 字符串比较: ${status} == 'success'、'${status}' == 'success'
+- 布尔值: true/false/null 与 True/False/None
+- 逻辑运算: and、or、not，以及 in、not in、is、is not
+- 列表/元组字面量: ${code} in [200, 201]
+"""
+import ast
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from .template import PLACEHOLDER_PATTERN, compile_template
+
+_MISSING = object()
+
+# 求值函数签名: evaluator(variables) -> value
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+_CONSTANTS = {
+    'True': True, 'true': True,
+    'False': False, 'false': False,
+    'None': None, 'null': None,
+}
+
+_COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+_UNARY_OPERATORS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_STRING_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_PATTERN = re.compile(r'^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$')
+
+
+class ConditionError(ValueError):
+    """条件表达式无法编译或求值"""
+
+
+class CompiledCondition:
+    """编译后的条件表达式"""
+
+    __slots__ = ('expression', '_evaluator')
+
+    def __init__(self, expression: str, evaluator: Evaluator):
+        self.expression = expression
+        self._evaluator = evaluator
+
+    def evaluate(self, variables: Dict[str, Any]) -> bool:
+        """按变量求值，变量缺失或类型不匹配时抛出 ConditionError"""
+        try:
+            return bool(self._evaluator(variables))
+        except ConditionError:
+            raise
+        except Exception as e:
+            raise ConditionError(f'{type(e).__name__}: {e}') from e
+
+    def __repr__(self):
+        return f'CompiledCondition({self.expression!r})'
+
+
+def _placeholder_value(name: str) -> Evaluator:
+    """
+    字符串外的 ${var}
+
+    与原先先替换文本再求值的行为一致：数字、布尔值等字符串按字面量处理，
+    其他字符串按字符串处理；变量不存在或值为 None 时无法求值
+    """
+    def evaluate(variables):
+        value = variables.get(name, _MISSING)
+        if value is _MISSING or value is None:
+            raise ConditionError(f'变量未定义: {name}')
+        if isinstance(value, str):
+            return _coerce_literal(value)
+        return value
+    return evaluate
+
+
+def _coerce_literal(text: str) -> Any:
+    stripped = text.strip()
+    if stripped in _CONSTANTS:
+        return _CONSTANTS[stripped]
+    if _NUMBER_PATTERN.match(stripped):
+        try:
+            return int(stripped)
+        except ValueError:
+            return float(stripped)
+    return text
+
+
+def _string_template(text: str) -> Evaluator:
+    """字符串字面量中的 ${var}，渲染规则与 resolve_variables 相同"""
+    template = compile_template(text)
+    return lambda variables: template.render(variables, missing='')
+
+
+def _substitute(expression: str) -> Tuple[str, Dict[str, Evaluator]]:
+    """
+    把占位符和含占位符的字符串替换为内部名称，返回替换后的表达式和名称对应的求值函数
+    """
+    slots: Dict[str, Evaluator] = {}
+    out: List[str] = []
+    pos = 0
+
+    def add_slot(evaluator):
+        slot = f'__slot{len(slots)}__'
+        slots[slot] = evaluator
+        return f' {slot} '
+
+    def replace_placeholders(segment):
+        return PLACEHOLDER_PATTERN.sub(lambda m: add_slot(_placeholder_value(m.group(1).strip())), segment)
+
+    for match in _STRING_PATTERN.finditer(expression):
+        out.append(replace_placeholders(expression[pos:match.start()]))
+        literal = match.group(0)
+        if PLACEHOLDER_PATTERN.search(literal):
+            out.append(add_slot(_string_template(ast.literal_eval(literal))))
+        else:
+            out.append(literal)
+        pos = match.end()
+    out.append(replace_placeholders(expression[pos:]))
+    return ''.join(out).strip(), slots
+
+
+def _compile_node(node: ast.AST, slots: Dict[str, Evaluator]) -> Evaluator:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            raise ConditionError(f'不支持的常量: {value!r}')
+        if value in ('true', 'false'):
+            # 兼容原先把 'true'/'false' 当作布尔值的写法
+            value = value == 'true'
+        return lambda variables: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in slots:
+            return slots[name]
+        if name in _CONSTANTS:
+            value = _CONSTANTS[name]
+            return lambda variables: value
+
+        def lookup(variables):
+            value = variables.get(name, _MISSING)
+            if value is _MISSING:
+                raise ConditionError(f'变量未定义: {name}')
+            return value
+        return lookup
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(value, slots) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def evaluate_and(variables):
+                result = True
+                for operand in operands:
+                    result = operand(variables)
+                    if not result:
+                        return result
+                return result
+            return evaluate_and
+
+        def evaluate_or(variables):
+            result = False
+            for operand in operands:
+                result = operand(variables)
+                if result:
+                    return result
+            return result
+        return evaluate_or
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise ConditionError(f'不支持的运算符: {type(node.op).__name__}')
+        operand = _compile_node(node.operand, slots)
+        return lambda variables: op(operand(variables))
+
+    if isinstance(node, ast.Compare):
+        left = _compile_node(node.left, slots)
+        pairs = []
+        for op_node, comparator in zip(node.ops, node.comparators):
+            op = _COMPARE_OPERATORS.get(type(op_node))
+            if op is None:
+                raise ConditionError(f'不支持的运算符: {type(op_node).__name__}')
+            pairs.append((op, _compile_node(comparator, slots)))
+
+        if len(pairs) == 1:
+            op, right = pairs[0]
+            return lambda variables: op(left(variables), right(variables))
+
+        def evaluate_chain(variables):
+            current = left(variables)
+            for op, right in pairs:
+                value = right(variables)
+                if not op(current, value):
+                    return False
+                current = value
+            return True
+        return evaluate_chain
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile_node(item, slots) for item in node.elts]
+        return lambda variables: [item(variables) for item in items]
+
+    raise ConditionError(f'不支持的表达式: {type(node).__name__}')
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> CompiledCondition:
+    """
+    编译条件表达式
+
+    只允许比较、布尔运算、常量、变量和列表字面量，不支持函数调用、属性访问、下标等，
+    表达式无效时抛出 ConditionError
+    """
+    try:
+        # 含占位符的字符串字面量在 _substitute 中解析，无效的转义等同样按语法错误处理
+        text, slots = _substitute(expression)
+        tree = ast.parse(text, mode='eval')
+    except (SyntaxError, ValueError) as e:
+        raise ConditionError(f'条件表达式语法错误: {expression}') from e
+    return CompiledCondition(expression, _compile_node(tree.body, slots))
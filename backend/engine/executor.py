@@ -4,6 +4,7 @@
 """
 import time
 from datetime import datetime
+from django.conf import settings
 from django.utils import timezone
 from typing import Dict, Any
 import logging
@@ -13,8 +14,10 @@ from .selenium_engine import SeleniumEngine
 from .playwright_engine import PlaywrightEngine
 from .appium_engine import AppiumEngine
 from .api_engine import ApiEngine
+from .template import compile_template, render_template
 from apps.executions.models import Execution
 from apps.scripts.models import Script, DataSource
+from apps.scripts.modules import get_module_resolver
 from apps.reports.generators import ReportGenerator
 
 logger = logging.getLogger(__name__)
@@ -26,8 +29,16 @@ class TestExecutor:
     负责执行测试脚本/计划并生成报告
     """
 
-    def __init__(self, execution: Execution):
+    def __init__(self, execution: Execution, load_test: Dict[str, Any] = None):
+        """
+        参数:
+            execution: 执行记录
+            load_test: 压测参数（users、duration、iterations、arrival_rate 等，见 LoadTestRunner），
+                       仅支持 httprunner 脚本
+        """
         self.execution = execution
+        self.load_test = load_test
+        self.load_runner = None
         self.script = execution.script
         self.engine = None
         self.debug_mode = execution.debug_mode
@@ -45,8 +56,8 @@ class TestExecutor:
             self.execution.started_at = timezone.now()
             self.execution.save()
 
-            # 初始化测试引擎
-            if not self._setup_engine():
+            # 初始化测试引擎（压测模式由 LoadTestRunner 为每个虚拟用户创建引擎）
+            if not self.load_test and not self._setup_engine():
                 self._mark_failed('引擎初始化失败', result=None)
                 return
 
@@ -58,12 +69,19 @@ class TestExecutor:
 
             # 执行测试
             if self.debug_mode:
-                result = self._run_debug_mode(steps)
+                result = {**self._run_debug_mode(steps), **self.engine.export_logs()}
+            elif self.load_test:
+                result = self._run_load_test(steps)
             else:
-                result = self.engine.execute_steps(steps)
+                # 结果中只保存最近的日志，完整日志超过上限时写入日志文件
+                result = {**self.engine.execute_steps(steps), **self.engine.export_logs()}
 
             # 更新执行结果
-            if not self.stopped:
+            if self.stopped and self.load_test:
+                # 停止压测时保存已收集的统计，状态保持为 stopped
+                self.execution.result = result
+                self.execution.save(update_fields=['result'])
+            elif not self.stopped:
                 self.execution.result = result
                 self.execution.status = 'completed' if result['failed'] == 0 else 'failed'
                 self.execution.completed_at = timezone.now()
@@ -93,6 +111,8 @@ class TestExecutor:
                     self.engine.teardown()
                 except Exception as e:
                     logger.error(f"清理引擎资源失败: {str(e)}")
+                # teardown 中的日志追加到日志文件后关闭
+                self.engine.log_buffer.close()
 
     def _run_debug_mode(self, steps: list) -> dict:
         """调试模式执行"""
@@ -155,6 +175,19 @@ class TestExecutor:
 
         return result
 
+    def _run_load_test(self, steps) -> dict:
+        """压测模式：多个虚拟用户重复执行脚本步骤"""
+        if self.script.framework != 'httprunner':
+            raise ValueError(f'压测模式仅支持 API 脚本，当前框架: {self.script.framework}')
+
+        from .load_runner import LoadTestRunner
+        self.load_runner = LoadTestRunner(
+            lambda: ApiEngine(self._get_engine_config()),
+            list(steps),
+            **self.load_test
+        )
+        return self.load_runner.run()
+
     def pause(self):
         """暂停执行"""
         self.paused = True
@@ -173,6 +206,8 @@ class TestExecutor:
         """停止执行"""
         self.stopped = True
         self.paused = False
+        if self.load_runner:
+            self.load_runner.stop()
         self.execution.status = 'stopped'
         self.execution.completed_at = timezone.now()
         self.execution.save()
@@ -232,6 +267,8 @@ class TestExecutor:
 
         # 从脚本获取全局变量
         config['variables'] = getattr(self.script, 'variables', {}) or {}
+        config['log_dir'] = settings.EXECUTION_LOGS_ROOT
+        config['log_name'] = f'execution_{self.execution.id}'
 
         if self.script.framework == 'selenium':
             config['browser'] = 'chrome'  # 可从配置中读取
@@ -254,6 +291,10 @@ class TestExecutor:
         elif self.script.framework == 'httprunner':
             config['base_url'] = ''  # 可从脚本步骤中获取
             config['timeout'] = getattr(self.script, 'timeout', 30000) / 1000
+            api_config = getattr(self.script, 'api_config', None)
+            if api_config:
+                config['parallel'] = api_config.parallel_enabled
+                config['max_parallel_requests'] = api_config.max_parallel_requests
 
         return config
 
@@ -269,65 +310,24 @@ class TestExecutor:
         return self._expand_modules(steps)
 
     def _expand_modules(self, steps: list) -> list:
-        """展开模块步骤"""
-        expanded_steps = []
-
-        for step in steps:
-            if step.get('type') == 'module':
-                # 获取模块脚本
-                module_script_id = step.get('module_id')
-                if module_script_id:
-                    try:
-                        module_script = Script.objects.get(id=module_script_id, is_module=True)
-                        # 递归展开模块
-                        module_steps = self._expand_modules(module_script.steps)
-                        expanded_steps.extend(module_steps)
-                    except Script.DoesNotExist:
-                        logger.warning(f"模块脚本 {module_script_id} 不存在")
-            else:
-                expanded_steps.append(step)
+        """展开模块步骤，模块循环引用时抛出 ModuleCycleError"""
+        return get_module_resolver().expand(steps, root_id=self.script.id)
 
-        return expanded_steps
+    def _process_data_driven_steps(self, steps: list):
+        """
+        处理数据驱动测试
 
-    def _process_data_driven_steps(self, steps: list) -> list:
-        """处理数据驱动测试"""
+        返回惰性的步骤序列，按数据行逐批从数据源读取并展开，不会一次性生成所有行的步骤副本
+        """
         data_source = self.script.data_source
         if not data_source:
             return steps
 
-        data = data_source.data
-        if not isinstance(data, dict) or 'rows' not in data:
+        row_count = data_source.get_row_count()
+        if not row_count:
             return steps
 
-        # 为每一行数据创建一组步骤
-        all_steps = []
-        for row_index, row_data in enumerate(data['rows']):
-            # 替换步骤中的变量
-            row_steps = self._replace_variables(steps, row_data, row_index)
-            all_steps.extend(row_steps)
-
-        return all_steps
-
-    def _replace_variables(self, steps: list, variables: dict, row_index: int) -> list:
-        """替换步骤中的变量"""
-        import json
-        import re
-
-        steps_json = json.dumps(steps)
-
-        # 替换 ${variable} 格式的变量
-        for key, value in variables.items():
-            placeholder = f'${{{key}}}'
-            steps_json = steps_json.replace(placeholder, str(value))
-
-        # 解析回步骤列表
-        new_steps = json.loads(steps_json)
-
-        # 为每个步骤添加数据行标识
-        for step in new_steps:
-            step['_data_row'] = row_index
-
-        return new_steps
+        return DataDrivenSteps(self._expand_modules(steps), data_source, row_count)
 
     def _mark_failed(self, error_msg: str, result: dict | None = None):
         """标记执行失败"""
@@ -345,6 +345,38 @@ class TestExecutor:
         self.execution.save()
 
 
+class DataDrivenSteps:
+    """
+    数据驱动步骤序列
+
+    支持 len() 和迭代，多行数据时步骤只编译一次，迭代时按行从数据源读取数据并渲染，
+    内存中只保留当前一行展开后的步骤
+    """
+
+    def __init__(self, steps: list, data_source: DataSource, row_count: int):
+        self.steps = steps
+        # 只有一行数据时编译的开销大于一次性渲染
+        self.template = compile_template(steps) if row_count > 1 else None
+        self.data_source = data_source
+        self.row_count = row_count
+
+    def __len__(self):
+        return len(self.steps) * self.row_count
+
+    def __iter__(self):
+        for row_index, row_data in self.data_source.iter_rows():
+            yield from self.render_row(row_data, row_index)
+
+    def render_row(self, row_data: dict, row_index: int) -> list:
+        """渲染一行数据对应的步骤，并为每个步骤添加数据行标识"""
+        # 未匹配的占位符保留，交由引擎在执行时按运行时变量解析；值为 None 时与原来一样替换为 'None'
+        if self.template is not None:
+            steps = self.template.render(row_data, none='None')
+        else:
+            steps = render_template(self.steps, row_data, none='None')
+        return [{**step, '_data_row': row_index} for step in steps]
+
+
 class PlanExecutor:
     """
     计划执行器
@@ -0,0 +1,440 @@
+"""
+编译后的 JSONPath 与正则提取器
+表达式只解析一次并按表达式缓存，断言和提取反复使用同一表达式时直接复用
+
+JSONPath 兼容原有的点号写法（data.items[0].id），并支持:
+- 根节点 $，可省略
+- 通配符 data.items[*].id、data.*
+- 递归查找 $..id
+- 切片 items[0:10]、items[-3:]
+- 带引号的键 ['a.b']
+- 过滤 items[?(@.price > 10 && @.status == 'ok')]，支持 == != > >= < <= =~ 和存在判断 [?(@.tag)]
+"""
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Union
+
+_MISSING = object()
+
+# 选择器: 输入节点列表，输出匹配的节点列表
+Selector = Callable[[List[Any]], List[Any]]
+
+
+class JsonPath:
+    """
+    编译后的 JSONPath
+
+    确定路径（只包含键和下标）的 get() 返回单个值，不存在时返回默认值；
+    包含通配符、递归、切片或过滤的路径 get() 返回所有匹配值的列表
+    """
+
+    __slots__ = ('expression', 'keys', '_selectors')
+
+    def __init__(self, expression: str, keys: Optional[List[Union[str, int]]], selectors: List[Selector]):
+        self.expression = expression
+        # 确定路径的键序列，不确定路径为 None
+        self.keys = keys
+        self._selectors = selectors
+
+    @property
+    def definite(self) -> bool:
+        return self.keys is not None
+
+    def get(self, document: Any, default: Any = None) -> Any:
+        if self.keys is None:
+            return self.find(document)
+
+        current = document
+        for key in self.keys:
+            if isinstance(key, int):
+                if not isinstance(current, list) or not -len(current) <= key < len(current):
+                    return default
+                current = current[key]
+            else:
+                if not isinstance(current, dict):
+                    return default
+                current = current.get(key, _MISSING)
+                if current is _MISSING:
+                    return default
+        return current
+
+    def find(self, document: Any) -> List[Any]:
+        """返回所有匹配的值"""
+        if self.keys is not None:
+            value = self.get(document, _MISSING)
+            return [] if value is _MISSING else [value]
+
+        nodes = [document]
+        for selector in self._selectors:
+            nodes = selector(nodes)
+            if not nodes:
+                break
+        return nodes
+
+    def __repr__(self):
+        return f'JsonPath({self.expression!r})'
+
+
+def _select_key(key: str) -> Selector:
+    def select(nodes):
+        return [node[key] for node in nodes if isinstance(node, dict) and key in node]
+    return select
+
+
+def _select_index(index: int) -> Selector:
+    def select(nodes):
+        return [
+            node[index] for node in nodes
+            if isinstance(node, list) and -len(node) <= index < len(node)
+        ]
+    return select
+
+
+def _select_slice(start: Optional[int], stop: Optional[int], step: Optional[int]) -> Selector:
+    def select(nodes):
+        out = []
+        for node in nodes:
+            if isinstance(node, list):
+                out.extend(node[start:stop:step])
+        return out
+    return select
+
+
+def _select_wildcard(nodes):
+    out = []
+    for node in nodes:
+        if isinstance(node, dict):
+            out.extend(node.values())
+        elif isinstance(node, list):
+            out.extend(node)
+    return out
+
+
+def _select_descendants(nodes):
+    """节点本身及其所有后代，按文档顺序"""
+    out = []
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        out.append(node)
+        if isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return out
+
+
+def _select_descendant_key(key: str) -> Selector:
+    """递归查找键，遍历时直接收集，不生成中间的后代列表"""
+    def select(nodes):
+        out = []
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if key in node:
+                    out.append(node[key])
+                children = [child for child in node.values() if isinstance(child, (dict, list))]
+            elif isinstance(node, list):
+                children = [child for child in node if isinstance(child, (dict, list))]
+            else:
+                continue
+            stack.extend(reversed(children))
+        return out
+    return select
+
+
+def _select_filter(predicate: Callable[[Any], bool]) -> Selector:
+    def select(nodes):
+        out = []
+        for node in nodes:
+            if isinstance(node, list):
+                children = node
+            elif isinstance(node, dict):
+                children = node.values()
+            else:
+                continue
+            out.extend(child for child in children if predicate(child))
+        return out
+    return select
+
+
+def _split_outside_quotes(text: str, separator: str) -> List[str]:
+    parts = []
+    quote = None
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in ('"', "'"):
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _find_closing_bracket(text: str, start: int) -> int:
+    """返回与 text[start] 处 '[' 匹配的 ']' 的位置"""
+    quote = None
+    depth = 0
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in ('"', "'"):
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError(f'JSONPath 缺少 "]": {text}')
+
+
+def _parse_literal(text: str) -> Any:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in ('"', "'"):
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered == 'true':
+        return True
+    if lowered == 'false':
+        return False
+    if lowered in ('null', 'none'):
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f'无法识别的过滤值: {text}')
+
+
+_CONDITION_PATTERN = re.compile(r'^\s*@(?P<path>[^\s=!<>~]*)\s*(?:(?P<op>==|!=|>=|<=|=~|>|<)\s*(?P<value>.+?))?\s*$')
+
+_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+
+
+def _relative_accessor(relative: str) -> Callable[[Any], Any]:
+    """过滤条件中 @ 之后的相对路径，不存在时返回 _MISSING"""
+    if not relative:
+        return lambda node: node
+
+    accessor = compile_json_path('$' + relative)
+    if accessor.keys is not None and len(accessor.keys) == 1 and isinstance(accessor.keys[0], str):
+        # 最常见的 @.field 直接取值
+        key = accessor.keys[0]
+        return lambda node: node.get(key, _MISSING) if isinstance(node, dict) else _MISSING
+    return lambda node: accessor.get(node, _MISSING)
+
+
+def _compile_condition(text: str) -> Callable[[Any], bool]:
+    match = _CONDITION_PATTERN.match(text)
+    if not match:
+        raise ValueError(f'无法解析的过滤条件: {text}')
+
+    resolve = _relative_accessor(match.group('path'))
+    op = match.group('op')
+
+    if not op:
+        return lambda node: resolve(node) is not _MISSING
+
+    raw_value = match.group('value').strip()
+    if op == '=~':
+        if len(raw_value) >= 2 and raw_value[0] == raw_value[-1] == '/':
+            raw_value = raw_value[1:-1]
+        else:
+            raw_value = _parse_literal(raw_value)
+        pattern = compile_regex(str(raw_value)).pattern
+
+        def matches(node):
+            value = resolve(node)
+            return value is not _MISSING and value is not None and pattern.search(str(value)) is not None
+        return matches
+
+    expected = _parse_literal(raw_value)
+    compare = _OPERATORS[op]
+
+    def check(node):
+        value = resolve(node)
+        if value is _MISSING:
+            return False
+        try:
+            return bool(compare(value, expected))
+        except TypeError:
+            return False
+    return check
+
+
+def _compile_filter(text: str) -> Callable[[Any], bool]:
+    """编译过滤表达式，支持 && 和 ||（&& 优先）"""
+    text = text.strip()
+    if text.startswith('(') and text.endswith(')'):
+        text = text[1:-1]
+
+    alternatives = []
+    for branch in _split_outside_quotes(text, '||'):
+        alternatives.append([_compile_condition(part) for part in _split_outside_quotes(branch, '&&')])
+
+    if len(alternatives) == 1 and len(alternatives[0]) == 1:
+        return alternatives[0][0]
+
+    def predicate(node):
+        return any(all(condition(node) for condition in conditions) for conditions in alternatives)
+    return predicate
+
+
+def _parse_bracket(content: str, selectors: List[Selector], keys: Optional[list]) -> Optional[list]:
+    """解析 [...] 中的内容，返回更新后的确定路径键序列（不确定时为 None）"""
+    content = content.strip()
+    if content == '*':
+        selectors.append(_select_wildcard)
+        return None
+    if content.startswith('?'):
+        selectors.append(_select_filter(_compile_filter(content[1:])))
+        return None
+    if len(content) >= 2 and content[0] == content[-1] and content[0] in ('"', "'"):
+        key = content[1:-1]
+        selectors.append(_select_key(key))
+        return keys + [key] if keys is not None else None
+    if ':' in content:
+        parts = [part.strip() for part in content.split(':')]
+        if len(parts) > 3:
+            raise ValueError(f'无效的切片: [{content}]')
+        values = [int(part) if part else None for part in parts] + [None] * (3 - len(parts))
+        selectors.append(_select_slice(*values))
+        return None
+    try:
+        index = int(content)
+    except ValueError:
+        raise ValueError(f'无效的 JSONPath 下标: [{content}]')
+    selectors.append(_select_index(index))
+    return keys + [index] if keys is not None else None
+
+
+def _read_name(text: str, pos: int) -> tuple:
+    end = pos
+    while end < len(text) and text[end] not in '.[':
+        end += 1
+    return text[pos:end], end
+
+
+@lru_cache(maxsize=1024)
+def compile_json_path(expression: str) -> JsonPath:
+    """
+    编译 JSONPath，结果按表达式缓存
+
+    异常:
+        ValueError: 表达式无效
+    """
+    text = (expression or '').strip()
+    selectors: List[Selector] = []
+    keys: Optional[List[Union[str, int]]] = []
+    pos = 0
+
+    if text.startswith('$'):
+        pos = 1
+    elif text and text[0] not in '.[':
+        # 兼容不带 $ 的写法: data.items[0].id
+        name, pos = _read_name(text, 0)
+        selectors.append(_select_wildcard if name == '*' else _select_key(name))
+        keys = None if name == '*' else [name]
+    elif not text:
+        # 与旧实现一致，空路径按键 '' 查找
+        return JsonPath(expression, [''], [_select_key('')])
+
+    while pos < len(text):
+        if text.startswith('..', pos):
+            keys = None
+            pos += 2
+            if pos < len(text) and text[pos] == '[':
+                selectors.append(_select_descendants)
+                continue
+            name, pos = _read_name(text, pos)
+            if not name:
+                raise ValueError(f'无效的 JSONPath: {expression}')
+            if name == '*':
+                selectors.extend([_select_descendants, _select_wildcard])
+            else:
+                selectors.append(_select_descendant_key(name))
+        elif text[pos] == '.':
+            name, pos = _read_name(text, pos + 1)
+            if not name:
+                raise ValueError(f'无效的 JSONPath: {expression}')
+            if name == '*':
+                selectors.append(_select_wildcard)
+                keys = None
+            else:
+                selectors.append(_select_key(name))
+                keys = keys + [name] if keys is not None else None
+        elif text[pos] == '[':
+            end = _find_closing_bracket(text, pos)
+            keys = _parse_bracket(text[pos + 1:end], selectors, keys)
+            pos = end + 1
+        else:
+            raise ValueError(f'无效的 JSONPath: {expression}')
+
+    return JsonPath(expression, keys, selectors)
+
+
+class RegexExtractor:
+    """编译后的正则提取器"""
+
+    __slots__ = ('pattern',)
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = re.compile(pattern, flags)
+
+    def search(self, text: str) -> Optional[re.Match]:
+        return self.pattern.search(text)
+
+    def extract(self, text: str) -> Optional[str]:
+        """有捕获组时返回第一个捕获组，否则返回整个匹配，未匹配返回 None"""
+        match = self.pattern.search(text)
+        if not match:
+            return None
+        return match.group(1) if match.lastindex else match.group(0)
+
+
+@lru_cache(maxsize=512)
+def compile_regex(pattern: str, flags: int = 0) -> RegexExtractor:
+    """
+    编译正则表达式，结果按表达式缓存
+
+    异常:
+        re.error: 正则表达式无效
+    """
+    return RegexExtractor(pattern, flags)
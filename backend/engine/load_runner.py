@@ -0,0 +1,407 @@
+"""
+API 压测执行器
+使用多个虚拟用户重复执行 httprunner 脚本，统计每个步骤的延迟分布、吞吐量和错误率
+
+- 闭环模式：每个虚拟用户执行完一次场景后立即（或等待 think_time 后）开始下一次
+- 开环模式：设置 arrival_rate 后按固定速率发起场景，空闲虚拟用户接收执行，全部繁忙时记为丢弃
+
+每个虚拟用户占用一个线程，虚拟用户数上限为 MAX_USERS，超出时按上限执行
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .base import TestEngine
+
+logger = logging.getLogger(__name__)
+
+CONTROL_STEP_TYPES = ('if', 'loop', 'retry', 'skip')
+
+# 虚拟用户数上限（每个虚拟用户一个线程）
+MAX_USERS = 500
+
+
+class LatencyHistogram:
+    """
+    延迟直方图（HDR 风格的对数线性分桶）
+
+    以微秒记录，每个 2 的幂区间再线性划分为 2**SUB_BUCKET_BITS 个桶，
+    分位数的相对误差不超过 1/2**SUB_BUCKET_BITS，桶数量与取值范围的对数成正比
+    """
+
+    SUB_BUCKET_BITS = 6
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        value = max(int(value_ms * 1000), 0)
+        shift = max(value.bit_length() - self.SUB_BUCKET_BITS, 0)
+        bucket = (value >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """返回百分位延迟（毫秒），取所在桶的中间值"""
+        if not self.count:
+            return 0.0
+        target = max(int(self.count * percent / 100 + 0.5), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                shift = max(bucket.bit_length() - self.SUB_BUCKET_BITS, 0)
+                value = (bucket + ((1 << shift) - 1) / 2) / 1000
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'min': round(self.min or 0.0, 2),
+            'mean': round(self.mean, 2),
+            'p50': round(self.percentile(50), 2),
+            'p90': round(self.percentile(90), 2),
+            'p99': round(self.percentile(99), 2),
+            'max': round(self.max, 2),
+        }
+
+    def to_buckets(self) -> List[List[float]]:
+        """紧凑格式 [[桶下界(ms), 次数], ...]"""
+        return [[bucket / 1000, self.counts[bucket]] for bucket in sorted(self.counts)]
+
+
+class _StepMetrics:
+    """单个步骤的统计"""
+
+    __slots__ = ('index', 'name', 'type', 'errors', 'histogram', 'last_error')
+
+    def __init__(self, index: int, step: Dict[str, Any]):
+        self.index = index
+        self.name = step.get('name', f'Step {index + 1}')
+        self.type = step.get('type', 'unknown')
+        self.errors = 0
+        self.histogram = LatencyHistogram()
+        self.last_error = ''
+
+
+class LoadTestRunner:
+    """
+    压测执行器
+
+    每个虚拟用户使用独立的引擎实例（独立的 Session、Cookie 和变量），
+    请求步骤的延迟取引擎记录的 response_time，其他步骤取执行耗时
+    """
+
+    def __init__(self, engine_factory: Callable[[], TestEngine], steps: List[Dict[str, Any]],
+                 users: int = 1, duration: float = 0, iterations: int = 0,
+                 arrival_rate: float = 0, spawn_rate: float = 0, think_time: float = 0):
+        """
+        参数:
+            engine_factory: 创建引擎实例的函数，每个虚拟用户调用一次
+            steps: 场景步骤
+            users: 虚拟用户数，不超过 MAX_USERS
+            duration: 压测时长（秒），0 表示不限制
+            iterations: 场景总执行次数，0 表示不限制；两者都为 0 时按 60 秒执行
+            arrival_rate: 每秒发起的场景数，大于 0 时为开环模式
+            spawn_rate: 每秒启动的虚拟用户数，0 表示同时启动
+            think_time: 闭环模式下每个虚拟用户两次场景之间的等待时间（秒）
+        """
+        self.engine_factory = engine_factory
+        self.steps = steps
+        self.users = max(int(users), 1)
+        if self.users > MAX_USERS:
+            logger.warning(f"虚拟用户数 {self.users} 超过上限 {MAX_USERS}，按 {MAX_USERS} 执行")
+            self.users = MAX_USERS
+        self.duration = max(float(duration), 0)
+        self.iterations = max(int(iterations), 0)
+        if not self.duration and not self.iterations:
+            self.duration = 60
+        self.arrival_rate = max(float(arrival_rate), 0)
+        self.spawn_rate = max(float(spawn_rate), 0)
+        self.think_time = max(float(think_time), 0)
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._tokens: queue.Queue = queue.Queue(maxsize=self.users)
+        self._dispatch_done = threading.Event()
+        self._claimed = 0
+        self._completed = 0
+        self._failed_iterations = 0
+        self._dropped = 0
+        self._start_time = 0.0
+        self._deadline: Optional[float] = None
+
+        self._steps = [_StepMetrics(index, step) for index, step in enumerate(steps)]
+        self._total = LatencyHistogram()
+        # 秒偏移 -> [请求数, 请求错误数, 请求延迟直方图]
+        self._seconds: Dict[int, list] = {}
+
+    def stop(self):
+        """停止压测，正在执行的场景执行完当前步骤后结束"""
+        self._stop_event.set()
+
+    def run(self) -> Dict[str, Any]:
+        """执行压测并返回结果"""
+        self._start_time = time.time()
+        self._deadline = self._start_time + self.duration if self.duration else None
+
+        threads = []
+        dispatcher = None
+        if self.arrival_rate:
+            dispatcher = threading.Thread(target=self._dispatch, daemon=True, name='LoadTestDispatcher')
+            dispatcher.start()
+
+        for user_id in range(self.users):
+            if self._should_stop():
+                break
+            thread = threading.Thread(
+                target=self._run_user, args=(user_id,), daemon=True, name=f'LoadTestUser-{user_id + 1}'
+            )
+            thread.start()
+            threads.append(thread)
+            if self.spawn_rate and user_id < self.users - 1:
+                self._stop_event.wait(1 / self.spawn_rate)
+
+        for thread in threads:
+            thread.join()
+        if dispatcher:
+            self._stop_event.set()
+            dispatcher.join()
+
+        return self._build_result(len(threads), time.time() - self._start_time)
+
+    def _should_stop(self) -> bool:
+        if self._stop_event.is_set():
+            return True
+        return self._deadline is not None and time.time() >= self._deadline
+
+    def _claim_iteration(self) -> Optional[int]:
+        with self._lock:
+            if self.iterations and self._claimed >= self.iterations:
+                return None
+            self._claimed += 1
+            return self._claimed
+
+    def _dispatch(self):
+        """开环模式：按 arrival_rate 发放执行令牌，所有虚拟用户都繁忙时丢弃"""
+        issued = 0
+        try:
+            while not self._should_stop():
+                if self.iterations and issued >= self.iterations:
+                    break
+                target = self._start_time + issued / self.arrival_rate
+                delay = target - time.time()
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+                issued += 1
+                try:
+                    self._tokens.put_nowait(issued)
+                except queue.Full:
+                    with self._lock:
+                        self._dropped += 1
+        finally:
+            self._dispatch_done.set()
+
+    def _next_iteration(self) -> Optional[int]:
+        if not self.arrival_rate:
+            if self._should_stop():
+                return None
+            return self._claim_iteration()
+
+        while True:
+            try:
+                self._tokens.get(timeout=0.2)
+            except queue.Empty:
+                if self._dispatch_done.is_set() or self._stop_event.is_set():
+                    return None
+                continue
+            if self._stop_event.is_set():
+                return None
+            return self._claim_iteration()
+
+    def _run_user(self, user_id: int):
+        engine = self.engine_factory()
+        # 引擎配置中的变量字典可能被多个实例共享，每个虚拟用户使用独立副本
+        engine.variables = dict(engine.variables)
+        try:
+            if not engine.setup():
+                self._record_setup_failure()
+                return
+            engine.variables['__vu__'] = user_id + 1
+
+            while True:
+                iteration = self._next_iteration()
+                if iteration is None:
+                    break
+                engine.variables['__iteration__'] = iteration
+                self._run_iteration(engine)
+
+                if self.think_time and not self.arrival_rate:
+                    if self._stop_event.wait(self.think_time):
+                        break
+        finally:
+            try:
+                engine.teardown()
+            except Exception:
+                pass
+
+    def _run_iteration(self, engine: TestEngine):
+        # 每次场景重置引擎的结果，避免长时间压测时日志无限增长
+        engine.results = {'total': 0, 'passed': 0, 'failed': 0, 'steps': [], 'logs': [], 'screenshots': []}
+        iteration_failed = False
+
+        for index, step in enumerate(self.steps):
+            if self._stop_event.is_set():
+                break
+            start_time = time.time()
+            try:
+                resolved_step = engine.resolve_variables(step)
+                if resolved_step.get('type') in CONTROL_STEP_TYPES:
+                    result = engine.execute_control_step(resolved_step)
+                else:
+                    result = engine.execute_step(resolved_step)
+            except Exception as e:
+                result = {'success': False, 'error': f'步骤执行异常: {str(e)}'}
+
+            elapsed_ms = (time.time() - start_time) * 1000
+            latency = result.get('response_time') or result.get('duration') or elapsed_ms
+            success = bool(result.get('success'))
+            self._record(index, latency, success, result.get('error') or result.get('message', ''), start_time)
+            if not success:
+                iteration_failed = True
+
+        with self._lock:
+            self._completed += 1
+            if iteration_failed:
+                self._failed_iterations += 1
+
+    def _record(self, index: int, latency_ms: float, success: bool, error: str, timestamp: float):
+        metrics = self._steps[index]
+        second = int(timestamp - self._start_time)
+        with self._lock:
+            metrics.histogram.record(latency_ms)
+            bucket = self._seconds.get(second)
+            if bucket is None:
+                bucket = self._seconds[second] = [0, 0, LatencyHistogram()]
+            # 按秒的时间序列只统计请求步骤，请求数和错误数使用同一组步骤
+            if metrics.type == 'request':
+                self._total.record(latency_ms)
+                bucket[0] += 1
+                bucket[2].record(latency_ms)
+                if not success:
+                    bucket[1] += 1
+            if not success:
+                metrics.errors += 1
+                metrics.last_error = error
+
+    def _record_setup_failure(self):
+        with self._lock:
+            self._failed_iterations += 1
+
+    def _build_result(self, started_users: int, elapsed: float) -> Dict[str, Any]:
+        """
+        生成执行结果
+
+        steps 为每个步骤的汇总（与普通执行的结果结构一致，便于报告复用），
+        load_test 为压测统计：总体延迟、每步骤统计和按秒的时间序列
+        """
+        elapsed = max(elapsed, 0.001)
+        step_stats = []
+        step_rows = []
+        for metrics in self._steps:
+            count = metrics.histogram.count
+            latency = metrics.histogram.summary()
+            error_rate = round(metrics.errors / count * 100, 2) if count else 0.0
+            step_stats.append({
+                'index': metrics.index,
+                'name': metrics.name,
+                'type': metrics.type,
+                'count': count,
+                'errors': metrics.errors,
+                'error_rate': error_rate,
+                'throughput': round(count / elapsed, 2),
+                'latency': latency,
+                'histogram': metrics.histogram.to_buckets(),
+            })
+
+            row = {
+                'index': metrics.index,
+                'name': metrics.name,
+                'type': metrics.type,
+                'success': count > 0 and metrics.errors == 0,
+                'message': (
+                    f"{count} 次, 错误率 {error_rate}%, "
+                    f"p50/p90/p99 = {latency['p50']}/{latency['p90']}/{latency['p99']}ms"
+                ),
+                'duration': latency['mean'],
+            }
+            if metrics.errors:
+                row['error'] = metrics.last_error
+            step_rows.append(row)
+
+        seconds = sorted(self._seconds)
+        timeseries = {'t': seconds, 'requests': [], 'errors': [], 'avg_ms': [], 'p90_ms': []}
+        for second in seconds:
+            requests_count, errors, histogram = self._seconds[second]
+            timeseries['requests'].append(requests_count)
+            timeseries['errors'].append(errors)
+            timeseries['avg_ms'].append(round(histogram.mean, 2))
+            timeseries['p90_ms'].append(round(histogram.percentile(90), 2))
+
+        total_errors = sum(metrics.errors for metrics in self._steps)
+        total_steps = sum(metrics.histogram.count for metrics in self._steps)
+        passed = sum(1 for row in step_rows if row['success'])
+        load_test = {
+            'config': {
+                'users': self.users,
+                'duration': self.duration,
+                'iterations': self.iterations,
+                'arrival_rate': self.arrival_rate,
+                'spawn_rate': self.spawn_rate,
+                'think_time': self.think_time,
+            },
+            'users_started': started_users,
+            'elapsed': round(elapsed, 2),
+            'iterations': self._completed,
+            'failed_iterations': self._failed_iterations,
+            'dropped_iterations': self._dropped,
+            'requests': self._total.count,
+            'throughput': round(self._total.count / elapsed, 2),
+            'errors': total_errors,
+            'error_rate': round(total_errors / total_steps * 100, 2) if total_steps else 0.0,
+            'latency': self._total.summary(),
+            'steps': step_stats,
+            'timeseries': timeseries,
+        }
+
+        return {
+            'total': len(step_rows),
+            'passed': passed,
+            'failed': len(step_rows) - passed,
+            'steps': step_rows,
+            'logs': [],
+            'screenshots': [],
+            'load_test': load_test,
+        }
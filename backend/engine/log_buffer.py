@@ -0,0 +1,127 @@
+"""
+执行日志缓冲
+- 按级别过滤，低于最低级别的日志直接丢弃
+- 记录单调时钟时间戳，导出或写入文件时才格式化为日期时间
+- 内存中最多保留 capacity 条；超过后全部日志写入 gzip 压缩的日志文件，内存中只保留最近的 capacity 条
+- 执行结果中只保存最近的日志和日志文件路径
+"""
+import gzip
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+LOG_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+# 日志记录: (单调时钟时间, 步骤序号, 级别, 消息)
+LogRecord = Tuple[float, int, str, str]
+
+
+def level_value(level: str) -> int:
+    return LOG_LEVELS.get(str(level).lower(), LOG_LEVELS['info'])
+
+
+class LogBuffer:
+    """
+    有界日志缓冲
+
+    与 list 一样支持 append/extend/len，引擎的 results['logs'] 直接使用该对象；
+    并行执行的工作线程先写入普通列表，再按顺序 extend 合并
+    """
+
+    def __init__(self, capacity: int = 1000, log_dir: Optional[str] = None, name: Optional[str] = None):
+        """
+        参数:
+            capacity: 内存中保留的最大日志条数，同时也是开始写入日志文件的阈值
+            log_dir: 日志文件目录，默认使用系统临时目录
+            name: 日志文件名（不含扩展名），默认随机生成
+        """
+        self.capacity = max(int(capacity), 1)
+        self.log_dir = str(log_dir) if log_dir else tempfile.gettempdir()
+        self.name = name or f'execution_{uuid.uuid4().hex}'
+        self.total = 0
+        self.path = None
+        self._records = deque(maxlen=self.capacity)
+        self._file = None
+        # 单调时钟与墙上时钟的对应关系，格式化时换算
+        self._wall_base = time.time()
+        self._monotonic_base = time.monotonic()
+
+    def append(self, record: LogRecord):
+        if self._file is None:
+            if self.path:
+                # 导出后继续写入（如 teardown 中的日志）时追加到同一文件
+                self._file = gzip.open(self.path, 'at', encoding='utf-8')
+            elif len(self._records) >= self.capacity:
+                self._spill()
+        if self._file is not None:
+            self._write(record)
+        self._records.append(record)
+        self.total += 1
+
+    def extend(self, records: Iterable[LogRecord]):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return self.total
+
+    @property
+    def spilled(self) -> bool:
+        return self.path is not None
+
+    def format_record(self, record: LogRecord) -> Dict[str, Any]:
+        timestamp, step, level, message = record
+        wall = self._wall_base + (timestamp - self._monotonic_base)
+        return {
+            'step': step,
+            'message': message,
+            'level': level,
+            'timestamp': datetime.fromtimestamp(wall).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def tail(self) -> List[Dict[str, Any]]:
+        """内存中保留的最近日志"""
+        return [self.format_record(record) for record in self._records]
+
+    def export(self) -> Dict[str, Any]:
+        """
+        导出到执行结果
+
+        返回:
+            logs: 最近的日志；log_total: 日志总数；
+            log_file: 写入过文件时为完整日志的 gzip 文件路径（每行一条 JSON）
+        """
+        self.close()
+        result = {'logs': self.tail(), 'log_total': self.total}
+        if self.path:
+            result['log_file'] = self.path
+        return result
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _spill(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.path = os.path.join(self.log_dir, f'{self.name}.log.gz')
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8', compresslevel=6)
+        for record in self._records:
+            self._write(record)
+
+    def _write(self, record: LogRecord):
+        self._file.write(json.dumps(self.format_record(record), ensure_ascii=False))
+        self._file.write('\n')
+
+
+def read_log_file(path: str) -> Iterable[Dict[str, Any]]:
+    """逐行读取 LogBuffer 写入的日志文件"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,142 @@
+"""
+API 请求步骤依赖分析
+将步骤划分为请求组（一个 request 步骤及其后续的断言、提取等步骤），
+并根据组之间对 ${变量} 的读写关系计算依赖，供 ApiEngine 并行执行
+"""
+from typing import Any, Dict, List, Set, Tuple
+
+from .template import PLACEHOLDER_PATTERN
+
+# 可以放在请求组内、与所属请求一起执行的步骤类型
+GROUP_STEP_TYPES = ('assert', 'extract', 'wait', 'set_variable')
+
+
+class RequestGroup:
+    """
+    请求组
+
+    属性:
+        position: 组在步骤列表中的顺序
+        steps: [(步骤下标, 步骤)]
+        reads: 组内步骤引用的变量
+        writes: 组内步骤写入的变量
+        serial: 是否必须串行执行（等待前面所有组完成，后面的组也等待它完成）
+        depends_on: 必须先完成的组的 position
+    """
+
+    __slots__ = ('position', 'steps', 'reads', 'writes', 'serial', 'depends_on')
+
+    def __init__(self, position: int):
+        self.position = position
+        self.steps: List[Tuple[int, Dict[str, Any]]] = []
+        self.reads: Set[str] = set()
+        self.writes: Set[str] = set()
+        self.serial = False
+        self.depends_on: Set[int] = set()
+
+    @property
+    def has_request(self) -> bool:
+        return bool(self.steps) and self.steps[0][1].get('type') == 'request'
+
+    def add_step(self, index: int, step: Dict[str, Any]):
+        self.steps.append((index, step))
+        _collect_placeholders(step, self.reads)
+
+        step_type = step.get('type')
+        params = step.get('params') or {}
+        if step.get('serial') or step_type not in ('request',) + GROUP_STEP_TYPES:
+            self.serial = True
+            return
+
+        # 前置/后置脚本可以读写任意变量，无法分析依赖
+        if params.get('pre_request_script') or params.get('post_request_script'):
+            self.serial = True
+
+        if step_type == 'extract':
+            written = params.get('variable_name')
+        elif step_type == 'set_variable':
+            written = params.get('name') or params.get('variable_name')
+        else:
+            written = None
+
+        if written:
+            if '${' in str(written):
+                # 变量名本身由变量决定
+                self.serial = True
+            else:
+                self.writes.add(written)
+
+
+def _collect_placeholders(value: Any, names: Set[str]):
+    if isinstance(value, str):
+        if '${' in value:
+            names.update(PLACEHOLDER_PATTERN.findall(value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _collect_placeholders(key, names)
+            _collect_placeholders(item, names)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_placeholders(item, names)
+
+
+def build_request_groups(steps: List[Dict[str, Any]]) -> List[RequestGroup]:
+    """
+    划分请求组并计算依赖
+
+    依赖规则:
+    - 读变量的组依赖最近一个写该变量的组（写后读）
+    - 写变量的组依赖之前写过或读过该变量的组（写后写、读后写）
+    - 串行组依赖之前所有组，之后的组都依赖串行组
+    - 流程控制步骤、含前置/后置脚本的请求、不在请求之后的断言/提取步骤以及设置了 serial 的步骤都是串行组
+
+    Cookie 等不经过变量的隐式依赖无法识别，需要时在步骤上设置 "serial": true
+    """
+    groups: List[RequestGroup] = []
+    current = None
+    for index, step in enumerate(steps):
+        step_type = step.get('type')
+        starts_group = (
+            current is None
+            or step_type == 'request'
+            or step_type not in GROUP_STEP_TYPES
+            or not current.has_request
+        )
+        if starts_group:
+            current = RequestGroup(len(groups))
+            groups.append(current)
+        current.add_step(index, step)
+        if not current.has_request:
+            # 没有所属请求的步骤依赖上一个组的响应
+            current.serial = True
+
+    last_serial = None
+    last_writer: Dict[str, int] = {}
+    readers: Dict[str, Set[int]] = {}
+    for group in groups:
+        if group.serial:
+            # 上一个串行组之前的组已经被它间接依赖
+            group.depends_on = set(range(last_serial or 0, group.position))
+            last_serial = group.position
+            last_writer.clear()
+            readers.clear()
+            continue
+
+        if last_serial is not None:
+            group.depends_on.add(last_serial)
+        for name in group.reads:
+            if name in last_writer:
+                group.depends_on.add(last_writer[name])
+        for name in group.writes:
+            if name in last_writer:
+                group.depends_on.add(last_writer[name])
+            group.depends_on.update(readers.get(name, ()))
+        group.depends_on.discard(group.position)
+
+        for name in group.reads:
+            readers.setdefault(name, set()).add(group.position)
+        for name in group.writes:
+            last_writer[name] = group.position
+            readers[name] = set()
+
+    return groups
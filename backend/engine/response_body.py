@@ -0,0 +1,212 @@
+"""
+API 响应体流式读取
+- 边读取边计算大小和 SHA-256，超过内存阈值的部分写入临时文件，超过上限的部分丢弃
+- 步骤结果中只保留截断后的预览，断言和提取需要时才解码文本或解析 JSON
+- 写入临时文件的大响应体按 JSONPath 提取时，如已安装 ijson 则增量解析，找到目标值即停止
+"""
+import hashlib
+import json
+import tempfile
+from typing import Any, List, Tuple, Union
+
+import requests
+
+from .extractors import compile_json_path
+
+_MISSING = object()
+
+
+class ResponseBody:
+    """
+    流式读取的响应体
+
+    内容保存在 SpooledTemporaryFile 中：不超过 memory_bytes 时在内存中，否则写入临时文件
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, memory_bytes: int, max_bytes: int, preview_bytes: int):
+        self.max_bytes = max_bytes
+        self.preview_bytes = preview_bytes
+        self.size = 0
+        self.truncated = False
+        self.preview = b''
+        self._sha256 = hashlib.sha256()
+        self._file = tempfile.SpooledTemporaryFile(max_size=max(memory_bytes, 0))
+
+    @classmethod
+    def read(cls, response: requests.Response, memory_bytes: int, max_bytes: int,
+             preview_bytes: int) -> 'ResponseBody':
+        """
+        读取以 stream=True 发送的请求的响应体
+
+        参数:
+            memory_bytes: 内存中保留的最大字节数，超过后写入临时文件
+            max_bytes: 最多读取的字节数，超过的部分丢弃并标记为截断，0 表示不限制
+            preview_bytes: 预览的字节数
+        """
+        body = cls(memory_bytes, max_bytes, preview_bytes)
+        try:
+            for chunk in response.iter_content(cls.CHUNK_SIZE):
+                if not body.write(chunk):
+                    break
+        finally:
+            # 完整读取后连接归还连接池，截断时关闭连接
+            response.close()
+        body._file.seek(0)
+        return body
+
+    def write(self, chunk: bytes) -> bool:
+        """写入一段内容，达到上限时返回 False"""
+        if self.max_bytes and self.size + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.size]
+            self.truncated = True
+        if len(self.preview) < self.preview_bytes:
+            self.preview += chunk[:self.preview_bytes - len(self.preview)]
+        self._sha256.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+        return not self.truncated
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def spilled(self) -> bool:
+        """内容是否已写入临时文件"""
+        return bool(getattr(self._file, '_rolled', False))
+
+    def getvalue(self) -> bytes:
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(0)
+        return data
+
+    def stream_json_value(self, keys: List[Union[str, int]]) -> Tuple[bool, Any]:
+        """
+        增量解析 JSON 查找 keys 对应的值
+
+        返回:
+            (是否完成查找, 值)；未安装 ijson 时返回 (False, None)，由调用方解析整个文档，
+            路径不存在时返回 (True, None)
+        """
+        try:
+            import ijson
+            from ijson.common import ObjectBuilder
+        except ImportError:
+            return False, None
+        if any(isinstance(key, int) and key < 0 for key in keys):
+            # 负数下标需要知道数组长度，无法增量查找
+            return False, None
+
+        # 每层容器: [当前键或下标, 是否为数组]
+        stack: List[list] = []
+        builder = None
+        depth = 0
+        self._file.seek(0)
+        try:
+            for _, event, value in ijson.parse(self._file, use_float=True):
+                if builder is not None:
+                    builder.event(event, value)
+                    if event in ('start_map', 'start_array'):
+                        depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        depth -= 1
+                        if depth == 0:
+                            return True, builder.value
+                    continue
+
+                if event == 'map_key':
+                    stack[-1][0] = value
+                    continue
+                if event in ('end_map', 'end_array'):
+                    stack.pop()
+                    continue
+
+                # 数组中的每个元素开始时下标加一
+                if stack and stack[-1][1]:
+                    stack[-1][0] += 1
+                at_target = len(stack) == len(keys) and all(
+                    item[0] == key for item, key in zip(stack, keys)
+                )
+
+                if event in ('start_map', 'start_array'):
+                    if at_target:
+                        builder = ObjectBuilder()
+                        builder.event(event, value)
+                        depth = 1
+                    else:
+                        stack.append([None if event == 'start_map' else -1, event == 'start_array'])
+                elif at_target:
+                    return True, value
+        finally:
+            self._file.seek(0)
+        return True, None
+
+    def close(self):
+        self._file.close()
+
+
+class CapturedResponse:
+    """
+    已读取响应体的响应
+
+    提供断言和提取使用的 requests.Response 常用属性（status_code、headers、cookies、elapsed、
+    text、json()），文本和 JSON 在首次访问时才解码并缓存
+    """
+
+    def __init__(self, response: requests.Response, body: ResponseBody):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.cookies = response.cookies
+        self.elapsed = response.elapsed
+        self.url = response.url
+        self.reason = response.reason
+        # 与 requests 一致优先使用响应头中的编码，未声明时按 UTF-8 解码
+        self.encoding = response.encoding or 'utf-8'
+        self.body = body
+        self._text = None
+        self._json = _MISSING
+
+    @property
+    def content(self) -> bytes:
+        return self.body.getvalue()
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._decode(self.content)
+        return self._text
+
+    @property
+    def preview_text(self) -> str:
+        return self._decode(self.body.preview)
+
+    def json(self) -> Any:
+        if self._json is _MISSING:
+            self._json = json.loads(self.text)
+        return self._json
+
+    def json_value(self, path: str, fallback) -> Any:
+        """
+        按 JSONPath 取值
+
+        已写入临时文件且尚未解析过的大响应体按确定路径增量解析，否则解析整个文档后调用 fallback(document, path)
+        """
+        if self._json is _MISSING and self.body.spilled:
+            keys = compile_json_path(path).keys
+            if keys is not None:
+                streamed, value = self.body.stream_json_value(keys)
+                if streamed:
+                    return value
+        return fallback(self.json(), path)
+
+    def close(self):
+        self.body.close()
+
+    def _decode(self, data: bytes) -> str:
+        try:
+            return data.decode(self.encoding, errors='replace')
+        except LookupError:
+            return data.decode('utf-8', errors='replace')
@@ -0,0 +1,585 @@
+"""
+执行引擎单元测试
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.test import SimpleTestCase, TransactionTestCase
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    """测试 HTTP 服务：返回路径和查询参数，delay 参数指定响应延迟（秒）"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        time.sleep(float(query.pop('delay', 0)))
+        body = json.dumps({'path': url.path, 'query': query}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServerMixin:
+    """在本地线程中启动测试 HTTP 服务"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _JsonHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class TemplateTest(SimpleTestCase):
+    """变量模板测试"""
+
+    def test_compiled_and_one_pass_render_match(self):
+        """测试编译渲染与一次性渲染结果一致，静态子树共享，键中的占位符也会替换"""
+        from engine.template import compile_template, render_template
+
+        source = {'name': '${user}', 'static': {'a': 1}, '${key}': ['x-${n}', 2]}
+        variables = {'user': 'alice', 'key': 'k', 'n': 3}
+        rendered = compile_template(source).render(variables)
+
+        self.assertEqual(rendered, {'name': 'alice', 'static': {'a': 1}, 'k': ['x-3', 2]})
+        self.assertEqual(rendered, render_template(source, variables))
+        self.assertIs(rendered['static'], source['static'])
+        self.assertIsNot(compile_template(source, copy_containers=True).render(variables)['static'],
+                         source['static'])
+
+    def test_missing_and_none_values(self):
+        """测试未定义变量和值为 None 的变量的替换规则"""
+        from engine.template import compile_template, render_template
+
+        variables = {'empty': None}
+        self.assertEqual(render_template('${empty}/${missing}', variables), '${empty}/${missing}')
+        self.assertEqual(render_template('${empty}/${missing}', variables, missing=''), '${empty}/')
+        self.assertEqual(compile_template('${empty}').render(variables, none='None'), 'None')
+
+
+class JsonPathTest(SimpleTestCase):
+    """JSONPath 解析与取值"""
+
+    document = {
+        'data': {
+            'items': [
+                {'id': 1, 'name': 'a', 'price': 5, 'status': 'ok', 'tags': ['x']},
+                {'id': 2, 'name': 'b', 'price': 15, 'status': 'ok'},
+                {'id': 3, 'name': 'c', 'price': 25, 'status': 'sold', 'tags': []},
+            ],
+            'total': 3,
+            'a.b': 'dotted',
+        },
+        'meta': {'id': 'm'},
+        '': 'empty',
+    }
+
+    def get(self, path, default=None):
+        from .extractors import compile_json_path
+        return compile_json_path(path).get(self.document, default)
+
+    def test_dotted_paths_keep_old_semantics(self):
+        """原有的点号写法：确定路径返回单个值，不存在时返回 None"""
+        self.assertEqual(self.get('data.total'), 3)
+        self.assertEqual(self.get('data.items[0].id'), 1)
+        self.assertEqual(self.get('data.items[-1].name'), 'c')
+        self.assertEqual(self.get('data.items[1]'), self.document['data']['items'][1])
+        self.assertIsNone(self.get('data.missing'))
+        self.assertIsNone(self.get('data.total.value'))
+        self.assertIsNone(self.get('data.items[5].id'))
+        self.assertEqual(self.get(''), 'empty')
+        self.assertEqual(self.get('$.data.total'), self.get('data.total'))
+
+    def test_definite_paths_expose_keys(self):
+        from .extractors import compile_json_path
+
+        self.assertEqual(compile_json_path("$.data.items[0]['a.b']").keys, ['data', 'items', 0, 'a.b'])
+        self.assertTrue(compile_json_path('data.items[0].id').definite)
+        for path in ('data.items[*].id', '$..id', 'data.items[0:2]', 'data.items[?(@.id)]', 'data.*'):
+            self.assertIsNone(compile_json_path(path).keys, path)
+        self.assertIs(compile_json_path('data.total'), compile_json_path('data.total'))
+
+    def test_wildcards_slices_and_recursive_descent(self):
+        self.assertEqual(self.get("data['a.b']"), 'dotted')
+        self.assertEqual(self.get('data.items[*].id'), [1, 2, 3])
+        self.assertEqual(self.get('data.items[0:2].id'), [1, 2])
+        self.assertEqual(self.get('data.items[-2:].name'), ['b', 'c'])
+        self.assertEqual(self.get('data.items[::2].id'), [1, 3])
+        self.assertEqual(self.get('$..id'), [1, 2, 3, 'm'])
+        self.assertEqual(self.get('meta.*'), ['m'])
+        self.assertEqual(self.get('data.missing[*]'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.get('data.items[?(@.price > 10)].id'), [2, 3])
+        self.assertEqual(self.get("data.items[?(@.price > 10 && @.status == 'ok')].id"), [2])
+        self.assertEqual(self.get("data.items[?(@.price < 10 || @.status == 'sold')].id"), [1, 3])
+        self.assertEqual(self.get('data.items[?(@.tags)].id'), [1, 3])
+        self.assertEqual(self.get('data.items[?(@.name =~ /^[ab]$/)].id'), [1, 2])
+        self.assertEqual(self.get('data.items[?(@.status != "ok")].name'), ['c'])
+        # 类型不匹配的比较视为不满足
+        self.assertEqual(self.get("data.items[?(@.price > 'x')]"), [])
+
+    def test_invalid_paths(self):
+        from .extractors import compile_json_path
+
+        for path in ('data.items[', 'data..', 'data.', 'data.items[abc]', 'data.items[1:2:3:4]',
+                     'data.items[?(@.price >)]', 'data.items[?(@.price > abc)]'):
+            with self.assertRaises(ValueError, msg=path):
+                compile_json_path(path)
+
+
+class RegexExtractorTest(SimpleTestCase):
+    """正则提取"""
+
+    def test_extract_group_or_match(self):
+        import re
+
+        from .extractors import compile_regex
+
+        self.assertEqual(compile_regex(r'token=(\w+)').extract('a token=abc1 b'), 'abc1')
+        self.assertEqual(compile_regex(r'\d+').extract('id 42'), '42')
+        self.assertIsNone(compile_regex(r'\d+').extract('none'))
+        self.assertIs(compile_regex('a+'), compile_regex('a+'))
+        with self.assertRaises(re.error):
+            compile_regex('(')
+
+
+class ConditionTest(SimpleTestCase):
+    """流程控制条件表达式"""
+
+    def evaluate(self, expression, **variables):
+        from .conditions import compile_condition
+        return compile_condition(expression).evaluate(variables)
+
+    def test_rejects_calls_attributes_and_subscripts(self):
+        from .conditions import ConditionError, compile_condition
+
+        for expression in ("__import__('os').system('id')", 'len(items) > 0', 'items.__class__',
+                           'items[0] == 1', '${a} + 1 > 2', 'lambda: 1', '[x for x in items]'):
+            with self.assertRaises(ConditionError, msg=expression):
+                compile_condition(expression)
+
+    def test_placeholder_outside_quotes_coerced(self):
+        """字符串外的 ${var}：数字和布尔字符串按字面量比较，其他字符串按字符串比较"""
+        self.assertTrue(self.evaluate('${code} == 200', code='200'))
+        self.assertTrue(self.evaluate('${ratio} > 0.5', ratio='0.75'))
+        self.assertTrue(self.evaluate('${flag} == true', flag='true'))
+        self.assertTrue(self.evaluate('${flag} == True', flag=True))
+        self.assertTrue(self.evaluate("${status} == 'success'", status='success'))
+        self.assertTrue(self.evaluate('${a} == ${b}', a='1', b=1))
+        self.assertTrue(self.evaluate('count >= 3', count=3))
+
+    def test_placeholder_inside_quotes_rendered_as_text(self):
+        """字符串中的 ${var} 按文本渲染，变量缺失时为空字符串"""
+        self.assertTrue(self.evaluate("'${code}' == '200'", code=200))
+        self.assertFalse(self.evaluate("'${code}' == 200", code=200))
+        self.assertTrue(self.evaluate("'${first}-${last}' == 'a-b'", first='a', last='b'))
+        self.assertTrue(self.evaluate("'${missing}' == ''"))
+
+    def test_missing_variable_outside_quotes(self):
+        from .conditions import ConditionError
+
+        for expression in ('${missing} == 1', 'missing == 1'):
+            with self.assertRaises(ConditionError):
+                self.evaluate(expression)
+        with self.assertRaises(ConditionError):
+            self.evaluate('${value} == 1', value=None)
+
+    def test_membership_and_boolean_operators(self):
+        self.assertTrue(self.evaluate('${code} in [200, 201]', code='201'))
+        self.assertTrue(self.evaluate('${code} not in (200, 201)', code=404))
+        self.assertTrue(self.evaluate("'ok' in '${text}'", text='all ok'))
+        self.assertTrue(self.evaluate("'err' not in '${text}'", text='all ok'))
+        self.assertTrue(self.evaluate('${a} > 1 and not ${b}', a=2, b='false'))
+        self.assertTrue(self.evaluate('1 < ${a} <= 3', a=3))
+        self.assertFalse(self.evaluate('1 < ${a} <= 3', a=5))
+
+    def test_invalid_literal_returns_false(self):
+        """字符串字面量无效时条件按不成立处理，不中断执行"""
+        from engine.api_engine import ApiEngine
+        from .conditions import ConditionError, compile_condition
+
+        with self.assertRaises(ConditionError):
+            compile_condition(r"'${a}\N' == 'x'")
+
+        engine = ApiEngine({})
+        engine.variables['a'] = 'x'
+        self.assertFalse(engine.evaluate_condition(r"'${a}\N' == 'x'"))
+        self.assertFalse(engine.evaluate_condition("len('x') == 1"))
+        self.assertTrue(engine.evaluate_condition("'${a}' == 'x'"))
+        self.assertTrue(any('条件评估失败' in log['message'] for log in engine.log_buffer.tail()))
+
+
+def _request(name, path, **extra):
+    return {'name': name, 'type': 'request', 'params': {'method': 'GET', 'url': path}, **extra}
+
+
+def _extract(name, variable, json_path):
+    return {'name': name, 'type': 'extract',
+            'params': {'variable_name': variable, 'extract_type': 'json_path', 'json_path': json_path}}
+
+
+class RequestGraphTest(SimpleTestCase):
+    """请求组依赖分析测试"""
+
+    def test_extract_then_request_dependency(self):
+        """测试提取变量的组被引用该变量的请求依赖，无关请求没有依赖"""
+        from engine.request_graph import build_request_groups
+
+        groups = build_request_groups([
+            _request('登录', '/login'),
+            _extract('提取 token', 'token', 'data.token'),
+            _request('查询订单', '/orders?token=${token}'),
+            _request('查询商品', '/products'),
+        ])
+
+        self.assertEqual([[index for index, _ in group.steps] for group in groups], [[0, 1], [2], [3]])
+        self.assertEqual(groups[0].writes, {'token'})
+        self.assertEqual(groups[1].depends_on, {0})
+        self.assertEqual(groups[2].depends_on, set())
+        self.assertFalse(any(group.serial for group in groups))
+
+    def test_write_after_read_and_write(self):
+        """测试读后写、写后写依赖"""
+        from engine.request_graph import build_request_groups
+
+        groups = build_request_groups([
+            _request('读取', '/a?x=${x}'),
+            _request('写入1', '/b'),
+            {'type': 'set_variable', 'params': {'name': 'x', 'value': '1'}},
+            _request('写入2', '/c'),
+            {'type': 'set_variable', 'params': {'name': 'x', 'value': '2'}},
+            _request('读取2', '/d?x=${x}'),
+        ])
+
+        self.assertEqual([group.depends_on for group in groups], [set(), {0}, {1}, {2}])
+
+    def test_serial_groups(self):
+        """测试流程控制、设置 serial、前置脚本以及写入动态变量名的组都是串行组"""
+        from engine.request_graph import build_request_groups
+
+        groups = build_request_groups([
+            _request('请求1', '/a'),
+            _request('请求2', '/b'),
+            {'type': 'if', 'params': {'condition': 'true'}, 'steps': []},
+            _request('请求3', '/c'),
+            _request('请求4', '/d', serial=True),
+            _request('请求5', '/e'),
+            {'type': 'request', 'params': {'url': '/f', 'pre_request_script': 'x = 1'}},
+            _request('请求6', '/g'),
+            {'type': 'set_variable', 'params': {'name': '${dynamic}', 'value': 1}},
+        ])
+
+        self.assertEqual([group.serial for group in groups],
+                         [False, False, True, False, True, False, True, True])
+        self.assertEqual(groups[2].depends_on, {0, 1})
+        self.assertEqual(groups[3].depends_on, {2})
+        self.assertEqual(groups[4].depends_on, {2, 3})
+        self.assertEqual(groups[5].depends_on, {4})
+
+
+class ApiEngineParallelTest(LocalServerMixin, SimpleTestCase):
+    """ApiEngine 并行请求模式测试"""
+
+    def _run(self, steps, parallel=True):
+        from engine.api_engine import ApiEngine
+
+        engine = ApiEngine({'base_url': self.base_url, 'parallel': parallel, 'max_parallel_requests': 4})
+        self.assertTrue(engine.setup())
+        try:
+            results = engine.execute_steps(steps)
+        finally:
+            engine.teardown()
+        return engine, results
+
+    def test_results_and_variables_in_step_order(self):
+        """测试先完成的请求不会打乱步骤结果顺序，变量按步骤顺序生效"""
+        steps = [
+            _request('慢请求', '/slow?delay=0.3&value=first'),
+            _extract('提取1', 'first', 'query.value'),
+            _request('快请求', '/fast?value=second'),
+            _extract('提取2', 'second', 'query.value'),
+            {'type': 'set_variable', 'params': {'name': 'shared', 'value': 'early'}},
+            _request('覆盖', '/overwrite?value=late'),
+            _extract('提取3', 'shared', 'query.value'),
+            _request('依赖两个变量', '/combined?a=${first}&b=${second}&c=${shared}'),
+            _extract('提取4', 'combined', 'query'),
+        ]
+
+        sequential, expected = self._run(steps, parallel=False)
+        for _ in range(3):
+            engine, results = self._run(steps)
+            self.assertEqual([step['index'] for step in results['steps']], list(range(len(steps))))
+            self.assertEqual([step['name'] for step in results['steps']],
+                             [step['name'] for step in expected['steps']])
+            self.assertEqual((results['passed'], results['failed']), (len(steps), 0))
+            self.assertEqual(engine.variables, sequential.variables)
+        self.assertEqual(engine.variables['combined'], {'a': 'first', 'b': 'second', 'c': 'late'})
+
+    def test_independent_requests_run_concurrently(self):
+        """测试相互独立的请求并发执行"""
+        steps = [_request(f'请求{i}', f'/item/{i}?delay=0.3') for i in range(4)]
+
+        start = time.time()
+        _, results = self._run(steps)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(results['passed'], 4)
+
+
+    def test_replaced_response_bodies_closed(self):
+        """测试被替换的响应体立即关闭，最后一个响应在 teardown 时关闭"""
+        from engine.api_engine import ApiEngine
+        from engine.response_body import ResponseBody
+
+        original_read = ResponseBody.read
+        steps = [_request(f'请求{i}', f'/item/{i}') for i in range(4)]
+        for parallel in (False, True):
+            bodies = []
+
+            def read(*args, **kwargs):
+                body = original_read(*args, **kwargs)
+                bodies.append(body)
+                return body
+
+            engine = ApiEngine({'base_url': self.base_url, 'parallel': parallel, 'max_parallel_requests': 4})
+            self.assertTrue(engine.setup())
+            with mock.patch.object(ResponseBody, 'read', side_effect=read):
+                engine.execute_steps(steps)
+            self.assertEqual(len(bodies), 4)
+            self.assertEqual(sum(not body._file.closed for body in bodies), 1)
+            self.assertFalse(engine.last_response.body._file.closed)
+
+            engine.teardown()
+            self.assertTrue(all(body._file.closed for body in bodies))
+            self.assertFalse(hasattr(engine, 'last_response'))
+
+
+class LatencyHistogramTest(SimpleTestCase):
+    """压测延迟直方图"""
+
+    def test_percentiles_within_bucket_error(self):
+        from .load_runner import LatencyHistogram
+
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+
+        error = 1 / 2 ** LatencyHistogram.SUB_BUCKET_BITS
+        for percent, expected in ((50, 500), (90, 900), (99, 990)):
+            self.assertAlmostEqual(histogram.percentile(percent), expected, delta=expected * error)
+        self.assertEqual(histogram.percentile(100), 1000)
+        self.assertEqual(histogram.min, 1)
+        self.assertAlmostEqual(histogram.mean, 500.5)
+        self.assertEqual(sum(count for _, count in histogram.to_buckets()), 1000)
+
+    def test_merge_and_empty(self):
+        from .load_runner import LatencyHistogram
+
+        empty = LatencyHistogram()
+        self.assertEqual(empty.percentile(99), 0.0)
+        self.assertEqual(empty.summary()['min'], 0.0)
+
+        low, high = LatencyHistogram(), LatencyHistogram()
+        for _ in range(90):
+            low.record(10)
+        for _ in range(10):
+            high.record(200)
+        low.merge(high)
+        self.assertEqual(low.count, 100)
+        self.assertEqual((low.min, low.max), (10, 200))
+        self.assertAlmostEqual(low.percentile(50), 10, delta=10 / 64)
+        self.assertAlmostEqual(low.percentile(99), 200, delta=200 / 64)
+
+
+class _SleepEngine:
+    """压测用的假引擎：每个步骤等待 step['sleep'] 秒"""
+
+    def __init__(self):
+        self.variables = {}
+        self.results = {}
+
+    def setup(self):
+        return True
+
+    def teardown(self):
+        pass
+
+    def resolve_variables(self, step):
+        return step
+
+    def execute_step(self, step):
+        time.sleep(step.get('sleep', 0))
+        return {'success': not step.get('fail'), 'duration': step.get('sleep', 0) * 1000}
+
+
+class LoadTestRunnerTest(SimpleTestCase):
+    """压测执行器"""
+
+    def test_open_model_drops_when_users_busy(self):
+        from .load_runner import LoadTestRunner
+
+        runner = LoadTestRunner(
+            _SleepEngine, [{'name': 'slow', 'type': 'request', 'sleep': 0.1}],
+            users=1, iterations=20, arrival_rate=100,
+        )
+        stats = runner.run()['load_test']
+
+        # 每个发放的令牌要么被执行，要么记为丢弃
+        self.assertGreater(stats['dropped_iterations'], 0)
+        self.assertEqual(stats['iterations'] + stats['dropped_iterations'], 20)
+        self.assertEqual(stats['requests'], stats['iterations'])
+
+    def test_closed_model_runs_all_iterations(self):
+        from .load_runner import LoadTestRunner
+
+        runner = LoadTestRunner(
+            _SleepEngine, [{'name': 'fast', 'type': 'request'}], users=4, iterations=40,
+        )
+        stats = runner.run()['load_test']
+        self.assertEqual(stats['iterations'], 40)
+        self.assertEqual(stats['dropped_iterations'], 0)
+        self.assertEqual(stats['requests'], 40)
+
+    def test_timeseries_errors_count_request_steps_only(self):
+        """测试按秒的错误数与请求数统计同一组步骤，非请求步骤的失败只计入步骤统计"""
+        from .load_runner import LoadTestRunner
+
+        runner = LoadTestRunner(
+            _SleepEngine,
+            [{'name': 'check', 'type': 'assert', 'fail': True}, {'name': 'call', 'type': 'request'}],
+            users=2, iterations=10,
+        )
+        stats = runner.run()['load_test']
+        self.assertEqual(sum(stats['timeseries']['requests']), 10)
+        self.assertEqual(sum(stats['timeseries']['errors']), 0)
+        self.assertEqual([step['errors'] for step in stats['steps']], [10, 0])
+
+    def test_users_capped(self):
+        from .load_runner import LoadTestRunner, MAX_USERS
+
+        with self.assertLogs('engine.load_runner', level='WARNING'):
+            runner = LoadTestRunner(_SleepEngine, [], users=MAX_USERS + 1)
+        self.assertEqual(runner.users, MAX_USERS)
+
+
+class LogBufferTest(SimpleTestCase):
+    """执行日志缓冲"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir, ignore_errors=True)
+
+    def _buffer(self, capacity=3):
+        from .log_buffer import LogBuffer
+        return LogBuffer(capacity=capacity, log_dir=self.log_dir, name='execution_1')
+
+    @staticmethod
+    def _record(n):
+        return (time.monotonic(), n, 'info', f'message {n}')
+
+    def test_within_capacity_stays_in_memory(self):
+        buffer = self._buffer()
+        buffer.extend(self._record(n) for n in range(3))
+
+        exported = buffer.export()
+        self.assertFalse(buffer.spilled)
+        self.assertNotIn('log_file', exported)
+        self.assertEqual(exported['log_total'], 3)
+        self.assertEqual([log['message'] for log in exported['logs']], ['message 0', 'message 1', 'message 2'])
+        self.assertEqual(set(exported['logs'][0]), {'step', 'message', 'level', 'timestamp'})
+
+    def test_spill_keeps_tail_and_writes_all(self):
+        from .log_buffer import read_log_file
+
+        buffer = self._buffer()
+        for n in range(10):
+            buffer.append(self._record(n))
+
+        self.assertTrue(buffer.spilled)
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual([log['step'] for log in buffer.tail()], [7, 8, 9])
+
+        exported = buffer.export()
+        self.assertEqual(exported['log_file'], os.path.join(self.log_dir, 'execution_1.log.gz'))
+        self.assertEqual(exported['log_total'], 10)
+        self.assertEqual([log['step'] for log in read_log_file(exported['log_file'])], list(range(10)))
+
+    def test_append_after_export(self):
+        """导出后继续写入的日志追加到同一文件"""
+        from .log_buffer import read_log_file
+
+        buffer = self._buffer()
+        buffer.extend(self._record(n) for n in range(5))
+        path = buffer.export()['log_file']
+
+        buffer.append(self._record(5))
+        buffer.append(self._record(6))
+        exported = buffer.export()
+
+        self.assertEqual(exported['log_file'], path)
+        self.assertEqual(exported['log_total'], 7)
+        self.assertEqual([log['step'] for log in exported['logs']], [4, 5, 6])
+        self.assertEqual([log['step'] for log in read_log_file(path)], list(range(7)))
+
+
+class _ConfigSleepEngine(_SleepEngine):
+    """按引擎配置创建的压测假引擎，记录创建次数"""
+
+    created = 0
+
+    def __init__(self, config=None):
+        super().__init__()
+        type(self).created += 1
+
+
+class LoadTestExecutionTest(TransactionTestCase):
+    """压测模式的执行记录"""
+
+    def test_stopped_load_test_keeps_partial_result(self):
+        from apps.executions.models import Execution
+        from apps.projects.models import Project
+        from apps.scripts.models import Script
+        from apps.users.models import User
+        from .executor import TestExecutor
+
+        user = User.objects.create_user(username='load', email='load@example.com', password='testpass123')
+        project = Project.objects.create(name='压测项目', creator=user)
+        script = Script.objects.create(project=project, name='压测脚本', type='api', framework='httprunner',
+                                       created_by=user, steps=[{'name': 'slow', 'type': 'request', 'sleep': 0.05}])
+        execution = Execution.objects.create(execution_type='script', script=script, created_by=user)
+
+        _ConfigSleepEngine.created = 0
+        executor = TestExecutor(execution, load_test={'users': 2, 'duration': 30})
+        with mock.patch('engine.executor.ApiEngine', _ConfigSleepEngine):
+            thread = threading.Thread(target=executor.run)
+            thread.start()
+            time.sleep(0.5)
+            executor.stop()
+            thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        # 只为虚拟用户创建引擎
+        self.assertEqual(_ConfigSleepEngine.created, 2)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'stopped')
+        self.assertGreater(execution.result['load_test']['iterations'], 0)
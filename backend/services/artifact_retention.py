@@ -0,0 +1,374 @@
+"""
+Artifact Retention Service - 执行产物保留与清理服务
+
+按项目的 RetentionPolicy 清理报告、截图、完整执行日志等执行产物：
+- 始终保留最近 keep_last_runs 次执行
+- 超出部分中，成功执行保留 keep_days 天，失败执行保留 keep_failed_days 天
+- 设置了 max_total_bytes 时，从最旧的执行开始淘汰（优先淘汰成功执行），直到总大小低于上限
+
+只删除产物文件和 Screenshot/Report 记录，执行记录本身保留（移除结果中指向已删除文件的字段）。
+"""
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional, Iterable, Set
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from apps.executions.models import Execution
+from apps.projects.models import Project
+from apps.reports.models import Report, Screenshot, RetentionPolicy
+
+logger = logging.getLogger(__name__)
+
+# 已结束的执行状态，运行中的执行不参与清理
+FINISHED_STATUSES = ['completed', 'failed', 'stopped']
+
+
+# 旧版本在执行结果中以路径保存截图的字段
+LEGACY_SCREENSHOT_KEYS = ('screenshot', 'failure_screenshot', 'screenshots')
+
+# 执行结果中完整日志文件（EXECUTION_LOGS_ROOT 下的 gzip 文件）的字段
+LOG_FILE_KEY = 'log_file'
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def legacy_screenshot_urls(result) -> Set[str]:
+    """执行结果中旧版本保存的截图路径（screenshot、failure_screenshot 以及 screenshots 列表）"""
+    if not isinstance(result, dict):
+        return set()
+    urls = set()
+    for key in ('screenshot', 'failure_screenshot'):
+        if isinstance(result.get(key), str) and result[key]:
+            urls.add(result[key])
+    for item in result.get('screenshots') or []:
+        if isinstance(item, str):
+            urls.add(item)
+        elif isinstance(item, dict):
+            urls.update(item[key] for key in ('url', 'thumbnail', 'path') if isinstance(item.get(key), str) and item[key])
+    return urls
+
+
+class ArtifactRetention:
+    """
+    执行产物保留引擎
+
+    功能:
+    - 按项目策略选出需要淘汰的执行
+    - 分批删除产物文件以及对应的 Screenshot/Report 记录
+    - 清理未被任何记录引用的孤儿文件
+    - 支持 dry_run，只统计不删除
+    """
+
+    def __init__(self, dry_run: bool = False, batch_size: int = 200, now=None):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+        self.media_url = settings.MEDIA_URL.rstrip('/') + '/'
+        self.media_root = str(settings.MEDIA_ROOT)
+        self.logs_root = os.path.normpath(os.path.abspath(str(settings.EXECUTION_LOGS_ROOT)))
+        self.stats = self._empty_stats()
+        # 已删除（dry_run 时为将删除）的文件和已淘汰的执行，避免共享文件重复统计
+        self._deleted_paths: Set[str] = set()
+        self._evicted_ids: Set[int] = set()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            'projects': 0,
+            'runs_evicted': 0,
+            'screenshots_deleted': 0,
+            'reports_deleted': 0,
+            'files_deleted': 0,
+            'bytes_freed': 0,
+        }
+
+    def run(self, project_id: Optional[int] = None, sweep_orphans: bool = False,
+            orphan_grace_days: int = 1) -> Dict[str, int]:
+        """
+        执行清理
+
+        Args:
+            project_id: 只清理指定项目，为空时清理所有项目
+            sweep_orphans: 是否同时清理孤儿文件
+            orphan_grace_days: 孤儿文件的最短保留天数，避免误删正在写入的文件
+
+        Returns:
+            统计信息
+        """
+        self.stats = self._empty_stats()
+        self._deleted_paths = set()
+        self._evicted_ids = set()
+        default_policy = self.get_default_policy()
+        policies = {
+            policy.project_id: policy
+            for policy in RetentionPolicy.objects.filter(project__isnull=False)
+        }
+
+        projects = Project.objects.all()
+        if project_id:
+            projects = projects.filter(id=project_id)
+
+        for project in projects.iterator():
+            policy = policies.get(project.id, default_policy)
+            if not policy.is_enabled:
+                continue
+            self.stats['projects'] += 1
+            run_ids = self.select_runs_to_evict(project, policy)
+            if run_ids:
+                logger.info(f"项目 {project.name}: 淘汰 {len(run_ids)} 次执行的产物")
+                self.evict_runs(run_ids)
+
+        if sweep_orphans and not project_id:
+            self.sweep_orphan_files(orphan_grace_days)
+
+        return self.stats
+
+    @staticmethod
+    def get_default_policy() -> RetentionPolicy:
+        """获取全局默认策略，未配置时使用模型默认值"""
+        return RetentionPolicy.objects.filter(project__isnull=True).first() or RetentionPolicy()
+
+    def select_runs_to_evict(self, project, policy: RetentionPolicy) -> List[int]:
+        """
+        按策略选出需要淘汰产物的顶层执行 ID
+
+        Args:
+            project: 项目
+            policy: 保留策略
+
+        Returns:
+            顶层执行（父执行或独立脚本执行）ID 列表
+        """
+        runs = list(
+            Execution.objects.filter(
+                Q(script__project=project) | Q(plan__project=project),
+                parent__isnull=True,
+                status__in=FINISHED_STATUSES
+            ).order_by('-created_at').values_list('id', 'status', 'created_at')
+        )
+        candidates = runs[max(policy.keep_last_runs, 0):]
+        if not candidates:
+            return []
+
+        sizes = self._artifact_sizes([run_id for run_id, _, _ in runs])
+
+        ok_cutoff = self.now - timedelta(days=policy.keep_days)
+        failed_cutoff = self.now - timedelta(days=policy.keep_failed_days)
+
+        evict, retained = [], []
+        for run in candidates:
+            run_id, run_status, created_at = run
+            if run_id not in sizes:
+                # 没有产物，无需处理
+                continue
+            cutoff = failed_cutoff if run_status == 'failed' else ok_cutoff
+            (evict if created_at < cutoff else retained).append(run)
+
+        if policy.max_total_bytes:
+            evicted_ids = {run[0] for run in evict}
+            total = sum(size for run_id, size in sizes.items() if run_id not in evicted_ids)
+            # 超出容量时优先淘汰成功执行，再按时间从旧到新
+            retained.sort(key=lambda run: (run[1] == 'failed', run[2]))
+            for run in retained:
+                if total <= policy.max_total_bytes:
+                    break
+                evict.append(run)
+                total -= sizes[run[0]]
+
+        return [run[0] for run in evict]
+
+    def _artifact_sizes(self, run_ids: List[int]) -> Dict[int, int]:
+        """统计每个顶层执行（含子执行）的产物大小，只包含存在产物的执行"""
+        sizes: Dict[int, int] = {}
+        for batch in _chunks(run_ids, self.batch_size):
+            root_of = {run_id: run_id for run_id in batch}
+            root_of.update(
+                Execution.objects.filter(parent_id__in=batch).values_list('id', 'parent_id')
+            )
+            execution_ids = list(root_of.keys())
+
+            screenshot_sizes = (
+                Screenshot.objects.filter(execution_id__in=execution_ids)
+                .values('execution_id').annotate(total=Sum('file_size'))
+            )
+            for row in screenshot_sizes:
+                root = root_of[row['execution_id']]
+                sizes[root] = sizes.get(root, 0) + (row['total'] or 0)
+
+            reports = Report.objects.filter(execution_id__in=execution_ids).values_list(
+                'execution_id', 'html_report', 'pdf_report'
+            )
+            for execution_id, html_path, pdf_path in reports:
+                root = root_of[execution_id]
+                sizes[root] = sizes.get(root, 0) + self._file_size(html_path) + self._file_size(pdf_path)
+
+            log_files = Execution.objects.filter(
+                id__in=execution_ids, result__has_key=LOG_FILE_KEY
+            ).values_list('id', f'result__{LOG_FILE_KEY}')
+            for execution_id, log_file in log_files:
+                size = self._file_size(self._log_file_path(log_file))
+                if size:
+                    root = root_of[execution_id]
+                    sizes[root] = sizes.get(root, 0) + size
+        return sizes
+
+    def evict_runs(self, run_ids: List[int]):
+        """分批删除指定顶层执行（含子执行）的产物文件和记录"""
+        for batch in _chunks(run_ids, self.batch_size):
+            execution_ids = list(batch) + list(
+                Execution.objects.filter(parent_id__in=batch).values_list('id', flat=True)
+            )
+            self._evict_executions(execution_ids)
+            self.stats['runs_evicted'] += len(batch)
+
+    def _evict_executions(self, execution_ids: List[int]):
+        screenshots = list(
+            Screenshot.objects.filter(execution_id__in=execution_ids)
+            .values_list('id', 'image_path', 'thumbnail_path')
+        )
+        reports = list(
+            Report.objects.filter(execution_id__in=execution_ids)
+            .values_list('id', 'html_report', 'pdf_report')
+        )
+
+        # 截图按内容哈希存储，可能被其他执行引用，只有无引用时才删除文件
+        # dry_run 时记录不会被删除，之前批次淘汰的执行也不算引用
+        self._evicted_ids.update(execution_ids)
+        image_urls = {image_path for _, image_path, _ in screenshots if image_path}
+        legacy_urls = set()
+        log_files = []
+        for result in Execution.objects.filter(id__in=execution_ids).values_list('result', flat=True):
+            legacy_urls |= legacy_screenshot_urls(result)
+            if isinstance(result, dict) and result.get(LOG_FILE_KEY):
+                log_files.append(result[LOG_FILE_KEY])
+        still_referenced = set(
+            Screenshot.objects.filter(image_path__in=image_urls | legacy_urls)
+            .exclude(execution_id__in=self._evicted_ids)
+            .values_list('image_path', flat=True)
+        )
+
+        for _, image_path, thumbnail_path in screenshots:
+            if image_path and image_path not in still_referenced:
+                self._delete_file(self._url_to_path(image_path))
+                if thumbnail_path:
+                    self._delete_file(self._url_to_path(thumbnail_path))
+        for url in legacy_urls - image_urls - still_referenced:
+            self._delete_file(self._url_to_path(url))
+        for _, html_path, pdf_path in reports:
+            self._delete_file(html_path)
+            self._delete_file(pdf_path)
+        for log_file in log_files:
+            self._delete_file(self._log_file_path(log_file))
+
+        self.stats['screenshots_deleted'] += len(screenshots)
+        self.stats['reports_deleted'] += len(reports)
+
+        if self.dry_run:
+            return
+
+        Screenshot.objects.filter(id__in=[row[0] for row in screenshots]).delete()
+        Report.objects.filter(id__in=[row[0] for row in reports]).delete()
+
+        if legacy_urls or log_files:
+            removed_keys = LEGACY_SCREENSHOT_KEYS + (LOG_FILE_KEY,)
+            for execution in Execution.objects.filter(id__in=execution_ids).only('id', 'result'):
+                result = execution.result or {}
+                if any(key in result for key in removed_keys):
+                    for key in removed_keys:
+                        result.pop(key, None)
+                    execution.result = result
+                    execution.save(update_fields=['result'])
+
+    def sweep_orphan_files(self, grace_days: int = 1):
+        """删除截图、报告和执行日志目录中未被任何记录引用的文件"""
+        referenced = set()
+        for image_path, thumbnail_path in Screenshot.objects.values_list('image_path', 'thumbnail_path').iterator():
+            for url in (image_path, thumbnail_path):
+                if url:
+                    referenced.add(os.path.normpath(self._url_to_path(url)))
+        for html_path, pdf_path in Report.objects.values_list('html_report', 'pdf_report').iterator():
+            for path in (html_path, pdf_path):
+                if path:
+                    referenced.add(os.path.normpath(path))
+        # 只读取包含旧版本截图字段的执行结果，并分批读取
+        legacy_results = Execution.objects.filter(
+            result__has_any_keys=list(LEGACY_SCREENSHOT_KEYS)
+        ).values_list('result', flat=True).iterator(chunk_size=self.batch_size)
+        for result in legacy_results:
+            for url in legacy_screenshot_urls(result):
+                referenced.add(os.path.normpath(self._url_to_path(url)))
+        log_files = Execution.objects.filter(
+            result__has_key=LOG_FILE_KEY
+        ).values_list(f'result__{LOG_FILE_KEY}', flat=True).iterator(chunk_size=self.batch_size)
+        for log_file in log_files:
+            if isinstance(log_file, str) and log_file:
+                referenced.add(os.path.normpath(log_file))
+
+        cutoff = (self.now - timedelta(days=grace_days)).timestamp()
+        roots = {
+            os.path.normpath(str(settings.SCREENSHOTS_ROOT)),
+            os.path.normpath(os.path.join(self.media_root, 'screenshots')),
+            os.path.normpath(str(settings.REPORTS_ROOT)),
+            self.logs_root,
+        }
+        for root in roots:
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.normpath(os.path.join(dirpath, filename))
+                    if path in referenced:
+                        continue
+                    try:
+                        if os.path.getmtime(path) >= cutoff:
+                            continue
+                    except OSError:
+                        continue
+                    self._delete_file(path)
+
+    def _url_to_path(self, url: str) -> str:
+        """将 /media/... 形式的 URL 转换为文件路径"""
+        if url.startswith(self.media_url):
+            return os.path.join(self.media_root, *url[len(self.media_url):].split('/'))
+        return url
+
+    def _log_file_path(self, log_file) -> Optional[str]:
+        """执行结果中的日志文件路径，只处理执行日志目录下的文件"""
+        if not isinstance(log_file, str) or not log_file:
+            return None
+        path = os.path.normpath(log_file)
+        if os.path.commonpath([self.logs_root, os.path.abspath(path)]) != self.logs_root:
+            return None
+        return path
+
+    @staticmethod
+    def _file_size(path: Optional[str]) -> int:
+        if not path:
+            return 0
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _delete_file(self, path: Optional[str]):
+        """删除文件并计入统计，dry_run 时只统计"""
+        if not path or not os.path.isfile(path):
+            return
+        key = os.path.normpath(path)
+        if key in self._deleted_paths:
+            return
+        self._deleted_paths.add(key)
+        size = self._file_size(path)
+        if not self.dry_run:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除文件失败: {path}, {e}")
+                return
+        self.stats['files_deleted'] += 1
+        self.stats['bytes_freed'] += size
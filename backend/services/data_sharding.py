@@ -0,0 +1,224 @@
+"""
+Data Sharding Service - 数据驱动脚本分片服务
+
+将数据驱动脚本的数据行按连续区间拆分为多个分片，每个分片作为独立任务分发到不同执行机，
+所有分片完成后再合并为同一个执行记录的结果。
+
+分片结果在锁定执行记录后写入 result['shard_results']，已记录的分片数达到分片总数时合并；
+被取消且不会再上报结果的分片记为 cancelled，同样计入分片数。合并后 result 中只保留各分片的汇总（shards），
+之后重复上报的分片结果不再处理。
+
+SQLite 不支持 select_for_update，同一进程内通过进程锁串行写入分片结果；
+SQLite 只适合单进程部署，多进程并发写入时由数据库锁报错而不会丢失更新。
+"""
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from apps.executors.models import Executor
+
+logger = logging.getLogger(__name__)
+
+# SQLite 下串行写入分片结果的进程锁
+_sqlite_shard_lock = threading.Lock()
+
+
+def available_executors(project_id=None):
+    """当前可用于该项目的在线执行机"""
+    from django.db.models import Q
+
+    queryset = Executor.objects.filter(
+        is_enabled=True,
+        status__in=['idle', 'online', 'busy'],
+        last_heartbeat__gte=timezone.now() - timezone.timedelta(seconds=120)
+    )
+    scope_filter = Q(scope='global')
+    if project_id:
+        scope_filter |= Q(scope='project', bound_projects=project_id)
+    return queryset.filter(scope_filter).distinct()
+
+
+def count_available_executors(project_id=None) -> int:
+    """统计当前可用于该项目的在线执行机数量"""
+    return available_executors(project_id).count()
+
+
+def count_available_slots(project_id=None) -> int:
+    """统计当前可用于该项目的并发槽位数（各执行机当前并发数之和）"""
+    return sum(executor.capacity for executor in available_executors(project_id).only(
+        'id', 'max_concurrent', 'effective_capacity'
+    ))
+
+
+def plan_shards(row_count: int, executor_count: int) -> List[Tuple[int, int]]:
+    """
+    计算分片的行区间
+
+    Args:
+        row_count: 数据总行数
+        executor_count: 可用执行机数量
+
+    Returns:
+        [(row_start, row_end), ...]，区间左闭右开；不需要分片时只返回一个区间
+    """
+    if row_count <= 0:
+        return []
+
+    min_rows = max(getattr(settings, 'DATA_SHARD_MIN_ROWS', 200), 1)
+    max_shards = max(getattr(settings, 'DATA_SHARD_MAX_SHARDS', 16), 1)
+    shard_count = max(1, min(executor_count, max_shards, row_count // min_rows))
+
+    base, extra = divmod(row_count, shard_count)
+    shards = []
+    start = 0
+    for index in range(shard_count):
+        size = base + (1 if index < extra else 0)
+        shards.append((start, start + size))
+        start += size
+    return shards
+
+
+def merge_shard_results(shard_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各分片的执行结果
+
+    步骤按分片顺序拼接；耗时取各分片的最大值（分片并行执行）
+
+    Args:
+        shard_results: {分片序号: 分片结果}
+
+    Returns:
+        合并后的执行结果，shards 中只保留各分片的汇总信息
+    """
+    merged = {
+        'total': 0,
+        'passed': 0,
+        'failed': 0,
+        'steps': [],
+        'duration': 0,
+        'message': '',
+        'logs': [],
+        'shards': {},
+    }
+    messages = []
+    for key in sorted(shard_results, key=int):
+        shard = shard_results[key]
+        merged['total'] += shard.get('total', 0)
+        merged['passed'] += shard.get('passed', 0)
+        merged['failed'] += shard.get('failed', 0)
+        merged['steps'].extend(shard.get('steps', []))
+        merged['logs'].extend(shard.get('logs', []))
+        merged['duration'] = max(merged['duration'], shard.get('duration', 0) or 0)
+        if shard.get('status') != 'completed' and shard.get('message'):
+            messages.append(f"分片 {int(key) + 1}: {shard['message']}")
+        merged['shards'][key] = {
+            field: shard.get(field)
+            for field in ('status', 'row_start', 'row_end', 'total', 'passed', 'failed', 'duration', 'executor')
+        }
+
+    merged['message'] = '; '.join(messages)
+    return merged
+
+
+def _shard_entry(task, shard: Dict[str, Any], shard_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if shard_result is None:
+        shard_result = {'total': 0, 'passed': 0, 'failed': 0, 'steps': [], 'logs': [],
+                        'duration': 0, 'message': '分片已取消'}
+    return {
+        **shard_result,
+        'status': task.status,
+        'row_start': shard.get('row_start'),
+        'row_end': shard.get('row_end'),
+        'executor': task.executor.name if task.executor_id else None,
+    }
+
+
+def record_shard_result(task, shard_result: Optional[Dict[str, Any]] = None):
+    """
+    记录分片任务结果，所有分片都有结果后合并到执行记录
+
+    Args:
+        task: 已更新为结束状态的分片任务
+        shard_result: 执行机上报的分片结果，None 表示分片被取消
+
+    Returns:
+        所有分片都已结束时返回合并结果后的执行记录，否则返回 None
+    """
+    from django.db import transaction
+    from apps.executions.models import Execution
+    from apps.executors.models import TaskQueue
+
+    shard = task.script_data['shard']
+    lock = _sqlite_shard_lock if connection.vendor == 'sqlite' else nullcontext()
+    with lock, transaction.atomic():
+        # 锁定执行记录，多个分片同时上报时依次写入，完成判断也在锁内按已记录的分片数进行
+        execution = Execution.objects.select_for_update().get(id=task.execution_id)
+        result = execution.result or {}
+        if 'shards' in result and 'shard_results' not in result:
+            logger.info(f"执行 {execution.id} 的分片结果已合并，忽略分片 {shard['index'] + 1} 的重复上报")
+            return None
+        shard_results = dict(result.get('shard_results', {}))
+        key = str(shard['index'])
+        if shard_result is not None or key not in shard_results:
+            shard_results[key] = _shard_entry(task, shard, shard_result)
+
+        # 被取消的分片不会再上报结果，直接记为已取消
+        cancelled = TaskQueue.objects.filter(
+            execution_id=execution.id, status='cancelled'
+        ).select_related('executor')
+        for cancelled_task in cancelled:
+            cancelled_shard = (cancelled_task.script_data or {}).get('shard')
+            if cancelled_shard and str(cancelled_shard['index']) not in shard_results:
+                shard_results[str(cancelled_shard['index'])] = _shard_entry(cancelled_task, cancelled_shard, None)
+
+        if len(shard_results) < shard['count']:
+            execution.result = {**result, 'shard_results': shard_results}
+            if execution.status not in ('stopped', 'completed', 'failed'):
+                execution.status = 'running'
+            execution.save()
+            logger.info(f"执行 {execution.id} 已记录 {len(shard_results)}/{shard['count']} 个分片，等待其他分片")
+            return None
+
+        statuses = {item['status'] for item in shard_results.values()}
+        execution.result = merge_shard_results(shard_results)
+        if execution.status != 'stopped':
+            if statuses == {'completed'}:
+                execution.status = 'completed'
+            elif 'failed' in statuses:
+                execution.status = 'failed'
+            else:
+                execution.status = 'stopped'
+        if not execution.completed_at:
+            execution.completed_at = timezone.now()
+        execution.save()
+        logger.info(f"执行 {execution.id} 的 {len(shard_results)} 个分片已全部结束，结果已合并")
+        return execution
+
+
+def finish_cancelled_shards(execution_ids: Iterable[int]) -> int:
+    """
+    记录执行中被取消的分片；被取消的分片是最后一个未结束的分片时合并结果，避免执行记录一直处于执行中
+
+    Returns:
+        合并结果的执行记录数
+    """
+    from apps.executors.models import TaskQueue
+
+    merged = 0
+    recorded = set()
+    tasks = TaskQueue.objects.filter(
+        execution_id__in=list(execution_ids), status='cancelled', script_data__has_key='shard'
+    ).select_related('executor')
+    for task in tasks:
+        if task.execution_id in recorded:
+            continue
+        # 一次调用会记录该执行所有被取消的分片
+        recorded.add(task.execution_id)
+        if record_shard_result(task) is not None:
+            merged += 1
+    return merged
@@ -0,0 +1,195 @@
+"""
+Duration Estimator Service - 按执行历史预估脚本耗时，计划并行执行时最长预期优先调度
+
+- 每个脚本取最近若干次已结束执行的耗时，按完成时间计算指数加权移动平均（EWMA）
+- 没有历史的脚本使用同框架脚本的平均预估，框架也没有历史时使用默认值
+- 并行计划按预估耗时从长到短创建任务，分发服务按创建顺序分配给负载最低的执行机（LPT 调度），
+  避免长脚本最后才开始；同时按可用并发槽位模拟调度，给出预计总耗时
+- 失败优先：上次执行该计划时失败的脚本最先调度，其余按最近失败率从高到低，便于尽早暴露问题
+"""
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from apps.executions.models import Execution
+
+# EWMA 平滑系数，越大越偏向最近的执行
+EWMA_ALPHA = 0.3
+# 每个脚本参与计算的最近执行次数
+HISTORY_LIMIT = 10
+# 每个框架参与计算的最近执行次数（没有历史的脚本使用）
+FRAMEWORK_HISTORY_LIMIT = 50
+# 每个脚本参与计算失败率的最近执行次数
+FAILURE_HISTORY_LIMIT = 20
+
+
+def ewma(durations: Iterable[float], alpha: float = EWMA_ALPHA) -> Optional[float]:
+    """按时间先后顺序计算指数加权移动平均"""
+    average = None
+    for duration in durations:
+        average = duration if average is None else alpha * duration + (1 - alpha) * average
+    return average
+
+
+def _recent_durations(partition: str, filters: Dict, limit: int) -> Dict[object, List[float]]:
+    """按分组取最近 limit 次已结束执行的耗时（秒），按完成时间从早到晚排列"""
+    rows = Execution.objects.filter(
+        execution_type='script',
+        status__in=['completed', 'failed'],
+        started_at__isnull=False,
+        completed_at__isnull=False,
+        **filters
+    ).annotate(
+        row_number=Window(RowNumber(), partition_by=[F(partition)], order_by=F('completed_at').desc())
+    ).filter(row_number__lte=limit).values_list(partition, 'started_at', 'completed_at')
+
+    history: Dict[object, List[Tuple[object, float]]] = {}
+    for key, started_at, completed_at in rows:
+        history.setdefault(key, []).append((completed_at, (completed_at - started_at).total_seconds()))
+    return {
+        key: [max(duration, 0.0) for _, duration in sorted(items, key=lambda item: item[0])]
+        for key, items in history.items()
+    }
+
+
+def estimate_durations(scripts: Sequence) -> Dict[int, float]:
+    """
+    预估脚本耗时
+
+    Args:
+        scripts: Script 对象列表（使用 id 和 framework）
+
+    Returns:
+        {script_id: 预估耗时（秒）}
+    """
+    default = float(getattr(settings, 'EXPECTED_DURATION_DEFAULT', 60))
+    script_ids = {script.id for script in scripts}
+    by_script = {
+        script_id: ewma(durations)
+        for script_id, durations in _recent_durations('script_id', {'script_id__in': script_ids}, HISTORY_LIMIT).items()
+    }
+
+    missing_frameworks = {script.framework for script in scripts if script.id not in by_script}
+    by_framework = {}
+    if missing_frameworks:
+        by_framework = {
+            framework: ewma(durations)
+            for framework, durations in _recent_durations(
+                'script__framework', {'script__framework__in': missing_frameworks}, FRAMEWORK_HISTORY_LIMIT
+            ).items()
+        }
+
+    estimates = {}
+    for script in scripts:
+        estimate = by_script.get(script.id)
+        if estimate is None:
+            estimate = by_framework.get(script.framework)
+        estimates[script.id] = default if estimate is None else estimate
+    return estimates
+
+
+def failure_history(plan_id: int, script_ids: Iterable[int]) -> Tuple[List[int], Dict[int, float]]:
+    """
+    计划中脚本的失败历史
+
+    Args:
+        plan_id: 计划ID，用于查找上一次计划执行（需在创建本次父执行记录之前调用）
+        script_ids: 计划中的脚本ID
+
+    Returns:
+        (上一次计划执行中失败的脚本ID, {script_id: 最近执行的失败率})
+    """
+    script_ids = set(script_ids)
+    previous = Execution.objects.filter(
+        execution_type='plan', plan_id=plan_id
+    ).order_by('-created_at', '-id').values_list('id', flat=True).first()
+    failed_last_run = []
+    if previous is not None:
+        failed_last_run = sorted(set(Execution.objects.filter(
+            parent_id=previous, status='failed', script_id__in=script_ids
+        ).values_list('script_id', flat=True)))
+
+    rows = Execution.objects.filter(
+        execution_type='script',
+        status__in=['completed', 'failed'],
+        script_id__in=script_ids,
+    ).annotate(
+        row_number=Window(RowNumber(), partition_by=[F('script_id')], order_by=F('created_at').desc())
+    ).filter(row_number__lte=FAILURE_HISTORY_LIMIT).values_list('script_id', 'status')
+
+    outcomes: Dict[int, List[int]] = {}
+    for script_id, status in rows:
+        counts = outcomes.setdefault(script_id, [0, 0])
+        counts[0] += status == 'failed'
+        counts[1] += 1
+    failure_rates = {script_id: failed / total for script_id, (failed, total) in outcomes.items()}
+    return failed_last_run, failure_rates
+
+
+def simulate_makespan(durations: Sequence[float], slots: int) -> float:
+    """按顺序把任务分配给最早空闲的槽位，返回全部完成的时间"""
+    slots = max(int(slots), 1)
+    finish_times = [0.0] * min(slots, max(len(durations), 1))
+    for duration in durations:
+        heapq.heapreplace(finish_times, finish_times[0] + duration)
+    return max(finish_times)
+
+
+def plan_schedule(scripts: Sequence, execution_mode: str, slots: int,
+                  plan_id: Optional[int] = None, prioritize_failures: bool = False) -> Tuple[List, Dict]:
+    """
+    计算计划中脚本的调度顺序
+
+    Args:
+        scripts: 计划中的脚本（按计划顺序）
+        execution_mode: parallel/sequential，顺序执行时不按耗时调整顺序
+        slots: 可用的并发槽位数（在线执行机的并发数之和）
+        plan_id: 计划ID，失败优先时用于查找上一次计划执行
+        prioritize_failures: 失败优先，顺序执行和并行执行都会调整顺序，
+                             失败历史相同的脚本保持原有顺序（并行时为最长预期优先）
+
+    Returns:
+        (按调度顺序排列的脚本, 调度信息)
+    """
+    expected = estimate_durations(scripts)
+    plan_order = [expected[script.id] for script in scripts]
+
+    if execution_mode == 'sequential':
+        ordered = list(scripts)
+        strategy = 'plan_order'
+    else:
+        # 稳定排序，预估耗时相同时保持计划顺序
+        ordered = sorted(scripts, key=lambda script: -expected[script.id])
+        strategy = 'longest_expected_first'
+
+    failed_last_run, failure_rates = [], {}
+    if prioritize_failures:
+        failed_last_run, failure_rates = failure_history(plan_id, expected)
+        failed = set(failed_last_run)
+        ordered.sort(key=lambda script: (script.id not in failed, -failure_rates.get(script.id, 0.0)))
+        strategy = 'failures_first'
+
+    if execution_mode == 'sequential':
+        makespan = sum(plan_order)
+        baseline = makespan
+    else:
+        makespan = simulate_makespan([expected[script.id] for script in ordered], slots)
+        baseline = simulate_makespan(plan_order, slots)
+
+    schedule = {
+        'strategy': strategy,
+        'slots': max(int(slots), 1),
+        'expected_total': round(sum(plan_order), 1),
+        'predicted_makespan': round(makespan, 1),
+        'plan_order_makespan': round(baseline, 1),
+        'expected_durations': {str(script_id): round(duration, 1) for script_id, duration in expected.items()},
+    }
+    if prioritize_failures:
+        schedule['failed_last_run'] = failed_last_run
+        schedule['failure_rates'] = {
+            str(script_id): round(rate, 3) for script_id, rate in failure_rates.items()
+        }
+    return ordered, schedule
@@ -0,0 +1,143 @@
+"""
+Query Cache Service - 热点读接口的共享缓存
+
+- 缓存键带命名空间版本号，模型保存或删除时由信号更新版本号，旧缓存自然失效，无需按模式删除键
+- cached_view 缓存 DRF 视图 GET 请求的响应数据（按用户和完整 URL 区分）
+- cached_value 缓存任意可序列化的查询结果
+- invalidate_on_change 把模型的保存、删除信号连接到命名空间
+"""
+import functools
+import hashlib
+import time
+from typing import Callable, Iterable, Optional, Sequence
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from rest_framework import status
+from rest_framework.response import Response
+
+# 缓存的默认过期时间（秒），绕过信号的批量更新（QuerySet.update）最多在该时间后生效
+DEFAULT_TIMEOUT = 300
+
+_VERSION_KEY = 'query_cache:version:{namespace}'
+
+
+def _versions(namespaces: Sequence[str]) -> str:
+    """命名空间当前版本号的组合"""
+    keys = [_VERSION_KEY.format(namespace=namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            # 缓存被清空后重新生成版本号，不会与之前的缓存冲突
+            cache.add(key, f'{time.time_ns():x}', None)
+            found[key] = cache.get(key)
+        versions.append(str(found[key]))
+    return '.'.join(versions)
+
+
+def invalidate(*namespaces: str):
+    """使命名空间下的所有缓存失效"""
+    version = f'{time.time_ns():x}'
+    cache.set_many({_VERSION_KEY.format(namespace=namespace): version for namespace in namespaces}, None)
+
+
+def cached_value(key: str, namespaces: Sequence[str], producer: Callable[[], object],
+                 timeout: int = DEFAULT_TIMEOUT):
+    """
+    读取缓存的值，未命中时调用 producer 生成并写入缓存
+
+    参数:
+        key: 缓存键（不含版本号）
+        namespaces: 依赖的命名空间，任一命名空间失效后重新生成
+        producer: 生成值的函数，返回值必须可以 pickle
+    """
+    versioned_key = f'query_cache:value:{key}:{_versions(namespaces)}'
+    value = cache.get(versioned_key)
+    if value is None:
+        value = producer()
+        cache.set(versioned_key, value, timeout)
+    return value
+
+
+def cached_view(*namespaces: str, timeout: int = DEFAULT_TIMEOUT, per_user: bool = True):
+    """
+    缓存视图方法的 GET 响应数据
+
+    用于 ViewSet 的 list/retrieve/action 方法，只缓存 200 响应；
+    per_user 为 True 时按用户和角色区分缓存（查询结果依赖用户权限时必须开启）
+
+    示例:
+        @cached_view('projects')
+        def list(self, request, *args, **kwargs):
+            return super().list(request, *args, **kwargs)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return method(self, request, *args, **kwargs)
+
+            user = getattr(request, 'user', None)
+            user_part = f'{user.pk}:{getattr(user, "role", "")}' if per_user and user and user.is_authenticated else '-'
+            # 分页链接包含主机名，完整 URL 一起参与计算
+            digest = hashlib.sha1(
+                f'{request.build_absolute_uri()}|{sorted(kwargs.items())}'.encode('utf-8')
+            ).hexdigest()
+            key = (
+                f'query_cache:view:{type(self).__name__}:{method.__name__}:'
+                f'{user_part}:{digest}:{_versions(namespaces)}'
+            )
+
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = method(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_on_change(model, *namespaces: str, fields: Optional[Iterable[str]] = None):
+    """
+    模型保存或删除时使命名空间失效
+
+    参数:
+        fields: 只在这些字段变化（或新建、删除）时失效，用于忽略心跳等高频保存；
+                None 表示任何保存都失效
+    """
+    fields = tuple(fields) if fields is not None else None
+    uid = f'query_cache:{model._meta.label}:{",".join(namespaces)}'
+
+    def on_delete(sender, instance, **kwargs):
+        invalidate(*namespaces)
+
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'{uid}:delete')
+
+    if fields is None:
+        def on_save(sender, instance, **kwargs):
+            invalidate(*namespaces)
+
+        post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'{uid}:save')
+        return
+
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    snapshot_attr = f'_query_cache_{"_".join(namespaces)}'
+
+    def snapshot(instance):
+        return tuple(instance.__dict__.get(attname) for attname in attnames)
+
+    def on_init(sender, instance, **kwargs):
+        setattr(instance, snapshot_attr, snapshot(instance))
+
+    def on_save_fields(sender, instance, created, **kwargs):
+        current = snapshot(instance)
+        if created or current != getattr(instance, snapshot_attr, None):
+            invalidate(*namespaces)
+        setattr(instance, snapshot_attr, current)
+
+    post_init.connect(on_init, sender=model, weak=False, dispatch_uid=f'{uid}:init')
+    post_save.connect(on_save_fields, sender=model, weak=False, dispatch_uid=f'{uid}:save')
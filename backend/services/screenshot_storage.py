@@ -0,0 +1,177 @@
+"""
+Screenshot Storage Service - 截图存储服务
+
+按内容哈希存储截图：
+- 原图: SCREENSHOTS_ROOT/{sha[:2]}/{sha}.webp（不支持 WebP 时回退为压缩 PNG）
+- 缩略图: SCREENSHOTS_ROOT/thumbs/{sha[:2]}/{sha}.webp，由后台线程生成
+
+相同内容的截图只保存一份，文件名不会因同一秒内多次上报而冲突。
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotStorageError(Exception):
+    """截图存储错误"""
+    pass
+
+
+class ScreenshotStorage:
+    """
+    内容寻址截图存储
+
+    负责图片校验、格式转换、去重落盘以及缩略图的异步生成
+    """
+
+    # 缩略图最大尺寸（宽, 高）
+    THUMBNAIL_SIZE = (320, 240)
+    # WebP 编码质量
+    WEBP_QUALITY = 80
+    THUMBNAIL_QUALITY = 60
+    # 后台缩略图线程数
+    THUMBNAIL_WORKERS = 2
+
+    def __init__(self, root: Optional[str] = None, url_prefix: Optional[str] = None):
+        self.root = str(root or settings.SCREENSHOTS_ROOT)
+        self.url_prefix = url_prefix or f"{settings.MEDIA_URL.rstrip('/')}/screenshots"
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.THUMBNAIL_WORKERS,
+            thread_name_prefix='screenshot-thumb'
+        )
+        self._use_webp = self._check_webp()
+
+    @staticmethod
+    def _check_webp() -> bool:
+        """检查 Pillow 是否支持 WebP 编码"""
+        try:
+            from PIL import features
+            return bool(features.check('webp'))
+        except Exception:
+            return False
+
+    @property
+    def extension(self) -> str:
+        return 'webp' if self._use_webp else 'png'
+
+    def _relative_path(self, digest: str, thumbnail: bool = False) -> str:
+        parts = ['thumbs'] if thumbnail else []
+        parts += [digest[:2], f"{digest}.{self.extension}"]
+        return '/'.join(parts)
+
+    def _absolute_path(self, relative_path: str) -> str:
+        return os.path.join(self.root, *relative_path.split('/'))
+
+    def _url(self, relative_path: str) -> str:
+        return f"{self.url_prefix}/{relative_path}"
+
+    def _encode(self, image, quality: int) -> bytes:
+        """将 PIL 图片编码为 WebP 或压缩 PNG"""
+        buffer = io.BytesIO()
+        if self._use_webp:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.save(buffer, format='WEBP', quality=quality, method=4)
+        else:
+            image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """先写临时文件再重命名，避免并发上报同一截图时读到半截文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, fileobj, on_thumbnail=None) -> Dict[str, Any]:
+        """
+        保存截图
+
+        Args:
+            fileobj: 可读的二进制文件对象（如 UploadedFile）或 bytes
+            on_thumbnail: 缩略图生成完成后的回调，参数为缩略图 URL
+
+        Returns:
+            包含 sha256、path、url、thumbnail_url、size 的字典
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        if isinstance(fileobj, (bytes, bytearray)):
+            fileobj = io.BytesIO(fileobj)
+
+        # 原始内容的哈希用于去重，解码前计算可避免重复编码
+        hasher = hashlib.sha256()
+        raw = io.BytesIO()
+        for chunk in iter(lambda: fileobj.read(64 * 1024), b''):
+            hasher.update(chunk)
+            raw.write(chunk)
+        digest = hasher.hexdigest()
+
+        relative_path = self._relative_path(digest)
+        thumb_relative_path = self._relative_path(digest, thumbnail=True)
+        absolute_path = self._absolute_path(relative_path)
+
+        if not os.path.exists(absolute_path):
+            raw.seek(0)
+            try:
+                image = Image.open(raw)
+                image.load()
+            except (UnidentifiedImageError, OSError) as e:
+                raise ScreenshotStorageError(f'无法识别的图片数据: {e}')
+            self._write_atomic(absolute_path, self._encode(image, self.WEBP_QUALITY))
+            logger.info(f"截图已保存: {relative_path} ({raw.tell()} -> {os.path.getsize(absolute_path)} 字节)")
+        else:
+            logger.debug(f"截图已存在，跳过写入: {relative_path}")
+
+        thumbnail_url = self._url(thumb_relative_path)
+        self._executor.submit(self._generate_thumbnail, absolute_path, thumb_relative_path, on_thumbnail)
+
+        return {
+            'sha256': digest,
+            'path': absolute_path,
+            'url': self._url(relative_path),
+            'thumbnail_url': thumbnail_url,
+            'size': os.path.getsize(absolute_path),
+        }
+
+    def _generate_thumbnail(self, source_path: str, thumb_relative_path: str, callback=None):
+        """后台生成缩略图"""
+        from django.db import close_old_connections
+        from PIL import Image
+
+        thumb_path = self._absolute_path(thumb_relative_path)
+        try:
+            if not os.path.exists(thumb_path):
+                with Image.open(source_path) as image:
+                    image.thumbnail(self.THUMBNAIL_SIZE)
+                    self._write_atomic(thumb_path, self._encode(image, self.THUMBNAIL_QUALITY))
+            if callback:
+                callback(self._url(thumb_relative_path))
+        except Exception as e:
+            logger.error(f"生成缩略图失败: {source_path}, {e}")
+        finally:
+            # 后台线程使用的数据库连接需要手动释放
+            close_old_connections()
+
+
+# 全局单例
+_screenshot_storage: Optional[ScreenshotStorage] = None
+
+
+def get_screenshot_storage() -> ScreenshotStorage:
+    """获取截图存储单例"""
+    global _screenshot_storage
+    if _screenshot_storage is None:
+        _screenshot_storage = ScreenshotStorage()
+    return _screenshot_storage
@@ -9,10 +9,14 @@ from datetime import timedelta
 from django.db import transaction
 from django.utils import timezone
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Least
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from apps.executors.models import Executor, TaskQueue
 from apps.executions.models import Execution
+from services.data_sharding import finish_cancelled_shards
+from services.variable_cache import VariableSnapshots
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,9 @@ class TaskDistributor:
     - 分配任务并通过 WebSocket 下发
     """
 
+    def __init__(self):
+        self.variable_snapshots = VariableSnapshots()
+
     def distribute_tasks(self, limit: int = 50) -> int:
         """
         分发待分配的任务
@@ -40,15 +47,23 @@ class TaskDistributor:
         distributed_count = 0
 
         # 获取待分配的任务（按优先级排序）
+        # 并行计划的任务按预估耗时从长到短创建，按创建顺序分配给负载最低的执行机即为最长预期优先调度
         pending_tasks = TaskQueue.objects.filter(
             status='pending'
         ).order_by(
             '-priority',  # 优先级高的先分配
-            'created_at'  # 创建时间早的先分配
+            'created_at',  # 创建时间早的先分配
+            'id'  # 同一时刻创建的任务按创建顺序
         )[:limit]
 
         logger.info(f"开始分发任务，共 {len(pending_tasks)} 个待分配任务")
 
+        # 本批任务涉及的项目和脚本变量一次性加载
+        self.variable_snapshots.prefetch(
+            ((task.script_data or {}).get('project_id'), (task.script_data or {}).get('script_id'))
+            for task in pending_tasks
+        )
+
         for task in pending_tasks:
             try:
                 logger.info(f"正在处理任务 {task.id}, execution_id={task.execution_id}, status={task.status}")
@@ -67,6 +82,7 @@ class TaskDistributor:
                             task.status = 'cancelled'
                             task.completed_at = timezone.now()
                             task.save()
+                            self._finish_cancelled_shard(task)
                             continue
                     except Execution.DoesNotExist:
                         logger.warning(f"父任务 {parent_execution_id} 不存在，跳过任务 {task.id}")
@@ -140,12 +156,12 @@ class TaskDistributor:
         1. 在线 + 启用
         2. 优先匹配项目专用执行机
         3. 其次使用全局可用执行机
-        4. 考虑当前任务数，选择负载最低的（作为参考，不强制限制）
+        4. 只选择还有空闲并发槽位的执行机，剩余槽位多的优先
 
-        注意：并发控制由执行机端负责
-        - 执行机检查 current_tasks < max_concurrent
-        - 达到限制时拒绝任务（NACK + requeue=True）
-        - 后端重新分发被拒绝的任务
+        并发控制:
+        - 空闲槽位 = 执行机上报的有效并发数（不超过 max_concurrent） - 已分配和运行中的任务数
+        - 没有空闲槽位的执行机不分配任务，任务保持 pending 等待下次分发
+        - 执行机端仍会在资源不足时拒绝任务（NACK + requeue=True），由后端重新分发
 
         Args:
             task: 待分配的任务
@@ -158,8 +174,7 @@ class TaskDistributor:
         if task.execution and task.execution.script:
             project = task.execution.script.project
 
-        # 基础查询条件: 在线 + 启用
-        # 不再检查并发上限，由执行机端自己控制
+        # 基础查询条件: 在线 + 启用（并发槽位在 _order_by_load 中检查）
         base_queryset = Executor.objects.filter(
             is_enabled=True,
             status__in=['idle', 'online', 'busy'],  # 包含所有在线状态
@@ -168,35 +183,60 @@ class TaskDistributor:
 
         # 优先查找项目专用执行机
         if project:
-            # 作为参考，按当前任务数排序（不强制限制）
-            project_executors = base_queryset.filter(
+            project_executors = self._order_by_load(base_queryset.filter(
                 scope='project',
                 bound_projects=project
-            ).annotate(
-                running_count=models.Count(
-                    'tasks',
-                    filter=models.Q(tasks__status='running')
-                )
-            ).order_by('running_count')  # 优先选择负载低的
+            ), task)
 
             if project_executors.exists():
                 return project_executors.first()
 
         # 查找全局可用执行机
-        global_executors = base_queryset.filter(
+        global_executors = self._order_by_load(base_queryset.filter(
             scope='global'
-        ).annotate(
-            running_count=models.Count(
-                'tasks',
-                filter=models.Q(tasks__status='running')
-            )
-        ).order_by('running_count')  # 优先选择负载低的
+        ), task)
 
         if global_executors.exists():
             return global_executors.first()
 
         return None
 
+    def _order_by_load(self, queryset, task: TaskQueue):
+        """
+        过滤掉没有空闲并发槽位的执行机，并按负载排序
+
+        分片任务优先选择尚未承担同一执行其他分片的执行机，使分片分散到不同执行机
+        """
+        queryset = queryset.annotate(
+            # 已分配但尚未开始的任务同样占用槽位，避免一次分发把任务都派给同一台执行机
+            running_count=models.Count(
+                'tasks',
+                filter=models.Q(tasks__status__in=['assigned', 'running']),
+                distinct=True
+            )
+        ).annotate(
+            # 执行机上报的有效并发数（不超过 max_concurrent）减去已占用的槽位
+            free_slots=Least(
+                Coalesce('effective_capacity', 'max_concurrent'),
+                models.F('max_concurrent')
+            ) - models.F('running_count')
+        )
+        # 优先选择剩余并发多、负载低的
+        ordering = ['-free_slots', 'running_count']
+        if (task.script_data or {}).get('shard'):
+            queryset = queryset.annotate(
+                sibling_count=models.Count(
+                    'tasks',
+                    filter=models.Q(
+                        tasks__execution_id=task.execution_id,
+                        tasks__status__in=['assigned', 'running']
+                    ),
+                    distinct=True
+                )
+            )
+            ordering.insert(0, 'sibling_count')
+        return queryset.filter(free_slots__gt=0).order_by(*ordering)
+
     def _assign_task(self, task: TaskQueue, executor: Executor) -> None:
         """
         分配任务给执行机
@@ -224,6 +264,7 @@ class TaskDistributor:
                         task.status = 'cancelled'
                         task.completed_at = timezone.now()
                         task.save()
+                        self._finish_cancelled_shard(task)
                         return
                 except Execution.DoesNotExist:
                     logger.warning(f"父任务 {parent_execution_id} 不存在，不分配任务 {task.id}")
@@ -235,6 +276,7 @@ class TaskDistributor:
                 task.status = 'cancelled'
                 task.completed_at = timezone.now()
                 task.save()
+                self._finish_cancelled_shard(task)
                 return
 
             # 更新任务状态
@@ -267,8 +309,9 @@ class TaskDistributor:
             'script_data': task.script_data,
             'browser_type': task.script_data.get('browser_type', 'chrome'),
             'timeout': task.script_data.get('timeout', 300),
-            'variables': self._get_execution_variables(task.execution)
         }
+        # 变量哈希相同表示变量集合未变化，执行机可以复用本地缓存
+        task_data['variables'], task_data['variables_hash'] = self._get_task_variables(task)
 
         # 通过消息队列发送到执行机
         try:
@@ -300,39 +343,26 @@ class TaskDistributor:
             executor.current_tasks = max(0, executor.current_tasks - 1)
             executor.save()
 
-    def _get_execution_variables(self, execution: Execution) -> dict:
+    def _get_task_variables(self, task: TaskQueue) -> tuple:
         """
-        获取执行所需的变量
+        获取任务所需的变量（脚本级变量覆盖项目级变量）
 
         Args:
-            execution: 执行对象
+            task: 任务对象
 
         Returns:
-            变量字典
+            (变量字典, 变量哈希)
         """
-        variables = {}
+        script_data = task.script_data or {}
+        project_id = script_data.get('project_id')
+        script_id = script_data.get('script_id')
 
-        # 获取项目级变量
-        if execution.script and execution.script.project:
-            from apps.executors.models import Variable
-            project_vars = Variable.objects.filter(
-                scope='project',
-                project=execution.script.project
-            )
-            for var in project_vars:
-                variables[var.name] = var.value
-
-        # 获取脚本级变量（会覆盖项目级变量）
-        if execution.script:
-            from apps.executors.models import Variable
-            script_vars = Variable.objects.filter(
-                scope='script',
-                script=execution.script
-            )
-            for var in script_vars:
-                variables[var.name] = var.value
+        # 旧任务数据中没有项目和脚本ID时从执行记录获取
+        if not script_id and task.execution and task.execution.script:
+            script_id = task.execution.script_id
+            project_id = task.execution.script.project_id
 
-        return variables
+        return self.variable_snapshots.get(project_id, script_id)
 
     def redistribute_task(self, task_id: int) -> bool:
         """
@@ -379,6 +409,12 @@ class TaskDistributor:
             logger.error(f"重新分配任务 {task_id} 失败: {str(e)}")
             return False
 
+    @staticmethod
+    def _finish_cancelled_shard(task):
+        """分片任务被取消时记录该分片，其他分片都已结束时合并结果"""
+        if (task.script_data or {}).get('shard') and task.execution_id:
+            finish_cancelled_shards([task.execution_id])
+
     def cancel_pending_tasks(self, execution_id: int) -> int:
         """
         取消某个执行的所有待分配任务
@@ -422,6 +458,10 @@ class TaskDistributor:
         except Execution.DoesNotExist:
             logger.warning(f"执行记录 {execution_id} 不存在")
 
+        if count:
+            finish_cancelled_shards(
+                Execution.objects.filter(Q(id=execution_id) | Q(parent_id=execution_id)).values_list('id', flat=True)
+            )
         logger.info(f"已取消执行 {execution_id} 的 {count} 个待分配任务")
         return count
 
@@ -472,6 +512,10 @@ class TaskDistributor:
 
                 logger.info(f"已取消计划执行 {execution_id} 的 {count} 个子任务（包括 running 状态）")
 
+                # 分片子任务被取消后不会再上报结果，记录已取消的分片并合并
+                if count:
+                    finish_cancelled_shards(child_ids)
+
         except Execution.DoesNotExist:
             logger.warning(f"执行记录 {execution_id} 不存在")
 
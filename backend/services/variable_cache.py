@@ -0,0 +1,111 @@
+"""
+Variable Cache Service - 任务下发时的变量快照缓存
+
+- 项目级、脚本级变量分别缓存，缓存键带版本号，Variable 保存或删除时更新对应版本号，旧快照自然失效
+- 同一项目下的大量脚本共用一份项目级变量，一个计划的变量只需查询一次
+- 合并后的变量附带内容哈希，执行机可据此判断变量集合是否变化
+"""
+import hashlib
+import json
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.core.cache import cache
+
+# 快照的过期时间（秒），绕过信号的批量更新（QuerySet.update）最多在该时间后生效
+SNAPSHOT_TIMEOUT = 600
+
+_VERSION_KEY = 'variables:version:{scope}:{object_id}'
+_SNAPSHOT_KEY = 'variables:{scope}:{object_id}:{version}'
+
+
+def _versions(scope: str, object_ids: Iterable[int]) -> Dict[int, str]:
+    keys = {object_id: _VERSION_KEY.format(scope=scope, object_id=object_id) for object_id in object_ids}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for object_id, key in keys.items():
+        if key not in found:
+            # 缓存被清空后重新生成版本号，不会与之前的快照冲突
+            cache.add(key, f'{time.time_ns():x}', None)
+            found[key] = cache.get(key)
+        versions[object_id] = found[key]
+    return versions
+
+
+def bump_version(scope: str, object_id: Optional[int]):
+    """项目或脚本的变量发生变化"""
+    if object_id:
+        cache.set(_VERSION_KEY.format(scope=scope, object_id=object_id), f'{time.time_ns():x}', None)
+
+
+def _load(scope: str, object_ids: Iterable[int]) -> Dict[int, Dict[str, object]]:
+    """批量查询多个项目或脚本的变量"""
+    from apps.executors.models import Variable
+
+    field = 'project_id' if scope == 'project' else 'script_id'
+    result = {object_id: {} for object_id in object_ids}
+    rows = Variable.objects.filter(
+        scope=scope, **{f'{field}__in': list(result)}
+    ).values_list(field, 'name', 'value')
+    for object_id, name, value in rows:
+        result[object_id][name] = value
+    return result
+
+
+def _get_scoped(scope: str, object_ids: Iterable[int]) -> Dict[int, Dict[str, object]]:
+    versions = _versions(scope, {object_id for object_id in object_ids if object_id})
+    keys = {
+        object_id: _SNAPSHOT_KEY.format(scope=scope, object_id=object_id, version=version)
+        for object_id, version in versions.items()
+    }
+    cached = cache.get_many(list(keys.values())) if keys else {}
+    result = {object_id: cached[key] for object_id, key in keys.items() if key in cached}
+
+    missing = [object_id for object_id in keys if object_id not in result]
+    if missing:
+        loaded = _load(scope, missing)
+        cache.set_many({keys[object_id]: loaded[object_id] for object_id in missing}, SNAPSHOT_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def variables_hash(variables: Dict[str, object]) -> str:
+    """变量集合的内容哈希"""
+    payload = json.dumps(variables, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class VariableSnapshots:
+    """
+    一次分发内的变量快照
+
+    prefetch() 批量加载所有任务涉及的项目和脚本的变量（未缓存的每种作用域一次查询），
+    get() 返回合并后的变量（脚本级覆盖项目级）和内容哈希
+    """
+
+    def __init__(self):
+        self._project: Dict[int, Dict[str, object]] = {}
+        self._script: Dict[int, Dict[str, object]] = {}
+        self._merged: Dict[Tuple[Optional[int], Optional[int]], Tuple[Dict[str, object], str]] = {}
+
+    def prefetch(self, pairs: Iterable[Tuple[Optional[int], Optional[int]]]):
+        """
+        Args:
+            pairs: (project_id, script_id) 列表
+        """
+        pairs = list(pairs)
+        project_ids = {project_id for project_id, _ in pairs if project_id and project_id not in self._project}
+        script_ids = {script_id for _, script_id in pairs if script_id and script_id not in self._script}
+        if project_ids:
+            self._project.update(_get_scoped('project', project_ids))
+        if script_ids:
+            self._script.update(_get_scoped('script', script_ids))
+
+    def get(self, project_id: Optional[int], script_id: Optional[int]) -> Tuple[Dict[str, object], str]:
+        key = (project_id, script_id)
+        if key not in self._merged:
+            self.prefetch([key])
+            variables = {**self._project.get(project_id, {}), **self._script.get(script_id, {})}
+            self._merged[key] = (variables, variables_hash(variables))
+        variables, digest = self._merged[key]
+        return dict(variables), digest
@@ -7,6 +7,9 @@ echo "Starting Django backend..."
 echo "Running migrations..."
 python manage.py migrate --noinput
 
+# 清理旧版本遗留的会话文件
+python manage.py cleanup_legacy_sessions
+
 # 收集静态文件
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
@@ -0,0 +1,142 @@
+"""
+并发准入控制 - 根据机器资源动态决定可同时执行的任务数
+- CPU：按每个任务实测的 CPU 占用估算剩余可容纳的任务数
+- 内存：按每个任务实测的常驻内存（驱动 + 浏览器）估算可容纳的任务数
+- 结果不超过平台上配置的 max_concurrent，并随心跳上报给平台调度
+"""
+
+import threading
+import time
+from typing import Dict, Any, Optional
+from loguru import logger
+
+from utils.system import get_resource_usage, get_children_rss_mb
+
+
+class AdmissionController:
+    """
+    并发准入控制器
+
+    effective_capacity() 返回的是总并发数（含正在执行的任务），
+    调用方在 running_tasks >= effective_capacity 时拒绝新任务。
+    """
+
+    # 资源采样结果的有效期（秒），同一批到达的任务共用一次采样
+    SAMPLE_TTL = 2.0
+    # 尚未实测时每个任务的内存估算（MB），约为一个 Chrome 实例加驱动
+    DEFAULT_TASK_RSS_MB = 600.0
+    # 实测值的指数加权系数
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, max_concurrent: int, cpu_limit: float = 85.0,
+                 memory_reserve_mb: int = 1024, task_rss_mb: int = 0):
+        """
+        Args:
+            max_concurrent: 并发上限（平台上由管理员配置）
+            cpu_limit: CPU 使用率超过该值（%）时不再接收新任务
+            memory_reserve_mb: 为系统和其他程序保留的内存（MB）
+            task_rss_mb: 每个任务的内存估算（MB），0 表示按实测值自动估算
+        """
+        self.max_concurrent = max(max_concurrent, 1)
+        self.cpu_limit = cpu_limit
+        self.memory_reserve_mb = memory_reserve_mb
+        self.task_rss_mb = task_rss_mb
+
+        self._lock = threading.Lock()
+        self._task_rss_estimate: Optional[float] = None
+        self._task_cpu_estimate: Optional[float] = None
+        self._sampled_at = 0.0
+        self._capacity = self.max_concurrent
+        self._last_sample: Dict[str, Any] = {}
+
+    def set_max_concurrent(self, max_concurrent: int):
+        """更新并发上限，下次计算时生效"""
+        with self._lock:
+            self.max_concurrent = max(max_concurrent, 1)
+            self._sampled_at = 0.0
+
+    def effective_capacity(self, running_tasks: int) -> int:
+        """
+        计算当前的有效并发数
+
+        Args:
+            running_tasks: 正在执行（含已接收未启动）的任务数
+
+        Returns:
+            有效并发数，至少为 1，不超过 max_concurrent
+        """
+        with self._lock:
+            if time.time() - self._sampled_at < self.SAMPLE_TTL:
+                return self._capacity
+
+            try:
+                self._capacity = self._compute(running_tasks)
+            except Exception as e:
+                # 采样失败时退回静态上限，不影响接收任务
+                logger.warning(f"资源采样失败，使用并发上限: {e}")
+                self._capacity = self.max_concurrent
+            self._sampled_at = time.time()
+            return self._capacity
+
+    def _compute(self, running_tasks: int) -> int:
+        usage = get_resource_usage()
+        children_rss = get_children_rss_mb()
+        cpu_count = usage.get("cpu_count") or 1
+
+        # 按正在执行的任务实测单任务资源占用
+        if running_tasks > 0:
+            if children_rss > 0:
+                self._task_rss_estimate = self._ewma(self._task_rss_estimate, children_rss / running_tasks)
+            if usage["cpu"] > 0:
+                self._task_cpu_estimate = self._ewma(self._task_cpu_estimate, usage["cpu"] / running_tasks)
+
+        task_rss = self.task_rss_mb or self._task_rss_estimate or self.DEFAULT_TASK_RSS_MB
+        # 未实测时按每个任务占用一个 CPU 核心估算
+        task_cpu = self._task_cpu_estimate or 100.0 / cpu_count
+
+        # 内存：已被本机任务占用的内存也计入预算，得到的是总并发数
+        memory_budget = usage["memory_available_mb"] + children_rss - self.memory_reserve_mb
+        memory_slots = int(max(memory_budget, 0) // max(task_rss, 1))
+
+        # CPU：在当前任务数基础上按剩余 CPU 余量增加
+        cpu_headroom = self.cpu_limit - usage["cpu"]
+        cpu_slots = running_tasks + (int(cpu_headroom // max(task_cpu, 0.1)) if cpu_headroom > 0 else 0)
+
+        limits = {
+            "max_concurrent": self.max_concurrent,
+            "memory": memory_slots,
+            "cpu": cpu_slots,
+        }
+        limited_by = min(limits, key=limits.get)
+        # 没有任务时始终允许执行一个，避免小内存机器完全无法接收任务
+        capacity = max(limits[limited_by], 1)
+
+        self._last_sample = {
+            "cpu": usage["cpu"],
+            "cpu_count": cpu_count,
+            "memory_available_mb": usage["memory_available_mb"],
+            "task_rss_mb": round(task_rss, 1),
+            "task_cpu_percent": round(task_cpu, 2),
+            "memory_slots": memory_slots,
+            "cpu_slots": cpu_slots,
+            "limited_by": limited_by,
+        }
+        if capacity != self._capacity:
+            logger.info(
+                f"有效并发数: {self._capacity} -> {capacity} (受 {limited_by} 限制, "
+                f"CPU={usage['cpu']}%, 可用内存={usage['memory_available_mb']}MB, 单任务内存={task_rss:.0f}MB)"
+            )
+        return capacity
+
+    def _ewma(self, current: Optional[float], observed: float) -> float:
+        if current is None:
+            return observed
+        return current + self.EWMA_ALPHA * (observed - current)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取最近一次计算的准入统计"""
+        with self._lock:
+            stats = dict(self._last_sample)
+            stats["effective_capacity"] = self._capacity
+            stats["max_concurrent"] = self.max_concurrent
+        return stats
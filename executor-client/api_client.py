@@ -0,0 +1,164 @@
+"""
+平台 API 客户端 - 执行机与平台之间的所有 HTTP 请求共用
+- 共享 requests.Session 和连接池，保持长连接，避免每次请求重新建立 TCP/TLS 连接
+- 连接失败、超时以及 502/503/504 时按带抖动的指数退避重试（默认只重试幂等请求）
+- 按接口统计请求数、失败数、重试数和耗时，随心跳上报
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from config import get_config_manager
+
+# 统计时把路径中的 ID 归并为同一个接口
+_ID_SEGMENT = re.compile(r'/(?:\d+|[0-9a-fA-F-]{32,36})(?=/|$)')
+
+
+class ApiClient:
+    """
+    线程安全的平台 API 客户端
+
+    path 为相对平台地址的路径（如 /api/executor/heartbeat/），平台地址每次请求时从配置读取，
+    GUI 中修改服务器地址后立即生效。请求失败时抛出 requests 的异常，与直接调用 requests 一致。
+    """
+
+    # 需要重试的 HTTP 状态码
+    RETRY_STATUSES = (502, 503, 504)
+    # 退避基数和上限（秒）
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 8.0
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 2, verify: bool = False):
+        """
+        Args:
+            pool_size: 每个主机保持的最大连接数
+            max_retries: 幂等请求（GET/HEAD 等）的默认重试次数，POST 默认不重试
+            verify: 是否校验 SSL 证书（平台常用自签名证书，默认不校验）
+        """
+        self.max_retries = max(max_retries, 0)
+        self.verify = verify
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        # 接口 -> {requests, errors, retries, total_ms, max_ms}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def base_url(self) -> str:
+        return get_config_manager().get().server_url.rstrip('/')
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def request(self, method: str, path: str, retries: Optional[int] = None,
+                timeout: float = 10, **kwargs) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: HTTP 方法
+            path: 相对平台地址的路径
+            retries: 重试次数，默认幂等请求为 max_retries，其他请求为 0
+            timeout: 单次请求超时（秒）
+            **kwargs: 传给 requests 的其他参数（json、data、files、params、headers）
+        """
+        method = method.upper()
+        if retries is None:
+            retries = self.max_retries if method in ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE') else 0
+        kwargs.setdefault('verify', self.verify)
+        url = f"{self.base_url}{path}"
+        endpoint = f"{method} {_ID_SEGMENT.sub('/{id}', path.split('?', 1)[0])}"
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, start, error=True, retry=attempt > 0)
+                if attempt >= retries:
+                    raise
+                logger.debug(f"API 请求失败，准备重试: {endpoint}, {e}")
+            else:
+                retryable = response.status_code in self.RETRY_STATUSES
+                self._record(endpoint, start, error=response.status_code >= 500, retry=attempt > 0)
+                if not retryable or attempt >= retries:
+                    return response
+                response.close()
+                logger.debug(f"API 请求返回 HTTP {response.status_code}，准备重试: {endpoint}")
+
+            # 全抖动退避，避免多个执行机在平台恢复时同时重试
+            time.sleep(random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * (2 ** attempt))))
+            attempt += 1
+
+    def _record(self, endpoint: str, start: float, error: bool, retry: bool):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {
+                    "requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0
+                }
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += int(retry)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """按接口汇总的请求统计"""
+        with self._lock:
+            snapshot = {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+        endpoints = {}
+        totals = {"requests": 0, "errors": 0, "retries": 0}
+        for endpoint, stats in snapshot.items():
+            endpoints[endpoint] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "avg_ms": round(stats["total_ms"] / stats["requests"], 1) if stats["requests"] else 0.0,
+                "max_ms": round(stats["max_ms"], 1),
+            }
+            for key in totals:
+                totals[key] += stats[key]
+        return {**totals, "endpoints": endpoints}
+
+    def close(self):
+        self.session.close()
+
+
+# 单例
+_api_client: Optional[ApiClient] = None
+_api_client_pid: Optional[int] = None
+_api_client_lock = threading.Lock()
+
+
+def get_api_client() -> ApiClient:
+    """获取平台 API 客户端单例"""
+    global _api_client, _api_client_pid
+    with _api_client_lock:
+        # 连接池不能跨进程共享，工作进程中创建自己的客户端
+        if _api_client is None or _api_client_pid != os.getpid():
+            config = get_config_manager().get()
+            _api_client = ApiClient(
+                pool_size=config.api_pool_size,
+                max_retries=config.api_max_retries
+            )
+            _api_client_pid = os.getpid()
+        return _api_client
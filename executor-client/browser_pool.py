@@ -0,0 +1,233 @@
+"""
+浏览器池 - 复用已启动的浏览器
+- 任务结束后清理浏览器状态（Cookie、存储、标签页）并放回池中
+- 只复用 Chrome/Edge：Firefox 的 WebDriver 只能删除当前页面所在域名的 Cookie，
+  其他域名（如 SSO 跳转）的 Cookie 无法清除，Firefox 每个任务都启动新的浏览器
+- 空闲超时或执行次数达到上限的浏览器会被关闭
+- 统计命中率和节省的启动时间，随心跳上报
+"""
+
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+from loguru import logger
+
+from config import get_config_manager
+from executor import ScriptExecutor
+
+
+class BrowserPool:
+    """
+    浏览器池
+
+    按浏览器类型保存空闲的 ScriptExecutor，acquire 时优先复用空闲实例，
+    release 时清理状态后放回；清理失败、浏览器已崩溃、超出容量或浏览器不支持完整清理时直接关闭。
+    """
+
+    # 可以通过 CDP 清除所有 Cookie 和存储、能够安全复用的浏览器
+    POOLED_BROWSERS = ("chrome", "edge")
+
+    def __init__(self, size: int = 2, idle_ttl: int = 300, max_uses: int = 20):
+        """
+        Args:
+            size: 每种浏览器最多保留的空闲实例数，0 表示不复用
+            idle_ttl: 空闲实例最长保留时间（秒）
+            max_uses: 单个浏览器实例最多执行的任务数
+        """
+        self.size = max(size, 0)
+        self.idle_ttl = idle_ttl
+        self.max_uses = max(max_uses, 1)
+
+        self._lock = threading.Lock()
+        # browser_type -> [(executor, 放回时间)]，后放回的在末尾
+        self._idle: Dict[str, List[Tuple[ScriptExecutor, float]]] = {}
+        self._in_use = 0
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "hits": 0,
+            "launches": 0,
+            "launch_failures": 0,
+            "launch_seconds": 0.0,
+            "discarded": 0,
+        }
+
+    def acquire(self, browser_type: str) -> Optional[ScriptExecutor]:
+        """
+        获取一个可用的浏览器
+
+        Args:
+            browser_type: 浏览器类型 (chrome/firefox/edge)
+
+        Returns:
+            已启动的 ScriptExecutor，启动失败时返回 None
+        """
+        while True:
+            with self._lock:
+                idle = self._idle.get(browser_type)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                break
+
+            executor, _ = entry
+            if executor.is_alive():
+                with self._lock:
+                    self._stats["acquired"] += 1
+                    self._stats["hits"] += 1
+                    self._in_use += 1
+                executor.uses += 1
+                logger.debug(f"复用浏览器: {browser_type} (第 {executor.uses} 次使用)")
+                return executor
+            logger.info(f"空闲浏览器已失效，关闭: {browser_type}")
+            self._discard(executor)
+
+        executor = ScriptExecutor()
+        started = executor.start(browser_type)
+        with self._lock:
+            self._stats["acquired"] += 1
+            if not started:
+                self._stats["launch_failures"] += 1
+                return None
+            self._stats["launches"] += 1
+            self._stats["launch_seconds"] += executor.launch_seconds
+            self._in_use += 1
+        executor.uses = 1
+        return executor
+
+    def release(self, executor: ScriptExecutor, reusable: bool = True):
+        """
+        归还浏览器
+
+        Args:
+            executor: acquire 获取的 ScriptExecutor
+            reusable: 是否允许复用，任务被取消或浏览器异常时传 False
+        """
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+            accept = (
+                reusable
+                and executor.browser_type in self.POOLED_BROWSERS
+                and not self._closed
+                and self.size > 0
+                and executor.uses < self.max_uses
+                and len(self._idle.get(executor.browser_type, [])) < self.size
+            )
+
+        if not accept or not executor.reset():
+            self._discard(executor)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(executor.browser_type, [])
+            # 清理期间容量可能已被其他线程占满，或者池已关闭
+            if self._closed or len(idle) >= self.size:
+                accept = False
+            else:
+                idle.append((executor, time.time()))
+        if not accept:
+            self._discard(executor)
+
+    def evict_idle(self):
+        """关闭空闲超时的浏览器"""
+        deadline = time.time() - self.idle_ttl
+        expired = []
+        with self._lock:
+            for browser_type, idle in self._idle.items():
+                keep = [(executor, since) for executor, since in idle if since >= deadline]
+                expired.extend(executor for executor, since in idle if since < deadline)
+                self._idle[browser_type] = keep
+
+        for executor in expired:
+            logger.info(f"空闲浏览器超时，关闭: {executor.browser_type}")
+            self._discard(executor)
+
+    def close(self):
+        """关闭所有空闲浏览器，之后归还的浏览器也会直接关闭"""
+        with self._lock:
+            self._closed = True
+            executors = [executor for idle in self._idle.values() for executor, _ in idle]
+            self._idle.clear()
+
+        for executor in executors:
+            self._discard(executor)
+        if executors:
+            logger.info(f"浏览器池已关闭，共关闭 {len(executors)} 个空闲浏览器")
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _discard(self, executor: ScriptExecutor):
+        with self._lock:
+            self._stats["discarded"] += 1
+        try:
+            executor.stop()
+        except Exception as e:
+            logger.warning(f"关闭浏览器失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取浏览器池统计信息
+
+        Returns:
+            命中率、启动次数、平均启动耗时以及按平均启动耗时估算的节省时间
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            idle = sum(len(items) for items in self._idle.values())
+            in_use = self._in_use
+
+        launches = stats["launches"]
+        avg_launch = stats["launch_seconds"] / launches if launches else 0.0
+        return {
+            "size": self.size,
+            "idle": idle,
+            "in_use": in_use,
+            "acquired": stats["acquired"],
+            "hits": stats["hits"],
+            "hit_rate": round(stats["hits"] / stats["acquired"], 4) if stats["acquired"] else 0.0,
+            "launches": launches,
+            "launch_failures": stats["launch_failures"],
+            "discarded": stats["discarded"],
+            "avg_launch_seconds": round(avg_launch, 3),
+            "saved_seconds": round(stats["hits"] * avg_launch, 1),
+        }
+
+
+def merge_pool_stats(stats_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个浏览器池（如各工作进程）的统计信息"""
+    merged = {
+        "size": 0, "idle": 0, "in_use": 0, "acquired": 0, "hits": 0,
+        "launches": 0, "launch_failures": 0, "discarded": 0, "saved_seconds": 0.0,
+    }
+    launch_seconds = 0.0
+    for stats in stats_list:
+        for key in merged:
+            merged[key] += stats.get(key, 0)
+        launch_seconds += stats.get("avg_launch_seconds", 0) * stats.get("launches", 0)
+
+    merged["hit_rate"] = round(merged["hits"] / merged["acquired"], 4) if merged["acquired"] else 0.0
+    merged["avg_launch_seconds"] = round(launch_seconds / merged["launches"], 3) if merged["launches"] else 0.0
+    merged["saved_seconds"] = round(merged["saved_seconds"], 1)
+    return merged
+
+
+# 单例
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取浏览器池单例"""
+    global _browser_pool
+    with _browser_pool_lock:
+        # 断开连接时浏览器池会被关闭，重新连接后创建新的浏览器池
+        if _browser_pool is None or _browser_pool.closed:
+            config = get_config_manager().get()
+            _browser_pool = BrowserPool(
+                size=config.browser_pool_size,
+                idle_ttl=config.browser_pool_idle_ttl,
+                max_uses=config.browser_pool_max_uses
+            )
+        return _browser_pool
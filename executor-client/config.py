@@ -26,7 +26,14 @@ class ExecutorConfig:
     owner_password: str = ""  # 所有者密码
 
     # 执行配置
-    max_concurrent: int = 3  # 最大并发任务数
+    max_concurrent: int = 3  # 最大并发任务数（上限）
+    execution_backend: str = "thread"  # 任务执行模式: thread（线程）/process（独立工作进程）
+    task_timeout: int = 1800  # 进程模式下单个任务的最长执行时间（秒），0 表示不限制
+
+    # 并发准入配置（实际并发数按资源动态计算，max_concurrent 为上限，以平台配置为准）
+    admission_cpu_limit: float = 85.0  # CPU 使用率超过该值（%）时不再接收新任务
+    admission_memory_reserve_mb: int = 1024  # 为系统保留的内存（MB）
+    admission_task_rss_mb: int = 0  # 单个任务的内存估算（MB），0 表示按实测自动估算
 
     # 浏览器配置
     default_browser: str = "chrome"  # 默认浏览器: chrome/firefox/edge
@@ -37,6 +44,15 @@ class ExecutorConfig:
     edge_path: str = ""  # Edge浏览器路径
     edge_driver_path: str = ""  # EdgeDriver路径
 
+    # 浏览器池配置
+    browser_pool_size: int = 2  # 每种浏览器最多保留的空闲实例数，0 表示不复用（只复用 Chrome/Edge）
+    browser_pool_idle_ttl: int = 300  # 空闲实例最长保留时间（秒）
+    browser_pool_max_uses: int = 20  # 单个浏览器实例最多执行的任务数
+
+    # 平台 API 客户端配置
+    api_pool_size: int = 10  # 与平台保持的最大长连接数
+    api_max_retries: int = 2  # 查询类请求失败时的重试次数
+
     # 日志配置
     log_retention_days: int = 7
     log_level: str = "INFO"  # 日志级别: DEBUG, INFO, WARNING, ERROR
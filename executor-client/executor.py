@@ -7,9 +7,11 @@ Selenium 执行引擎 - 执行测试脚本
 """
 
 import base64
+import shutil
 import time
 from io import BytesIO
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set
+from urllib.parse import urlparse
 from loguru import logger
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -21,6 +23,8 @@ from selenium.webdriver.support.ui import Select
 from selenium.common.exceptions import WebDriverException, TimeoutException
 
 from config import get_config_manager
+from utils.driver_cache import get_driver_cache, is_version_mismatch
+from utils.template import compile_template, render_template
 
 
 class StepExecutor:
@@ -30,6 +34,8 @@ class StepExecutor:
     负责执行单个测试步骤
     """
 
+    TEMPLATE_CACHE_SIZE = 512
+
     def __init__(self, driver: webdriver.Remote):
         """
         初始化步骤执行器
@@ -38,6 +44,9 @@ class StepExecutor:
             driver: Selenium WebDriver 实例
         """
         self.driver = driver
+        # 参数模板缓存: id(params) -> (params, CompiledTemplate 或 None)，保存源对象引用以保证 id 不被复用；
+        # 第一次渲染时一次性替换并记为 None，同一对象第二次渲染时才编译
+        self._templates: Dict[int, tuple] = {}
 
     def execute(self, step: Dict[str, Any], variables: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -82,6 +91,9 @@ class StepExecutor:
         """
         替换参数中的变量
 
+        只渲染一次的参数直接替换；同一个参数对象（如数据驱动时的每一行）再次渲染时编译一次并复用。
+        未定义的变量保留原占位符，值为 None 的变量与原来一样替换为 'None'
+
         Args:
             params: 原始参数
             variables: 变量字典
@@ -89,23 +101,18 @@ class StepExecutor:
         Returns:
             替换后的参数
         """
-        import json
-
-        def replace_value(value: Any) -> Any:
-            """递归替换值中的变量"""
-            if isinstance(value, str):
-                # 替换 ${变量名} 格式的变量
-                for var_name, var_value in variables.items():
-                    value = value.replace(f"${{{var_name}}}", str(var_value))
-                return value
-            elif isinstance(value, dict):
-                return {k: replace_value(v) for k, v in value.items()}
-            elif isinstance(value, list):
-                return [replace_value(v) for v in value]
-            else:
-                return value
-
-        return replace_value(params)
+        cached = self._templates.get(id(params))
+        if cached is None or cached[0] is not params:
+            if len(self._templates) >= self.TEMPLATE_CACHE_SIZE:
+                self._templates.clear()
+            self._templates[id(params)] = (params, None)
+            return render_template(params, variables, none='None')
+
+        template = cached[1]
+        if template is None:
+            template = compile_template(params, copy_containers=True)
+            self._templates[id(params)] = (params, template)
+        return template.render(variables, none='None')
 
     def _execute_by_type(self, step_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -521,6 +528,14 @@ class StepExecutor:
             return ""
 
 
+def _url_origin(url: Optional[str]) -> Optional[str]:
+    """http(s) URL 的源，其他 URL 返回 None"""
+    parsed = urlparse(url or "")
+    if parsed.scheme in ("http", "https") and parsed.netloc:
+        return f"{parsed.scheme}://{parsed.netloc}"
+    return None
+
+
 class ScriptExecutor:
     """
     脚本执行器
@@ -528,10 +543,27 @@ class ScriptExecutor:
     负责执行完整的测试脚本（多个步骤）
     """
 
+    # 复用前清空当前页面所在源的 Web Storage
+    CLEAR_STORAGE_SCRIPT = (
+        "try { window.localStorage.clear(); } catch (e) {}"
+        "try { window.sessionStorage.clear(); } catch (e) {}"
+    )
+
     def __init__(self):
         self.driver: Optional[webdriver.Remote] = None
         self.step_executor: Optional[StepExecutor] = None
         self.config = get_config_manager().get()
+        self.browser_type: Optional[str] = None
+        # Chrome 临时用户数据目录，关闭浏览器时删除
+        self.profile_dir: Optional[str] = None
+        # 浏览器启动耗时（秒）和已执行的任务数，供浏览器池统计
+        self.launch_seconds: float = 0.0
+        self.uses: int = 0
+        # 从驱动缓存获取的驱动路径，浏览器启动失败时用于使缓存失效
+        self.cached_driver_path: Optional[str] = None
+        # 任务访问过的源（含 iframe），复用前逐个清除存储；记录失败时该浏览器不再复用
+        self.visited_origins: Set[str] = set()
+        self.origins_complete: bool = True
 
     def start(self, browser_type: str = "chrome") -> bool:
         """
@@ -543,6 +575,7 @@ class ScriptExecutor:
         Returns:
             是否启动成功
         """
+        start_time = time.time()
         try:
             if browser_type == "chrome":
                 self.driver = self._create_chrome_driver()
@@ -555,13 +588,30 @@ class ScriptExecutor:
                 return False
 
             self.step_executor = StepExecutor(self.driver)
-            logger.info(f"浏览器启动成功: {browser_type}")
+            self.browser_type = browser_type
+            self.launch_seconds = time.time() - start_time
+            logger.info(f"浏览器启动成功: {browser_type} (耗时 {self.launch_seconds:.2f}s)")
             return True
 
         except Exception as e:
             logger.error(f"浏览器启动失败: {e}")
+            self._remove_profile_dir()
+            # 缓存的驱动与升级后的浏览器不匹配时下次启动重新解析；其他启动失败保留缓存，供离线复用
+            if self.cached_driver_path and is_version_mismatch(e):
+                get_driver_cache().invalidate(browser_type, self.cached_driver_path)
             return False
 
+    def _cached_driver_service(self, service_class, browser_type: str, browser_path: str):
+        """
+        根据驱动缓存创建 Service
+
+        缓存和 webdriver-manager 都不可用时不指定驱动路径，交给 Selenium Manager 处理
+        """
+        self.cached_driver_path = get_driver_cache().resolve(browser_type, browser_path)
+        if self.cached_driver_path:
+            return service_class(executable_path=self.cached_driver_path)
+        return service_class()
+
     def _create_chrome_driver(self) -> webdriver.Chrome:
         """创建 Chrome WebDriver"""
         options = webdriver.ChromeOptions()
@@ -585,17 +635,13 @@ class ScriptExecutor:
 
         # 每次启动使用新的临时用户数据目录，清除缓存
         import tempfile
-        import os
-        user_data_dir = tempfile.mkdtemp(prefix='chrome_profile_')
-        options.add_argument(f"--user-data-dir={user_data_dir}")
+        self.profile_dir = tempfile.mkdtemp(prefix='chrome_profile_')
+        options.add_argument(f"--user-data-dir={self.profile_dir}")
 
-        if service:
-            return webdriver.Chrome(service=service, options=options)
-        else:
-            # 使用 webdriver-manager 自动管理驱动
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
-            return webdriver.Chrome(service=service, options=options)
+        if not service:
+            # 使用缓存的驱动路径，未命中时由 webdriver-manager 解析
+            service = self._cached_driver_service(Service, "chrome", self.config.chrome_path)
+        return webdriver.Chrome(service=service, options=options)
 
     def _create_firefox_driver(self) -> webdriver.Firefox:
         """创建 Firefox WebDriver"""
@@ -611,8 +657,7 @@ class ScriptExecutor:
         if self.config.firefox_driver_path:
             service = Service(executable_path=self.config.firefox_driver_path)
         else:
-            from webdriver_manager.firefox import GeckoDriverManager
-            service = Service(GeckoDriverManager().install())
+            service = self._cached_driver_service(Service, "firefox", self.config.firefox_path)
 
         return webdriver.Firefox(service=service, options=options)
 
@@ -626,8 +671,7 @@ class ScriptExecutor:
         if self.config.edge_driver_path:
             service = Service(executable_path=self.config.edge_driver_path)
         else:
-            from webdriver_manager.microsoft import EdgeChromiumDriverManager
-            service = Service(EdgeChromiumDriverManager().install())
+            service = self._cached_driver_service(Service, "edge", self.config.edge_path)
 
         return webdriver.Edge(service=service, options=options)
 
@@ -664,6 +708,7 @@ class ScriptExecutor:
 
             step_result = self.step_executor.execute(step, variables)
             step_result["step_index"] = index
+            self._record_origins()
             results.append(step_result)
 
             # 回调
@@ -691,10 +736,122 @@ class ScriptExecutor:
                 "steps": results
             }
 
+    def reset(self) -> bool:
+        """
+        清理浏览器状态，供下一个任务复用
+
+        关闭多余标签页，清除当前页面的 Cookie 和 Web Storage，并回到空白页。
+        Chrome/Edge 额外通过 CDP 清除所有 Cookie、缓存，以及任务执行过程中访问过的每个源
+        （含 iframe）的 localStorage、IndexedDB 等存储；CDP 命令失败或访问记录不完整时返回 False。
+        其他浏览器无法清除未打开的域名的 Cookie，浏览器池不会复用（见 BrowserPool.POOLED_BROWSERS）。
+
+        Returns:
+            是否清理成功，失败时该浏览器不应再复用
+        """
+        if not self.driver:
+            return False
+
+        try:
+            # 未处理的弹窗会阻塞后续命令
+            try:
+                self.driver.switch_to.alert.dismiss()
+            except Exception:
+                pass
+
+            handles = self.driver.window_handles
+            if not handles:
+                return False
+
+            for handle in handles:
+                self.driver.switch_to.window(handle)
+                self._record_origins()
+                parsed = urlparse(self.driver.current_url or "")
+                if parsed.scheme in ("http", "https"):
+                    self.driver.execute_script(self.CLEAR_STORAGE_SCRIPT)
+                    self.driver.delete_all_cookies()
+
+            for handle in handles[1:]:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(handles[0])
+
+            if self.browser_type in ("chrome", "edge"):
+                if not self.origins_complete:
+                    logger.warning("任务访问过的源记录不完整，浏览器不再复用")
+                    return False
+                self._clear_chromium_data(self.visited_origins)
+
+            self.visited_origins.clear()
+            self.driver.get("about:blank")
+            # 步骤执行器持有参数模板缓存，随任务重建
+            self.step_executor = StepExecutor(self.driver)
+            return True
+
+        except Exception as e:
+            logger.warning(f"浏览器状态清理失败: {e}")
+            return False
+
+    def _clear_chromium_data(self, origins):
+        """
+        通过 CDP 清除 Chromium 内核浏览器的 Cookie、缓存和各源的存储
+
+        命令失败时抛出异常，由 reset() 放弃复用该浏览器
+        """
+        self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        self.driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        for origin in sorted(origins):
+            self.driver.execute_cdp_cmd(
+                "Storage.clearDataForOrigin",
+                {"origin": origin, "storageTypes": "all"}
+            )
+
+    def _record_origins(self):
+        """记录当前窗口中页面及其所有 iframe 的源"""
+        if not self.driver:
+            return
+        try:
+            if self.browser_type in ("chrome", "edge"):
+                tree = self.driver.execute_cdp_cmd("Page.getFrameTree", {})
+                nodes = [tree.get("frameTree") or {}]
+                while nodes:
+                    node = nodes.pop()
+                    frame = node.get("frame") or {}
+                    origin = frame.get("securityOrigin") or _url_origin(frame.get("url"))
+                    if origin and origin.startswith(("http://", "https://")):
+                        self.visited_origins.add(origin)
+                    nodes.extend(node.get("childFrames") or [])
+            else:
+                origin = _url_origin(self.driver.current_url)
+                if origin:
+                    self.visited_origins.add(origin)
+        except Exception as e:
+            logger.warning(f"记录访问的源失败: {e}")
+            self.origins_complete = False
+
+    def is_alive(self) -> bool:
+        """检查浏览器会话是否仍然可用"""
+        if not self.driver:
+            return False
+        try:
+            return bool(self.driver.window_handles)
+        except Exception:
+            return False
+
+    def _remove_profile_dir(self):
+        """删除临时用户数据目录"""
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
     def stop(self):
         """关闭浏览器"""
         if self.driver:
-            self.driver.quit()
-            self.driver = None
-            self.step_executor = None
+            try:
+                self.driver.quit()
+            finally:
+                self.driver = None
+                self.step_executor = None
+                self._remove_profile_dir()
             logger.info("浏览器已关闭")
+        else:
+            self._remove_profile_dir()
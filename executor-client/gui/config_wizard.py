@@ -452,7 +452,7 @@ class AdvancedConfigPage(QWizardPage):
 
         # 最大并发数
         self.max_concurrent_spin = QSpinBox()
-        self.max_concurrent_spin.setRange(1, 10)
+        self.max_concurrent_spin.setRange(1, 64)
         self.max_concurrent_spin.setValue(config.max_concurrent)
         layout.addRow("最大并发任务数:", self.max_concurrent_spin)
 
@@ -162,4 +162,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序启动任务工作进程时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -27,6 +27,7 @@ from pika.exceptions import (
 )
 from loguru import logger
 
+from api_client import get_api_client
 from config import get_config_manager, ExecutorConfig
 
 
@@ -257,14 +258,15 @@ class MessageQueueConsumer:
                     logger.info(f"[停止检查-缓存] 父任务 {parent_execution_id} 已停止（缓存命中），拒绝接收任务")
                     return True
 
-            import requests
-            api_base = self.config.server_url.rstrip('/')
+            api_client = get_api_client()
 
             # 优先检查父任务状态
             if parent_execution_id:
                 try:
-                    status_check_url = f"{api_base}/api/executions/{parent_execution_id}/status_check/"
-                    response = requests.get(status_check_url, timeout=2)
+                    # 在消费回调中执行，不重试，避免长时间阻塞消费线程
+                    response = api_client.get(
+                        f"/api/executions/{parent_execution_id}/status_check/", timeout=2, retries=0
+                    )
                     if response.status_code == 200:
                         data = response.json()
                         parent_status = data.get("status", "")
@@ -284,8 +286,7 @@ class MessageQueueConsumer:
             # 检查子执行状态
             if execution_id:
                 try:
-                    status_check_url = f"{api_base}/api/executions/{execution_id}/status_check/"
-                    response = requests.get(status_check_url, timeout=2)
+                    response = api_client.get(f"/api/executions/{execution_id}/status_check/", timeout=2, retries=0)
                     if response.status_code == 200:
                         data = response.json()
                         exec_status = data.get("status", "")
@@ -329,14 +330,15 @@ class MessageQueueConsumer:
                     logger.info(f"[停止检查-缓存] 父任务 {parent_execution_id} 已停止（缓存命中），任务不重新入队")
                     return False
 
-            import requests
-            api_base = self.config.server_url.rstrip('/')
+            api_client = get_api_client()
 
             # 优先检查父任务状态
             if parent_execution_id:
                 try:
-                    status_check_url = f"{api_base}/api/executions/{parent_execution_id}/status_check/"
-                    response = requests.get(status_check_url, timeout=2)
+                    # 在消费回调中执行，不重试，避免长时间阻塞消费线程
+                    response = api_client.get(
+                        f"/api/executions/{parent_execution_id}/status_check/", timeout=2, retries=0
+                    )
                     if response.status_code == 200:
                         data = response.json()
                         parent_status = data.get("status", "")
@@ -356,8 +358,7 @@ class MessageQueueConsumer:
             # 检查子执行状态
             if execution_id:
                 try:
-                    status_check_url = f"{api_base}/api/executions/{execution_id}/status_check/"
-                    response = requests.get(status_check_url, timeout=2)
+                    response = api_client.get(f"/api/executions/{execution_id}/status_check/", timeout=2, retries=0)
                     if response.status_code == 200:
                         data = response.json()
                         exec_status = data.get("status", "")
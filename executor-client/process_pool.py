@@ -0,0 +1,340 @@
+"""
+任务进程池 - 在独立工作进程中执行任务
+- 每个工作进程同一时间只执行一个任务，拥有独立的解释器、浏览器池和 GIL
+- 日志、结果和浏览器池统计通过队列回传主进程
+- 任务超时、取消后长时间无响应或工作进程崩溃时，终止整个进程树（含驱动和浏览器）并重建工作进程
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Dict, Any, Optional, List, Callable
+from loguru import logger
+import psutil
+
+
+class TaskWorkerError(Exception):
+    """工作进程未能正常返回任务结果（超时、崩溃或被强制终止）"""
+
+    def __init__(self, message: str, cancelled: bool = False):
+        super().__init__(message)
+        self.cancelled = cancelled
+
+
+def _kill_process_tree(pid: int):
+    """终止进程及其所有子进程（chromedriver、浏览器等）"""
+    try:
+        parent = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    processes = parent.children(recursive=True) + [parent]
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+
+
+def _setup_worker_logging(worker_id: int, outbox, log_level: str):
+    """工作进程的日志统一转发到主进程，由主进程写入日志文件"""
+    def sink(message):
+        record = message.record
+        try:
+            outbox.put(("log", worker_id, record["level"].name, str(message).rstrip("\n")))
+        except Exception:
+            pass
+
+    logger.remove()
+    logger.add(sink, level=log_level, format="{message}", catch=True)
+
+
+def _worker_main(worker_id: int, inbox, outbox, cancel_event, idle_interval: float):
+    """工作进程入口"""
+    from config import get_config_manager
+    _setup_worker_logging(worker_id, outbox, get_config_manager().get().log_level)
+
+    from browser_pool import get_browser_pool
+    from task_manager_v2 import WorkerTaskRunner
+
+    runner = WorkerTaskRunner(cancel_event)
+    browser_pool = get_browser_pool()
+    try:
+        while True:
+            try:
+                task_data = inbox.get(timeout=idle_interval)
+            except queue.Empty:
+                # 空闲时关闭超时的浏览器，并同步浏览器池统计
+                browser_pool.evict_idle()
+                outbox.put(("stats", worker_id, browser_pool.get_stats()))
+                continue
+            if task_data is None:
+                break
+
+            task_id = task_data.get("task_id", "")
+            result = runner._run_task(task_data)
+            summary = None
+            if result is not None:
+                summary = {key: result.get(key) for key in ("success", "message", "cancelled")}
+            outbox.put(("result", worker_id, task_id, summary))
+            outbox.put(("stats", worker_id, browser_pool.get_stats()))
+    finally:
+        browser_pool.close()
+
+
+class _Worker:
+    """工作进程句柄"""
+
+    def __init__(self, context, worker_id: int, outbox, idle_interval: float, target: Callable = _worker_main):
+        self.worker_id = worker_id
+        self.inbox = context.Queue()
+        self.cancel_event = context.Event()
+        self.task_id: Optional[str] = None
+        self.process = context.Process(
+            target=target,
+            args=(worker_id, self.inbox, outbox, self.cancel_event, idle_interval),
+            daemon=True,
+            name=f"TaskWorker-{worker_id}"
+        )
+        self.process.start()
+
+    def kill(self):
+        if self.process.pid and self.process.is_alive():
+            _kill_process_tree(self.process.pid)
+        self.process.join(timeout=1)
+
+
+class _Waiter:
+    """等待工作进程返回结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class TaskProcessPool:
+    """
+    受监管的任务进程池
+
+    run() 在调用线程中阻塞等待任务完成，调用方通常是每个任务的监督线程；
+    工作进程按需创建，异常退出或被终止后下次使用时重新创建。
+    """
+
+    # 取消后等待工作进程自行结束的时间（秒），超过后强制终止
+    CANCEL_GRACE_SECONDS = 30
+    # 工作进程空闲检查间隔（秒）
+    IDLE_INTERVAL = 30
+
+    def __init__(self, max_workers: int, task_timeout: int = 0, worker_target: Callable = _worker_main):
+        """
+        Args:
+            max_workers: 最大工作进程数
+            task_timeout: 单个任务的最长执行时间（秒），0 表示不限制
+            worker_target: 工作进程入口，参数和消息格式与 _worker_main 相同（测试时替换）
+        """
+        self.max_workers = max(max_workers, 1)
+        self.task_timeout = task_timeout
+        self._worker_target = worker_target
+
+        # 统一使用 spawn，避免在多线程进程中 fork
+        self._context = multiprocessing.get_context("spawn")
+        self._outbox = self._context.Queue()
+        self._condition = threading.Condition()
+        self._workers: List[_Worker] = []
+        self._idle: List[_Worker] = []
+        self._next_worker_id = 1
+        self._waiters: Dict[str, _Waiter] = {}
+        self._browser_stats: Dict[int, Dict[str, Any]] = {}
+        self._closed = False
+
+        self._stats = {
+            "tasks": 0,
+            "timeouts": 0,
+            "crashes": 0,
+            "killed": 0,
+        }
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop,
+            daemon=True,
+            name="TaskProcessPoolDispatcher"
+        )
+        self._dispatcher.start()
+
+    def run(self, task_data: Dict[str, Any], should_cancel: Callable[[], bool] = None) -> Optional[Dict[str, Any]]:
+        """
+        在工作进程中执行任务并等待结果
+
+        Args:
+            task_data: 任务数据
+            should_cancel: 定期调用，返回 True 时通知工作进程取消任务
+
+        Returns:
+            任务结果摘要 {success, message, cancelled}，工作进程已上报结果
+
+        Raises:
+            TaskWorkerError: 工作进程没有返回结果，调用方需要自行上报失败结果
+        """
+        task_id = task_data.get("task_id", "")
+        worker = self._acquire_worker()
+        waiter = _Waiter()
+        with self._condition:
+            self._waiters[task_id] = waiter
+            self._stats["tasks"] += 1
+
+        worker.task_id = task_id
+        worker.cancel_event.clear()
+        worker.inbox.put(task_data)
+
+        healthy = False
+        start_time = time.time()
+        cancelled_at = None
+        try:
+            while not waiter.event.wait(1):
+                if not worker.process.is_alive():
+                    with self._condition:
+                        self._stats["crashes"] += 1
+                    raise TaskWorkerError(f"工作进程异常退出 (exitcode={worker.process.exitcode})")
+
+                if cancelled_at is None and should_cancel and should_cancel():
+                    logger.info(f"任务 {task_id}: 通知工作进程 {worker.worker_id} 取消任务")
+                    worker.cancel_event.set()
+                    cancelled_at = time.time()
+
+                if cancelled_at and time.time() - cancelled_at > self.CANCEL_GRACE_SECONDS:
+                    logger.warning(f"任务 {task_id}: 取消后工作进程 {worker.worker_id} 无响应，强制终止")
+                    raise TaskWorkerError("任务已被取消", cancelled=True)
+
+                if self.task_timeout and time.time() - start_time > self.task_timeout:
+                    logger.warning(f"任务 {task_id}: 执行超过 {self.task_timeout} 秒，强制终止工作进程 {worker.worker_id}")
+                    with self._condition:
+                        self._stats["timeouts"] += 1
+                    raise TaskWorkerError(f"任务执行超时（{self.task_timeout}秒），已终止")
+
+            healthy = True
+            return waiter.result
+        finally:
+            with self._condition:
+                self._waiters.pop(task_id, None)
+            self._release_worker(worker, healthy)
+
+    def _acquire_worker(self) -> _Worker:
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise TaskWorkerError("任务进程池已关闭")
+                if self._idle:
+                    worker = self._idle.pop()
+                    if worker.process.is_alive():
+                        return worker
+                    # 空闲期间退出的工作进程直接丢弃
+                    self._workers.remove(worker)
+                    self._browser_stats.pop(worker.worker_id, None)
+                    continue
+                if len(self._workers) < self.max_workers:
+                    worker = _Worker(self._context, self._next_worker_id, self._outbox, self.IDLE_INTERVAL,
+                                     self._worker_target)
+                    self._next_worker_id += 1
+                    self._workers.append(worker)
+                    logger.info(f"已启动工作进程 {worker.worker_id} (pid={worker.process.pid})")
+                    return worker
+                self._condition.wait()
+
+    def _release_worker(self, worker: _Worker, healthy: bool):
+        worker.task_id = None
+        if not healthy or self._closed:
+            if worker.process.is_alive():
+                with self._condition:
+                    self._stats["killed"] += 1
+            worker.kill()
+        with self._condition:
+            if healthy and not self._closed and len(self._workers) <= self.max_workers:
+                self._idle.append(worker)
+            else:
+                if healthy and not self._closed:
+                    # 最大工作进程数调小后，多出的工作进程在空闲时退出
+                    worker.inbox.put(None)
+                self._workers.remove(worker)
+                self._browser_stats.pop(worker.worker_id, None)
+            self._condition.notify()
+
+    def _dispatch_loop(self):
+        """接收工作进程回传的日志、结果和统计信息"""
+        while True:
+            try:
+                message = self._outbox.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+
+            kind, worker_id = message[0], message[1]
+            if kind == "log":
+                _, _, level, text = message
+                logger.log(level, f"[Worker-{worker_id}] {text}")
+            elif kind == "result":
+                _, _, task_id, summary = message
+                with self._condition:
+                    waiter = self._waiters.get(task_id)
+                if waiter:
+                    waiter.result = summary
+                    waiter.event.set()
+            elif kind == "stats":
+                with self._condition:
+                    self._browser_stats[worker_id] = message[2]
+
+    def resize(self, max_workers: int):
+        """调整最大工作进程数，调小时多出的工作进程在完成当前任务后退出"""
+        with self._condition:
+            self.max_workers = max(max_workers, 1)
+            self._condition.notify_all()
+
+    def cancel_all(self):
+        """通知所有工作进程取消当前任务"""
+        with self._condition:
+            workers = list(self._workers)
+        for worker in workers:
+            if worker.task_id:
+                worker.cancel_event.set()
+
+    def shutdown(self, timeout: float = 10):
+        """关闭进程池：工作进程正常退出，超时未退出的强制终止"""
+        with self._condition:
+            self._closed = True
+            workers = list(self._workers)
+            self._condition.notify_all()
+
+        # 执行中的工作进程先取消当前任务，上报结果后再读取到退出消息
+        for worker in workers:
+            if worker.task_id:
+                worker.cancel_event.set()
+            worker.inbox.put(None)
+
+        deadline = time.time() + timeout
+        for worker in workers:
+            worker.process.join(timeout=max(deadline - time.time(), 0))
+            if worker.process.is_alive():
+                worker.kill()
+
+        self._outbox.put(None)
+        logger.info(f"任务进程池已关闭，共 {len(workers)} 个工作进程")
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计信息"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats["workers"] = len(self._workers)
+            stats["busy"] = len(self._workers) - len(self._idle)
+        stats["max_workers"] = self.max_workers
+        stats["task_timeout"] = self.task_timeout
+        return stats
+
+    def get_browser_pool_stats(self) -> List[Dict[str, Any]]:
+        """获取各工作进程最近上报的浏览器池统计"""
+        with self._condition:
+            return list(self._browser_stats.values())
@@ -18,9 +18,14 @@ import requests
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+from api_client import get_api_client
 from config import get_config_manager, ExecutorConfig
 from executor import ScriptExecutor
+from admission import AdmissionController
+from browser_pool import get_browser_pool, merge_pool_stats
 from message_queue_client import get_message_queue_consumer
+from process_pool import TaskProcessPool, TaskWorkerError
+from utils.driver_cache import get_driver_cache
 from utils.system import get_resource_usage
 
 
@@ -36,7 +41,6 @@ class TaskManagerV2:
 
     def __init__(self):
         self.config: ExecutorConfig = get_config_manager().get()
-        self.mq_consumer = get_message_queue_consumer()
         self.running_tasks: Dict[str, Dict[str, Any]] = {}  # task_id -> task_info
         self.cancelled_tasks: set = set()
 
@@ -52,6 +56,17 @@ class TaskManagerV2:
         self._plan_executions_lock = threading.Lock()
         self._max_history_records = 50  # 最多保留 50 条历史记录
 
+        # 并发准入控制：按 CPU/内存动态决定有效并发数，max_concurrent 只作为上限
+        self.admission = AdmissionController(
+            max_concurrent=self.config.max_concurrent,
+            cpu_limit=self.config.admission_cpu_limit,
+            memory_reserve_mb=self.config.admission_memory_reserve_mb,
+            task_rss_mb=self.config.admission_task_rss_mb
+        )
+
+        # 进程模式下的任务进程池（execution_backend=process 时在连接时创建）
+        self.process_pool: Optional[TaskProcessPool] = None
+
         # 心跳线程
         self._heartbeat_thread: Optional[threading.Thread] = None
         self._is_heartbeat_running = False
@@ -63,7 +78,11 @@ class TaskManagerV2:
         self._sequential_wait_queue: Dict[str, list] = {}
         self._wait_lock = threading.Lock()
 
-        # 设置消息队列回调
+        self._attach_message_queue()
+
+    def _attach_message_queue(self):
+        """获取消息队列消费者并设置回调"""
+        self.mq_consumer = get_message_queue_consumer()
         self.mq_consumer.on_task_received = self.on_task_received
         self.mq_consumer.on_connected = self.on_mq_connected
         self.mq_consumer.on_disconnected = self.on_mq_disconnected
@@ -81,14 +100,34 @@ class TaskManagerV2:
             if not self._register_executor():
                 return False
 
-            # 2. 启动消息队列消费者
+            # 2. 进程模式下创建任务进程池，工作进程在收到任务时按需启动
+            if self.config.execution_backend == "process" and (not self.process_pool or self.process_pool.closed):
+                self.process_pool = TaskProcessPool(
+                    max_workers=self.config.max_concurrent,
+                    task_timeout=self.config.task_timeout
+                )
+                logger.info(f"任务执行模式: 进程池 (最大 {self.config.max_concurrent} 个工作进程)")
+
+            # 3. 启动消息队列消费者
             if not self.mq_consumer.start():
                 logger.error("启动消息队列消费者失败")
                 return False
 
-            # 3. 启动心跳线程
+            # 4. 启动心跳线程
             self._start_heartbeat()
 
+            # 5. 后台预解析默认浏览器的驱动，首个任务无需等待驱动下载
+            threading.Thread(
+                target=get_driver_cache().warm_up,
+                args=([self.config.default_browser], {
+                    "chrome": self.config.chrome_path,
+                    "firefox": self.config.firefox_path,
+                    "edge": self.config.edge_path,
+                }),
+                daemon=True,
+                name="DriverWarmUp"
+            ).start()
+
             logger.info("执行机已成功连接到平台")
             return True
 
@@ -109,24 +148,23 @@ class TaskManagerV2:
         """
         import time
 
-        api_base = self.config.server_url.rstrip('/')
-        register_url = f"{api_base}/api/executor/register/"
-
         for attempt in range(max_retries):
             try:
-                response = requests.post(
-                    register_url,
+                response = get_api_client().post(
+                    "/api/executor/register/",
                     json={
                         "executor_uuid": self.config.executor_uuid,
                         "executor_name": self.config.executor_name,
                         "platform": "Windows",
                         "browser_types": ["chrome", "firefox", "edge"],
-                        "owner_username": self.config.owner_username
-                    }, verify=False, timeout=10
+                        "owner_username": self.config.owner_username,
+                        "max_concurrent": self.config.max_concurrent
+                    }, timeout=10
                 )
 
                 if response.status_code == 200:
                     logger.info("执行机注册成功")
+                    self._apply_max_concurrent(response.json().get("max_concurrent"))
                     return True
                 else:
                     logger.warning(f"执行机注册失败: HTTP {response.status_code}")
@@ -144,6 +182,17 @@ class TaskManagerV2:
 
         return False
 
+    def _apply_max_concurrent(self, value):
+        """采用平台上管理员配置的并发上限"""
+        if not isinstance(value, int) or value < 1 or value == self.config.max_concurrent:
+            return
+        logger.info(f"平台并发上限更新: {self.config.max_concurrent} -> {value}")
+        get_config_manager().update(max_concurrent=value)
+        self.config.max_concurrent = value
+        self.admission.set_max_concurrent(value)
+        if self.process_pool:
+            self.process_pool.resize(value)
+
     def _start_heartbeat(self):
         """启动心跳线程"""
         if self._is_heartbeat_running:
@@ -185,20 +234,30 @@ class TaskManagerV2:
             resources = get_resource_usage()
             current_tasks = len(self.running_tasks)
 
+            # 顺便关闭空闲超时的浏览器
+            browser_pool = get_browser_pool()
+            browser_pool.evict_idle()
+            metrics = {"browser_pool": browser_pool.get_stats()}
+            if self.process_pool:
+                # 进程模式下浏览器池位于各工作进程中
+                metrics["browser_pool"] = merge_pool_stats(self.process_pool.get_browser_pool_stats())
+                metrics["process_pool"] = self.process_pool.get_stats()
+
+            # 有效并发数随资源变化，上报给平台用于调度
+            effective_capacity = self.admission.effective_capacity(current_tasks)
+            metrics["admission"] = self.admission.get_stats()
+
             # 确定状态
             if current_tasks == 0:
                 status = "idle"
-            elif current_tasks < self.config.max_concurrent:
-                status = "busy"
             else:
                 status = "busy"
 
-            # 构建 API URL
-            api_base = self.config.server_url.rstrip('/')
-            heartbeat_url = f"{api_base}/api/executor/heartbeat/"
+            api_client = get_api_client()
+            metrics["api_client"] = api_client.get_stats()
 
-            response = requests.post(
-                heartbeat_url,
+            response = api_client.post(
+                "/api/executor/heartbeat/",
                 json={
                     "executor_uuid": self.config.executor_uuid,
                     "status": status,
@@ -206,12 +265,15 @@ class TaskManagerV2:
                     "cpu_usage": resources.get("cpu", 0),
                     "memory_usage": resources.get("memory", 0),
                     "disk_usage": resources.get("disk", 0),
-                    "message": ""
-                }, verify=False, timeout=5
+                    "effective_capacity": effective_capacity,
+                    "message": "",
+                    "metrics": metrics
+                }, timeout=5
             )
 
             if response.status_code == 200:
-                logger.debug(f"心跳上报成功: status={status}, tasks={current_tasks}")
+                logger.debug(f"心跳上报成功: status={status}, tasks={current_tasks}, capacity={effective_capacity}")
+                self._apply_max_concurrent(response.json().get("max_concurrent"))
             else:
                 logger.warning(f"心跳上报失败: HTTP {response.status_code}")
 
@@ -237,11 +299,10 @@ class TaskManagerV2:
 
             # 批量查询这些父执行的状态
             if parent_ids:
-                api_base = self.config.server_url.rstrip('/')
+                api_client = get_api_client()
                 for parent_id in parent_ids:
                     try:
-                        status_check_url = f"{api_base}/api/executions/{parent_id}/status_check/"
-                        response = requests.get(status_check_url, verify=False, timeout=2)
+                        response = api_client.get(f"/api/executions/{parent_id}/status_check/", timeout=2)
                         if response.status_code == 200:
                             data = response.json()
                             status = data.get("status", "")
@@ -303,12 +364,14 @@ class TaskManagerV2:
 
         # 【修复】先检查并发限制，再决定是否接收任务
         # 必须在加入 running_tasks 之前检查，避免超出限制
+        # 有效并发数由准入控制按 CPU/内存动态计算，不超过 max_concurrent
         current_tasks = len(self.running_tasks)
-        logger.info(f"[并发检查] 任务 {task_id} 到达，当前任务数={current_tasks}，最大并发={self.config.max_concurrent}")
+        capacity = self.admission.effective_capacity(current_tasks)
+        logger.info(f"[并发检查] 任务 {task_id} 到达，当前任务数={current_tasks}，有效并发={capacity}，最大并发={self.config.max_concurrent}")
 
-        if current_tasks >= self.config.max_concurrent:
+        if current_tasks >= capacity:
             # 超过限制，拒绝任务
-            logger.warning(f"执行机已达到最大并发数 ({self.config.max_concurrent})，当前任务数={current_tasks}，拒绝接收新任务 {task_id}")
+            logger.warning(f"执行机已达到有效并发数 ({capacity})，当前任务数={current_tasks}，拒绝接收新任务 {task_id}")
             return False  # 返回 False 拒绝任务，消息会重新入队（requeue=True）
 
         # 【修复】对于顺序执行，需要检查是否有同父任务正在执行
@@ -358,12 +421,11 @@ class TaskManagerV2:
             任务是否仍然有效（True=有效，False=已停止）
         """
         try:
-            api_base = self.config.server_url.rstrip('/')
+            api_client = get_api_client()
 
             # 优先检查父任务状态（如果存在）
             if parent_execution_id:
-                status_check_url = f"{api_base}/api/executions/{parent_execution_id}/status_check/"
-                response = requests.get(status_check_url, verify=False, timeout=3)
+                response = api_client.get(f"/api/executions/{parent_execution_id}/status_check/", timeout=3)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -375,8 +437,7 @@ class TaskManagerV2:
                         return False
 
             # 检查子执行状态
-            status_check_url = f"{api_base}/api/executions/{execution_id}/status_check/"
-            response = requests.get(status_check_url, verify=False, timeout=3)
+            response = api_client.get(f"/api/executions/{execution_id}/status_check/", timeout=3)
 
             if response.status_code == 200:
                 data = response.json()
@@ -409,12 +470,7 @@ class TaskManagerV2:
             父执行是否仍然有效（True=有效，False=已停止）
         """
         try:
-            import requests
-
-            api_base = self.config.server_url.rstrip('/')
-            status_check_url = f"{api_base}/api/executions/{parent_execution_id}/status_check/"
-
-            response = requests.get(status_check_url, verify=False, timeout=3)
+            response = get_api_client().get(f"/api/executions/{parent_execution_id}/status_check/", timeout=3)
 
             if response.status_code == 200:
                 data = response.json()
@@ -455,10 +511,7 @@ class TaskManagerV2:
                 return True
 
             # 向后端查询父任务状态
-            api_base = self.config.server_url.rstrip('/')
-            status_check_url = f"{api_base}/api/executions/{parent_execution_id}/status_check/"
-
-            response = requests.get(status_check_url, verify=False, timeout=5)
+            response = get_api_client().get(f"/api/executions/{parent_execution_id}/status_check/", timeout=5)
 
             if response.status_code == 200:
                 data = response.json()
@@ -491,8 +544,6 @@ class TaskManagerV2:
         task_id = task_data.get("task_id", "")
         execution_id = task_data.get("execution_id")
         script_data = task_data.get("script_data", {})
-        variables = task_data.get("variables", {})
-        browser_type = task_data.get("browser_type", self.config.default_browser)
 
         # 【修复】任务已在 on_task_received 中加入 running_tasks
         # 这里只更新状态为 running，不再重复创建
@@ -542,8 +593,92 @@ class TaskManagerV2:
         # 初始化结果变量
         result = None
 
-        # 每个线程创建自己的 executor 实例（避免并发冲突）
+        try:
+            if self.process_pool:
+                result = self._run_task_in_process(task_data)
+            else:
+                result = self._run_task(task_data)
+
+        finally:
+            # 获取任务信息，用于检查是否有等待的任务
+            task_info = self.running_tasks.get(task_id, {})
+            script_data = task_info.get("script_data", {})
+            parent_execution_id = script_data.get("parent_execution_id")
+            script_index = script_data.get("script_index", -1)
+
+            # 清理任务
+            self.running_tasks.pop(task_id, None)
+            self.cancelled_tasks.discard(task_id)
+
+            # 确定最终状态
+            if result is not None:
+                final_status = "completed" if result.get("success", False) else "failed"
+                final_message = result.get("message", "")
+            else:
+                final_status = "failed"
+                final_message = "执行失败"
+
+            # 【修复】更新 plan_executions 中的脚本状态，保留历史记录（到退出时才清空）
+            if parent_execution_id and parent_execution_id in self.plan_executions:
+                with self._plan_executions_lock:
+                    if 0 <= script_index < len(self.plan_executions[parent_execution_id]["scripts"]):
+                        old_status = self.plan_executions[parent_execution_id]["scripts"][script_index]["status"]
+                        self.plan_executions[parent_execution_id]["scripts"][script_index]["status"] = final_status
+                        self.plan_executions[parent_execution_id]["scripts"][script_index]["completed_at"] = time.strftime("%H:%M:%S")
+                        logger.info(f"任务完成后更新脚本状态: index={script_index}, {old_status} -> {final_status}")
+
+                    # 检查是否所有脚本都已完成，如果是则添加计划完成时间
+                    all_finished = True
+                    for script_info in self.plan_executions[parent_execution_id]["scripts"]:
+                        if script_info["status"] in ["waiting", "running"]:
+                            all_finished = False
+                            break
+
+                    if all_finished:
+                        # 所有脚本完成，添加计划完成时间，保留历史记录
+                        self.plan_executions[parent_execution_id]["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                        logger.info(f"父执行 {parent_execution_id} 所有脚本已完成，保留历史记录（退出时清空）")
+
+            # 【关键修复】检查并触发等待队列中的下一个任务
+            if parent_execution_id:
+                logger.info(f"任务 {task_id} 完成，parent_id={parent_execution_id}，检查等待队列")
+                self._process_sequential_queue(parent_execution_id)
+
+            # 调用任务完成回调
+            if self.on_task_complete:
+                try:
+                    self.on_task_complete(task_id, final_status, final_message)
+                except Exception as e:
+                    logger.error(f"任务完成回调失败: {e}")
+
+            logger.info(f"任务结束: {task_id}")
+
+    def _run_task(self, task_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        检查停止状态、获取浏览器、执行脚本并上报结果
+
+        线程模式下在任务线程中调用，进程模式下在工作进程中调用
+
+        Args:
+            task_data: 任务数据
+
+        Returns:
+            执行结果，执行异常时返回 None（失败结果已上报）
+        """
+        task_id = task_data.get("task_id", "")
+        script_data = task_data.get("script_data", {})
+        variables = task_data.get("variables", {})
+        browser_type = task_data.get("browser_type", self.config.default_browser)
+        parent_execution_id = script_data.get("parent_execution_id")
+
+        # 初始化结果变量
+        result = None
+
+        # 每个线程从浏览器池独占一个 executor 实例（避免并发冲突）
         executor = None
+        browser_pool = get_browser_pool()
+        # 执行过程中抛出异常时浏览器状态不可信，不再放回浏览器池
+        browser_reusable = True
 
         try:
             # 【修复】在启动浏览器之前，检查父执行是否已被停止
@@ -582,13 +717,13 @@ class TaskManagerV2:
             if task_id in self.cancelled_tasks:
                 raise Exception("任务已被取消")
 
-            # 启动浏览器
-            logger.info(f"任务 {task_id}: 正在启动 {browser_type} 浏览器...")
-            executor = ScriptExecutor()
-            if not executor.start(browser_type):
+            # 从浏览器池获取浏览器，没有空闲实例时启动新浏览器
+            logger.info(f"任务 {task_id}: 正在获取 {browser_type} 浏览器...")
+            executor = browser_pool.acquire(browser_type)
+            if not executor:
                 raise Exception("浏览器启动失败")
 
-            logger.info(f"任务 {task_id}: 浏览器启动成功")
+            logger.info(f"任务 {task_id}: 浏览器就绪 (第 {executor.uses} 次使用)")
 
             # 执行脚本
             result = self._execute_script(task_id, script_data, variables, executor)
@@ -621,6 +756,7 @@ class TaskManagerV2:
         except Exception as e:
             logger.exception(f"任务 {task_id} 执行异常")
             error_msg = f"执行异常: {str(e)}"
+            browser_reusable = False
 
             # 上报失败结果
             self._send_task_result(task_id, {
@@ -630,65 +766,41 @@ class TaskManagerV2:
             })
 
         finally:
-            # 关闭浏览器（使用局部 executor 变量）
+            # 归还浏览器（使用局部 executor 变量），浏览器池负责清理状态或关闭
             if executor:
                 try:
-                    executor.stop()
-                except:
-                    pass
-
-            # 获取任务信息，用于检查是否有等待的任务
-            task_info = self.running_tasks.get(task_id, {})
-            script_data = task_info.get("script_data", {})
-            parent_execution_id = script_data.get("parent_execution_id")
-            script_index = script_data.get("script_index", -1)
-
-            # 清理任务
-            self.running_tasks.pop(task_id, None)
-            self.cancelled_tasks.discard(task_id)
+                    browser_pool.release(executor, reusable=browser_reusable)
+                except Exception as e:
+                    logger.warning(f"归还浏览器失败: {e}")
 
-            # 确定最终状态
-            if result is not None:
-                final_status = "completed" if result.get("success", False) else "failed"
-                final_message = result.get("message", "")
-            else:
-                final_status = "failed"
-                final_message = "执行失败"
+        return result
 
-            # 【修复】更新 plan_executions 中的脚本状态，保留历史记录（到退出时才清空）
-            if parent_execution_id and parent_execution_id in self.plan_executions:
-                with self._plan_executions_lock:
-                    if 0 <= script_index < len(self.plan_executions[parent_execution_id]["scripts"]):
-                        old_status = self.plan_executions[parent_execution_id]["scripts"][script_index]["status"]
-                        self.plan_executions[parent_execution_id]["scripts"][script_index]["status"] = final_status
-                        self.plan_executions[parent_execution_id]["scripts"][script_index]["completed_at"] = time.strftime("%H:%M:%S")
-                        logger.info(f"任务完成后更新脚本状态: index={script_index}, {old_status} -> {final_status}")
-
-                    # 检查是否所有脚本都已完成，如果是则添加计划完成时间
-                    all_finished = True
-                    for script_info in self.plan_executions[parent_execution_id]["scripts"]:
-                        if script_info["status"] in ["waiting", "running"]:
-                            all_finished = False
-                            break
+    def _run_task_in_process(self, task_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        在工作进程中执行任务，当前线程只负责监督
 
-                    if all_finished:
-                        # 所有脚本完成，添加计划完成时间，保留历史记录
-                        self.plan_executions[parent_execution_id]["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                        logger.info(f"父执行 {parent_execution_id} 所有脚本已完成，保留历史记录（退出时清空）")
+        本地取消标记和已停止的父执行会同步给工作进程；工作进程没有返回结果时由这里上报失败
+        """
+        task_id = task_data.get("task_id", "")
+        parent_execution_id = task_data.get("script_data", {}).get("parent_execution_id")
 
-            # 【关键修复】检查并触发等待队列中的下一个任务
+        def should_cancel() -> bool:
+            if task_id in self.cancelled_tasks:
+                return True
             if parent_execution_id:
-                logger.info(f"任务 {task_id} 完成，parent_id={parent_execution_id}，检查等待队列")
-                self._process_sequential_queue(parent_execution_id)
-
-            # 调用任务完成回调
-            if self.on_task_complete:
-                try:
-                    self.on_task_complete(task_id, final_status, final_message)
-                except Exception as e:
-                    logger.error(f"任务完成回调失败: {e}")
+                with self._stopped_executions_lock:
+                    return parent_execution_id in self._stopped_executions_list
+            return False
 
-            logger.info(f"任务结束: {task_id}")
+        try:
+            return self.process_pool.run(task_data, should_cancel=should_cancel)
+        except TaskWorkerError as e:
+            logger.error(f"任务 {task_id} 执行异常: {e}")
+            self._send_task_result(task_id, {
+                "status": "failed",
+                "message": f"执行异常: {e}"
+            })
+            return {"success": False, "message": str(e), "cancelled": e.cancelled}
 
     def _execute_script(
         self,
@@ -714,7 +826,19 @@ class TaskManagerV2:
         execution_id = script_data.get("execution_id", "")
         parent_execution_id = script_data.get("parent_execution_id")
 
-        logger.info(f"任务 {task_id}: 脚本 '{script_name}' 共有 {len(steps)} 个步骤")
+        data_source = script_data.get("data_source") or {}
+        data_driven = bool(script_data.get("data_driven") and data_source.get("row_count"))
+        # 分片任务只执行 [row_start, row_end) 区间内的数据行
+        shard = script_data.get("shard") or {}
+        row_start = shard.get("row_start", 0)
+        row_end = shard.get("row_end", data_source.get("row_count", 0))
+        total_steps = len(steps) * (row_end - row_start) if data_driven else len(steps)
+
+        if data_driven:
+            shard_info = f" (分片 {shard['index'] + 1}/{shard['count']})" if shard else ""
+            logger.info(f"任务 {task_id}: 脚本 '{script_name}' 共有 {len(steps)} 个步骤 x {row_end - row_start} 行数据{shard_info}")
+        else:
+            logger.info(f"任务 {task_id}: 脚本 '{script_name}' 共有 {len(steps)} 个步骤")
 
         # 【修复】在执行任何步骤之前，先检查父执行是否已被停止
         # 这是为了处理以下场景：
@@ -754,7 +878,12 @@ class TaskManagerV2:
         import time
         start_time = time.time()
 
-        for index, step in enumerate(steps):
+        if data_driven:
+            step_iter = self._iter_data_driven_steps(task_id, steps, variables, data_source, row_start, row_end)
+        else:
+            step_iter = ((step, variables) for step in steps)
+
+        for index, (step, step_variables) in enumerate(step_iter):
             # 【关键修复】检查任务是否被取消
             if task_id in self.cancelled_tasks:
                 logger.info(f"任务 {task_id} 已被取消（本地标记）")
@@ -783,10 +912,10 @@ class TaskManagerV2:
             step_type = step.get("type", "")
             step_start_time = time.time()
 
-            logger.info(f"任务 {task_id}: 执行步骤 {index + 1}/{len(steps)}: {step_name} ({step_type})")
+            logger.info(f"任务 {task_id}: 执行步骤 {index + 1}/{total_steps}: {step_name} ({step_type})")
 
             # 执行步骤
-            step_result = executor.step_executor.execute(step, variables)
+            step_result = executor.step_executor.execute(step, step_variables)
 
             # 计算步骤耗时（毫秒）
             step_duration = round((time.time() - step_start_time) * 1000, 2)
@@ -796,6 +925,8 @@ class TaskManagerV2:
             step_result["type"] = step_type
             step_result["duration"] = step_duration
             step_result["step_index"] = index
+            if "_data_row" in step:
+                step_result["data_row"] = step["_data_row"]
 
             results.append(step_result)
 
@@ -807,7 +938,11 @@ class TaskManagerV2:
 
                 # 失败立即上传截图
                 if "screenshot" in step_result and step_result["screenshot"]:
-                    self._send_screenshot(task_id, step_result["screenshot"], is_failure=True)
+                    self._send_screenshot(
+                        task_id, step_result["screenshot"], is_failure=True,
+                        step_index=index, step_name=step_name,
+                        error_message=step_result.get("message", "")
+                    )
 
                 all_success = False
                 break
@@ -830,12 +965,48 @@ class TaskManagerV2:
                 "duration": round(duration, 2)
             }
 
+    def _iter_data_driven_steps(
+        self,
+        task_id: str,
+        steps: list,
+        variables: Dict[str, Any],
+        data_source: Dict[str, Any],
+        row_start: int = 0,
+        row_end: Optional[int] = None
+    ):
+        """
+        按页从平台拉取数据行，逐行生成 (步骤, 变量) 对
+
+        数据行合并到变量中，同名时以数据行为准；内存中只保留当前一页数据
+        """
+        page_size = data_source.get("page_size") or 100
+        offset = row_start
+        while row_end is None or offset < row_end:
+            limit = page_size if row_end is None else min(page_size, row_end - offset)
+            rows = self._fetch_data_rows(task_id, offset, limit)
+            if not rows:
+                return
+            for row in rows:
+                row_variables = {**variables, **(row.get("data") or {})}
+                for step in steps:
+                    yield {**step, "_data_row": row.get("row_index")}, row_variables
+            offset += len(rows)
+
+    def _fetch_data_rows(self, task_id: str, offset: int, limit: int) -> list:
+        """从平台获取一页数据行"""
+        response = get_api_client().get(
+            f"/api/tasks/{task_id}/data-rows/",
+            params={"offset": offset, "limit": limit},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json().get("rows", [])
+
     def _send_task_result(self, task_id: str, result: Dict[str, Any]):
         """发送任务执行结果到平台"""
         try:
             import json
-            api_base = self.config.server_url.rstrip('/')
-            result_url = f"{api_base}/api/tasks/{task_id}/result/"
+            api_client = get_api_client()
 
             # 【关键修复】后端期望的是 status 字段 ('completed'/'failed')，不是 success 字段
             # 将 success: True/False 转换为 status: 'completed'/'failed'
@@ -883,10 +1054,9 @@ class TaskManagerV2:
             # 【关键修复】使用 json 参数而不是 data 参数
             # requests 库会自动设置正确的 Content-Length 和 Content-Type 头
             # 避免 JSON 数据在传输过程中被截断
-            response = requests.post(
-                result_url,
+            response = api_client.post(
+                f"/api/tasks/{task_id}/result/",
                 json=result,  # 直接传入字典，让 requests 自动序列化
-                verify=False,  # 跳过 SSL 验证
                 timeout=10
             )
 
@@ -896,11 +1066,10 @@ class TaskManagerV2:
 
                 # 主动请求后端分发新任务（确保并发任务能立即开始）
                 try:
-                    distribute_url = f"{api_base}/api/tasks/distribute/"
-                    dist_response = requests.post(
-                        distribute_url,
+                    dist_response = api_client.post(
+                        "/api/tasks/distribute/",
                         json={},
-                        headers={'Content-Type': 'application/json; charset=utf-8'}, verify=False, timeout=5
+                        headers={'Content-Type': 'application/json; charset=utf-8'}, timeout=5
                     )
                     if dist_response.status_code == 200:
                         logger.info(f"已请求后端分发新任务")
@@ -929,8 +1098,9 @@ class TaskManagerV2:
 
         # 首先检查并发限制（注意：当前任务刚完成，所以有一个空位）
         current_tasks = len(self.running_tasks)
-        if current_tasks >= self.config.max_concurrent:
-            logger.debug(f"达到最大并发数 ({self.config.max_concurrent})，不触发等待队列中的任务")
+        capacity = self.admission.effective_capacity(current_tasks)
+        if current_tasks >= capacity:
+            logger.debug(f"达到有效并发数 ({capacity})，不触发等待队列中的任务")
             return
 
         # 检查是否还有同父任务正在运行（排除刚刚完成的任务）
@@ -984,20 +1154,37 @@ class TaskManagerV2:
             )
             thread.start()
 
-    def _send_screenshot(self, task_id: str, image_data: str, is_failure: bool = True):
-        """发送截图到平台"""
+    def _send_screenshot(self, task_id: str, image_data: str, is_failure: bool = True,
+                         step_index: int = 0, step_name: str = "", error_message: str = ""):
+        """发送截图到平台（二进制 multipart 上传，服务端不支持时回退为 base64 JSON）"""
         try:
-            api_base = self.config.server_url.rstrip('/')
-            screenshot_url = f"{api_base}/api/tasks/{task_id}/screenshot/"
-
-            # 【关键修复】使用 json 参数，requests 会自动处理序列化和 Content-Length
-            requests.post(
-                screenshot_url,
-                json={
-                    "image_data": image_data,
-                    "is_failure": is_failure
-                }, verify=False, timeout=10
+            import base64
+            api_client = get_api_client()
+
+            if image_data.startswith('data:image'):
+                image_data = image_data.split(',', 1)[1]
+            image_bytes = base64.b64decode(image_data)
+
+            response = api_client.post(
+                f"/api/tasks/{task_id}/screenshot/upload/",
+                files={"file": (f"task_{task_id}_step_{step_index}.png", image_bytes, "image/png")},
+                data={
+                    "is_failure": "true" if is_failure else "false",
+                    "step_index": step_index,
+                    "step_name": step_name,
+                    "error_message": error_message or ""
+                }, timeout=10
             )
+
+            # 旧版平台没有上传端点，回退到 base64 JSON 接口
+            if response.status_code == 404:
+                api_client.post(
+                    f"/api/tasks/{task_id}/screenshot/",
+                    json={
+                        "image_data": image_data,
+                        "is_failure": is_failure
+                    }, timeout=10
+                )
             logger.info(f"截图已上报: {task_id}")
 
         except Exception as e:
@@ -1027,6 +1214,13 @@ class TaskManagerV2:
         # 停止消息队列消费者
         self.mq_consumer.stop()
 
+        # 关闭浏览器池中的空闲浏览器，执行中的浏览器在任务结束归还时关闭
+        get_browser_pool().close()
+
+        # 关闭任务进程池，执行中的任务会先被取消
+        if self.process_pool:
+            self.process_pool.shutdown()
+
         # 取消所有正在执行的任务
         for task_id in list(self.running_tasks.keys()):
             self.cancelled_tasks.add(task_id)
@@ -1044,6 +1238,44 @@ class TaskManagerV2:
         logger.info("任务管理器已断开连接并清空所有缓存和历史记录")
 
 
+class _CancelEventFlag:
+    """
+    工作进程中的取消标记
+
+    模拟 cancelled_tasks 集合的用法，实际状态保存在主进程可设置的 multiprocessing.Event 中；
+    工作进程同一时间只执行一个任务，因此不区分 task_id
+    """
+
+    def __init__(self, event):
+        self._event = event
+
+    def __contains__(self, task_id) -> bool:
+        return self._event.is_set()
+
+    def add(self, task_id):
+        self._event.set()
+
+    def discard(self, task_id):
+        pass
+
+
+class WorkerTaskRunner(TaskManagerV2):
+    """
+    工作进程中的任务执行器
+
+    只复用 TaskManagerV2 的脚本执行和结果上报逻辑，不连接消息队列、不发送心跳；
+    其余状态与 TaskManagerV2 一致，由父类初始化
+    """
+
+    def __init__(self, cancel_event):
+        super().__init__()
+        self.cancelled_tasks = _CancelEventFlag(cancel_event)
+
+    def _attach_message_queue(self):
+        """工作进程不连接消息队列"""
+        self.mq_consumer = None
+
+
 # 单例
 _task_manager_v2: Optional[TaskManagerV2] = None
 
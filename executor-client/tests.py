@@ -0,0 +1,529 @@
+"""
+执行机客户端单元测试
+
+在 executor-client 目录下运行: python -m unittest tests
+"""
+import os
+import queue
+import time
+import unittest
+from unittest import mock
+
+from browser_pool import BrowserPool
+from process_pool import TaskProcessPool, TaskWorkerError
+
+
+class FakeExecutor:
+    """模拟 ScriptExecutor，不启动真实浏览器"""
+
+    def __init__(self):
+        self.browser_type = None
+        self.launch_seconds = 0.5
+        self.uses = 0
+        self.alive = True
+        self.reset_ok = True
+        self.resets = 0
+        self.stopped = False
+
+    def start(self, browser_type):
+        self.browser_type = browser_type
+        return True
+
+    def is_alive(self):
+        return self.alive and not self.stopped
+
+    def reset(self):
+        self.resets += 1
+        return self.reset_ok
+
+    def stop(self):
+        self.stopped = True
+
+
+class BrowserPoolTest(unittest.TestCase):
+    """浏览器池测试"""
+
+    def setUp(self):
+        patcher = mock.patch('browser_pool.ScriptExecutor', FakeExecutor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_reset_browser(self):
+        """测试归还后清理状态并被下一个任务复用"""
+        pool = BrowserPool(size=1)
+        first = pool.acquire('chrome')
+        pool.release(first)
+        second = pool.acquire('chrome')
+
+        self.assertIs(first, second)
+        self.assertEqual((first.resets, first.uses), (1, 2))
+        stats = pool.get_stats()
+        self.assertEqual((stats['launches'], stats['hits'], stats['hit_rate']), (1, 1, 0.5))
+        self.assertEqual(stats['saved_seconds'], 0.5)
+
+    def test_firefox_is_not_pooled(self):
+        """测试 Firefox 无法完整清理 Cookie，归还时直接关闭"""
+        pool = BrowserPool(size=2)
+        executor = pool.acquire('firefox')
+        pool.release(executor)
+
+        self.assertTrue(executor.stopped)
+        self.assertEqual(executor.resets, 0)
+        self.assertIsNot(pool.acquire('firefox'), executor)
+        self.assertEqual(pool.get_stats()['hits'], 0)
+
+    def test_discards_unusable_browsers(self):
+        """测试清理失败、达到使用上限、不可复用或超出容量时关闭浏览器"""
+        pool = BrowserPool(size=1, max_uses=2)
+
+        failed_reset = pool.acquire('chrome')
+        failed_reset.reset_ok = False
+        pool.release(failed_reset)
+        self.assertTrue(failed_reset.stopped)
+
+        not_reusable = pool.acquire('chrome')
+        pool.release(not_reusable, reusable=False)
+        self.assertTrue(not_reusable.stopped)
+
+        worn = pool.acquire('chrome')
+        pool.release(worn)
+        self.assertIs(pool.acquire('chrome'), worn)
+        pool.release(worn)
+        self.assertTrue(worn.stopped)
+
+        first, second = pool.acquire('edge'), pool.acquire('edge')
+        pool.release(first)
+        pool.release(second)
+        self.assertFalse(first.stopped)
+        self.assertTrue(second.stopped)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+
+    def test_dead_idle_browser_replaced(self):
+        """测试空闲浏览器崩溃后获取时关闭并启动新浏览器"""
+        pool = BrowserPool(size=1)
+        executor = pool.acquire('chrome')
+        pool.release(executor)
+        executor.alive = False
+
+        replacement = pool.acquire('chrome')
+        self.assertIsNot(replacement, executor)
+        self.assertTrue(executor.stopped)
+        self.assertEqual(pool.get_stats()['launches'], 2)
+
+    def test_evict_idle_and_close(self):
+        """测试空闲超时的浏览器被关闭，关闭池后归还的浏览器也直接关闭"""
+        pool = BrowserPool(size=2, idle_ttl=60)
+        expired, fresh, in_use = pool.acquire('chrome'), pool.acquire('chrome'), pool.acquire('edge')
+        pool.release(expired)
+        pool.release(fresh)
+        pool._idle['chrome'][0] = (expired, 0)
+
+        pool.evict_idle()
+        self.assertTrue(expired.stopped)
+        self.assertFalse(fresh.stopped)
+
+        pool.close()
+        self.assertTrue(fresh.stopped)
+        pool.release(in_use)
+        self.assertTrue(in_use.stopped)
+        self.assertEqual(pool.get_stats()['idle'], 0)
+
+
+
+class BrowserResetTest(unittest.TestCase):
+    """Chrome/Edge 归还前的状态清理"""
+
+    def setUp(self):
+        from executor import ScriptExecutor
+
+        self.cdp_calls = []
+        self.fail_command = None
+        self.frame_tree = {'frameTree': {
+            'frame': {'url': 'https://a.example/page', 'securityOrigin': 'https://a.example'},
+            'childFrames': [{'frame': {'url': 'https://ads.example/frame', 'securityOrigin': 'https://ads.example'}}],
+        }}
+
+        driver = mock.MagicMock()
+        driver.window_handles = ['main']
+        driver.current_url = 'https://a.example/page'
+        driver.execute_cdp_cmd.side_effect = self._cdp
+        self.executor = ScriptExecutor()
+        self.executor.driver = driver
+        self.executor.browser_type = 'chrome'
+        self.executor.step_executor = mock.MagicMock()
+        self.executor.step_executor.execute.return_value = {'success': True}
+
+    def _cdp(self, command, params):
+        if command == self.fail_command:
+            raise RuntimeError('cdp failed')
+        if command == 'Page.getFrameTree':
+            return self.frame_tree
+        self.cdp_calls.append((command, params.get('origin')))
+        return {}
+
+    def test_clears_every_visited_origin(self):
+        """测试清除任务中访问过的所有源（含已离开的页面和 iframe）"""
+        self.executor.execute_script({'steps': [{'name': 'open a'}]})
+        self.frame_tree = {'frameTree': {'frame': {'url': 'https://b.example/', 'securityOrigin': 'https://b.example'}}}
+        self.executor.execute_script({'steps': [{'name': 'open b'}]})
+
+        self.assertTrue(self.executor.reset())
+        cleared = {origin for command, origin in self.cdp_calls if command == 'Storage.clearDataForOrigin'}
+        self.assertEqual(cleared, {'https://a.example', 'https://ads.example', 'https://b.example'})
+        self.assertIn(('Network.clearBrowserCookies', None), self.cdp_calls)
+        self.assertEqual(self.executor.visited_origins, set())
+
+    def test_cdp_failure_prevents_reuse(self):
+        """测试 CDP 清理失败时不复用浏览器"""
+        self.executor.execute_script({'steps': [{'name': 'open a'}]})
+        self.fail_command = 'Storage.clearDataForOrigin'
+        self.assertFalse(self.executor.reset())
+
+    def test_incomplete_origin_record_prevents_reuse(self):
+        """测试无法记录访问的源时不复用浏览器"""
+        self.fail_command = 'Page.getFrameTree'
+        self.executor.execute_script({'steps': [{'name': 'open a'}]})
+        self.fail_command = None
+        self.assertFalse(self.executor.reset())
+
+
+class DriverCacheTest(unittest.TestCase):
+    """驱动路径缓存"""
+
+    def setUp(self):
+        import tempfile
+        import shutil
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.cache_path = os.path.join(self.tmpdir, 'drivers.json')
+        self.version = '120.0.6099.109'
+        self.installs = []
+        self.offline = False
+
+        patchers = [
+            mock.patch('utils.driver_cache._install_driver', side_effect=self._install),
+            mock.patch('utils.driver_cache.DriverCache._detect_version', side_effect=lambda *args: self.version),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _install(self, browser_type):
+        if self.offline:
+            raise ConnectionError('offline')
+        path = os.path.join(self.tmpdir, f'{browser_type}driver-{self.version}')
+        with open(path, 'w') as f:
+            f.write('driver')
+        self.installs.append(path)
+        return path
+
+    def _cache(self):
+        from utils.driver_cache import DriverCache
+        return DriverCache(self.cache_path)
+
+    def test_cached_path_reused_across_instances(self):
+        """测试解析结果持久化，浏览器版本不变时不再调用 webdriver-manager"""
+        path = self._cache().resolve('chrome')
+        self.assertEqual(self._cache().resolve('chrome'), path)
+        self.assertEqual(self.installs, [path])
+
+    def test_browser_upgrade_resolves_again(self):
+        cache = self._cache()
+        old_path = cache.resolve('chrome')
+        self.version = '121.0.6167.85'
+        cache._versions.clear()
+
+        new_path = cache.resolve('chrome')
+        self.assertNotEqual(new_path, old_path)
+        self.assertEqual(len(self.installs), 2)
+
+    def test_offline_falls_back_to_same_major(self):
+        """测试离线时回退到同一主版本的驱动，解析失败后一段时间内不再重试"""
+        cache = self._cache()
+        cached = cache.resolve('chrome')
+        self.version = '120.0.6099.200'
+        cache._versions.clear()
+        self.offline = True
+
+        self.assertEqual(cache.resolve('chrome'), cached)
+        with mock.patch('utils.driver_cache._install_driver') as install:
+            self.assertEqual(cache.resolve('chrome'), cached)
+            install.assert_not_called()
+
+    def test_invalidate_removes_entries_for_path(self):
+        cache = self._cache()
+        path = cache.resolve('chrome')
+        cache.invalidate('chrome', path)
+
+        self.assertEqual(self._cache()._entries['chrome'], {})
+        self.assertIsNotNone(cache.resolve('chrome'))
+        self.assertEqual(len(self.installs), 2)
+
+    def test_version_mismatch_detection(self):
+        from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+        from utils.driver_cache import is_version_mismatch
+
+        self.assertTrue(is_version_mismatch(SessionNotCreatedException(
+            'session not created: This version of ChromeDriver only supports Chrome version 114\n'
+            'Current browser version is 120.0.6099.109'
+        )))
+        self.assertFalse(is_version_mismatch(SessionNotCreatedException('session not created: Chrome failed to start')))
+        self.assertFalse(is_version_mismatch(WebDriverException('only supports Chrome version 114')))
+
+    def test_start_invalidates_only_on_version_mismatch(self):
+        """测试浏览器偶发启动失败时保留缓存，版本不匹配时才移除"""
+        from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+        from executor import ScriptExecutor
+
+        errors = [
+            (WebDriverException('chrome not reachable'), False),
+            (SessionNotCreatedException('This version of ChromeDriver only supports Chrome version 114'), True),
+        ]
+        for error, invalidated in errors:
+            executor = ScriptExecutor()
+            executor.cached_driver_path = '/drivers/chromedriver'
+            with mock.patch.object(ScriptExecutor, '_create_chrome_driver', side_effect=error), \
+                    mock.patch('executor.get_driver_cache') as get_cache:
+                self.assertFalse(executor.start('chrome'))
+            self.assertEqual(get_cache.return_value.invalidate.called, invalidated)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    """并发准入控制"""
+
+    def setUp(self):
+        self.usage = {'cpu': 10.0, 'cpu_count': 16, 'memory_available_mb': 16384}
+        self.children_rss = 0.0
+        patchers = [
+            mock.patch('admission.get_resource_usage', side_effect=lambda: dict(self.usage)),
+            mock.patch('admission.get_children_rss_mb', side_effect=lambda: self.children_rss),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _controller(self, max_concurrent=8):
+        from admission import AdmissionController
+        return AdmissionController(max_concurrent, cpu_limit=85.0, memory_reserve_mb=1024)
+
+    def test_bounded_by_max_concurrent(self):
+        controller = self._controller(max_concurrent=2)
+        self.assertEqual(controller.effective_capacity(0), 2)
+        self.assertEqual(controller.get_stats()['limited_by'], 'max_concurrent')
+
+    def test_memory_limit_uses_default_estimate(self):
+        """测试未实测时按默认单任务内存估算"""
+        self.usage['memory_available_mb'] = 1024 + 600 * 3 + 100
+        controller = self._controller()
+        self.assertEqual(controller.effective_capacity(0), 3)
+        self.assertEqual(controller.get_stats()['limited_by'], 'memory')
+
+    def test_estimates_from_running_tasks(self):
+        """测试按正在执行的任务实测单任务内存和 CPU，本机任务已占用的内存计入预算"""
+        self.usage.update(cpu=20.0, memory_available_mb=3000)
+        self.children_rss = 1000.0
+        controller = self._controller(max_concurrent=16)
+
+        # 内存: (3000 + 1000 - 1024) // 500 = 5；CPU: 2 + (85 - 20) // 10 = 8
+        self.assertEqual(controller.effective_capacity(2), 5)
+        stats = controller.get_stats()
+        self.assertEqual((stats['task_rss_mb'], stats['task_cpu_percent']), (500.0, 10.0))
+        self.assertEqual((stats['memory_slots'], stats['cpu_slots']), (5, 8))
+
+    def test_cpu_over_limit_keeps_running_tasks_only(self):
+        self.usage['cpu'] = 95.0
+        self.children_rss = 1200.0
+        self.assertEqual(self._controller().effective_capacity(3), 3)
+
+    def test_always_admits_one_task(self):
+        """测试资源不足时仍允许执行一个任务"""
+        self.usage.update(cpu=99.0, memory_available_mb=100)
+        self.assertEqual(self._controller().effective_capacity(0), 1)
+
+    def test_sample_reused_within_ttl(self):
+        """测试采样有效期内复用结果，更新并发上限后立即重新计算"""
+        controller = self._controller()
+        self.assertEqual(controller.effective_capacity(0), 8)
+        self.usage['memory_available_mb'] = 1024 + 600
+        self.assertEqual(controller.effective_capacity(0), 8)
+
+        controller.set_max_concurrent(4)
+        self.assertEqual(controller.effective_capacity(0), 1)
+
+    def test_sampling_failure_falls_back_to_max_concurrent(self):
+        controller = self._controller(max_concurrent=5)
+        with mock.patch('admission.get_resource_usage', side_effect=OSError('psutil')):
+            self.assertEqual(controller.effective_capacity(0), 5)
+
+
+class ApiClientTest(unittest.TestCase):
+    """平台 API 客户端"""
+
+    def setUp(self):
+        self.config = mock.Mock(server_url='http://platform:8000/', api_pool_size=4, api_max_retries=2)
+        patchers = [
+            mock.patch('api_client.get_config_manager', return_value=mock.Mock(get=lambda: self.config)),
+            mock.patch('api_client.time.sleep'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        from api_client import ApiClient
+        self.client = ApiClient(max_retries=2)
+        self.client.session = mock.Mock()
+
+    def _response(self, status_code):
+        return mock.Mock(status_code=status_code)
+
+    def test_session_reused_and_url_follows_config(self):
+        """测试所有请求共用同一个 Session，服务器地址修改后立即生效"""
+        self.client.session.request.return_value = self._response(200)
+
+        self.client.get('/api/executor/heartbeat/')
+        self.config.server_url = 'https://other'
+        self.client.post('/api/tasks/12/result/', json={'ok': True})
+
+        calls = self.client.session.request.call_args_list
+        self.assertEqual(calls[0], mock.call('GET', 'http://platform:8000/api/executor/heartbeat/',
+                                             timeout=10, verify=False))
+        self.assertEqual(calls[1], mock.call('POST', 'https://other/api/tasks/12/result/',
+                                             timeout=10, verify=False, json={'ok': True}))
+
+    def test_idempotent_request_retried_on_connection_error(self):
+        import requests
+
+        response = self._response(200)
+        self.client.session.request.side_effect = [requests.ConnectionError('reset'), response]
+
+        self.assertIs(self.client.get('/api/tasks/1/'), response)
+        stats = self.client.get_stats()
+        self.assertEqual((stats['requests'], stats['errors'], stats['retries']), (2, 1, 1))
+        self.assertEqual(list(stats['endpoints']), ['GET /api/tasks/{id}/'])
+
+    def test_retry_statuses_exhausted_returns_last_response(self):
+        """测试 503 重试次数用尽后返回最后一次响应，中间的响应被关闭"""
+        responses = [self._response(503) for _ in range(3)]
+        self.client.session.request.side_effect = responses
+
+        self.assertIs(self.client.get('/api/drivers/'), responses[-1])
+        self.assertEqual(self.client.session.request.call_count, 3)
+        responses[0].close.assert_called_once()
+        responses[-1].close.assert_not_called()
+
+    def test_client_errors_not_retried(self):
+        self.client.session.request.return_value = self._response(404)
+
+        self.assertEqual(self.client.get('/api/tasks/1/').status_code, 404)
+        self.assertEqual(self.client.session.request.call_count, 1)
+        self.assertEqual(self.client.get_stats()['errors'], 0)
+
+    def test_post_not_retried_by_default(self):
+        import requests
+
+        self.client.session.request.side_effect = requests.Timeout('timeout')
+
+        with self.assertRaises(requests.Timeout):
+            self.client.post('/api/tasks/1/result/')
+        self.assertEqual(self.client.session.request.call_count, 1)
+
+        self.client.session.request.reset_mock()
+        with self.assertRaises(requests.Timeout):
+            self.client.post('/api/tasks/1/result/', retries=1)
+        self.assertEqual(self.client.session.request.call_count, 2)
+
+    def test_singleton_recreated_in_child_process(self):
+        """测试同一进程内复用客户端，进程变化（工作进程）后重新创建"""
+        import api_client
+
+        with mock.patch.object(api_client, '_api_client', None):
+            client = api_client.get_api_client()
+            self.assertIs(api_client.get_api_client(), client)
+            with mock.patch('api_client.os.getpid', return_value=-1):
+                self.assertIsNot(api_client.get_api_client(), client)
+
+
+def _test_worker(worker_id, inbox, outbox, cancel_event, idle_interval):
+    """测试用工作进程入口：按任务数据模拟执行、等待取消或崩溃"""
+    while True:
+        try:
+            task_data = inbox.get(timeout=idle_interval)
+        except queue.Empty:
+            continue
+        if task_data is None:
+            break
+        action = task_data.get("action")
+        if action == "crash":
+            os._exit(3)
+        if action in ("hang", "wait_cancel"):
+            deadline = time.time() + 60
+            while time.time() < deadline and not (action == "wait_cancel" and cancel_event.is_set()):
+                time.sleep(0.05)
+        outbox.put(("result", worker_id, task_data["task_id"], {
+            "success": not cancel_event.is_set(), "message": str(os.getpid()), "cancelled": cancel_event.is_set()
+        }))
+
+
+class TaskProcessPoolTest(unittest.TestCase):
+    """任务进程池测试（使用测试工作进程，不执行真实脚本）"""
+
+    def setUp(self):
+        self.pool = TaskProcessPool(max_workers=1, task_timeout=0, worker_target=_test_worker)
+        self.addCleanup(self.pool.shutdown, 5)
+
+    def test_runs_tasks_and_reuses_worker(self):
+        """测试任务结果回传，空闲工作进程被下一个任务复用"""
+        first = self.pool.run({"task_id": "t1"})
+        second = self.pool.run({"task_id": "t2"})
+
+        self.assertTrue(first["success"])
+        self.assertEqual(first["message"], second["message"])
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["tasks"], stats["workers"], stats["busy"]), (2, 1, 0))
+
+    def test_crashed_worker_replaced(self):
+        """测试工作进程崩溃时抛出 TaskWorkerError，下一个任务使用新的工作进程"""
+        with self.assertRaises(TaskWorkerError):
+            self.pool.run({"task_id": "crash", "action": "crash"})
+        self.assertEqual(self.pool.get_stats()["crashes"], 1)
+        self.assertTrue(self.pool.run({"task_id": "after"})["success"])
+
+    def test_timeout_kills_worker(self):
+        """测试任务超时后终止工作进程"""
+        self.pool.task_timeout = 1
+        with self.assertRaises(TaskWorkerError):
+            self.pool.run({"task_id": "hang", "action": "hang"})
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["timeouts"], stats["killed"], stats["workers"]), (1, 1, 0))
+
+    def test_cancel_is_forwarded_to_worker(self):
+        """测试 should_cancel 返回 True 时通知工作进程取消当前任务"""
+        result = self.pool.run({"task_id": "cancel", "action": "wait_cancel"}, should_cancel=lambda: True)
+        self.assertTrue(result["cancelled"])
+
+
+class WorkerTaskRunnerTest(unittest.TestCase):
+    """工作进程任务执行器测试"""
+
+    def test_inherits_manager_state_without_message_queue(self):
+        """测试工作进程执行器由父类初始化全部状态，但不连接消息队列"""
+        import multiprocessing
+        from task_manager_v2 import TaskManagerV2, WorkerTaskRunner
+
+        with mock.patch('task_manager_v2.get_message_queue_consumer') as get_consumer:
+            runner = WorkerTaskRunner(multiprocessing.Event())
+        get_consumer.assert_not_called()
+        self.assertIsNone(runner.mq_consumer)
+
+        with mock.patch('task_manager_v2.get_message_queue_consumer'):
+            manager_attrs = set(vars(TaskManagerV2()))
+        self.assertLessEqual(manager_attrs, set(vars(runner)))
+
+        self.assertNotIn("task", runner.cancelled_tasks)
+        runner.cancelled_tasks.add("task")
+        self.assertIn("task", runner.cancelled_tasks)
+
+
+if __name__ == '__main__':
+    unittest.main()
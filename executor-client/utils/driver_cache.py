@@ -0,0 +1,305 @@
+"""
+WebDriver 驱动路径缓存
+- 按浏览器类型和版本缓存 webdriver-manager 解析出的驱动路径，持久化到本地 JSON 文件
+- 浏览器版本不变时直接使用缓存路径，不再做版本探测和网络请求
+- 浏览器升级后自动重新解析；离线时回退到同一主版本或最近一次解析的驱动
+- 只有驱动与浏览器版本不匹配导致启动失败时才移除缓存，浏览器偶发崩溃不影响离线复用
+"""
+
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+from loguru import logger
+from selenium.common.exceptions import SessionNotCreatedException
+
+
+VERSION_PATTERN = re.compile(r"(\d+(?:\.\d+)+)")
+
+# 驱动与浏览器版本不匹配时 SessionNotCreatedException 的错误信息
+# 例如 "This version of ChromeDriver only supports Chrome version 114\nCurrent browser version is 120.0"
+VERSION_MISMATCH_PATTERN = re.compile(
+    r"only supports .*version|current browser version is|browser version .*not supported",
+    re.IGNORECASE
+)
+
+# 非 Windows 平台上用于探测版本的浏览器命令
+BROWSER_COMMANDS = {
+    "chrome": [
+        "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    ],
+    "firefox": [
+        "firefox",
+        "/Applications/Firefox.app/Contents/MacOS/firefox",
+    ],
+    "edge": [
+        "microsoft-edge", "microsoft-edge-stable",
+        "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
+    ],
+}
+
+# Windows 注册表中的浏览器版本 (键路径, 值名)
+WINDOWS_REGISTRY_KEYS = {
+    "chrome": [
+        (r"Software\Google\Chrome\BLBeacon", "version"),
+        (r"SOFTWARE\WOW6432Node\Google\Chrome\BLBeacon", "version"),
+    ],
+    "firefox": [
+        (r"SOFTWARE\Mozilla\Mozilla Firefox", "CurrentVersion"),
+        (r"SOFTWARE\WOW6432Node\Mozilla\Mozilla Firefox", "CurrentVersion"),
+    ],
+    "edge": [
+        (r"Software\Microsoft\Edge\BLBeacon", "version"),
+        (r"SOFTWARE\WOW6432Node\Microsoft\Edge\BLBeacon", "version"),
+    ],
+}
+
+
+def _install_driver(browser_type: str) -> str:
+    """调用 webdriver-manager 下载或定位驱动，返回驱动路径"""
+    if browser_type == "chrome":
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    if browser_type == "firefox":
+        from webdriver_manager.firefox import GeckoDriverManager
+        return GeckoDriverManager().install()
+    if browser_type == "edge":
+        from webdriver_manager.microsoft import EdgeChromiumDriverManager
+        return EdgeChromiumDriverManager().install()
+    raise ValueError(f"不支持的浏览器类型: {browser_type}")
+
+
+def is_version_mismatch(error: Exception) -> bool:
+    """浏览器启动失败是否由驱动与浏览器版本不匹配引起"""
+    return isinstance(error, SessionNotCreatedException) and bool(
+        VERSION_MISMATCH_PATTERN.search(str(error))
+    )
+
+
+class DriverCache:
+    """
+    驱动路径缓存
+
+    缓存文件结构: {browser_type: {browser_version: {"path": str, "resolved_at": str}}}
+    浏览器版本探测结果在进程内缓存 VERSION_CHECK_INTERVAL 秒，用于发现浏览器升级。
+    """
+
+    VERSION_CHECK_INTERVAL = 600
+    UNKNOWN_VERSION = "unknown"
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        # 同一浏览器只允许一个线程解析，避免并发任务同时下载驱动
+        self._resolve_locks: Dict[str, threading.Lock] = {
+            browser_type: threading.Lock() for browser_type in BROWSER_COMMANDS
+        }
+        # (browser_type, browser_path) -> (version, 探测时间)
+        self._versions: Dict[tuple, tuple] = {}
+        # (browser_type, version) -> 最近一次解析失败的时间，离线时避免每次启动都重试网络请求
+        self._failed_at: Dict[tuple, float] = {}
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"加载驱动缓存失败: {e}，将重新解析驱动")
+            return {}
+
+    def _save(self):
+        """写入临时文件后替换，避免进程中断时留下损坏的缓存文件"""
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"保存驱动缓存失败: {e}")
+
+    def resolve(self, browser_type: str, browser_path: str = "") -> Optional[str]:
+        """
+        获取驱动路径
+
+        Args:
+            browser_type: 浏览器类型 (chrome/firefox/edge)
+            browser_path: 配置的浏览器路径，用于探测版本
+
+        Returns:
+            驱动路径；无法解析且没有可用缓存时返回 None，由 Selenium Manager 兜底
+        """
+        version = self.get_browser_version(browser_type, browser_path) or self.UNKNOWN_VERSION
+
+        cached = self._lookup(browser_type, version)
+        if cached:
+            return cached
+
+        with self._resolve_locks.setdefault(browser_type, threading.Lock()):
+            # 等锁期间其他线程可能已完成解析
+            cached = self._lookup(browser_type, version)
+            if cached:
+                return cached
+
+            failed_at = self._failed_at.get((browser_type, version))
+            if failed_at and time.time() - failed_at < self.VERSION_CHECK_INTERVAL:
+                return self._fallback(browser_type, version)
+
+            try:
+                start_time = time.time()
+                driver_path = _install_driver(browser_type)
+                logger.info(
+                    f"驱动解析完成: {browser_type} {version} -> {driver_path} "
+                    f"(耗时 {time.time() - start_time:.2f}s)"
+                )
+            except Exception as e:
+                self._failed_at[(browser_type, version)] = time.time()
+                fallback = self._fallback(browser_type, version)
+                if fallback:
+                    logger.warning(f"驱动解析失败: {e}，使用已缓存的驱动: {fallback}")
+                else:
+                    logger.warning(f"驱动解析失败且没有可用缓存: {browser_type} {version}, {e}")
+                return fallback
+
+            with self._lock:
+                self._entries.setdefault(browser_type, {})[version] = {
+                    "path": driver_path,
+                    "resolved_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                self._save()
+            return driver_path
+
+    def _lookup(self, browser_type: str, version: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(browser_type, {}).get(version)
+        if entry and os.path.isfile(entry.get("path", "")):
+            return entry["path"]
+        return None
+
+    def _fallback(self, browser_type: str, version: str) -> Optional[str]:
+        """离线时优先使用同一主版本的驱动，其次使用最近解析的驱动"""
+        with self._lock:
+            entries = list(self._entries.get(browser_type, {}).items())
+
+        available = [
+            (cached_version, entry) for cached_version, entry in entries
+            if os.path.isfile(entry.get("path", ""))
+        ]
+        if not available:
+            return None
+
+        major = version.split(".")[0]
+        same_major = [item for item in available if item[0].split(".")[0] == major]
+        candidates = same_major or available
+        candidates.sort(key=lambda item: item[1].get("resolved_at", ""))
+        return candidates[-1][1]["path"]
+
+    def invalidate(self, browser_type: str, driver_path: str):
+        """驱动与浏览器版本不匹配时移除对应缓存，下次启动重新解析"""
+        with self._lock:
+            entries = self._entries.get(browser_type, {})
+            stale = [version for version, entry in entries.items() if entry.get("path") == driver_path]
+            for version in stale:
+                entries.pop(version)
+            if stale:
+                self._save()
+                logger.info(f"已移除失效的驱动缓存: {browser_type} {driver_path}")
+
+    def warm_up(self, browser_types: List[str], browser_paths: Dict[str, str] = None):
+        """预先解析驱动，通常在执行机启动时于后台线程调用"""
+        browser_paths = browser_paths or {}
+        for browser_type in browser_types:
+            try:
+                self.resolve(browser_type, browser_paths.get(browser_type, ""))
+            except Exception as e:
+                logger.warning(f"预解析驱动失败: {browser_type}, {e}")
+
+    def get_browser_version(self, browser_type: str, browser_path: str = "") -> Optional[str]:
+        """
+        探测浏览器版本，结果在进程内缓存一段时间
+
+        Returns:
+            版本号字符串，无法探测时返回 None
+        """
+        key = (browser_type, browser_path or "")
+        now = time.time()
+        with self._lock:
+            memo = self._versions.get(key)
+        if memo and now - memo[1] < self.VERSION_CHECK_INTERVAL:
+            return memo[0]
+
+        version = self._detect_version(browser_type, browser_path)
+        with self._lock:
+            self._versions[key] = (version, now)
+        if memo and version and memo[0] and memo[0] != version:
+            logger.info(f"检测到浏览器升级: {browser_type} {memo[0]} -> {version}")
+        return version
+
+    def _detect_version(self, browser_type: str, browser_path: str) -> Optional[str]:
+        # Windows 上 chrome.exe --version 会直接打开浏览器窗口，只读取注册表
+        if platform.system() == "Windows":
+            return self._read_windows_registry(browser_type)
+
+        commands = [browser_path] if browser_path else []
+        commands += BROWSER_COMMANDS.get(browser_type, [])
+        for command in commands:
+            executable = command if os.path.isfile(command) else shutil.which(command)
+            if not executable:
+                continue
+            try:
+                output = subprocess.run(
+                    [executable, "--version"],
+                    capture_output=True, text=True, timeout=10
+                ).stdout
+            except Exception:
+                continue
+            match = VERSION_PATTERN.search(output or "")
+            if match:
+                return match.group(1)
+        return None
+
+    @staticmethod
+    def _read_windows_registry(browser_type: str) -> Optional[str]:
+        try:
+            import winreg
+        except ImportError:
+            return None
+
+        for key_path, value_name in WINDOWS_REGISTRY_KEYS.get(browser_type, []):
+            for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(hive, key_path) as key:
+                        value, _ = winreg.QueryValueEx(key, value_name)
+                except OSError:
+                    continue
+                match = VERSION_PATTERN.search(str(value))
+                if match:
+                    return match.group(1)
+        return None
+
+
+# 单例
+_driver_cache: Optional[DriverCache] = None
+_driver_cache_lock = threading.Lock()
+
+
+def get_driver_cache() -> DriverCache:
+    """获取驱动缓存单例，缓存文件与配置文件位于同一目录"""
+    global _driver_cache
+    with _driver_cache_lock:
+        if _driver_cache is None:
+            from config import get_config_manager
+            cache_dir = Path(get_config_manager().config_path).parent
+            _driver_cache = DriverCache(str(cache_dir / "drivers.json"))
+        return _driver_cache
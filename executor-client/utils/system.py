@@ -30,7 +30,8 @@ def get_resource_usage() -> dict:
     获取系统资源使用情况
 
     Returns:
-        资源使用情况 {"cpu": float, "memory": float, "disk": float}
+        资源使用情况 {"cpu": float, "memory": float, "disk": float,
+                      "cpu_count": int, "memory_total_mb": float, "memory_available_mb": float}
     """
     # CPU 使用率（百分比）
     cpu_percent = psutil.cpu_percent(interval=0.1)
@@ -46,10 +47,33 @@ def get_resource_usage() -> dict:
     return {
         "cpu": round(cpu_percent, 1),
         "memory": round(memory_percent, 1),
-        "disk": round(disk_percent, 1)
+        "disk": round(disk_percent, 1),
+        "cpu_count": psutil.cpu_count() or 1,
+        "memory_total_mb": round(memory.total / 1024 / 1024, 1),
+        "memory_available_mb": round(memory.available / 1024 / 1024, 1)
     }
 
 
+def get_children_rss_mb() -> float:
+    """
+    获取当前进程所有子进程（驱动、浏览器、任务工作进程）的常驻内存总和
+
+    Returns:
+        常驻内存（MB）
+    """
+    total = 0
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return 0.0
+    for child in children:
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            continue
+    return round(total / 1024 / 1024, 1)
+
+
 def get_platform() -> str:
     """
     获取操作系统平台
@@ -0,0 +1,215 @@
+"""
+变量模板编译
+将步骤树中的 ${变量名} 占位符预先解析为模板，渲染时只处理占位符所在的路径
+
+编译的开销大于一次性渲染，只有同一对象渲染多次时才值得编译；只渲染一次时使用 render_template
+
+平台后端 engine/template.py 与执行机客户端 utils/template.py 是同一份文件，修改时需同步
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+PLACEHOLDER_PATTERN = re.compile(r'\$\{([^}]+)\}')
+
+_MISSING = object()
+
+# 渲染函数签名: renderer(lookup) -> value，lookup(name, placeholder) -> str
+Renderer = Callable[[Callable[[str, str], str]], Any]
+
+
+@lru_cache(maxsize=4096)
+def _compile_string(text: str) -> Optional[Renderer]:
+    """编译字符串，不含占位符时返回 None"""
+    if '${' not in text:
+        return None
+    parts = PLACEHOLDER_PATTERN.split(text)
+    if len(parts) == 1:
+        return None
+
+    # 整个字符串就是一个占位符
+    if len(parts) == 3 and not parts[0] and not parts[2]:
+        name = parts[1]
+        return lambda lookup: lookup(name, text)
+
+    literals = parts[0::2]
+    names = parts[1::2]
+    slots = [(name, f'${{{name}}}', literals[i + 1]) for i, name in enumerate(names)]
+    head = literals[0]
+
+    def render(lookup):
+        out = [head]
+        for name, placeholder, literal in slots:
+            out.append(lookup(name, placeholder))
+            out.append(literal)
+        return ''.join(out)
+
+    return render
+
+
+def _compile_dict(source: dict, copy_containers: bool) -> Optional[Renderer]:
+    slots = []
+    for key, value in source.items():
+        if type(key) is str and '${' in key and _compile_string(key):
+            return _compile_dict_with_keys(source, copy_containers)
+        if type(value) is str:
+            if '${' not in value:
+                continue
+            value_renderer = _compile_string(value)
+        elif isinstance(value, (dict, list)):
+            value_renderer = _compile(value, copy_containers)
+        else:
+            continue
+        if value_renderer is not None:
+            slots.append((key, value_renderer))
+
+    if not slots and not copy_containers:
+        return None
+
+    def render(lookup):
+        out = dict(source)
+        for key, value_renderer in slots:
+            out[key] = value_renderer(lookup)
+        return out
+
+    return render
+
+
+def _compile_dict_with_keys(source: dict, copy_containers: bool) -> Renderer:
+    """键中也包含占位符时，按原顺序重建整个字典"""
+    entries = [
+        (
+            key,
+            _compile_string(key) if isinstance(key, str) else None,
+            value,
+            _compile(value, copy_containers),
+        )
+        for key, value in source.items()
+    ]
+
+    def render(lookup):
+        return {
+            (key_renderer(lookup) if key_renderer else key): (value_renderer(lookup) if value_renderer else value)
+            for key, key_renderer, value, value_renderer in entries
+        }
+
+    return render
+
+
+def _compile_list(source: list, copy_containers: bool) -> Optional[Renderer]:
+    slots = []
+    for index, item in enumerate(source):
+        if type(item) is str:
+            if '${' not in item:
+                continue
+            item_renderer = _compile_string(item)
+        elif isinstance(item, (dict, list)):
+            item_renderer = _compile(item, copy_containers)
+        else:
+            continue
+        if item_renderer is not None:
+            slots.append((index, item_renderer))
+
+    if not slots and not copy_containers:
+        return None
+
+    def render(lookup):
+        out = list(source)
+        for index, item_renderer in slots:
+            out[index] = item_renderer(lookup)
+        return out
+
+    return render
+
+
+def _compile(value: Any, copy_containers: bool) -> Optional[Renderer]:
+    if isinstance(value, str):
+        return _compile_string(value)
+    if isinstance(value, dict):
+        return _compile_dict(value, copy_containers)
+    if isinstance(value, list):
+        return _compile_list(value, copy_containers)
+    return None
+
+
+def _render_once(value: Any, lookup) -> Any:
+    """不编译直接渲染，用于只渲染一次的值，dict/list 总是返回新对象"""
+    if isinstance(value, str):
+        if '${' not in value:
+            return value
+        return PLACEHOLDER_PATTERN.sub(lambda match: lookup(match.group(1), match.group(0)), value)
+    if isinstance(value, dict):
+        return {
+            (_render_once(key, lookup) if type(key) is str and '${' in key else key): _render_once(item, lookup)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_render_once(item, lookup) for item in value]
+    return value
+
+
+def _make_lookup(variables: Dict[str, Any], missing: Optional[str], none: Optional[str]):
+    get = variables.get
+
+    def lookup(name: str, placeholder: str) -> str:
+        value = get(name, _MISSING)
+        if value is _MISSING:
+            return placeholder if missing is None else missing
+        if value is None:
+            return placeholder if none is None else none
+        return value if isinstance(value, str) else str(value)
+
+    return lookup
+
+
+class CompiledTemplate:
+    """
+    编译后的变量模板
+
+    渲染时只处理含占位符的节点，不含占位符的子树：
+    - copy_containers=False 时直接与源对象共享（调用方不应修改渲染结果中的容器）
+    - copy_containers=True 时复制所有 dict/list，渲染结果可以安全修改
+    """
+
+    __slots__ = ('source', '_renderer')
+
+    def __init__(self, source: Any, copy_containers: bool = False):
+        self.source = source
+        self._renderer = _compile(source, copy_containers)
+
+    @property
+    def is_static(self) -> bool:
+        return self._renderer is None
+
+    def render(self, variables: Dict[str, Any], missing: Optional[str] = None,
+               none: Optional[str] = None) -> Any:
+        """
+        渲染模板
+
+        参数:
+            variables: 变量字典
+            missing: 变量不存在时的替换值，为 None 时保留原占位符
+            none: 变量值为 None 时的替换值，为 None 时保留原占位符（与 TestEngine 原有行为一致）；
+                  原来按 str(value) 替换的调用方传入 'None'
+
+        返回:
+            渲染后的值
+        """
+        if self._renderer is None:
+            return self.source
+        return self._renderer(_make_lookup(variables, missing, none))
+
+
+def compile_template(value: Any, copy_containers: bool = False) -> CompiledTemplate:
+    """编译步骤、参数或字符串为变量模板"""
+    return CompiledTemplate(value, copy_containers)
+
+
+def render_template(value: Any, variables: Dict[str, Any], missing: Optional[str] = None,
+                    none: Optional[str] = None) -> Any:
+    """
+    一次性渲染，不保留编译结果，参数含义同 CompiledTemplate.render
+
+    只渲染一次的值直接遍历替换，跳过不含占位符的字符串；需要反复渲染同一对象时应使用 compile_template
+    """
+    return _render_once(value, _make_lookup(variables, missing, none))
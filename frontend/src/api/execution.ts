@@ -17,7 +17,7 @@ export async function stopExecution(id: number): Promise<{ message: string }> {
   return post(`/executions/${id}/stop/`)
 }
 
-export async function getExecutionLogs(id: number): Promise<{ logs: any[] }> {
+export async function getExecutionLogs(id: number): Promise<{ logs: any[]; total?: number; has_full_log?: boolean }> {
   return get(`/executions/${id}/logs/`)
 }
 
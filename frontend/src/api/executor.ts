@@ -12,6 +12,7 @@ export interface Executor {
   scope: string
   scope_display: string
   max_concurrent: number
+  effective_capacity?: number | null
   current_tasks: number
   browser_types: string[]
   platform: string